@@ -1,83 +1,108 @@
 import torch
 import torch.nn as nn
-import torch.optim as optim
+import os
+import sys
 import numpy as np
 from sklearn.preprocessing import StandardScaler
 
-class SimpleKalman:
-    def __init__(self, q=0.01, r=0.1):
-        self.q = q
-        self.r = r
-        self.p = 1.0
-        self.x = 0.0
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from halo.filters import KalmanBank
 
-    def update(self, measurement):
-        self.p += self.q
-        k = self.p / (self.p + self.r)
-        self.x += k * (measurement - self.x)
-        self.p *= (1 - k)
-        return self.x
+NUM_INPUTS = 23
+MODEL_FILE = "glove_mlp.pth"
 
-X = np.load("sensor_inputs.npy")
-y = np.load("joint_outputs.npy")
+# Training lives in trainer.py (python trainer.py glove); importing this
+# module only defines the model and loads MODEL_FILE on the first
+# predict_live() call.
 
-x_scaler = StandardScaler()
-y_scaler = StandardScaler()
+# Same filter for training and live prediction: the recorded samples are run
+# through a fresh bank in order, live frames through one that keeps its state.
+def make_filter():
+    return KalmanBank(NUM_INPUTS, q=0.01, r=0.1)
 
-X_scaled = x_scaler.fit_transform(X)
-y_scaled = y_scaler.fit_transform(y)
+def load_data(inputs="sensor_inputs.npy", outputs="joint_outputs.npy"):
+    # filtered inputs, targets and the scalers fitted on them
+    X = make_filter().update(np.load(inputs))
+    y = np.load(outputs)
+    return X, y, StandardScaler().fit(X), StandardScaler().fit(y)
 
-X_tensor = torch.tensor(X_scaled, dtype=torch.float32)
-y_tensor = torch.tensor(y_scaled, dtype=torch.float32)
+def scaler_state(x_scaler, y_scaler):
+    # tensors, so the checkpoint loads with torch.load's weights_only default
+    return {k: torch.tensor(v) for k, v in (("x_mean", x_scaler.mean_), ("x_scale", x_scaler.scale_),
+                                            ("y_mean", y_scaler.mean_), ("y_scale", y_scaler.scale_))}
+
+def _scaler(mean, scale):
+    s = StandardScaler()
+    s.mean_, s.scale_ = np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+    s.var_, s.n_features_in_ = s.scale_ ** 2, len(s.mean_)
+    return s
 
 class GloveMLP(nn.Module):
-    def __init__(self, input_dim=23, output_dim=15):
+    # hidden: hidden layer sizes; deeper variants such as (128, 64) are compared
+    # by python sweep.py glove. The default is the layout glove_mlp.pth has.
+    def __init__(self, input_dim=23, output_dim=15, hidden=(64,)):
         super().__init__()
-        self.net = nn.Sequential(
-            nn.Linear(input_dim, 64),
-            nn.ReLU(),
-            nn.Linear(64, output_dim)
-            # nn.ReLU(),
-            # nn.Linear(128, 64),
-            # nn.ReLU(),
-            # nn.Linear(64, output_dim)
-        )
+        layers = []
+        for h in hidden:
+            layers += [nn.Linear(input_dim, h), nn.ReLU()]
+            input_dim = h
+        self.net = nn.Sequential(*layers, nn.Linear(input_dim, output_dim))
 
     def forward(self, x):
         return self.net(x)
 
-# Training
-model = GloveMLP()
-loss_fn = nn.MSELoss()
-optimizer = optim.Adam(model.parameters(), lr=0.001)
-
-# Split train
-train_size = int(0.8 * len(X_tensor)) 
-X_train, y_train = X_tensor[:train_size], y_tensor[:train_size]
-X_val, y_val = X_tensor[train_size:], y_tensor[train_size:]
-
-# Training
-for epoch in range(300):
-    model.train()
-    preds = model(X_train)
-    loss = loss_fn(preds, y_train)
-    optimizer.zero_grad()
-    loss.backward()
-    optimizer.step()
-
-    if epoch % 10 == 0:
-        val_loss = loss_fn(model(X_val), y_val)
-        print(f"Epoch {epoch}: Train Loss = {loss.item():.4f} | Val Loss = {val_loss.item():.4f}")
+def glove_arch(model):
+    # stored as "arch" in the checkpoint so load() rebuilds the same layers
+    return {"hidden": [m.out_features for m in model.net if isinstance(m, nn.Linear)][:-1]}
+
+model = None
+x_scaler = None
+y_scaler = None
+
+def build(ckpt):
+    # GloveMLP of a checkpoint's architecture; older ones are read off the weights
+    sd = ckpt["model_state"]
+    weights = [sd[k] for k in sorted((k for k in sd if k.endswith(".weight")), key=lambda k: int(k.split(".")[1]))]
+    hidden = ckpt["arch"]["hidden"] if "arch" in ckpt else [w.shape[0] for w in weights[:-1]]
+    return GloveMLP(weights[0].shape[1], weights[-1].shape[0], hidden)
+
+def load(path=MODEL_FILE):
+    global model, x_scaler, y_scaler
+    ckpt = torch.load(path, map_location="cpu")
+    model = build(ckpt)
+    model.load_state_dict(ckpt["model_state"])
+    model.eval()
+    x_scaler = _scaler(ckpt["x_mean"], ckpt["x_scale"])
+    y_scaler = _scaler(ckpt["y_mean"], ckpt["y_scale"])
+    return model
 
 # Prediction
-def predict_live(sensor_input):
+live_filter = make_filter()   # live_filter.reset() when a new glove session starts
 
-    kalman_filters = [SimpleKalman() for _ in range(23)]
-    
-    filtered = np.array([kf.update(val) for kf, val in zip(kalman_filters, sensor_input)])
+def predict_live(sensor_input):
+    # one frame (23,) -> (15,), or a block of frames (T, 23) -> (T, 15)
+    if model is None:
+        load()
+    sensor_input = np.asarray(sensor_input, dtype=np.float64)
+    filtered = live_filter.update(sensor_input).reshape(-1, NUM_INPUTS)
 
-    scaled = x_scaler.transform([filtered])
+    scaled = x_scaler.transform(filtered)
     tensor = torch.tensor(scaled, dtype=torch.float32)
     with torch.no_grad():
         output = model(tensor).numpy()
-    return y_scaler.inverse_transform(output)[0]  
+    out = y_scaler.inverse_transform(output)
+    return out[0] if sensor_input.ndim == 1 else out
+
+# Export for predictor.py (scalers folded into the weights, no sklearn needed)
+def export(path="glove_mlp.npz"):
+    from model_export import export_glove_mlp
+    if model is None:
+        load()
+    kf = live_filter
+    return export_glove_mlp(model, x_scaler, y_scaler, path, kalman={"q": kf.q, "r": kf.r})
+
+if __name__ == "__main__":
+    # python MLP.py [trainer options] == python trainer.py glove [trainer options]
+    import trainer
+    sys.argv[1:1] = ["glove"]
+    trainer.main()
@@ -1,12 +1,18 @@
+import os
+import sys
 import numpy as np
 
-N = 1000
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from halo.synth import glove_dataset
+
+N = 20000
 input_dim = 23   # 10 encoders + 4 flex + 9 IMU
 output_dim = 15  # joint values
 
-X = np.random.rand(N, input_dim)
-
-y = np.random.uniform(-1, 1, size=(N, output_dim))
+# simulated hand (halo/synth.py) instead of uniform noise: inputs and joints
+# come from the same motion, so the MLP has something to learn
+X, y = glove_dataset(N)
+assert X.shape == (N, input_dim) and y.shape == (N, output_dim)
 
 np.save("sensor_inputs.npy", X)
 np.save("joint_outputs.npy", y)
@@ -0,0 +1,355 @@
+# Distil the NewMLP LSTMClassifier into a small streaming student.
+#
+#   python distill.py train --teacher gesture_model.pth                # causal TCN -> gesture_student.pth
+#   python distill.py train --arch gru --hidden 64 -o gesture_gru.pth
+#   python distill.py report --student gesture_student.pth --frames 5000 --json report.json
+#
+# The LSTM re-reads its window (the checkpoint's arch seq_len, NewMLP SEQ_LEN
+# for old checkpoints) for every prediction; students are trained and
+# scored on that same window length. The students cost
+# the same per frame however long they run:
+#   tcn   causal dilated convolutions (kernel 3, dilations 1 2 4 8: a
+#         31-frame receptive field, shorter than the window). Streaming keeps
+#         the last (kernel - 1) * dilation inputs of each layer, so step() by
+#         step() gives exactly the outputs of forward() over a window.
+#   gru   one GRU layer carrying its hidden state from frame to frame. Like
+#         the stateful LSTM it is trained on windows but not cut at the
+#         window length when streaming.
+# Training matches the student to the teacher's temperature-softened output
+# (KL, weight alpha) plus the true labels (cross entropy); the teacher's
+# logits are computed once. The split is trainer.split's: the tail
+# --val-frac of every gesture run held out for early stopping.
+#
+# The report streams the same held-out stretches through the windowed LSTM,
+# the stateful LSTM and the student (inference_engine.StreamingClassifier,
+# one frame per push, reset between stretches) and prints, per model:
+# parameters, float32 size,
+# accuracy and agreement with the windowed LSTM on the frames every model
+# predicts, and the per-frame latency.
+#
+# NewMLP: live_inference(seq_mode=True, student=STUDENT_FILE).
+
+import argparse
+import io
+import json
+import os
+import time
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from inference_engine import StreamingClassifier
+import trainer
+
+
+# ---------- students ----------
+class StreamingStudent(nn.Module):
+    """forward(x (B, T, D)) -> logits of the last frame, like LSTMClassifier;
+    init_state(n) / step(frames (n, D), state) -> (logits, state) stream one
+    frame at a time. Inputs are standardised with buffers set from the
+    training data (set_scale), so raw degrees go in as with the LSTM."""
+
+    def __init__(self, input_dim):
+        super().__init__()
+        self.register_buffer("mean", torch.zeros(input_dim))
+        self.register_buffer("std", torch.ones(input_dim))
+
+    def set_scale(self, mean, std):
+        self.mean.copy_(torch.as_tensor(mean))
+        self.std.copy_(torch.as_tensor(std).clamp_min(1e-3))
+
+    def norm(self, x):
+        return (x - self.mean) / self.std
+
+
+class CausalTCN(StreamingStudent):
+    def __init__(self, input_dim, num_classes, channels=32, kernel=3, dilations=(1, 2, 4, 8)):
+        super().__init__(input_dim)
+        self.inp = nn.Conv1d(input_dim, channels, 1)
+        self.convs = nn.ModuleList(nn.Conv1d(channels, channels, kernel, dilation=d) for d in dilations)
+        self.fc = nn.Linear(channels, num_classes)
+        self.span = [(kernel - 1) * d for d in dilations]
+        self.receptive_field = 1 + sum(self.span)   # frames before the first prediction when streaming
+
+    def forward(self, x):
+        # only the last receptive_field frames reach the last output: unpadded
+        # convolutions over them shrink the sequence to that one frame
+        x = x[:, -self.receptive_field:]
+        if x.shape[1] < self.receptive_field:
+            x = F.pad(x, (0, 0, self.receptive_field - x.shape[1], 0))
+        h = self.inp(self.norm(x).transpose(1, 2))
+        for conv, span in zip(self.convs, self.span):
+            h = h[:, :, span:] + F.relu(conv(h))
+        return self.fc(h[:, :, -1])
+
+    def init_state(self, n, device="cpu"):
+        return [torch.zeros(n, conv.in_channels, span, device=device) for conv, span in zip(self.convs, self.span)]
+
+    def step(self, frames, state):
+        h = self.inp(self.norm(frames)[:, :, None])
+        new = []
+        for conv, buf in zip(self.convs, state):
+            x = torch.cat([buf, h], dim=2)
+            new.append(x[:, :, 1:])
+            h = h + F.relu(conv(x))
+        return self.fc(h[:, :, -1]), new
+
+
+class GRUStudent(StreamingStudent):
+    def __init__(self, input_dim, num_classes, hidden=64, window=50):
+        super().__init__(input_dim)
+        self.gru = nn.GRU(input_dim, hidden, batch_first=True)
+        self.fc = nn.Linear(hidden, num_classes)
+        self.receptive_field = window   # first streaming prediction once a training window has been seen
+
+    def forward(self, x):
+        _, h = self.gru(self.norm(x))
+        return self.fc(h[-1])
+
+    def init_state(self, n, device="cpu"):
+        return [torch.zeros(n, self.gru.hidden_size, device=device)]
+
+    def step(self, frames, state):
+        _, h = self.gru(self.norm(frames)[:, None], state[0][None].contiguous())
+        return self.fc(h[-1]), [h[0]]
+
+
+ARCHS = {"tcn": CausalTCN, "gru": GRUStudent}
+
+
+def build_student(arch, input_dim, num_classes, **kw):
+    return ARCHS[arch](input_dim, num_classes, **kw)
+
+
+def load_student(path, device="cpu"):
+    """(model, labels_map) from a checkpoint written by train()."""
+    ckpt = torch.load(path, map_location=device)
+    spec = ckpt["student"]
+    model = build_student(spec["arch"], spec["input_dim"], len(ckpt["labels_map"]), **spec["kwargs"])
+    model.load_state_dict(ckpt["model_state"])
+    return model.to(device).eval(), ckpt["labels_map"]
+
+
+def load_teacher(nm, path, device="cpu"):
+    """(model, labels_map, arch) of a NewMLP LSTMClassifier checkpoint."""
+    ckpt = torch.load(path, map_location=device)
+    model, arch = nm.load_model(ckpt)
+    if arch["type"] != "lstm":
+        raise ValueError(f"{path} holds a {arch['type']} model; the teacher must be an LSTMClassifier"
+                         " (trainer.py gesture --seq)")
+    return model.to(device).eval(), ckpt["labels_map"], arch
+
+
+def _teacher(nm, path, device="cpu"):
+    try:
+        return load_teacher(nm, path, device)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+
+
+# ---------- distillation ----------
+class DistillLoss(nn.Module):
+    """alpha * T^2 * KL(teacher_T || student_T) + (1 - alpha) * CE(labels).
+    target rows are the teacher's logits with the true label appended."""
+
+    def __init__(self, temperature=4.0, alpha=0.7):
+        super().__init__()
+        self.T, self.alpha = temperature, alpha
+
+    def forward(self, logits, target):
+        teacher, labels = target[:, :-1], target[:, -1].long()
+        kd = F.kl_div(F.log_softmax(logits / self.T, dim=1), F.log_softmax(teacher / self.T, dim=1),
+                      reduction="batchmean", log_target=True) * self.T ** 2
+        return self.alpha * kd + (1 - self.alpha) * F.cross_entropy(logits, labels)
+
+
+class SoftTargets(torch.utils.data.Dataset):
+    """(window, teacher logits + label) for the windows of `dataset`."""
+
+    def __init__(self, dataset, logits):
+        self.dataset, self.logits = dataset, logits
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, i):
+        x, y = self.dataset[i]
+        return x, torch.cat([self.logits[i], y.float()[None]])
+
+
+@torch.no_grad()
+def teacher_logits(teacher, dataset, batch_size=1024, device="cpu"):
+    loader = trainer._loader(dataset, batch_size, False, 0, torch.device(device))
+    return torch.cat([teacher(X.to(device)).cpu() for X, _ in loader])
+
+
+@torch.no_grad()
+def input_scale(dataset, n=2000):
+    idx = np.linspace(0, len(dataset) - 1, min(n, len(dataset))).astype(np.int64)
+    X = torch.stack([dataset[int(i)][0] for i in idx]).reshape(-1, dataset[0][0].shape[-1])
+    return X.mean(0), X.std(0)
+
+
+def train(args):
+    nm = trainer.load_newmlp()
+    device = torch.device(args.device)
+    teacher, labels_map, arch = _teacher(nm, args.teacher, device)
+    seq_len = arch["seq_len"]
+    ds = nm.GestureDataset(args.csv or nm.CSV_FILE, seq_len=seq_len, mmap=args.mmap)
+    if ds.labels_map != labels_map:
+        raise SystemExit(f"{args.csv or nm.CSV_FILE} has other labels than the teacher {args.teacher}")
+    train_ds, val_ds = trainer.split(ds, args.val_frac)
+
+    t0 = time.perf_counter()
+    soft_train = teacher_logits(teacher, train_ds, device=device)
+    soft_val = teacher_logits(teacher, val_ds, device=device)
+    print(f"teacher logits for {len(ds)} {seq_len}-frame windows in {time.perf_counter() - t0:.1f} s")
+
+    kwargs = {"channels": args.channels} if args.arch == "tcn" else {"hidden": args.hidden, "window": seq_len}
+    student = build_student(args.arch, ds.samples.shape[-1], len(labels_map), **kwargs)
+    student.set_scale(*input_scale(train_ds))
+    extra = {"labels_map": labels_map, "teacher": os.path.abspath(args.teacher),
+             "student": {"arch": args.arch, "input_dim": ds.samples.shape[-1], "kwargs": kwargs},
+             "distill": {"temperature": args.temperature, "alpha": args.alpha}}
+    trainer.fit(student, SoftTargets(train_ds, soft_train), SoftTargets(val_ds, soft_val),
+                DistillLoss(args.temperature, args.alpha), args.out, extra=extra, epochs=args.epochs,
+                batch_size=args.batch_size, lr=args.lr, workers=args.workers, patience=args.patience,
+                resume=args.resume, device=device)
+    return args.out
+
+
+# ---------- report ----------
+def size_of(model):
+    buf = io.BytesIO()
+    torch.save(model.state_dict(), buf)
+    return sum(p.numel() for p in model.parameters()), buf.tell()
+
+
+def stream(engine, stretches, first):
+    """Push each stretch of frames one at a time from a reset engine;
+    predictions from frame `first` of each on (-1 where the engine did not
+    predict) and the wall time per frame."""
+    out, n = [], 0
+    t0 = time.perf_counter()
+    for frames in stretches:
+        engine.reset()
+        preds = np.full(len(frames), -1, dtype=np.int64)
+        for t, frame in enumerate(frames):
+            ds, p, _ = engine.push(frame[None])
+            if len(ds):
+                preds[t] = p[0]
+        out.append(preds[first:])
+        n += len(frames)
+    return np.concatenate(out), (time.perf_counter() - t0) / n
+
+
+def held_out(ds, seq_len, val_frac, max_frames=0):
+    """The held-out seq_len windows of trainer.split as frame stretches: one
+    (frames, labels) per contiguous run of held-out windows, each starting
+    seq_len - 1 frames before its first window ends."""
+    n_win = max(len(ds) - seq_len, 0)
+    win_labels = ds.labels[seq_len - 1:seq_len - 1 + n_win]
+    _, val = trainer.split_indices(win_labels, val_frac, seq_len - 1)
+    breaks = np.flatnonzero(np.diff(val) > 1) + 1
+    stretches, total = [], 0
+    for run in np.split(val, breaks) if len(val) else []:
+        a, b = run[0], run[-1] + seq_len
+        if max_frames and total + b - a > max_frames:
+            b = a + max_frames - total
+            if b - a < seq_len:
+                break
+        stretches.append((ds.samples[a:b].numpy(), ds.labels[a:b].numpy()))
+        total += b - a
+        if max_frames and total >= max_frames:
+            break
+    return stretches
+
+
+def report(args):
+    nm = trainer.load_newmlp()
+    teacher, labels_map, arch = _teacher(nm, args.teacher)
+    student, s_labels = load_student(args.student)
+    if s_labels != labels_map:
+        raise SystemExit(f"{args.student} was trained on other labels than {args.teacher}")
+    ds = nm.GestureDataset(args.csv or nm.CSV_FILE, seq_len=1)
+    L = arch["seq_len"]
+    stretches = held_out(ds, L, args.val_frac, args.frames)
+    if not stretches:
+        raise SystemExit("not enough held-out frames")
+    frames = [f for f, _ in stretches]
+    D = frames[0].shape[1]
+
+    engines = {
+        "lstm (window)": (teacher, StreamingClassifier(teacher, D, L)),
+        "lstm (stateful)": (teacher, StreamingClassifier(teacher, D, L, stateful=True)),
+        f"{type(student).__name__} student": (student, StreamingClassifier(student, D, L)),
+    }
+    first = L - 1   # every model predicts from here on
+    truth = np.concatenate([labels[first:] for _, labels in stretches])
+    n_frames = sum(len(f) for f in frames)
+    rows, ref = [], None
+    for name, (model, engine) in engines.items():
+        preds, wall = stream(engine, frames, first)
+        ref = preds if ref is None else ref
+        params, size = size_of(model)
+        lat = engine.latency()
+        rows.append({"model": name, "params": params, "size_kb": size / 1024,
+                     "accuracy": float(np.mean(preds == truth)), "agreement": float(np.mean(preds == ref)),
+                     "p50_ms": lat["p50_ms"], "p99_ms": lat["p99_ms"], "frames_per_s": 1 / wall})
+
+    print(f"held-out: {len(frames)} stretches, {n_frames} frames, {len(truth)} scored, {L}-frame windows")
+    print(f"{'model':<22} {'params':>8} {'KB':>8} {'acc':>7} {'agree':>7} {'p50 ms':>8} {'p99 ms':>8} {'frames/s':>9}")
+    for r in rows:
+        print(f"{r['model']:<22} {r['params']:8d} {r['size_kb']:8.1f} {r['accuracy']:7.3f} {r['agreement']:7.3f}"
+              f" {r['p50_ms']:8.3f} {r['p99_ms']:8.3f} {r['frames_per_s']:9.0f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"frames": n_frames, "stretches": len(frames), "scored": len(truth), "seq_len": L,
+                       "teacher": args.teacher,
+                       "student": args.student, "models": rows}, f, indent=1)
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Distil the gesture LSTM into a streaming student")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("train", "report"):
+        p = sub.add_parser(name)
+        p.add_argument("--teacher", default="gesture_model.pth", help="LSTMClassifier checkpoint")
+        p.add_argument("--csv", help="data CSV (default NewMLP CSV_FILE)")
+        p.add_argument("--val-frac", type=float, default=0.2)
+        p.add_argument("--threads", type=int, default=0, help="torch.set_num_threads (0 = torch default)")
+    p = sub.choices["train"]
+    p.add_argument("--arch", choices=sorted(ARCHS), default="tcn")
+    p.add_argument("--channels", type=int, default=32, help="tcn: channels per layer")
+    p.add_argument("--hidden", type=int, default=64, help="gru: hidden size")
+    p.add_argument("--temperature", type=float, default=4.0)
+    p.add_argument("--alpha", type=float, default=0.7, help="weight of the teacher term")
+    p.add_argument("--mmap", action="store_true", help="keep the dataset on disk")
+    p.add_argument("-o", "--out", default="gesture_student.pth")
+    p.add_argument("--epochs", type=int, default=30)
+    p.add_argument("--batch-size", type=int, default=64)
+    p.add_argument("--lr", type=float, default=3e-3)
+    p.add_argument("--patience", type=int, default=5, help="0 disables early stopping")
+    p.add_argument("--workers", type=int, default=0, help="DataLoader worker processes")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--resume", action="store_true", help="continue from <out>.ckpt")
+    p.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    p = sub.choices["report"]
+    p.add_argument("--student", default="gesture_student.pth")
+    p.add_argument("--frames", type=int, default=5000, help="held-out frames streamed (0 = all)")
+    p.add_argument("--json", help="also write the report here")
+    args = ap.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    if args.cmd == "train":
+        torch.manual_seed(args.seed)
+        print("✅ Student saved:", train(args))
+    else:
+        report(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+# Columnar cache for gesture_data.csv.
+#
+# The CSV is converted once into a directory next to it:
+#   gesture_data.store/samples.npy   float32 (N, 33)
+#   gesture_data.store/labels.npy    int16   (N,)    ids into labels_map
+#   gesture_data.store/meta.json     labels_map, row count, CSV size/mtime
+# and rebuilt automatically when the CSV changes. Conversion streams the CSV
+# in blocks straight into a memmapped .npy, so it works for files larger than
+# RAM, and loading is an np.load (optionally mmap_mode="r").
+#
+# Sequence windows are strided views over the samples (no per-window copies):
+# window i is samples[i:i+seq_len] with the label of its last frame, the same
+# windows GestureDataset used to build with torch.stack. With segment=...
+# the windows are the motion segments instead (halo/segment.py): one per
+# movement, resampled to seq_len, labelled with the gesture it ends in.
+#
+# AugmentedDataset wraps one of these (or a Subset of one, e.g. the train
+# split) and augments whole batches on the fly (halo/augment.py), inside the
+# DataLoader workers.
+
+import json
+import os
+import sys
+import warnings
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from halo.augment import Augment, batch_rng
+from halo.segment import segment_windows
+
+BLOCK_BYTES = 16 << 20
+
+
+def store_dir_for(csv_file):
+    return os.path.splitext(csv_file)[0] + ".store"
+
+
+def _csv_signature(csv_file):
+    st = os.stat(csv_file)
+    return {"size": st.st_size, "mtime": st.st_mtime}
+
+
+def _iter_blocks(csv_file):
+    with open(csv_file, "rb") as f:
+        rest = b""
+        while True:
+            block = f.read(BLOCK_BYTES)
+            if not block:
+                if rest.strip():
+                    yield rest
+                return
+            block = rest + block
+            cut = block.rfind(b"\n") + 1
+            rest = block[cut:]
+            if cut:
+                yield block[:cut]
+
+
+def _parse_block(block, n_cols):
+    """(labels, (rows, n_cols) values, n_cols, rows skipped)."""
+    lines = [l for l in block.replace(b"\r", b"").split(b"\n") if l]
+    heads, tails = [], []
+    for line in lines:
+        head, _, tail = line.partition(b",")
+        heads.append(head)
+        tails.append(tail)
+    vals = np.fromstring(b",".join(tails), dtype=np.float32, sep=",") if tails else np.zeros(0, np.float32)
+    if n_cols is None and tails:
+        n_cols = tails[0].count(b",") + 1
+    if vals.size == len(tails) * n_cols:
+        return heads, vals.reshape(-1, n_cols), n_cols, 0
+    # some rows have the wrong number of columns: keep only the good ones
+    keep = [i for i, t in enumerate(tails) if t.count(b",") == n_cols - 1]
+    heads = [heads[i] for i in keep]
+    vals = np.fromstring(b",".join(tails[i] for i in keep), dtype=np.float32, sep=",")
+    return heads, vals.reshape(-1, n_cols), n_cols, len(tails) - len(keep)
+
+
+def build_store(csv_file, out_dir=None):
+    """Convert the CSV into the columnar store; returns the store directory.
+    Raises ValueError if the CSV has no data rows; rows with the wrong
+    number of fields are skipped, with a warning and a count in meta.json."""
+    out_dir = out_dir or store_dir_for(csv_file)
+
+    # pass 1: upper bound on rows and the column count (from the first row)
+    n_max = 0
+    n_cols = None
+    for block in _iter_blocks(csv_file):
+        n_max += block.count(b"\n") + (0 if block.endswith(b"\n") else 1)
+        if n_cols is None:
+            first = next((l.strip() for l in block.split(b"\n") if l.strip()), b"")
+            n_cols = first.count(b",") or None
+    if n_cols is None:
+        raise ValueError(f"{csv_file}: no data rows (expected label,value,... lines)")
+    os.makedirs(out_dir, exist_ok=True)
+    samples = np.lib.format.open_memmap(os.path.join(out_dir, "samples.tmp.npy"), mode="w+",
+                                        dtype=np.float32, shape=(max(n_max, 1), n_cols))
+    labels = np.zeros(max(n_max, 1), dtype=np.int16)
+
+    # pass 2: parse block by block; label ids in order of first appearance
+    seen = {}
+    n = skipped = 0
+    for block in _iter_blocks(csv_file):
+        heads, vals, n_cols, bad = _parse_block(block, n_cols)
+        ids = [seen.setdefault(h, len(seen)) for h in heads]
+        samples[n:n + len(vals)] = vals
+        labels[n:n + len(vals)] = ids
+        n += len(vals)
+        skipped += bad
+    samples.flush()
+    del samples
+    if n == 0:
+        os.remove(os.path.join(out_dir, "samples.tmp.npy"))
+        raise ValueError(f"{csv_file}: no rows with {n_cols} values after the label ({skipped} skipped)")
+    if skipped:
+        warnings.warn(f"{csv_file}: skipped {skipped} rows without {n_cols} values after the label")
+
+    # same label ids as before: sorted label names
+    names = sorted(seen, key=lambda b: b.decode())
+    remap = np.zeros(len(seen), dtype=np.int16)
+    for new_id, name in enumerate(names):
+        remap[seen[name]] = new_id
+    np.save(os.path.join(out_dir, "labels.npy"), remap[labels[:n]])
+
+    os.replace(os.path.join(out_dir, "samples.tmp.npy"), os.path.join(out_dir, "samples.npy"))
+    meta = {
+        "rows": n,
+        "cols": n_cols,
+        "skipped_rows": skipped,
+        "labels_map": {name.decode(): i for i, name in enumerate(names)},
+        "csv": _csv_signature(csv_file),
+    }
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=1)
+    return out_dir
+
+
+class GestureStore:
+    def __init__(self, store_dir, mmap=False):
+        with open(os.path.join(store_dir, "meta.json")) as f:
+            self.meta = json.load(f)
+        mode = "r" if mmap else None
+        n = self.meta["rows"]
+        self.samples = np.load(os.path.join(store_dir, "samples.npy"), mmap_mode=mode)[:n]
+        self.labels = np.load(os.path.join(store_dir, "labels.npy"), mmap_mode=mode)[:n]
+        self.labels_map = self.meta["labels_map"]
+        self.inv_labels_map = {i: l for l, i in self.labels_map.items()}
+
+    @classmethod
+    def from_csv(cls, csv_file, mmap=False, store_dir=None):
+        """Open the cached store for csv_file, (re)building it if it is stale."""
+        store_dir = store_dir or store_dir_for(csv_file)
+        meta_path = os.path.join(store_dir, "meta.json")
+        fresh = False
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                fresh = json.load(f).get("csv") == _csv_signature(csv_file)
+        if not fresh:
+            build_store(csv_file, store_dir)
+        return cls(store_dir, mmap=mmap)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def windows(self, seq_len):
+        """(windows, labels): windows[i] == samples[i:i+seq_len] as a strided view."""
+        n = len(self.samples) - seq_len
+        if n <= 0:
+            return np.zeros((0, seq_len, self.samples.shape[1]), np.float32), self.labels[:0]
+        win = np.lib.stride_tricks.sliding_window_view(self.samples, seq_len, axis=0)
+        # sliding_window_view puts the window axis last: (N, cols, L) -> (N, L, cols)
+        return win[:n].transpose(0, 2, 1), self.labels[seq_len - 1:seq_len - 1 + n]
+
+    def segments(self, seq_len, **kw):
+        """(windows, labels) cut at the motion: one (seq_len, cols) window per
+        segment (halo.segment.segment_windows arguments in kw)."""
+        X, y, _ = segment_windows(self.samples, self.labels, seq_len, **kw)
+        return X, y
+
+
+class StoreDataset(torch.utils.data.Dataset):
+    """Dataset over a GestureStore: single frames (seq_len=1) or windows.
+
+    In RAM the windows come from Tensor.unfold (a view); with mmap=True each
+    item is copied out of the memmapped window view on access. segment (a dict
+    of segment_windows arguments) uses one window per motion segment instead.
+    """
+
+    def __init__(self, store, seq_len=1, segment=None):
+        self.store = store
+        self.seq_len = seq_len
+        self.labels_map = store.labels_map
+        self.inv_labels_map = store.inv_labels_map
+        self.mmap = isinstance(store.samples, np.memmap) and segment is None
+        # neighbours that can share frames (trainer.split keeps them out of
+        # training next to held-out items): overlapping windows, or the split
+        # pieces of one long motion
+        self.overlap = seq_len - 1 if segment is None else 1
+
+        if segment is not None:
+            X, labels = store.segments(seq_len, **segment)
+            self.samples = torch.from_numpy(X)
+        elif seq_len > 1:
+            if self.mmap:
+                self.samples, labels = store.windows(seq_len)
+            else:
+                x = torch.from_numpy(np.ascontiguousarray(store.samples))
+                n = max(len(x) - seq_len, 0)
+                self.samples = x.unfold(0, seq_len, 1)[:n].transpose(1, 2)
+                labels = store.labels[seq_len - 1:seq_len - 1 + n]
+        else:
+            self.samples = store.samples if self.mmap else torch.from_numpy(np.ascontiguousarray(store.samples))
+            labels = store.labels
+        self.labels = torch.from_numpy(np.asarray(labels, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        x = self.samples[idx]
+        if self.mmap:
+            x = torch.from_numpy(np.array(x, dtype=np.float32))
+        return x, self.labels[idx]
+
+
+def _resolve(ds, idx):
+    """Follow Subset chains down to the dataset holding the samples."""
+    idx = np.asarray(idx, dtype=np.int64)
+    while isinstance(ds, torch.utils.data.Subset):
+        idx = np.asarray(ds.indices, dtype=np.int64)[idx] if not isinstance(ds.indices, range) else \
+            ds.indices.start + idx * ds.indices.step
+        ds = ds.dataset
+    return ds, idx
+
+
+class AugmentedDataset(torch.utils.data.Dataset):
+    """dataset (a StoreDataset or Subset of one) augmented per batch.
+
+    The DataLoader fetches a whole batch through __getitems__: the windows are
+    gathered with one fancy index and augmented together. The rng for a batch
+    comes from (seed, its indices), so a run repeats exactly for any number of
+    workers, and the reshuffle gives every epoch new draws. Pass
+    collate_fn=AugmentedDataset.collate (trainer._loader does). augment is an
+    Augment or a dict of its arguments (NewMLP AUGMENT); single frames
+    (seq_len=1) skip the time warp.
+    """
+
+    def __init__(self, dataset, augment=None, seed=0):
+        self.dataset = dataset
+        self.augment = augment if isinstance(augment, Augment) else Augment(**(augment or {}))
+        self.seed = seed
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, idx):
+        X, y = self.__getitems__([idx])
+        return X[0], y[0]
+
+    def __getitems__(self, indices):
+        base, idx = _resolve(self.dataset, indices)
+        if isinstance(base, StoreDataset):
+            X = base.samples[torch.from_numpy(idx)] if torch.is_tensor(base.samples) else base.samples[idx]
+            y = base.labels[torch.from_numpy(idx)]
+        else:
+            items = [self.dataset[i] for i in indices]
+            X = torch.stack([torch.as_tensor(x) for x, _ in items])
+            y = torch.stack([torch.as_tensor(t) for _, t in items])
+        X = np.asarray(X, dtype=np.float32)
+        frames = X.ndim == 2
+        X = self.augment(X[:, None] if frames else X, batch_rng(self.seed, indices))
+        return torch.from_numpy(X[:, 0] if frames else X), y
+
+    @staticmethod
+    def collate(batch):
+        return batch
@@ -0,0 +1,486 @@
+# Warm inference daemon: gesture and joint predictions over a local socket.
+#
+# Importing torch / sklearn / serial and building the models takes seconds in
+# every process that wants a prediction. The daemon does it once and serves
+# any number of clients over a Unix domain socket (or localhost TCP with
+# --port, e.g. on Windows):
+#   gesture   NewMLP's gesture_model.pth (MLP on frames or LSTMClassifier on
+#             windows, detected from the checkpoint) -> logits per item
+#   joints    MLP.py's glove_mlp.pth (GloveMLP and its scalers) -> the 15
+#             joint values; each connection has its own Kalman filter, as
+#             predict_live() keeps one per glove session
+#
+# Requests from all connections are micro-batched: the first item opens a
+# batch, anything else arriving within max_wait (or while the previous batch
+# is still running) joins it, up to max_batch items of the same shape, and
+# the batch is one forward pass on a worker thread while the event loop keeps
+# reading. A changed checkpoint (mtime polled every `watch` s, SIGHUP, or a
+# RELOAD request) is loaded on the side and swapped in between batches;
+# connections stay open and the response's version field tells clients.
+#
+# Wire format, little-endian, float32 payloads:
+#   request   REQUEST  id u32 | op u8 | flags u8 | n u16 | t u16 | d u16
+#             then n * t * d floats (n items of t frames of d values)
+#   response  RESPONSE id u32 | status u8 | op u8 | version u16 | n u16 | k u16 | nbytes u32
+#             then nbytes: n * k floats (ok), JSON (INFO) or a UTF-8 error
+# Requests on one connection may be pipelined; responses carry the id.
+#
+#   python inference_daemon.py serve [--socket /tmp/halo-inference.sock] [--max-batch 64]
+#   python inference_daemon.py info | reload
+#
+#   with DaemonClient() as c:
+#       c.predict_label(window)         # like predictor.Predictor.predict_label
+#       c.predict_live(sensor_frame)    # like MLP.predict_live, filtered per connection
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from halo.metrics import Metrics
+
+SOCKET = "/tmp/halo-inference.sock"
+REQUEST = struct.Struct("<IBBHHH")
+RESPONSE = struct.Struct("<IBBHHHI")
+OP_GESTURE, OP_JOINTS, OP_INFO, OP_RELOAD = 1, 2, 3, 4
+FLAG_RAW = 1            # joints: skip the connection's Kalman filter
+FLAG_RESET = 2          # joints: reset the connection's Kalman filter first
+OK, ERROR = 0, 1
+
+
+# ---------- models ----------
+class Models:
+    """Both checkpoints, loaded together; replaced as a whole on reload."""
+
+    def __init__(self, gesture_path, glove_path, version=0):
+        import torch
+
+        self.torch = torch
+        self.version = version
+        self.paths = {"gesture": gesture_path, "glove": glove_path}
+        self.mtimes = {k: _mtime(p) for k, p in self.paths.items()}
+        self.gesture = self.glove = None
+        if gesture_path and os.path.exists(gesture_path):
+            self._load_gesture(gesture_path)
+        if glove_path and os.path.exists(glove_path):
+            self._load_glove(glove_path)
+        if self.gesture is None and self.glove is None:
+            raise FileNotFoundError(f"no checkpoint at {gesture_path} or {glove_path}")
+
+    def _load_gesture(self, path):
+        import trainer
+
+        nm = trainer.load_newmlp()
+        ckpt = self.torch.load(path, map_location="cpu")
+        self.labels_map = ckpt["labels_map"]
+        # sizes and window length from the checkpoint (its "arch", or the weights)
+        model, arch = nm.load_model(ckpt)
+        self.input_dim = arch["input_dim"]
+        self.seq = arch["type"] == "lstm"
+        self.seq_len = arch["seq_len"]
+        self.gesture = model.eval()
+
+    def _load_glove(self, path):
+        import MLP as glove
+
+        ckpt = self.torch.load(path, map_location="cpu")
+        model = glove.build(ckpt)
+        model.load_state_dict(ckpt["model_state"])
+        self.glove = model.eval()
+        f32 = lambda k: np.asarray(ckpt[k], dtype=np.float32)
+        self.x_mean, self.x_scale, self.y_mean, self.y_scale = (f32("x_mean"), f32("x_scale"), f32("y_mean"),
+                                                                f32("y_scale"))
+        self.make_filter = glove.make_filter
+
+    def changed(self):
+        return any(_mtime(p) != self.mtimes[k] for k, p in self.paths.items())
+
+    def info(self):
+        out = {"version": self.version}
+        if self.gesture is not None:
+            out["gesture"] = {"kind": "lstm" if self.seq else "mlp", "labels_map": self.labels_map,
+                              "input_dim": self.input_dim, "seq_len": self.seq_len}
+        if self.glove is not None:
+            out["joints"] = {"input_dim": len(self.x_mean), "output_dim": len(self.y_mean)}
+        return out
+
+    # ---------- forward (worker thread) ----------
+    def run_gesture(self, x):
+        with self.torch.no_grad():
+            x = self.torch.from_numpy(x if self.seq else x[:, -1])
+            return self.gesture(x).numpy()
+
+    def run_joints(self, x):
+        x = (x[:, -1] - self.x_mean) / self.x_scale
+        with self.torch.no_grad():
+            y = self.glove(self.torch.from_numpy(x)).numpy()
+        return y * self.y_scale + self.y_mean
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns if path else None
+    except FileNotFoundError:
+        return None
+
+
+# ---------- micro-batching ----------
+class Batcher:
+    """Collects (items, future) from all connections and runs them as one
+    forward pass per shape, on the daemon's worker thread."""
+
+    def __init__(self, daemon, op, max_batch=64, max_wait=0.001):
+        self.daemon = daemon
+        self.op = op
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.pending = deque()
+        self.rows = 0
+        self.wakeup = asyncio.Event()
+
+    def submit(self, x):
+        fut = asyncio.get_running_loop().create_future()
+        self.pending.append((x, fut))
+        self.rows += len(x)
+        self.wakeup.set()
+        return fut
+
+    def _take(self):
+        # oldest first, up to max_batch items shaped like the oldest
+        shape = self.pending[0][0].shape[1:]
+        taken, rows, keep = [], 0, deque()
+        while self.pending:
+            x, fut = self.pending.popleft()
+            if x.shape[1:] == shape and (not taken or rows + len(x) <= self.max_batch):
+                taken.append((x, fut))
+                rows += len(x)
+            else:
+                keep.append((x, fut))
+        self.pending = keep
+        self.rows -= rows
+        return taken
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        metrics = self.daemon.metrics
+        name = "gesture" if self.op == OP_GESTURE else "joints"
+        while True:
+            if not self.pending:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+            if self.max_wait and self.rows < self.max_batch:
+                await asyncio.sleep(self.max_wait)
+            batch = self._take()
+            models = self.daemon.models
+            x = np.concatenate([x for x, _ in batch]) if len(batch) > 1 else batch[0][0]
+            fn = models.run_gesture if self.op == OP_GESTURE else models.run_joints
+            t0 = time.perf_counter()
+            try:
+                out = await loop.run_in_executor(self.daemon.pool, fn, x)
+            except Exception as e:      # a bad batch fails its requests, not the daemon
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            metrics.observe(name, time.perf_counter() - t0)
+            metrics.count("batches")
+            metrics.count(f"{name}_items", len(x))
+            a = 0
+            for xi, fut in batch:
+                if not fut.done():
+                    fut.set_result((out[a:a + len(xi)], models.version))
+                a += len(xi)
+
+
+# ---------- server ----------
+class Connection:
+    def __init__(self, writer):
+        self.writer = writer
+        self.filter = None
+
+    def send(self, rid, status, op, version, n=0, k=0, payload=b""):
+        if self.writer.is_closing():
+            return
+        self.writer.write(RESPONSE.pack(rid, status, op, version, n, k, len(payload)))
+        if payload:
+            self.writer.write(payload)
+
+
+class InferenceDaemon:
+    def __init__(self, gesture_path="gesture_model.pth", glove_path="glove_mlp.pth", max_batch=64,
+                 max_wait=0.001, watch=1.0, threads=1, log=print):
+        self.models = Models(gesture_path, glove_path)
+        self.max_batch = max_batch
+        self.watch = watch
+        self.log = log
+        self.metrics = Metrics()
+        self.pool = ThreadPoolExecutor(1, thread_name_prefix="halo-infer")
+        self.models.torch.set_num_threads(threads)
+        self.batchers = {op: Batcher(self, op, max_batch, max_wait) for op in (OP_GESTURE, OP_JOINTS)}
+        self.connections = 0
+        self._reloading = None
+
+    # ---------- requests ----------
+    async def handle(self, reader, writer):
+        conn = Connection(writer)
+        self.connections += 1
+        self.metrics.count("connections")
+        try:
+            while True:
+                head = await reader.readexactly(REQUEST.size)
+                rid, op, flags, n, t, d = REQUEST.unpack(head)
+                body = await reader.readexactly(n * t * d * 4) if n else b""
+                self.metrics.count("requests")
+                if op in self.batchers:
+                    x = np.frombuffer(bytearray(body), dtype=np.float32).reshape(n, t, d)
+                    asyncio.ensure_future(self._predict(conn, rid, op, flags, x))
+                elif op == OP_INFO:
+                    conn.send(rid, OK, op, self.models.version, payload=json.dumps(self.models.info()).encode())
+                elif op == OP_RELOAD:
+                    ok = await self.reload(force=True)
+                    conn.send(rid, OK if ok else ERROR, op, self.models.version,
+                              payload=b"" if ok else b"reload failed, previous models kept")
+                else:
+                    conn.send(rid, ERROR, op, self.models.version, payload=f"unknown op {op}".encode())
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    def _check(self, op, x):
+        m = self.models
+        if op == OP_GESTURE:
+            if m.gesture is None:
+                return "no gesture model loaded"
+            if x.shape[2] != m.input_dim or (not m.seq and x.shape[1] != 1):
+                return f"gesture expects (n, {m.seq_len}, {m.input_dim}), got {x.shape}"
+        else:
+            if m.glove is None:
+                return "no glove model loaded"
+            if x.shape[1:] != (1, len(m.x_mean)):
+                return f"joints expects (n, 1, {len(m.x_mean)}), got {x.shape}"
+        return None
+
+    async def _predict(self, conn, rid, op, flags, x):
+        error = self._check(op, x)
+        if error:
+            conn.send(rid, ERROR, op, self.models.version, payload=error.encode())
+            return
+        if op == OP_JOINTS and not flags & FLAG_RAW:
+            # per connection and in arrival order, like predict_live()
+            if conn.filter is None or flags & FLAG_RESET:
+                conn.filter = self.models.make_filter()
+            x = conn.filter.update(x[:, 0].astype(np.float64)).astype(np.float32)[:, None]
+        try:
+            out, version = await self.batchers[op].submit(x)
+        except Exception as e:
+            conn.send(rid, ERROR, op, self.models.version, payload=str(e).encode())
+            return
+        out = np.ascontiguousarray(out, dtype=np.float32)
+        conn.send(rid, OK, op, version, len(out), out.shape[1], out.tobytes())
+
+    # ---------- reload ----------
+    async def reload(self, force=False):
+        """Load changed checkpoints next to the running ones and swap them in;
+        on failure the previous models stay."""
+        if self._reloading is not None:
+            return await self._reloading
+        if not force and not self.models.changed():
+            return True
+        self._reloading = asyncio.ensure_future(self._reload())
+        try:
+            return await self._reloading
+        finally:
+            self._reloading = None
+
+    async def _reload(self):
+        old = self.models
+        loop = asyncio.get_running_loop()
+        try:
+            new = await loop.run_in_executor(None, Models, old.paths["gesture"], old.paths["glove"],
+                                             (old.version + 1) % 65536)
+        except Exception as e:
+            self.log(f"[daemon] reload failed ({e}); keeping version {old.version}")
+            return False
+        self.models = new
+        self.metrics.count("reloads")
+        self.log(f"[daemon] loaded version {new.version}")
+        return True
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.watch)
+            if self.models.changed():
+                # let a checkpoint that is still being written settle
+                await asyncio.sleep(self.watch / 2)
+                await self.reload()
+
+    # ---------- run ----------
+    async def serve(self, path=SOCKET, port=None, stats_every=0.0):
+        if port:
+            server = await asyncio.start_server(self.handle, "127.0.0.1", port)
+        else:
+            if os.path.exists(path):
+                os.remove(path)
+            server = await asyncio.start_unix_server(self.handle, path)
+        tasks = [asyncio.ensure_future(b.run()) for b in self.batchers.values()]
+        if self.watch:
+            tasks.append(asyncio.ensure_future(self._watch()))
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        try:
+            loop.add_signal_handler(signal.SIGTERM, stop.set)
+            loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(self.reload(force=True)))
+        except (NotImplementedError, AttributeError):      # Windows: Ctrl+C and RELOAD requests only
+            pass
+        self.log(f"[daemon] serving {json.dumps(self.models.info())} on {f'127.0.0.1:{port}' if port else path}")
+        try:
+            async with server:
+                while not stop.is_set():
+                    try:
+                        await asyncio.wait_for(stop.wait(), stats_every or None)
+                    except asyncio.TimeoutError:
+                        self.log(f"[daemon] {self.hud()}")
+        finally:
+            for task in tasks:
+                task.cancel()
+            if not port and os.path.exists(path):
+                os.remove(path)
+
+    def hud(self):
+        c = self.metrics.counters
+        items = c.get("gesture_items", 0) + c.get("joints_items", 0)
+        return (f"v{self.models.version}  {self.connections} clients  {c.get('requests', 0)} requests"
+                f"  {items / max(c.get('batches', 0), 1):.1f} items/batch  {self.metrics.hud()}")
+
+
+# ---------- client ----------
+class DaemonClient:
+    """Blocking client; one connection, and so one Kalman filter, per glove."""
+
+    def __init__(self, path=SOCKET, port=None, timeout=5.0):
+        if port:
+            self.sock = socket.create_connection(("127.0.0.1", port), timeout)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(path)
+        self._id = 0
+        self._reset = False
+        self.version = None
+        self._info = None
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _recv(self, n):
+        buf = bytearray(n)
+        view, got = memoryview(buf), 0
+        while got < n:
+            k = self.sock.recv_into(view[got:])
+            if not k:
+                raise ConnectionError("daemon closed the connection")
+            got += k
+        return bytes(buf)
+
+    def call(self, op, x=None, flags=0):
+        """One request -> (array (n, k), JSON or None); raises on an error status."""
+        self._id = (self._id + 1) % (1 << 32)
+        x = np.zeros((0, 0, 0), np.float32) if x is None else np.ascontiguousarray(x, dtype=np.float32)
+        self.sock.sendall(REQUEST.pack(self._id, op, flags, *x.shape) + x.tobytes())
+        rid, status, op, version, n, k, nbytes = RESPONSE.unpack(self._recv(RESPONSE.size))
+        payload = self._recv(nbytes) if nbytes else b""
+        if status != OK:
+            raise RuntimeError(payload.decode(errors="replace"))
+        if version != self.version:
+            self.version, self._info = version, None
+        if op == OP_INFO:
+            return None, json.loads(payload)
+        return np.frombuffer(payload, dtype=np.float32).reshape(n, k), None
+
+    def info(self):
+        if self._info is None:
+            self._info = self.call(OP_INFO)[1]
+        return self._info
+
+    def reload(self):
+        self.call(OP_RELOAD)
+        return self.info()
+
+    def gesture_logits(self, x):
+        """One frame (D,) / window (T, D), or a batch of them -> (n, classes)."""
+        x = np.asarray(x, dtype=np.float32)
+        seq = self.info()["gesture"]["kind"] == "lstm"
+        x = x.reshape((-1,) + x.shape[-2:] if seq else (-1, 1, x.shape[-1]))
+        return self.call(OP_GESTURE, x)[0]
+
+    def predict_label(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        single = x.ndim == (2 if self.info()["gesture"]["kind"] == "lstm" else 1)
+        pred = np.argmax(self.gesture_logits(x), axis=1)
+        inv = {i: l for l, i in self.info()["gesture"]["labels_map"].items()}
+        labels = [inv.get(int(p), int(p)) for p in pred]
+        return labels[0] if single else labels
+
+    def predict_live(self, sensor_input, filtered=True):
+        """(23,) -> (15,) or (T, 23) -> (T, 15), through this connection's
+        Kalman filter unless filtered=False."""
+        x = np.asarray(sensor_input, dtype=np.float32)
+        flags = (0 if filtered else FLAG_RAW) | (FLAG_RESET if self._reset else 0)
+        self._reset = False
+        out = self.call(OP_JOINTS, x.reshape(-1, 1, x.shape[-1]), flags)[0]
+        return out[0] if x.ndim == 1 else out
+
+    def reset_filter(self):
+        """New glove session: the next predict_live starts a fresh filter."""
+        self._reset = True
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Warm gesture / joint inference daemon")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("serve")
+    s.add_argument("--gesture", default="gesture_model.pth", help="NewMLP checkpoint")
+    s.add_argument("--glove", default="glove_mlp.pth", help="MLP.py checkpoint")
+    s.add_argument("--max-batch", type=int, default=64, help="items per forward pass")
+    s.add_argument("--max-wait-ms", type=float, default=1.0, help="how long a batch stays open")
+    s.add_argument("--watch", type=float, default=1.0, help="checkpoint mtime poll, s (0 = SIGHUP / reload only)")
+    s.add_argument("--threads", type=int, default=1, help="torch threads")
+    s.add_argument("--stats-every", type=float, default=10.0)
+    for p in (s, sub.add_parser("info"), sub.add_parser("reload")):
+        p.add_argument("--socket", default=SOCKET)
+        p.add_argument("--port", type=int, help="localhost TCP instead of a Unix socket")
+    args = ap.parse_args()
+
+    if args.cmd == "serve":
+        daemon = InferenceDaemon(args.gesture, args.glove, args.max_batch, args.max_wait_ms / 1e3, args.watch,
+                                 args.threads)
+        try:
+            asyncio.run(daemon.serve(args.socket, args.port, args.stats_every))
+        except KeyboardInterrupt:
+            pass
+        return
+    with DaemonClient(args.socket, args.port) as c:
+        print(json.dumps(c.reload() if args.cmd == "reload" else c.info(), indent=1))
+
+
+if __name__ == "__main__":
+    main()
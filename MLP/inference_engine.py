@@ -0,0 +1,173 @@
+# Streaming gesture inference for NewMLP's MLP / LSTMClassifier.
+#
+# - Each stream (glove or replayed session) has a preallocated rolling window
+#   updated in place. The window is stored twice back to back (2 x seq_len),
+#   so the newest seq_len frames are always one contiguous slice: no
+#   torch.stack over a deque per frame.
+# - The model runs every `stride` frames instead of on every line.
+# - stateful=True (LSTM only) keeps (h, c) per stream and advances the LSTM
+#   one step per frame instead of re-running the whole window. This is an
+#   approximation of the windowed model (its memory is not cut at seq_len);
+#   reset() a stream to start from zero state again.
+# - Streaming models (init_state() / step(), the distill.py students) always
+#   advance one step per frame from their per-stream state; they start
+#   predicting after model.receptive_field frames.
+# - Frames from several streams are classified in one batched forward pass.
+# - Every prediction's latency (frame pushed -> class out) is kept so
+#   latency() can report percentiles.
+
+import time
+import numpy as np
+import torch
+
+
+class StreamingClassifier:
+    def __init__(self, model, input_dim, seq_len=1, n_streams=1, stride=1,
+                 stateful=False, device="cpu", history=4096):
+        self.model = model.eval()
+        self.input_dim = input_dim
+        self.seq_len = seq_len
+        self.n_streams = n_streams
+        self.stride = stride
+        self.device = torch.device(device)
+        self.stateful = stateful and hasattr(model, "lstm")
+        self.streaming = hasattr(model, "step")
+        # frames a stream needs before its first prediction
+        self.warmup = model.receptive_field if self.streaming else 1 if self.stateful else seq_len
+
+        self.buf = torch.zeros(n_streams, 2 * seq_len, input_dim, device=self.device)
+        self.count = np.zeros(n_streams, dtype=np.int64)      # frames pushed per stream
+        self.since_pred = np.zeros(n_streams, dtype=np.int64)
+        self.last_pred = np.full(n_streams, -1, dtype=np.int64)
+        if self.stateful:
+            lstm = model.lstm
+            shape = (lstm.num_layers, n_streams, lstm.hidden_size)
+            self.h = torch.zeros(shape, device=self.device)
+            self.c = torch.zeros(shape, device=self.device)
+        if self.streaming:
+            self.state = model.init_state(n_streams, self.device)
+
+        self.lat = np.zeros(history)
+        self.n_pred = 0
+        self._arange = torch.arange(seq_len, device=self.device)
+
+    def reset(self, stream=None):
+        s = slice(None) if stream is None else stream
+        self.count[s] = 0
+        self.since_pred[s] = 0
+        self.last_pred[s] = -1
+        if self.stateful:
+            self.h[:, s] = 0
+            self.c[:, s] = 0
+        if self.streaming:
+            for st in self.state:
+                st[s] = 0
+
+    # ---------- input ----------
+    def _write(self, stream, rows):
+        # newest frame ends up at buf[i] and buf[i + L]; the window is buf[i+1 : i+1+L]
+        L = self.seq_len
+        start = self.count[stream]
+        if len(rows) > L:
+            start += len(rows) - L
+            rows = rows[-L:]
+        idx = torch.from_numpy((start + np.arange(len(rows))) % L).to(self.device)
+        self.buf[stream, idx] = rows
+        self.buf[stream, idx + L] = rows
+
+    @torch.no_grad()
+    def append(self, rows, stream=0):
+        """Add frames to a stream without predicting (older frames of a block)."""
+        rows = torch.as_tensor(rows, dtype=torch.float32, device=self.device).reshape(-1, self.input_dim)
+        if len(rows) == 0:
+            return
+        if self.stateful:
+            h, c = self.h[:, stream:stream + 1], self.c[:, stream:stream + 1]
+            _, (h, c) = self.model.lstm(rows[None], (h.contiguous(), c.contiguous()))
+            self.h[:, stream] = h[:, 0]
+            self.c[:, stream] = c[:, 0]
+        if self.streaming:
+            state = [st[stream:stream + 1] for st in self.state]
+            for row in rows:
+                _, state = self.model.step(row[None], state)
+            for st, new in zip(self.state, state):
+                st[stream] = new[0]
+        self._write(stream, rows)
+        self.count[stream] += len(rows)
+        self.since_pred[stream] += len(rows)
+
+    @torch.no_grad()
+    def push(self, frames, streams=None):
+        """One new frame per listed stream (default: all streams, in order).
+
+        Returns (streams, preds, probs) for the streams that were due for a
+        prediction; empty arrays when none was.
+        """
+        t0 = time.perf_counter()
+        streams = np.arange(self.n_streams) if streams is None else np.asarray(streams, dtype=np.int64)
+        frames = torch.as_tensor(frames, dtype=torch.float32, device=self.device).reshape(len(streams), self.input_dim)
+        L = self.seq_len
+        st = torch.from_numpy(streams).to(self.device)
+
+        if self.stateful:
+            h, c = self.h[:, st], self.c[:, st]
+            out, (h, c) = self.model.lstm(frames[:, None], (h.contiguous(), c.contiguous()))
+            self.h[:, st] = h
+            self.c[:, st] = c
+        if self.streaming:
+            logits, state = self.model.step(frames, [s[st] for s in self.state])
+            for s, new in zip(self.state, state):
+                s[st] = new
+        i = torch.from_numpy(self.count[streams] % L).to(self.device)
+        self.buf[st, i] = frames
+        self.buf[st, i + L] = frames
+        self.count[streams] += 1
+        self.since_pred[streams] += 1
+
+        due = (self.since_pred[streams] >= self.stride) & (self.count[streams] >= self.warmup)
+        if not due.any():
+            return streams[:0], streams[:0], None
+        ds = streams[due]
+        self.since_pred[ds] = 0
+
+        if self.streaming:
+            logits = logits[torch.from_numpy(due).to(self.device)]
+        elif self.stateful:
+            logits = self.model.fc(h[-1][torch.from_numpy(due).to(self.device)])
+        elif L == 1:
+            logits = self.model(frames[torch.from_numpy(due).to(self.device)])
+        else:
+            start = torch.from_numpy((self.count[ds] - 1) % L + 1).to(self.device)
+            dst = torch.from_numpy(ds).to(self.device)
+            if len(ds) == 1:
+                x = self.buf[dst[0], start[0]:start[0] + L][None]          # contiguous view, no copy
+            else:
+                x = self.buf[dst[:, None], start[:, None] + self._arange]  # gather (k, L, D)
+            logits = self.model(x)
+
+        probs = torch.softmax(logits, dim=1)
+        preds = torch.argmax(probs, dim=1).cpu().numpy()
+        self.last_pred[ds] = preds
+        self._record(time.perf_counter() - t0, len(ds))
+        return ds, preds, probs
+
+    # ---------- stats ----------
+    def _record(self, dt, n):
+        for _ in range(n):
+            self.lat[self.n_pred % len(self.lat)] = dt
+            self.n_pred += 1
+
+    def latency(self):
+        """Per-prediction latency percentiles in ms over the recent history."""
+        n = min(self.n_pred, len(self.lat))
+        if n == 0:
+            return {}
+        p50, p90, p99 = np.percentile(self.lat[:n], [50, 90, 99]) * 1e3
+        return {"n": self.n_pred, "p50_ms": p50, "p90_ms": p90, "p99_ms": p99, "max_ms": self.lat[:n].max() * 1e3}
+
+    def latency_line(self):
+        s = self.latency()
+        if not s:
+            return "no predictions yet"
+        return (f"{s['n']} predictions  p50 {s['p50_ms']:.2f} ms  p90 {s['p90_ms']:.2f} ms"
+                f"  p99 {s['p99_ms']:.2f} ms")
@@ -0,0 +1,146 @@
+# Export trained glove models for predictor.py.
+#
+# The artifact is one .npz of float32 NumPy weights plus a JSON "meta" entry
+# (model kind, sizes, labels_map, Kalman settings). StandardScalers are folded
+# into the weights so the exported model maps raw sensor values straight to
+# joint values:
+#   first layer:  W (x - m) / s + b          ->  (W / s) x + (b - (W / s) m)
+#   last layer:   (W h + b) * s_y + m_y      ->  (s_y W) h + (s_y b + m_y)
+# Optionally the same folded model is also saved as TorchScript and ONNX.
+#
+#   python model_export.py gesture gesture_model.pth            # NewMLP MLP
+#   python model_export.py gesture gesture_model.pth --seq      # NewMLP LSTM
+#   python model_export.py glove glove_mlp.pth                  # MLP.py GloveMLP
+# add --torchscript / --onnx for the extra formats.
+
+import argparse
+import json
+import os
+import numpy as np
+import torch
+import torch.nn as nn
+
+from predictor import torch_module
+from trainer import load_newmlp
+
+
+def fold_input_scaler(weight, bias, mean, scale):
+    w = weight / scale[None, :]
+    return w, bias - w @ mean
+
+
+def fold_output_scaler(weight, bias, mean, scale):
+    return weight * scale[:, None], bias * scale + mean
+
+
+def _np(t):
+    return t.detach().cpu().numpy().astype(np.float64)
+
+
+def sequential_weights(model, x_scaler=None, y_scaler=None):
+    """Linear layers of a Linear/ReLU stack as {"w0", "b0", ...}, scalers folded."""
+    linears = [m for m in model.modules() if isinstance(m, nn.Linear)]
+    ws = [(_np(m.weight), _np(m.bias)) for m in linears]
+    if x_scaler is not None:
+        ws[0] = fold_input_scaler(*ws[0], x_scaler.mean_, x_scaler.scale_)
+    if y_scaler is not None:
+        ws[-1] = fold_output_scaler(*ws[-1], y_scaler.mean_, y_scaler.scale_)
+    out = {}
+    for k, (w, b) in enumerate(ws):
+        out[f"w{k}"] = w.astype(np.float32)
+        out[f"b{k}"] = b.astype(np.float32)
+    return out, len(ws)
+
+
+def lstm_weights(model):
+    lstm = model.lstm
+    out = {}
+    for k in range(lstm.num_layers):
+        out[f"w_ih{k}"] = _np(getattr(lstm, f"weight_ih_l{k}")).astype(np.float32)
+        out[f"w_hh{k}"] = _np(getattr(lstm, f"weight_hh_l{k}")).astype(np.float32)
+        # the two biases are always added together
+        out[f"b{k}"] = (_np(getattr(lstm, f"bias_ih_l{k}")) + _np(getattr(lstm, f"bias_hh_l{k}"))).astype(np.float32)
+    out["fc_w"] = _np(model.fc.weight).astype(np.float32)
+    out["fc_b"] = _np(model.fc.bias).astype(np.float32)
+    return out
+
+
+def save_artifact(path, weights, meta):
+    np.savez(path, meta=np.array(json.dumps(meta)), **weights)
+    return path
+
+
+def export_glove_mlp(model, x_scaler, y_scaler, path="glove_mlp.npz", kalman=None):
+    """MLP.py: GloveMLP with both scalers folded in, plus its Kalman settings."""
+    weights, n = sequential_weights(model, x_scaler, y_scaler)
+    meta = {"kind": "glove_mlp", "input_dim": weights["w0"].shape[1], "num_linear": n,
+            "kalman": kalman}
+    return save_artifact(path, weights, meta)
+
+
+def export_gesture_model(model, labels_map, path="gesture_model.npz", seq_len=1):
+    """NewMLP: MLP (static) or LSTMClassifier (dynamic, seq_len frames)."""
+    if hasattr(model, "lstm"):
+        weights = lstm_weights(model)
+        meta = {"kind": "lstm", "input_dim": model.lstm.input_size, "num_layers": model.lstm.num_layers,
+                "seq_len": seq_len}
+    else:
+        weights, n = sequential_weights(model)
+        meta = {"kind": "mlp", "input_dim": weights["w0"].shape[1], "num_linear": n}
+    meta["labels_map"] = labels_map
+    return save_artifact(path, weights, meta)
+
+
+def export_extra(path, torchscript=False, onnx=False):
+    """TorchScript / ONNX copies of an exported artifact (same folded weights)."""
+    art = np.load(path)
+    meta = json.loads(str(art["meta"]))
+    model = torch_module(meta, {k: art[k] for k in art.files if k != "meta"})
+    shape = (1, meta.get("seq_len", 1), meta["input_dim"]) if meta["kind"] == "lstm" else (1, meta["input_dim"])
+    example = torch.zeros(shape)
+    base = os.path.splitext(path)[0]
+    out = []
+    if torchscript:
+        torch.jit.trace(model, example).save(base + ".pt")
+        out.append(base + ".pt")
+    if onnx:
+        try:
+            torch.onnx.export(model, (example,), base + ".onnx", input_names=["x"], output_names=["y"],
+                              dynamic_axes={"x": {0: "batch"}, "y": {0: "batch"}})
+            out.append(base + ".onnx")
+        except Exception as e:   # the onnx package is optional
+            print("ONNX export skipped:", e)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Export glove models for predictor.py")
+    ap.add_argument("family", choices=["gesture", "glove"])
+    ap.add_argument("checkpoint", nargs="?", help="trained model (default the script's MODEL_FILE)")
+    ap.add_argument("--seq", action="store_true", help="(kept for old scripts: the model type is read from the checkpoint)")
+    ap.add_argument("-o", "--out")
+    ap.add_argument("--torchscript", action="store_true")
+    ap.add_argument("--onnx", action="store_true")
+    args = ap.parse_args()
+
+    if args.family == "gesture":
+        nm = load_newmlp()
+        checkpoint = args.checkpoint or nm.MODEL_FILE
+        ckpt = torch.load(checkpoint, map_location="cpu")
+        labels_map = ckpt["labels_map"]
+        model, arch = nm.load_model(ckpt)
+        path = export_gesture_model(model, labels_map, args.out or os.path.splitext(checkpoint)[0] + ".npz",
+                                    seq_len=arch["seq_len"])
+    else:
+        import MLP as glove
+        checkpoint = args.checkpoint or glove.MODEL_FILE
+        glove.load(checkpoint)
+        path = glove.export(args.out or os.path.splitext(checkpoint)[0] + ".npz")
+
+    print("saved", path)
+    for p in export_extra(path, args.torchscript, args.onnx):
+        print("saved", p)
+
+
+if __name__ == "__main__":
+    main()
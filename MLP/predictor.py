@@ -0,0 +1,184 @@
+# Lightweight predictor for models exported with model_export.py.
+#
+# Loads the .npz artifact (plain NumPy weights, scalers already folded into
+# the first / last linear layers). MLP artifacts run the forward pass in
+# NumPy: no sklearn and no torch import, so a script that only predicts
+# starts in a fraction of the time. LSTM artifacts run as a float torch
+# module by default (TorchPredictor): the per-timestep NumPy loop is about
+# 2.4x slower than eager torch per window (1371 vs 570 us, 50 x 33, hidden
+# 128), and int8 does not close the gap (1131 us). backend="numpy" keeps the
+# NumPy path for LSTMs too, e.g. where torch is not installed.
+#
+# quantize=True rebuilds the layers as torch modules and applies int8 dynamic
+# quantization (weights int8, activations quantized per call) to the Linear
+# and LSTM layers.
+#
+#   p = load_predictor("glove_mlp.npz")
+#   joints = p.predict_live(sensor_frame)          # (23,) -> (15,), Kalman-filtered
+#   g = load_predictor("gesture_model.npz")
+#   label = g.predict_label(frame_or_window)
+
+import json
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from halo.filters import KalmanBank
+
+
+def _relu(x):
+    return np.maximum(x, 0.0, out=x)
+
+
+def _sigmoid(x):
+    return 0.5 * (np.tanh(0.5 * x) + 1.0)
+
+
+class Predictor:
+    def __init__(self, path):
+        art = np.load(path)
+        self.meta = json.loads(str(art["meta"]))
+        self.kind = self.meta["kind"]
+        self.weights = {k: art[k] for k in art.files if k != "meta"}
+        self.input_dim = self.meta["input_dim"]
+        labels_map = self.meta.get("labels_map") or {}
+        self.inv_labels_map = {i: l for l, i in labels_map.items()}
+        kf = self.meta.get("kalman")
+        self.filter = KalmanBank(self.input_dim, **kf) if kf else None
+        self._build()
+
+    def _build(self):
+        w = self.weights
+        if self.kind == "lstm":
+            self.layers = [(w[f"w_ih{k}"].T.copy(), w[f"w_hh{k}"].T.copy(), w[f"b{k}"])
+                           for k in range(self.meta["num_layers"])]
+            self.fc = (w["fc_w"].T.copy(), w["fc_b"])
+        else:
+            self.linears = [(w[f"w{k}"].T.copy(), w[f"b{k}"]) for k in range(self.meta["num_linear"])]
+
+    # ---------- forward ----------
+    def _mlp(self, x):
+        for k, (wt, b) in enumerate(self.linears):
+            x = x @ wt + b
+            if k < len(self.linears) - 1:
+                x = _relu(x)
+        return x
+
+    def _lstm(self, x):
+        # x: (B, T, D); PyTorch gate order i, f, g, o
+        for w_ih, w_hh, b in self.layers:
+            B, T, _ = x.shape
+            H = w_hh.shape[0]
+            xg = x @ w_ih + b                          # input projection for all steps at once
+            h = np.zeros((B, H), np.float32)
+            c = np.zeros((B, H), np.float32)
+            out = np.empty((B, T, H), np.float32)
+            for t in range(T):
+                g = xg[:, t] + h @ w_hh
+                i, f, gg, o = _sigmoid(g[:, :H]), _sigmoid(g[:, H:2 * H]), np.tanh(g[:, 2 * H:3 * H]), _sigmoid(g[:, 3 * H:])
+                c = f * c + i * gg
+                h = o * np.tanh(c)
+                out[:, t] = h
+            x = out
+        return h @ self.fc[0] + self.fc[1]
+
+    def forward(self, x):
+        """(B, D) frames or (B, T, D) windows -> (B, outputs)."""
+        x = np.asarray(x, dtype=np.float32)
+        return self._lstm(x) if self.kind == "lstm" else self._mlp(x)
+
+    # ---------- helpers matching the training scripts ----------
+    def predict_live(self, sensor_input):
+        """MLP.py predict_live(): Kalman filter (stateful) -> joint values."""
+        sensor_input = np.asarray(sensor_input, dtype=np.float64)
+        x = sensor_input
+        if self.filter is not None:
+            x = self.filter.update(x)
+        out = self.forward(x.reshape(-1, self.input_dim))
+        return out[0] if sensor_input.ndim == 1 else out
+
+    def predict_label(self, x):
+        """One frame (D,) / window (T, D), or a batch of them -> label(s)."""
+        x = np.asarray(x, dtype=np.float32)
+        single = x.ndim == (2 if self.kind == "lstm" else 1)
+        pred = np.argmax(self.forward(x[None] if single else x), axis=1)
+        labels = [self.inv_labels_map.get(int(p), int(p)) for p in pred]
+        return labels[0] if single else labels
+
+
+def torch_module(meta, weights):
+    """Rebuild the exported (scaler-folded) model as a float torch module."""
+    import torch
+    import torch.nn as nn
+
+    w = {k: torch.from_numpy(v) for k, v in weights.items()}
+    if meta["kind"] != "lstm":
+        layers = []
+        for k in range(meta["num_linear"]):
+            lin = nn.Linear(w[f"w{k}"].shape[1], w[f"w{k}"].shape[0])
+            lin.weight.data.copy_(w[f"w{k}"])
+            lin.bias.data.copy_(w[f"b{k}"])
+            layers += [lin, nn.ReLU()]
+        return nn.Sequential(*layers[:-1]).eval()
+
+    class LSTMHead(nn.Module):
+        def __init__(self, lstm, fc):
+            super().__init__()
+            self.lstm = lstm
+            self.fc = fc
+
+        def forward(self, x):
+            _, (h, _) = self.lstm(x)
+            return self.fc(h[-1])
+
+    n_layers = meta["num_layers"]
+    hidden = w["w_hh0"].shape[1]
+    lstm = nn.LSTM(meta["input_dim"], hidden, n_layers, batch_first=True)
+    for k in range(n_layers):
+        getattr(lstm, f"weight_ih_l{k}").data.copy_(w[f"w_ih{k}"])
+        getattr(lstm, f"weight_hh_l{k}").data.copy_(w[f"w_hh{k}"])
+        getattr(lstm, f"bias_ih_l{k}").data.copy_(w[f"b{k}"])
+        getattr(lstm, f"bias_hh_l{k}").data.zero_()
+    fc = nn.Linear(hidden, w["fc_w"].shape[0])
+    fc.weight.data.copy_(w["fc_w"])
+    fc.bias.data.copy_(w["fc_b"])
+    return LSTMHead(lstm, fc).eval()
+
+
+class TorchPredictor(Predictor):
+    """Same artifact, run as a float torch module (the default for LSTMs)."""
+
+    def _build(self):
+        import torch
+
+        self.torch = torch
+        self.model = torch_module(self.meta, self.weights)
+
+    def forward(self, x):
+        with self.torch.no_grad():
+            return self.model(self.torch.as_tensor(np.asarray(x, dtype=np.float32))).numpy()
+
+
+class QuantizedPredictor(TorchPredictor):
+    """Same artifact, run as int8 dynamically-quantized torch modules."""
+
+    def _build(self):
+        import warnings
+        import torch.nn as nn
+        from torch.ao.quantization import quantize_dynamic
+
+        super()._build()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")      # quantize_dynamic deprecation notice
+            self.model = quantize_dynamic(self.model, {nn.Linear, nn.LSTM}, dtype=self.torch.qint8)
+
+
+def load_predictor(path, quantize=False, backend=None):
+    """backend: "numpy" or "torch"; default NumPy for MLPs, torch for LSTMs."""
+    if quantize:
+        return QuantizedPredictor(path)
+    if backend is None:
+        with np.load(path) as art:
+            backend = "torch" if json.loads(str(art["meta"]))["kind"] == "lstm" else "numpy"
+    return TorchPredictor(path) if backend == "torch" else Predictor(path)
@@ -0,0 +1,289 @@
+# Hyperparameter / architecture sweep for the glove models.
+#
+#   python sweep.py gesture --seq                  # LSTMClassifier: hidden_dim, num_layers, seq_len, lr
+#   python sweep.py gesture                        # NewMLP MLP: hidden sizes, lr, batch size
+#   python sweep.py glove                          # GloveMLP: hidden sizes (the deeper variants), lr
+#   python sweep.py gesture --seq --search random --trials 24 --epochs 27 --eta 3
+#   python sweep.py gesture --seq --space '{"hidden_dim": [32, 64], "num_layers": [1]}'
+#   python sweep.py glove --eta 1                  # no pruning: every trial gets all epochs
+#
+# Configurations come from the grid of SPACES (or --space) or --trials random
+# draws from it, and are trained by successive halving: every trial first
+# gets epochs / eta^s epochs, the best 1 / eta continue to the next budget,
+# and so on until the survivors reach --epochs. Trials run on a process pool
+# (--workers, default one per core), each worker on one torch thread, so the
+# cores are all busy without oversubscribing them. The data is prepared once
+# by the parent (the gesture_store of the CSV, or the Kalman-filtered and
+# scaled glove arrays as .npy) and every worker memmaps it read-only. A
+# trial's model and optimizer are kept in <out>/trials/ between rungs.
+#
+# Per configuration: validation accuracy (gesture) or joint MAE in degrees
+# (glove), the epoch it stopped at, parameters / float32 size, and the CPU
+# latency of one forward pass on one frame or window (one thread, median).
+# Results go to <out>/results.json; --budget-ms picks the best that fits, and
+# the trainer.py command for the winner is printed (the checkpoint it writes
+# stores the architecture, so NewMLP / MLP.py / the daemon load it as is).
+
+import argparse
+import itertools
+import json
+import math
+import multiprocessing as mp
+import os
+import sys
+import time
+import numpy as np
+import torch
+import torch.nn as nn
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from gesture_store import GestureStore, store_dir_for
+import trainer
+
+SPACES = {
+    "glove": {"hidden": [[64], [128, 64], [128, 128, 64]], "lr": [1e-3, 3e-3], "batch_size": [64]},
+    "gesture": {"hidden": [[128], [256, 128], [512, 256, 128]], "lr": [1e-3, 3e-3], "batch_size": [64, 256]},
+    "gesture_seq": {"hidden_dim": [32, 64, 128], "num_layers": [1, 2], "seq_len": [25, 50], "lr": [1e-3, 3e-3],
+                    "batch_size": [64]},
+}
+
+
+def configs(space, search="grid", trials=None, seed=0):
+    keys = sorted(space)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+    if search == "grid":
+        return grid
+    rng = np.random.default_rng(seed)
+    return [grid[i] for i in rng.permutation(len(grid))[:trials or len(grid)]]
+
+
+def rungs(n, epochs, eta):
+    """Epoch budget of each successive-halving rung for n trials."""
+    s = int(math.log(n) / math.log(eta) + 1e-9) if eta > 1 and n > 1 else 0
+    budgets = [max(1, round(epochs * eta ** (i - s))) for i in range(s + 1)]
+    return sorted(set(budgets))
+
+
+# ---------- data (parent) ----------
+def prepare(args, out):
+    """Build the read-only arrays the workers memmap; returns their spec."""
+    if args.family == "gesture":
+        csv_file = args.csv or trainer.load_newmlp().CSV_FILE
+        store = GestureStore.from_csv(csv_file)
+        return {"family": "gesture", "store": store_dir_for(csv_file), "rows": len(store), "val_frac": args.val_frac,
+                "classes": len(store.labels_map)}
+    import MLP as glove
+    X, y, x_scaler, y_scaler = glove.load_data(args.inputs, args.outputs)
+    os.makedirs(os.path.join(out, "data"), exist_ok=True)
+    paths = {k: os.path.join(out, "data", f"{k}.npy") for k in ("x", "y")}
+    np.save(paths["x"], x_scaler.transform(X).astype(np.float32))
+    np.save(paths["y"], y_scaler.transform(y).astype(np.float32))
+    return {"family": "glove", **paths, "rows": len(X), "val_frac": args.val_frac,
+            "y_scale": y_scaler.scale_.tolist()}
+
+
+# ---------- worker ----------
+_data = None
+
+
+def _init_worker(spec):
+    global _data
+    torch.set_num_threads(1)
+    if spec["family"] == "gesture":
+        store = GestureStore(spec["store"], mmap=True)
+        _data = dict(spec, x=store.samples, y=store.labels)
+    else:
+        _data = dict(spec, x=np.load(spec["x"], mmap_mode="r"), y=np.load(spec["y"], mmap_mode="r"))
+        _data["y_scale"] = np.asarray(spec["y_scale"], np.float32)
+
+
+def _split(n, seq_len):
+    # trainer.split_indices: per gesture run for the windows' labels (the
+    # label of their last frame), a plain tail split for the glove arrays
+    if _data["family"] != "gesture":
+        return trainer.split_indices(None, _data["val_frac"], n=n)
+    labels = np.asarray(_data["y"][seq_len - 1:seq_len - 1 + n])
+    return trainer.split_indices(labels, _data["val_frac"], seq_len - 1)
+
+
+def _batch(idx, seq_len):
+    # sorted indices read the memmap front to back; window i ends at frame i + seq_len - 1
+    x, y = _data["x"], _data["y"]
+    if seq_len > 1:
+        X = x[idx[:, None] + np.arange(seq_len)]
+        Y = y[idx + seq_len - 1]
+    else:
+        X, Y = x[idx], y[idx]
+    Y = np.asarray(Y, np.int64 if _data["family"] == "gesture" else np.float32)
+    return torch.from_numpy(np.asarray(X, np.float32)), torch.from_numpy(Y)
+
+
+def build(family, config, classes=None):
+    if family == "glove":
+        import MLP as glove
+        return glove.GloveMLP(hidden=config["hidden"])
+    nm = trainer.load_newmlp()
+    dim = nm.NUM_SENSORS * nm.SAMPLE_DIM
+    if "hidden_dim" in config:
+        return nm.LSTMClassifier(dim, config["hidden_dim"], classes, config["num_layers"])
+    return nm.MLP(dim, classes, config["hidden"])
+
+
+def evaluate(model, idx, seq_len, chunk=4096):
+    model.eval()
+    correct, err, n = 0, 0.0, 0
+    with torch.no_grad():
+        for a in range(0, len(idx), chunk):
+            X, Y = _batch(idx[a:a + chunk], seq_len)
+            out = model(X)
+            if _data["family"] == "gesture":
+                correct += int((out.argmax(dim=1) == Y).sum())
+            else:
+                err += float((out - Y).abs().mul(torch.from_numpy(_data["y_scale"])).sum())
+            n += len(X)
+    if _data["family"] == "gesture":
+        return {"accuracy": correct / max(n, 1)}
+    return {"mae_deg": float(np.degrees(err / max(n, 1) / _data["y_scale"].size))}
+
+
+def latency(model, shape, runs=100):
+    """Median ms of one forward pass on a single frame / window (one thread)."""
+    model.eval()
+    x = torch.zeros(shape)
+    times = []
+    with torch.no_grad():
+        for i in range(runs + 10):
+            t0 = time.perf_counter()
+            model(x)
+            if i >= 10:
+                times.append(time.perf_counter() - t0)
+    return float(np.median(times) * 1e3)
+
+
+def run_trial(job):
+    """Train one configuration up to `epochs` (continuing from its saved state)
+    and evaluate it."""
+    tid, config, epochs, state_path, seed = job
+    t0 = time.perf_counter()
+    seq_len = config.get("seq_len", 1)
+    torch.manual_seed(seed + tid)
+    model = build(_data["family"], config, _data.get("classes"))
+    opt = torch.optim.Adam(model.parameters(), lr=config["lr"])
+    done = 0
+    if os.path.exists(state_path):
+        state = torch.load(state_path)
+        model.load_state_dict(state["model_state"])
+        opt.load_state_dict(state["optimizer_state"])
+        done = state["epoch"]
+    n = _data["rows"] - seq_len + 1
+    train_idx, val_idx = _split(n, seq_len)
+    loss_fn = nn.CrossEntropyLoss() if _data["family"] == "gesture" else nn.MSELoss()
+    rng = np.random.default_rng(seed + tid * 1000 + done)
+    for _ in range(done, epochs):
+        model.train()
+        perm = rng.permutation(train_idx)
+        for a in range(0, len(perm), config["batch_size"]):
+            X, Y = _batch(np.sort(perm[a:a + config["batch_size"]]), seq_len)
+            opt.zero_grad()
+            loss_fn(model(X), Y).backward()
+            opt.step()
+    torch.save({"model_state": model.state_dict(), "optimizer_state": opt.state_dict(), "epoch": epochs}, state_path)
+
+    dim = _data["x"].shape[1]
+    params = sum(p.numel() for p in model.parameters())
+    return {"trial": tid, "config": config, "epochs": epochs, **evaluate(model, val_idx, seq_len),
+            "params": params, "size_kb": params * 4 / 1024,
+            "latency_ms": latency(model, (1, seq_len, dim) if "hidden_dim" in config else (1, dim)),
+            "train_s": time.perf_counter() - t0}
+
+
+# ---------- driver ----------
+def score(result):
+    return result["accuracy"] if "accuracy" in result else -result["mae_deg"]
+
+
+def sweep(spec, trials, epochs=27, eta=3, workers=None, out="sweep", seed=0, log=print):
+    """Successive halving over `trials` (configs) on a process pool; returns
+    the last result of every trial, best first."""
+    os.makedirs(os.path.join(out, "trials"), exist_ok=True)
+    for name in os.listdir(os.path.join(out, "trials")):      # a previous sweep's trial ids
+        os.remove(os.path.join(out, "trials", name))
+    budgets = rungs(len(trials), epochs, eta)
+    log(f"[sweep] {len(trials)} trials, rungs {budgets} epochs, {workers or os.cpu_count()} workers")
+    results = {}
+    alive = list(range(len(trials)))
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(workers or os.cpu_count(), initializer=_init_worker, initargs=(spec,)) as pool:
+        for i, budget in enumerate(budgets):
+            jobs = [(t, trials[t], budget, os.path.join(out, "trials", f"{t}.pt"), seed) for t in alive]
+            for r in pool.imap_unordered(run_trial, jobs):
+                results[r["trial"]] = r
+                log(f"[sweep] rung {i} trial {r['trial']:3d} {json.dumps(r['config'])}  {_metric(r)}"
+                    f"  {r['latency_ms']:.3f} ms  {r['train_s']:.1f} s")
+            if i < len(budgets) - 1:
+                alive.sort(key=lambda t: score(results[t]), reverse=True)
+                for t in alive[max(1, len(alive) // eta):]:
+                    results[t]["pruned"] = True
+                alive = alive[:max(1, len(alive) // eta)]
+    ranked = sorted(results.values(), key=lambda r: (not r.get("pruned", False), score(r)), reverse=True)
+    with open(os.path.join(out, "results.json"), "w") as f:
+        json.dump(ranked, f, indent=1)
+    return ranked
+
+
+def train_command(family, seq, config):
+    """The trainer.py command that trains a configuration in full."""
+    cmd = ["python", "trainer.py", family] + (["--seq"] if seq else [])
+    if "hidden_dim" in config:
+        cmd += ["--hidden", str(config["hidden_dim"]), "--num-layers", str(config["num_layers"]),
+                "--seq-len", str(config["seq_len"])]
+    else:
+        cmd += ["--hidden", *map(str, config["hidden"])]
+    return " ".join(cmd + ["--lr", str(config["lr"]), "--batch-size", str(config["batch_size"])])
+
+
+def _metric(r):
+    return f"acc {r['accuracy'] * 100:5.1f}%" if "accuracy" in r else f"MAE {r['mae_deg']:6.2f} deg"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Parallel hyperparameter / architecture sweep")
+    ap.add_argument("family", choices=["glove", "gesture"])
+    ap.add_argument("--seq", action="store_true", help="gesture: LSTMClassifier instead of the MLP")
+    ap.add_argument("--csv", help="gesture: data CSV (default NewMLP CSV_FILE)")
+    ap.add_argument("--inputs", default="sensor_inputs.npy", help="glove: sensor inputs")
+    ap.add_argument("--outputs", default="joint_outputs.npy", help="glove: joint targets")
+    ap.add_argument("--space", help="JSON {param: [values]} overriding parts of the default search space")
+    ap.add_argument("--search", choices=["grid", "random"], default="grid")
+    ap.add_argument("--trials", type=int, help="random: configurations drawn from the grid")
+    ap.add_argument("--epochs", type=int, default=27, help="epochs of the trials that survive every rung")
+    ap.add_argument("--eta", type=int, default=3, help="keep 1 / eta per rung (1 = no pruning)")
+    ap.add_argument("--val-frac", type=float, default=0.2)
+    ap.add_argument("--workers", type=int, help="processes (default one per core)")
+    ap.add_argument("--budget-ms", type=float, help="report the best configuration within this latency")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("-o", "--out", default="sweep")
+    args = ap.parse_args()
+
+    space = dict(SPACES["gesture_seq" if args.family == "gesture" and args.seq else args.family])
+    space.update(json.loads(args.space) if args.space else {})
+    trials = configs(space, args.search, args.trials, args.seed)
+    spec = prepare(args, args.out)
+    ranked = sweep(spec, trials, args.epochs, args.eta, args.workers, args.out, args.seed)
+
+    print(f"\n{'metric':>14} {'epochs':>6} {'params':>8} {'KB':>8} {'ms':>7}  config")
+    for r in ranked:
+        print(f"{_metric(r):>14} {r['epochs']:6d} {r['params']:8d} {r['size_kb']:8.1f} {r['latency_ms']:7.3f}"
+              f"  {json.dumps(r['config'])}{'  (pruned)' if r.get('pruned') else ''}")
+    if args.budget_ms:
+        fit = [r for r in ranked if not r.get("pruned") and r["latency_ms"] <= args.budget_ms]
+        print(f"best within {args.budget_ms} ms: " + (json.dumps(fit[0]["config"]) if fit else "none"))
+    else:
+        fit = [r for r in ranked if not r.get("pruned")]
+    if fit:
+        print("train it:", train_command(args.family, args.seq, fit[0]["config"]))
+    print(f"✅ {len(ranked)} trials -> {os.path.join(args.out, 'results.json')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+# Nearest-neighbour gesture recognition over recorded templates with DTW.
+#
+# For a user's own vocabulary: a gesture is added by recording a few
+# examples, no retraining. Every template and query is resampled to seq_len
+# frames (halo.segment.fit_length) and z-normalised per channel with the
+# index's statistics; the distance is multivariate DTW (squared Euclidean
+# frame cost, Sakoe-Chiba band of `band` frames).
+#
+# Search for one query, cheapest bound first. The templates' Keogh envelopes
+# (upper / lower over the band) are reduced to PAA segments when a template
+# is added; by convexity these bounds never exceed LB_Keogh.
+#   1. A two-segment bound against every template, one (N, 2, D) pass; DTW on
+#      its best four gives a first best distance.
+#   2. LB_PAA (`paa` frame segments) on whatever step 1 does not rule out.
+#   3. Candidates in LB_PAA order, in batches: anything whose bound is not
+#      below the best distance so far is pruned; the rest get LB_Keogh both
+#      ways (query vs template envelope and template vs query envelope), then
+#      DTW.
+#   4. DTW batched over the candidates, one row at a time: within a row
+#      D[i, j] = c[i, j] + min(m[j], D[i, j - 1]) unrolls to
+#      P[j] + min_{k<=j}(m[k] - P[k - 1]) with P the row's prefix sum, a
+#      minimum.accumulate. A candidate is abandoned as soon as its row minimum
+#      plus the LB_Keogh of the rows still to come reaches the best distance.
+#
+#   idx = TemplateIndex.from_csv("gesture_data.csv", SEQ_LEN)    # motion segments as templates
+#   idx.add(window, "snap")                                      # at runtime
+#   label, dist = idx.classify(window)
+#   idx.save("gesture_templates.npz")
+#
+# NewMLP: live_inference(seq_mode=True, templates="gesture_templates.npz"),
+# add_templates("snap", duration=5) records new ones.
+#
+#   python template_matcher.py build gesture_data.csv -o gesture_templates.npz --per-class 300
+#   python template_matcher.py eval gesture_templates.npz test_data.csv
+
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from halo.segment import fit_length
+
+
+def envelope(x, band):
+    """Upper / lower envelope (..., L, D) of x over +-band frames."""
+    L = x.shape[-2]
+    pad = [(0, 0)] * x.ndim
+    pad[-2] = (band, band)
+    up = np.pad(x, pad, mode="edge")
+    win = np.lib.stride_tricks.sliding_window_view(up, 2 * band + 1, axis=-2)[..., :L, :, :]
+    return win.max(axis=-1), win.min(axis=-1)
+
+
+def _paa_bounds(upper, lower, w):
+    s = upper.shape[-2] // w
+    shape = upper.shape[:-2] + (s, w, upper.shape[-1])
+    return upper[..., :s * w, :].reshape(shape).max(axis=-2), lower[..., :s * w, :].reshape(shape).min(axis=-2)
+
+
+def _paa(x, w):
+    s = x.shape[-2] // w
+    return x[..., :s * w, :].reshape(x.shape[:-2] + (s, w, x.shape[-1])).mean(axis=-2)
+
+
+def _outside(x, upper, lower, per_frame=False):
+    # squared distance of x to the [lower, upper] band, summed over all but the
+    # leading axis, or per frame (at most one of x - upper, lower - x is positive)
+    d = x - upper
+    np.maximum(d, lower - x, out=d)
+    np.maximum(d, 0.0, out=d)
+    if per_frame:
+        return np.einsum("nld,nld->nl", d, d)
+    d = d.reshape(len(d), -1)
+    return np.einsum("nk,nk->n", d, d)
+
+
+def dtw(query, cands, band, best=np.inf, tail=None):
+    """Banded DTW of query (L, D) against cands (B, L, D); candidates whose
+    distance reaches `best` come back as inf (early abandoned). tail (B, L + 1),
+    optional: a lower bound on what rows i.. still add (tail[:, L] = 0), to
+    abandon earlier."""
+    B, L = len(cands), len(query)
+    cost = (np.sum(query * query, axis=1)[None, :, None] + np.sum(cands * cands, axis=2)[:, None, :]
+            - 2 * np.einsum("id,bjd->bij", query, cands, dtype=np.float64))
+    np.maximum(cost, 0.0, out=cost)
+    alive = np.arange(B)
+    # rows kept with an inf sentinel in front: prev[:, j + 1] = D[i - 1, j]
+    prev = np.full((B, L + 1), np.inf)
+    for i in range(L):
+        lo, hi = max(0, i - band), min(L, i + band + 1)
+        c = cost[alive, i, lo:hi]
+        if i == 0:
+            m = np.full(c.shape, np.inf)
+            m[:, 0] = 0.0
+        else:
+            m = np.minimum(prev[:, lo + 1:hi + 1], prev[:, lo:hi])
+        P = np.cumsum(c, axis=1)
+        row = P + np.minimum.accumulate(m - (P - c), axis=1)
+        low = row.min(axis=1)
+        if tail is not None:
+            low += tail[alive, i + 1]
+        keep = low < best
+        if not keep.all():
+            alive, row = alive[keep], row[keep]
+            if not len(alive):
+                break
+        prev = np.full((len(alive), L + 1), np.inf)
+        prev[:, lo + 1:hi + 1] = row
+    out = np.full(B, np.inf)
+    if len(alive):
+        out[alive] = prev[:, L]
+    return out
+
+
+class TemplateIndex:
+    """Templates (N, seq_len, D) with their envelopes and PAA bounds."""
+
+    def __init__(self, seq_len=50, dim=33, band=5, paa=5, names=None, mean=None, std=None):
+        self.seq_len, self.dim, self.band, self.paa = seq_len, dim, band, paa
+        self.names = list(names or [])
+        self.mean = np.zeros(dim, np.float32) if mean is None else np.asarray(mean, np.float32)
+        self.std = np.ones(dim, np.float32) if std is None else np.asarray(std, np.float32)
+        self.n = 0
+        self._alloc(64)
+        self.queries = self.dtw_runs = 0
+        self.seconds = 0.0
+
+    def _alloc(self, cap):
+        # grown by doubling; the first n entries are carried over
+        S = self.seq_len // self.paa
+        shapes = {"x": (self.seq_len, self.dim), "upper": (self.seq_len, self.dim), "lower": (self.seq_len, self.dim),
+                  "paa_upper": (S, self.dim), "paa_lower": (S, self.dim),
+                  "half_upper": (2, self.dim), "half_lower": (2, self.dim), "labels": ()}
+        for name, shape in shapes.items():
+            new = np.empty((cap,) + shape, np.int64 if name == "labels" else np.float32)
+            if self.n:
+                new[:self.n] = getattr(self, name)[:self.n]
+            setattr(self, name, new)
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def labels_map(self):
+        return {name: i for i, name in enumerate(self.names)}
+
+    def fit_scale(self, windows):
+        """Per-channel mean / std from example windows (before adding)."""
+        flat = np.asarray(windows, np.float64).reshape(-1, self.dim)
+        self.mean = flat.mean(axis=0).astype(np.float32)
+        self.std = np.maximum(flat.std(axis=0), 1e-6).astype(np.float32)
+
+    def prepare(self, windows):
+        """(B, n, D), a list of (n_i, D) or one (n, D) of raw frames ->
+        normalised (B, seq_len, D)."""
+        windows = [windows] if isinstance(windows, np.ndarray) and windows.ndim == 2 else windows
+        x = np.stack([fit_length(w, self.seq_len) for w in windows])
+        return (x - self.mean) / self.std
+
+    def add(self, windows, labels):
+        """Add templates: windows (B, n, D) / (n, D) raw frames of any length,
+        labels a gesture name or one per window. New names extend names."""
+        x = self.prepare(windows)
+        labels = [labels] * len(x) if isinstance(labels, str) else list(labels)
+        ids = []
+        for name in labels:
+            if name not in self.names:
+                self.names.append(name)
+            ids.append(self.names.index(name))
+        if self.n + len(x) > len(self.x):
+            self._alloc(max(2 * len(self.x), self.n + len(x)))
+        s = slice(self.n, self.n + len(x))
+        up, lo = envelope(x, self.band)
+        self.x[s], self.upper[s], self.lower[s] = x, up, lo
+        self.paa_upper[s], self.paa_lower[s] = _paa_bounds(up, lo, self.paa)
+        self.half_upper[s], self.half_lower[s] = _paa_bounds(up, lo, self.seq_len // 2)
+        self.labels[s] = ids
+        self.n += len(x)
+
+    # ---------- search ----------
+    def nearest(self, window, batch=32, prepared=False):
+        """(template index, DTW distance) of the nearest template."""
+        t0 = time.perf_counter()
+        q = window if prepared else self.prepare(window)[0]
+        n = self.n
+        best, best_i = np.inf, -1
+        if n:
+            # two-segment bound over everything; DTW on its best few gives a
+            # first best distance, and only what that does not rule out gets
+            # the finer LB_PAA
+            h = self.seq_len // 2
+            coarse = h * _outside(_paa(q, h), self.half_upper[:n], self.half_lower[:n])
+            seed = np.argpartition(coarse, 4)[:4] if n > 4 else np.arange(n)
+            q_env = envelope(q, self.band)
+            best, best_i = self._search(q, seed, best, best_i, q_env)
+            rest = np.flatnonzero(coarse < best)
+            lb = self.paa * _outside(_paa(q, self.paa), self.paa_upper[rest], self.paa_lower[rest])
+            order = np.argsort(lb)
+            rest, lb = rest[order], lb[order]
+            for a in range(0, len(rest), batch):
+                cand = rest[a:a + batch][lb[a:a + batch] < best]
+                if not len(cand):
+                    break                   # sorted: every later bound is larger
+                best, best_i = self._search(q, cand, best, best_i, q_env)
+        self.queries += 1
+        self.seconds += time.perf_counter() - t0
+        return best_i, best
+
+    def _search(self, q, cand, best, best_i, q_env):
+        # LB_Keogh both ways: query against the templates' envelopes (per
+        # frame, for the cascading abandon in dtw) and templates against the
+        # query's
+        frames = _outside(q, self.upper[cand], self.lower[cand], per_frame=True)
+        keogh = np.maximum(frames.sum(axis=1), _outside(self.x[cand], *q_env))
+        keep = keogh < best
+        cand, frames = cand[keep], frames[keep]
+        if len(cand):
+            tail = np.zeros((len(cand), self.seq_len + 1))
+            tail[:, :-1] = np.cumsum(frames[:, ::-1], axis=1)[:, ::-1]
+            d = dtw(q, self.x[cand], self.band, best, tail)
+            self.dtw_runs += len(cand)
+            k = int(np.argmin(d))
+            if d[k] < best:
+                best, best_i = float(d[k]), int(cand[k])
+        return best, best_i
+
+    def classify(self, window):
+        i, d = self.nearest(window)
+        return self.names[self.labels[i]], d
+
+    def stats(self):
+        q = max(self.queries, 1)
+        return {"templates": self.n, "queries": self.queries, "ms_per_query": self.seconds / q * 1e3,
+                "dtw_per_query": self.dtw_runs / q, "pruned": 1.0 - self.dtw_runs / q / max(self.n, 1)}
+
+    def hud(self):
+        s = self.stats()
+        return (f"{s['templates']} templates  {s['ms_per_query']:.2f} ms/query  {s['dtw_per_query']:.1f} DTW/query"
+                f" ({s['pruned'] * 100:.1f}% pruned)")
+
+    # ---------- files ----------
+    def save(self, path):
+        meta = {"seq_len": self.seq_len, "dim": self.dim, "band": self.band, "paa": self.paa, "names": self.names}
+        np.savez(path, meta=np.array(json.dumps(meta)), x=self.x[:self.n], labels=self.labels[:self.n],
+                 mean=self.mean, std=self.std)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            meta = json.loads(str(f["meta"]))
+            idx = cls(meta["seq_len"], meta["dim"], meta["band"], meta["paa"], meta["names"], f["mean"], f["std"])
+            x, labels = f["x"], f["labels"]
+        # stored normalised: add back through the raw scale
+        idx.add(x * idx.std + idx.mean, [idx.names[i] for i in labels])
+        return idx
+
+    @classmethod
+    def from_csv(cls, csv_file, seq_len=50, per_class=None, band=5, paa=5, seed=0, **segment):
+        """Motion segments of a NewMLP CSV (gesture_store + halo.segment) as
+        templates, at most per_class random ones per gesture."""
+        from gesture_store import GestureStore
+
+        store = GestureStore.from_csv(csv_file)
+        X, y, _ = _segment_store(store, seq_len, segment)
+        if per_class:
+            rng = np.random.default_rng(seed)
+            keep = np.concatenate([rng.permutation(np.flatnonzero(y == c))[:per_class] for c in np.unique(y)])
+            X, y = X[np.sort(keep)], y[np.sort(keep)]
+        idx = cls(seq_len, X.shape[2], band, paa)
+        idx.fit_scale(X)
+        idx.add(X, [store.inv_labels_map[int(c)] for c in y])
+        return idx
+
+
+def _segment_store(store, seq_len, segment):
+    from halo.segment import segment_windows
+    return segment_windows(store.samples, store.labels, seq_len, **({"rate_hz": 100} | segment))
+
+
+class TemplateModel(torch.nn.Module):
+    """A TemplateIndex behind NewMLP's model interface: (B, L, D) windows in,
+    logits out (the nearest template's class at -distance, the rest -inf), so
+    StreamingClassifier and live_inference use it like the LSTM."""
+
+    def __init__(self, index):
+        super().__init__()
+        self.index = index
+
+    def forward(self, x):
+        x = x.detach().cpu().numpy() if isinstance(x, torch.Tensor) else np.asarray(x)
+        out = torch.full((len(x), len(self.index.names)), -np.inf)
+        for b, window in enumerate(x):
+            i, d = self.index.nearest(window)
+            if i >= 0:
+                out[b, self.index.labels[i]] = -d
+        return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="DTW template index for NewMLP gestures")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build")
+    b.add_argument("csv")
+    b.add_argument("-o", "--out", default="gesture_templates.npz")
+    b.add_argument("--seq-len", type=int, default=50)
+    b.add_argument("--per-class", type=int, help="random templates kept per gesture")
+    b.add_argument("--band", type=int, default=5, help="Sakoe-Chiba band, frames")
+    b.add_argument("--rate", type=float, default=100.0, help="sample rate of the CSV (segmentation)")
+    e = sub.add_parser("eval")
+    e.add_argument("templates")
+    e.add_argument("csv")
+    e.add_argument("--rate", type=float, default=100.0)
+    args = ap.parse_args()
+
+    if args.cmd == "build":
+        idx = TemplateIndex.from_csv(args.csv, args.seq_len, args.per_class, band=args.band, rate_hz=args.rate)
+        idx.save(args.out)
+        counts = np.bincount(idx.labels[:idx.n], minlength=len(idx.names))
+        print(f"{idx.n} templates -> {args.out}: " + ", ".join(f"{n} {c}" for n, c in zip(idx.names, counts)))
+        return
+
+    from gesture_store import GestureStore
+
+    idx = TemplateIndex.load(args.templates)
+    store = GestureStore.from_csv(args.csv)
+    X, y, _ = _segment_store(store, idx.seq_len, {"rate_hz": args.rate})
+    truth = [store.inv_labels_map[int(c)] for c in y]
+    hits = sum(idx.classify(x)[0] == t for x, t in zip(X, truth))
+    print(f"{hits}/{len(X)} segments correct ({hits / max(len(X), 1) * 100:.1f}%)  {idx.hud()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+# Training entry point for both model families.
+#
+#   python trainer.py glove                         # MLP.py GloveMLP -> glove_mlp.pth
+#   python trainer.py gesture                       # NewMLP MLP      -> gesture_model.pth
+#   python trainer.py gesture --seq --workers 4     # NewMLP LSTMClassifier
+#   python trainer.py gesture --seq --resume        # continue from gesture_model.pth.ckpt
+#   python trainer.py gesture --seq --segment       # windows cut at the motion (halo/segment.py)
+#   python trainer.py gesture --seq --augment       # NewMLP AUGMENT on the train split (halo/augment.py)
+#   python trainer.py gesture --seq --hidden 64 --num-layers 1 --seq-len 25   # e.g. a sweep.py winner
+#
+# Mini-batches from a shuffled DataLoader (num_workers / pinned memory), the
+# last --val-frac of every gesture's contiguous run held out (collect_data
+# records one gesture per block, so a plain tail split would hold out only the
+# last gestures), with the windows that would share frames with a held-out
+# one dropped from training; early stopping on validation loss, and a resumable
+# checkpoint (<out>.ckpt: model, optimizer, epoch, best) written every epoch.
+# The best weights go to <out> in the format the scripts already load.
+
+import argparse
+import importlib.machinery
+import importlib.util
+import os
+import time
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader, Subset, TensorDataset
+
+from gesture_store import AugmentedDataset
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_newmlp():
+    """NewMLP has no .py extension, so import it by path."""
+    loader = importlib.machinery.SourceFileLoader("NewMLP", os.path.join(HERE, "NewMLP"))
+    spec = importlib.util.spec_from_loader("NewMLP", loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+def split_indices(labels, val_frac, gap=0, n=None):
+    """(train, val) index arrays. With labels (one per sample / window, in
+    recording order) the last val_frac of each contiguous run of a label is
+    held out, and samples within `gap` of a held-out one are left out of
+    training. Without labels, the last val_frac of n samples."""
+    if labels is None:
+        n_val = int(n * val_frac)
+        return np.arange(n - n_val), np.arange(n - n_val, n)
+    labels = np.asarray(labels)
+    n = len(labels)
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]]) if n else np.zeros(0, np.int64)
+    ends = np.r_[starts[1:], n]
+    val = np.zeros(n, dtype=bool)
+    for start, end in zip(starts, ends):
+        val[end - int((end - start) * val_frac):end] = True
+    near = val
+    if gap:
+        c = np.r_[0, np.cumsum(val)]
+        i = np.arange(n)
+        near = c[np.minimum(i + gap + 1, n)] - c[np.maximum(i - gap, 0)] > 0
+    return np.flatnonzero(~near), np.flatnonzero(val)
+
+
+def split(dataset, val_frac):
+    """Train / validation Subsets (split_indices). StoreDatasets split per
+    gesture run, with their `overlap` as the gap; anything else (the glove
+    arrays) keeps the last val_frac in order."""
+    train, val = split_indices(getattr(dataset, "labels", None), val_frac, getattr(dataset, "overlap", 0),
+                               len(dataset))
+    return Subset(dataset, train.tolist()), Subset(dataset, val.tolist())
+
+
+def _loader(ds, batch_size, shuffle, workers, device):
+    return DataLoader(ds, batch_size=batch_size, shuffle=shuffle, num_workers=workers,
+                      collate_fn=getattr(ds, "collate", None),
+                      pin_memory=device.type == "cuda", persistent_workers=workers > 0)
+
+
+def evaluate(model, loader, loss_fn, device):
+    model.eval()
+    total, n = 0.0, 0
+    with torch.no_grad():
+        for X, y in loader:
+            X, y = X.to(device, non_blocking=True), y.to(device, non_blocking=True)
+            total += loss_fn(model(X), y).item() * len(X)
+            n += len(X)
+    return total / max(n, 1)
+
+
+def fit(model, train_ds, val_ds, loss_fn, out, extra=None, epochs=100, batch_size=64, lr=1e-3,
+        workers=0, patience=10, resume=False, device="cpu", log=print):
+    """Train with early stopping; best weights saved to `out` as
+    {"model_state": ..., **extra}. Returns the best validation loss."""
+    device = torch.device(device)
+    model.to(device)
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    train_loader = _loader(train_ds, batch_size, True, workers, device)
+    val_loader = _loader(val_ds, batch_size * 4, False, workers, device) if len(val_ds) else None
+
+    ckpt_path = out + ".ckpt"
+    start, best, bad = 0, float("inf"), 0
+    saved = False
+    if resume and os.path.exists(ckpt_path):
+        ckpt = torch.load(ckpt_path, map_location=device)
+        model.load_state_dict(ckpt["model_state"])
+        optimizer.load_state_dict(ckpt["optimizer_state"])
+        start, best, bad = ckpt["epoch"] + 1, ckpt["best"], ckpt["bad_epochs"]
+        log(f"Resumed from {ckpt_path} at epoch {start + 1}")
+
+    for epoch in range(start, epochs):
+        model.train()
+        t0 = time.perf_counter()
+        total, n = 0.0, 0
+        for X, y in train_loader:
+            X, y = X.to(device, non_blocking=True), y.to(device, non_blocking=True)
+            optimizer.zero_grad()
+            loss = loss_fn(model(X), y)
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * len(X)
+            n += len(X)
+        dt = time.perf_counter() - t0
+        val = evaluate(model, val_loader, loss_fn, device) if val_loader else total / max(n, 1)
+
+        if val < best:
+            best, bad = val, 0
+            torch.save({"model_state": model.state_dict(), **(extra or {})}, out)
+            saved = True
+        else:
+            bad += 1
+        log(f"Epoch {epoch+1}/{epochs} - Loss: {total/max(n, 1):.4f} | Val: {val:.4f}"
+            f" | {n/dt:,.0f} samples/s{'' if bad else ' *'}")
+        torch.save({"model_state": model.state_dict(), "optimizer_state": optimizer.state_dict(),
+                    "epoch": epoch, "best": best, "bad_epochs": bad}, ckpt_path)
+        if patience and bad >= patience:
+            log(f"Early stop: no val improvement for {patience} epochs (best {best:.4f})")
+            break
+
+    # leave the model holding the best weights (none saved if val was NaN
+    # throughout, or a resume found nothing left to train)
+    if saved or os.path.exists(out):
+        model.load_state_dict(torch.load(out, map_location=device)["model_state"])
+    else:
+        log(f"No best weights saved to {out}")
+    return best
+
+
+# ---------- model families ----------
+def train_glove(args):
+    import MLP as glove
+    X, y, x_scaler, y_scaler = glove.load_data(args.inputs, args.outputs)
+    ds = TensorDataset(torch.tensor(x_scaler.transform(X), dtype=torch.float32),
+                       torch.tensor(y_scaler.transform(y), dtype=torch.float32))
+    train_ds, val_ds = split(ds, args.val_frac)
+    model = glove.GloveMLP(hidden=args.hidden) if args.hidden else glove.GloveMLP()
+    out = args.out or glove.MODEL_FILE
+    fit(model, train_ds, val_ds, nn.MSELoss(), out,
+        extra={**glove.scaler_state(x_scaler, y_scaler), "arch": glove.glove_arch(model)},
+        epochs=args.epochs, batch_size=args.batch_size, lr=args.lr, workers=args.workers,
+        patience=args.patience, resume=args.resume, device=args.device)
+    return out
+
+
+def train_gesture(args):
+    nm = load_newmlp()
+    seq_len = (args.seq_len or nm.SEQ_LEN) if args.seq else 1
+    ds = nm.GestureDataset(args.csv or nm.CSV_FILE, seq_len=seq_len, mmap=args.mmap,
+                           segment=nm.SEGMENT if args.segment and args.seq else None)
+    train_ds, val_ds = split(ds, args.val_frac)
+    if args.augment:
+        train_ds = AugmentedDataset(train_ds, nm.AUGMENT, seed=args.seed)
+    input_dim = nm.NUM_SENSORS * nm.SAMPLE_DIM
+    if args.seq:
+        model = nm.LSTMClassifier(input_dim, args.hidden[0] if args.hidden else 128, len(ds.labels_map),
+                                  args.num_layers)
+    elif args.hidden:
+        model = nm.MLP(input_dim, len(ds.labels_map), args.hidden)
+    else:
+        model = nm.MLP(input_dim, len(ds.labels_map))
+    out = args.out or nm.MODEL_FILE
+    fit(model, train_ds, val_ds, nn.CrossEntropyLoss(), out,
+        extra={"labels_map": ds.labels_map, "arch": nm.model_arch(model, seq_len)},
+        epochs=args.epochs, batch_size=args.batch_size, lr=args.lr, workers=args.workers,
+        patience=args.patience, resume=args.resume, device=args.device)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Train GloveMLP (MLP.py) or the NewMLP gesture models")
+    ap.add_argument("family", choices=["glove", "gesture"])
+    ap.add_argument("--seq", action="store_true", help="gesture: LSTM on SEQ_LEN windows")
+    ap.add_argument("--csv", help="gesture: data CSV (default NewMLP CSV_FILE)")
+    ap.add_argument("--mmap", action="store_true", help="gesture: keep the dataset on disk")
+    ap.add_argument("--segment", action="store_true", help="gesture --seq: one window per motion segment")
+    ap.add_argument("--augment", action="store_true", help="gesture: augment training batches (NewMLP AUGMENT)")
+    ap.add_argument("--hidden", type=int, nargs="+", help="hidden layer sizes (--seq: the LSTM hidden size)")
+    ap.add_argument("--num-layers", type=int, default=2, help="gesture --seq: LSTM layers")
+    ap.add_argument("--seq-len", type=int, help="gesture --seq: window length (default NewMLP SEQ_LEN)")
+    ap.add_argument("--inputs", default="sensor_inputs.npy", help="glove: sensor inputs")
+    ap.add_argument("--outputs", default="joint_outputs.npy", help="glove: joint targets")
+    ap.add_argument("-o", "--out", help="model file (default the script's MODEL_FILE)")
+    ap.add_argument("--epochs", type=int, default=100)
+    ap.add_argument("--batch-size", type=int, default=64)
+    ap.add_argument("--lr", type=float, default=1e-3)
+    ap.add_argument("--val-frac", type=float, default=0.2)
+    ap.add_argument("--patience", type=int, default=10, help="0 disables early stopping")
+    ap.add_argument("--workers", type=int, default=0, help="DataLoader worker processes")
+    ap.add_argument("--threads", type=int, default=0, help="torch.set_num_threads (0 = torch default)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--resume", action="store_true", help="continue from <out>.ckpt")
+    ap.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    args = ap.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    torch.manual_seed(args.seed)
+    np.random.seed(args.seed)
+    out = train_glove(args) if args.family == "glove" else train_gesture(args)
+    print("✅ Model saved:" if os.path.exists(out) else "❌ No model written:", out)
+
+
+if __name__ == "__main__":
+    main()
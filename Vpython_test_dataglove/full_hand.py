@@ -0,0 +1,104 @@
+from vpython import *
+import serial, time, os, sys
+import numpy as np
+from serial.tools import list_ports
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from halo.binary_protocol import BinaryDecoder
+from halo.fusion import FusionDecoder
+from halo.serial_reader import SerialReader
+from halo.session import ReplayPort
+from halo import kinematics
+from halo.quat_math import rotate
+
+# Whole hand from the binary frames (all 11 IMUs): the 15 phalanges are placed
+# by halo.kinematics in one batched call per frame.
+#   python full_hand.py                  # glove on the first USB serial port
+#   python full_hand.py /tmp/ttyHALO     # python -m halo.synth stream --layout binary --link /tmp/ttyHALO
+#   python full_hand.py glove.halo 2     # recorded session at 2x
+# With the firmware in raw mode (RAW_MODE 1) set RAW = True: the MPUs are then
+# fused here (halo/fusion.py); raw recordings are detected. Start in the flat
+# reference pose, 'y' re-takes the finger headings relative to the wrist.
+
+# ---------- PORT ----------
+def pick_port():
+    ports = list(list_ports.comports())
+    for p in ports:
+        desc = (p.description or "").lower()
+        if any(k in desc for k in ("cp210","silicon","ch340","usb-serial","esp32","wch","ftdi")):
+            return p.device
+    return ports[0].device if ports else None
+
+PORT = pick_port() or "COM4"   # fallback, change if needed
+BAUD = 921600
+RAW = False
+FUSION = dict(method="madgwick", beta=0.1, yaw_gain=0.2)     # tune without reflashing
+
+if len(sys.argv) > 1 and sys.argv[1].endswith(".halo"):
+    PORT = sys.argv[1]
+    ser = ReplayPort(PORT, speed=float(sys.argv[2]) if len(sys.argv) > 2 else 1.0, loop=True)
+    RAW = ser.reader.layout == "raw"
+else:
+    if len(sys.argv) > 1:
+        PORT = sys.argv[1]
+    ser = serial.Serial(PORT, BAUD, timeout=1)
+    time.sleep(2.0)
+    ser.reset_input_buffer()
+decoder = FusionDecoder(**FUSION) if RAW else BinaryDecoder()
+reader = SerialReader(ser, decoder).start()
+
+# ---------- Scene ----------
+scene.title = "HALO full hand (BNO wrist + 10 MPU bones)"
+scene.range = 14
+scene.background = color.white
+scene.width = 1200
+scene.height = 800
+scene.forward = vector(-1, -1, -1)
+
+def vp(v):
+    # kinematics is z up, VPython y up
+    return vector(v[0], v[2], -v[1])
+
+palm = box(length=9.0, width=6.5, height=1.2, opacity=0.7, color=color.orange)
+FINGER_COLORS = (color.cyan, color.green, color.blue, color.magenta, color.red)
+bones = [box(length=1, width=1.0 - 0.15 * s, height=0.7, opacity=0.85, color=FINGER_COLORS[f])
+         for f in range(5) for s in range(3)]
+hud = wtext(text="")
+
+def on_key(evt):
+    if evt.key == 'y' and RAW:
+        got = decoder.ring.latest(1)
+        if len(got[0]):
+            decoder.fusion.bank.reset_yaw(got[0]["quat"][0, 0])
+
+scene.bind('keydown', on_key)
+
+# ---------- Main loop ----------
+while True:
+    try:
+        got = reader.take()
+        if got is None:
+            rate(200); continue
+        q = np.asarray(got[0]["quat"], dtype=np.float64)
+
+        p = kinematics.pose(q)
+        axis, up, pos = kinematics.bone_boxes(q, p["joints"])
+        k, u = rotate(q[0], ([1.0, 0, 0], [0, 0, 1.0]))
+        palm.axis = vp(k) * palm.length; palm.up = vp(u); palm.pos = vp(k * 4.5)
+        for b, a, upv, c in zip(bones, axis, up, pos):
+            if np.linalg.norm(a) < 1e-6:
+                b.visible = False; continue
+            b.visible = True
+            b.pos = vp(c); b.axis = vp(a); b.up = vp(upv)
+
+        deg = np.degrees(p["joints"]).reshape(5, 3)
+        hud.text = ("  ".join(f"{name}: {d[0]:5.1f}/{d[1]:5.1f}/{d[2]:5.1f}"
+                              for name, d in zip(kinematics.FINGERS, deg))
+                    + "  (MCP flex / abd / PIP flex, deg)\n" + reader.hud()
+                    + (f"\nfusion {decoder.stats()['fusion_us_per_frame']:.0f} us/frame, 'y' reset headings" if RAW else "")
+                    + "\n")
+        rate(60)
+
+    except Exception as e:
+        print("Error:", e)
+        rate(60)
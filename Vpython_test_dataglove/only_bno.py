@@ -3,10 +3,17 @@ import serial
 import time
 import math
 import numpy as np
+import os, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from halo.packet_parser import StreamParser, as_rows
+from halo.serial_reader import SerialReader
+from halo import quat_math
 
 # ---------- SERIAL SETUP ----------
 ad = serial.Serial('COM4', 115200)
 time.sleep(1)
+reader = SerialReader(ad, StreamParser()).start()   # layout auto-detected
 
 # ---------- SCENE SETUP ----------
 scene.title = "BNO055 Hand Simulation"
@@ -45,35 +52,25 @@ scene.up = vector(0, 1, 0)
 # ---------- MAIN LOOP ----------
 while True:
     try:
-        while ad.in_waiting == 0:
-            pass
-
-        # Read and parse the serial data
-        dataPacket = ad.readline().decode('utf-8').strip()
-        splitPacket = dataPacket.split(',')
-
-        if len(splitPacket) < 4:
+        # newest frame from the reader thread (no busy-wait on in_waiting)
+        got = reader.take()
+        if got is None:
+            rate(200)
             continue
 
-        q0 = float(splitPacket[0])
-        q1 = float(splitPacket[1])
-        q2 = float(splitPacket[2])
-        q3 = float(splitPacket[3])
+        q = as_rows(got[0])[:4]
 
-        # ---------- Convert quaternion to Euler angles ----------
-        roll = -math.atan2(2 * (q0 * q1 + q2 * q3), 1 - 2 * (q1 ** 2 + q2 ** 2))
-        pitch = math.asin(2 * (q0 * q2 - q3 * q1))
-        yaw = -math.atan2(2 * (q0 * q3 + q1 * q2), 1 - 2 * (q2 ** 2 + q3 ** 2)) - np.pi / 2
+        # ---------- Convert quaternion to Euler angles (asin clamped) ----------
+        roll, pitch, yaw = quat_math.to_rpy(q)
+        yaw = yaw - np.pi / 2
 
         # ---------- Update 3D hand orientation ----------
         rate(50)
 
-        # Forward direction
-        k = vector(math.cos(yaw) * math.cos(pitch), math.sin(pitch), math.sin(yaw) * math.cos(pitch))
-        y = vector(0, 1, 0)
-        s = cross(k, y)
-        v = cross(s, k)
-        vrot = v * math.cos(roll) + cross(k, v) * math.sin(roll)
+        # Forward direction and rolled up vector
+        k_np, up_np = quat_math.rpy_to_axis_up(roll, pitch, yaw)
+        k = vector(*k_np)
+        vrot = vector(*up_np)
 
         # Update arrows
         frontArrow.axis = k * 2
@@ -4,8 +4,13 @@ from vpython import *
 import serial
 import time
 import math
+import os
+import sys
 import numpy as np
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from halo.calibration import Calibrator, load_calibration
+
 # ---------- SERIAL SETUP ----------
 ad = serial.Serial('COM4', 115200)
 time.sleep(1)
@@ -33,6 +38,21 @@ frontArrow = arrow(length=1.2, shaftwidth=0.07, color=color.orange)  #
 upArrow = arrow(length=1, shaftwidth=0.07, color=color.magenta)
 sideArrow = box(length=4, shaftwidth=0.07, color=color.orange)     # 
 
+# ---------- CALIBRATION ----------
+# sensor offset of the BNO from the saved calibration ('c' captures a new one
+# over 1.5 s and saves it); the manual offsets below only align the scene
+GLOVE = "default"
+cal = load_calibration(GLOVE)
+calib = Calibrator(cal)
+
+def on_key(evt):
+    global calib
+    if evt.key == 'c':
+        calib = Calibrator(cal).start()
+        print("Calibrating, hold still...")
+
+scene.bind('keydown', on_key)
+
 # ---------- MANUAL ALIGNMENT OFFSETS ----------
 yaw_offset = math.radians(180)      # rotate around vertical axis (Y)
 pitch_offset = math.radians(0)      # tilt up/down
@@ -55,6 +75,10 @@ while True:
         q2 = float(splitPacket[2])
         q3 = float(splitPacket[3])
 
+        if calib.active and calib.feed([q0, q1, q2, q3]):
+            print(calib.status)
+        q0, q1, q2, q3 = cal.apply([q0, q1, q2, q3], imus=0)
+
         # ---------- Convert quaternion to Euler ----------
         roll = -math.atan2(2 * (q0*q1 + q2*q3), 1 - 2 * (q1**2 + q2**2))
         pitch = math.asin(2 * (q0*q2 - q3*q1))
@@ -1,7 +1,18 @@
 from vpython import *
-import serial, time, math
+import serial, time, math, os, sys
+import numpy as np
 from serial.tools import list_ports
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from halo.packet_parser import StreamParser, as_rows
+from halo.serial_reader import SerialReader
+from halo.quat_math import finger_pose
+from halo.session import ReplayPort
+from halo.frame_bus import FrameSubscriber
+from halo.filters import EMABank
+from halo.metrics import Metrics
+from halo.calibration import Calibrator, load_calibration
+
 # ---------- PORT ----------
 def pick_port():
     ports = list(list_ports.comports())
@@ -14,9 +25,30 @@ def pick_port():
 PORT = pick_port() or "COM4"   # fallback, change if needed
 BAUD = 115200
 
-ser = serial.Serial(PORT, BAUD, timeout=1)
-time.sleep(2.0)
-ser.reset_input_buffer()
+ser = None
+if len(sys.argv) > 1 and sys.argv[1].startswith("bus:"):
+    # frames from a shared-memory bus: python -m halo.frame_bus publish --port COM4 --layout quat14
+    PORT = sys.argv[1]
+elif len(sys.argv) > 1 and sys.argv[1].endswith(".halo"):
+    # replay a recorded session instead: python test2_2mpu_bno_sameRollYaw.py glove.halo [speed]
+    PORT = sys.argv[1]
+    ser = ReplayPort(PORT, speed=float(sys.argv[2]) if len(sys.argv) > 2 else 1.0, loop=True)
+else:
+    if len(sys.argv) > 1:
+        PORT = sys.argv[1]    # e.g. the pty of python -m halo.synth stream --link /tmp/ttyHALO
+    ser = serial.Serial(PORT, BAUD, timeout=1)
+    time.sleep(2.0)
+    ser.reset_input_buffer()
+# port is drained on a background thread; the loop below only renders
+METRICS_PORT = None     # e.g. 9109: http://127.0.0.1:9109/metrics (Prometheus) and /metrics.json
+metrics = Metrics()
+if ser is None:
+    reader = FrameSubscriber(PORT[4:], "test2-viewer", metrics=metrics)
+else:
+    reader = SerialReader(ser, StreamParser("quat14"), metrics=metrics).start()
+if METRICS_PORT:
+    metrics.serve(METRICS_PORT)
+metrics.start_dump(30.0)
 
 # ---------- Scene ----------
 scene.title = "BNO wrist + two MPU finger bones (bend axis selectable)"
@@ -30,6 +62,7 @@ scene.forward = vector(-1, -1, -1)
 wrist_len = 4.0
 bone1_len = 3.0
 bone2_len = 3.0
+BONE_LENGTHS = (wrist_len, bone1_len, bone2_len)
 
 wrist = box(length=wrist_len, width=2.0, height=0.6, opacity=0.7, color=color.orange, pos=vector(0,0,0))
 bone1 = box(length=bone1_len, width=0.8, height=0.6, opacity=0.85, color=color.cyan)
@@ -49,75 +82,65 @@ USE_CLAMP = False       # set True to clamp to realistic finger range
 CLAMP_MIN_DEG = -5
 CLAMP_MAX_DEG = 110
 
-# ---------- Helpers ----------
-y_up = vector(0,1,0)
-
-def rpy_to_axis_up(roll, pitch, yaw):
-    k = vector(math.cos(yaw)*math.cos(pitch),
-               math.sin(pitch),
-               math.sin(yaw)*math.cos(pitch))
-    s = cross(k, y_up)
-    v = cross(s, k)
-    up = v*math.cos(roll) + cross(k, v)*math.sin(roll)
-    return k, up
+GLOVE = "default"        # calibration file name (python -m halo.calibration show default)
 
+# ---------- Helpers ----------
 def clamp(v, vmin, vmax):
     return max(vmin, min(v, vmax))
 
-# Zero & smoothing state
-bend1_zero = None
-bend2_zero = None
-bend1_prev = 0.0
-bend2_prev = 0.0
+# Zero & smoothing state: MPU zeros and the wrist offset come from the saved
+# calibration; without one the MPUs are zeroed on the first frame (not saved)
+cal = load_calibration(GLOVE)
+calib = Calibrator(cal)
+smoother = EMABank(2, SMOOTH)   # bend1, bend2
 
 def on_key(evt):
-    global BEND_AXIS_1, BEND_AXIS_2, bend1_zero, bend2_zero
+    global BEND_AXIS_1, BEND_AXIS_2, calib
     k = evt.key
     if k == '1':
         BEND_AXIS_1 = "roll" if BEND_AXIS_1 == "pitch" else "pitch"
     elif k == '2':
         BEND_AXIS_2 = "roll" if BEND_AXIS_2 == "pitch" else "pitch"
     elif k == 'z':
-        bend1_zero = None
-        bend2_zero = None
+        # re-zero the bends over 1 s of frames and save
+        calib = Calibrator(cal, seconds=1.0, quats=False).start()
+    elif k == 'c':
+        # full calibration: MPU zeros and wrist offset (hold the reference pose)
+        calib = Calibrator(cal, seconds=1.5).start()
 
 scene.bind('keydown', on_key)
 
 # ---------- Main loop ----------
 while True:
     try:
-        line = ser.readline().decode('utf-8', errors='ignore').strip()
-        if not line:
-            rate(200); continue
-        parts = [p.strip() for p in line.split(',')]
-        if len(parts) < 14:
+        # newest frame only; older ones were already superseded
+        got = reader.take()
+        if got is None:
             rate(200); continue
-
-        # BNO quaternion -> rollB/pitchB/yawB (radians)
-        q0,q1,q2,q3 = [float(parts[i]) for i in range(4)]
-        rollB  = -math.atan2(2*(q0*q1 + q2*q3), 1 - 2*(q1*q1 + q2*q2))
-        pitchB =  math.asin( 2*(q0*q2 - q3*q1))
-        yawB   = -math.atan2(2*(q0*q3 + q1*q2), 1 - 2*(q2*q2 + q3*q3))
+        parts = as_rows(got[0]).tolist()
+        t_arrival = got[1]
+        t_filter = time.perf_counter()
+        if calib.active:
+            calib.feed_frames(got[0], t_arrival)
 
         # Raw MPU degrees
         roll1_deg  = float(parts[4]);  pitch1_deg = float(parts[5])
         roll2_deg  = float(parts[7]);  pitch2_deg = float(parts[8])
 
-        # Choose which axis drives the bend (per bone), convert to radians
-        bend1_raw = math.radians(pitch1_deg if BEND_AXIS_1=="pitch" else roll1_deg) * SIGN_P1 * GAIN_1
-        bend2_raw = math.radians(pitch2_deg if BEND_AXIS_2=="pitch" else roll2_deg) * SIGN_P2 * GAIN_2
+        # Zeroed with the calibration ('z' / 'c'), or on the first frame
+        if "mpu1_rpy" not in cal.zeros:
+            cal.zeros["mpu1_rpy"] = np.array(parts[4:7]); cal.zeros["mpu2_rpy"] = np.array(parts[7:10])
+        r1, p1, _ = cal.zero("mpu1_rpy", parts[4:7])
+        r2, p2, _ = cal.zero("mpu2_rpy", parts[7:10])
 
-        # Auto-zero on first frame or after pressing 'z'
-        if bend1_zero is None: bend1_zero = bend1_raw
-        if bend2_zero is None: bend2_zero = bend2_raw
-        bend1 = bend1_raw - bend1_zero
-        bend2 = bend2_raw - bend2_zero
+        # Choose which axis drives the bend (per bone), convert to radians
+        bend1 = math.radians(p1 if BEND_AXIS_1=="pitch" else r1) * SIGN_P1 * GAIN_1
+        bend2 = math.radians(p2 if BEND_AXIS_2=="pitch" else r2) * SIGN_P2 * GAIN_2
 
         # Smoothing
-        if SMOOTH > 0:
-            bend1 = (1.0-SMOOTH)*bend1_prev + SMOOTH*bend1
-            bend2 = (1.0-SMOOTH)*bend2_prev + SMOOTH*bend2
-        bend1_prev, bend2_prev = bend1, bend2
+        smoother.alpha = SMOOTH
+        bend1, bend2 = smoother.update((bend1, bend2))
+        metrics.observe("filter", time.perf_counter() - t_filter)
 
         # Optional clamp
         if USE_CLAMP:
@@ -129,22 +152,17 @@ while True:
         hud.text = (f"Calib Sys:{system} G:{gyro} A:{accel} M:{mag} | Port:{PORT}\n"
                     f"MPU1 r={roll1_deg:.1f}° p={pitch1_deg:.1f}°  [bend axis={BEND_AXIS_1}]\n"
                     f"MPU2 r={roll2_deg:.1f}° p={pitch2_deg:.1f}°  [bend axis={BEND_AXIS_2}]\n"
-                    "Keys: '1' toggle bone1 axis, '2' toggle bone2 axis, 'z' re-zero\n")
-
-        # Wrist from BNO
-        kB, upB = rpy_to_axis_up(rollB, pitchB, yawB)
-        wrist.axis = kB; wrist.up = upB; wrist.pos = vector(0,0,0)
-
-        # Fingers: yaw/roll from BNO, bend from chosen axis
-        yawF = yawB; rollF = rollB
-
-        k1, up1 = rpy_to_axis_up(rollF, bend1, yawF)
-        bone1.axis = k1; bone1.up = up1
-        bone1.pos  = wrist.pos + kB * (wrist_len/2.0 + bone1_len/2.0)
-
-        k2, up2 = rpy_to_axis_up(rollF, bend2, yawF)
-        bone2.axis = k2; bone2.up = up2
-        bone2.pos  = bone1.pos + k1 * (bone1_len/2.0 + bone2_len/2.0)
+                    "Keys: '1' toggle bone1 axis, '2' toggle bone2 axis, 'z' re-zero, 'c' calibrate\n"
+                    f"Calibration ({GLOVE}): {calib.status}\n"
+                    f"{reader.hud()}\n{metrics.hud()}\n")
+
+        # Wrist from the BNO quaternion; fingers take yaw/roll from the BNO and
+        # their bend as pitch, chained wrist -> bone1 -> bone2 (one batched call)
+        with metrics.stage("render"):
+            axis, up, pos = finger_pose(cal.apply(parts[0:4], imus=0), [bend1, bend2], BONE_LENGTHS)
+            for obj, k, u, p in zip((wrist, bone1, bone2), axis, up, pos):
+                obj.axis = vector(*k); obj.up = vector(*u); obj.pos = vector(*p)
+        metrics.done(t_arrival)
 
         rate(60)
 
@@ -1,8 +1,14 @@
 from vpython import *
-import serial, time, math
+import serial, time, math, os, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from halo.packet_parser import StreamParser, as_rows
+from halo.serial_reader import SerialReader
+from halo import quat_math
 
 arduino = serial.Serial('COM3', 115200)  # adjust port!
 time.sleep(1)
+reader = SerialReader(arduino, StreamParser("quat11")).start()
 
 scene.range = 6
 scene.background = color.white
@@ -16,20 +22,14 @@ mpu_box = box(length=4, width=2, height=0.2, opacity=0.7, color=color.cyan, pos=
 
 while True:
     try:
-        while arduino.in_waiting == 0:
-            pass
-        line = arduino.readline().decode('utf-8').strip()
-        vals = line.split(",")
-
-        if len(vals) < 11:
+        got = reader.take()
+        if got is None:
+            rate(200)
             continue
+        vals = as_rows(got[0]).tolist()
 
         # --- BNO055 quaternion ---
-        q0, q1, q2, q3 = [float(v) for v in vals[0:4]]
-
-        rollB = -math.atan2(2*(q0*q1 + q2*q3), 1 - 2*(q1*q1 + q2*q2))
-        pitchB = math.asin(2*(q0*q2 - q3*q1))
-        yawB = -math.atan2(2*(q0*q3 + q1*q2), 1 - 2*(q2*q2 + q3*q3))
+        rollB, pitchB, yawB = quat_math.to_rpy(vals[0:4])
 
         #mpu roll pitch yaw 
         rollM = float(vals[4]) * math.pi/180
@@ -48,26 +48,14 @@ while True:
 
         print(f"Calibration -> Sys:{system} G:{gyro} A:{accel} M:{mag}")
 
-        # --- Update BNO box orientation ---
-        kB = vector(math.cos(yawB)*math.cos(pitchB),
-                    math.sin(pitchB),
-                    math.sin(yawB)*math.cos(pitchB))
-        y = vector(0,1,0)
-        s = cross(kB,y); v = cross(s,kB)
-        vrotB = v*math.cos(rollB) + cross(kB,v)*math.sin(rollB)
-
-        bno_box.axis = kB
-        bno_box.up = vrotB
+        # --- Both boxes in one call: [BNO, MPU] ---
+        k, up = quat_math.rpy_to_axis_up([rollB, rollM], [pitchB, pitchM], [yawB, yawM])
 
-        # --- Update MPU box orientation ---
-        kM = vector(math.cos(yawM)*math.cos(pitchM),
-                    math.sin(pitchM),
-                    math.sin(yawM)*math.cos(pitchM))
-        s = cross(kM,y); v = cross(s,kM)
-        vrotM = v*math.cos(rollM) + cross(kM,v)*math.sin(rollM)
+        bno_box.axis = vector(*k[0])
+        bno_box.up = vector(*up[0])
 
-        mpu_box.axis = kM
-        mpu_box.up = vrotM
+        mpu_box.axis = vector(*k[1])
+        mpu_box.up = vector(*up[1])
 
         rate(50)
 
@@ -72,12 +72,16 @@ loader.load(
 const calibration = {};
 let latestData = null;
 
-// finds average of the quaternions
+// finds average of the quaternions (q and -q are the same rotation, so each
+// sample is flipped onto the first one's side before summing; the exact
+// rotation mean is halo/calibration.py)
 function averageQuaternions(quaternions) {
   const qSum = new THREE.Vector4(0, 0, 0, 0);
+  const ref = quaternions[0].clone().normalize();
 
   quaternions.forEach((q) => {
     const nq = q.clone().normalize();
+    if (nq.dot(ref) < 0) nq.set(-nq.x, -nq.y, -nq.z, -nq.w);
     qSum.x += nq.x;
     qSum.y += nq.y;
     qSum.z += nq.z;
@@ -116,6 +120,38 @@ function applyOrientation(bone, qIMU, name) {
   bone.quaternion.copy(q);
 }
 
+// finger bones in the order of data.fingers and the saved calibration offsets
+const fingerNames = [
+  "pointer001","pointer002",
+  "middle001","middle002",
+  "ring001","ring002",
+  "pinky001","pinky002",
+  "thumb001","thumb002"
+];
+
+// saved calibration (python -m halo.calibration capture <glove> ...), served by
+// halo/relay.py at /calibration/<glove>.json; ?glove=name picks the glove
+const wxyz = ([w, x, y, z]) => new THREE.Quaternion(x, y, z, w);
+
+async function loadSavedCalibration() {
+  const glove = new URLSearchParams(window.location.search).get("glove") || "default";
+  try {
+    const res = await fetch(`/calibration/${encodeURIComponent(glove)}.json`);
+    if (!res.ok) return;
+    const saved = await res.json();
+    calibration["handy"] = wxyz(saved.offsets[0]);
+    fingerNames.forEach((name, i) => (calibration[name] = wxyz(saved.offsets[i + 1])));
+    wristAxisFix = wxyz(saved.axis_fixes[0]);
+    fingerAxisFix = wxyz(saved.axis_fixes[1]);
+    const statusEl = document.getElementById("calibration-status");
+    if (statusEl) statusEl.textContent = `Loaded calibration "${glove}"`;
+  } catch (err) {
+    console.log("No saved calibration:", err);
+  }
+}
+
+loadSavedCalibration();
+
 // find the mean values,take it as reference to calibrate
 function calibrateOverTime(duration = 1500) {
   if (!latestData) return;
@@ -124,14 +160,6 @@ function calibrateOverTime(duration = 1500) {
   if (statusEl) statusEl.textContent = "Calibrating...";
 
   const samples = { handy: [], fingers: [] };
-  const fingerNames = [
-    "pointer001","pointer002",
-    "middle001","middle002",
-    "ring001","ring002",
-    "pinky001","pinky002",
-    "thumb001","thumb002"
-  ];
-
   const start = performance.now();
 
   function sample() {
@@ -192,14 +220,6 @@ window.updateHand = function (data) {
 
   // Fingers
   if (Array.isArray(data.fingers)) {
-    const fingerNames = [
-      "pointer001","pointer002",
-      "middle001","middle002",
-      "ring001","ring002",
-      "pinky001","pinky002",
-      "thumb001","thumb002"
-    ];
-
     data.fingers.forEach((f, i) => {
       const name = fingerNames[i];
       const b = boneMap[name];
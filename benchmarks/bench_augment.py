@@ -0,0 +1,124 @@
+# On-the-fly augmentation (halo/augment.py, gesture_store.AugmentedDataset):
+#   - cost of each step and of the full AUGMENT pipeline on one batch of
+#     SEQ_LEN x 33 windows, next to one LSTMClassifier training step
+#   - an LSTM epoch over a synthetic gesture store with and without
+#     augmentation, for 0 and 2 DataLoader workers (samples/s)
+#   - checks: the same seed and indices give the same batch, batches do not
+#     depend on the number of workers, and the relative bone rotations are
+#     unchanged by the global rotation
+#
+#   python benchmarks/bench_augment.py [batch] [frames]
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+import torch
+import torch.nn as nn
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, os.path.join(HERE, "..", "MLP"))
+from halo import quat_math as qm
+from halo.augment import Augment, batch_rng
+from halo.synth import generate_dataset
+from gesture_store import AugmentedDataset, GestureStore, StoreDataset
+import trainer
+
+
+def best(fn, repeat=20):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times) * 1e3
+
+
+def epoch(model, ds, batch, workers, max_batches=60):
+    torch.manual_seed(0)
+    loader = trainer._loader(ds, batch, True, workers, torch.device("cpu"))
+    opt = torch.optim.Adam(model.parameters())
+    loss_fn = nn.CrossEntropyLoss()
+    batches = []
+    n, t0 = 0, time.perf_counter()
+    for i, (X, y) in enumerate(loader):
+        opt.zero_grad()
+        loss_fn(model(X), y).backward()
+        opt.step()
+        n += len(X)
+        if i < 3:
+            batches.append(X)
+        if i + 1 >= max_batches:
+            break
+    return n / (time.perf_counter() - t0), batches
+
+
+def relative(x):
+    r = np.radians(x.reshape(*x.shape[:-1], -1, 3))
+    q = qm.from_rpy(r[..., 0], r[..., 1], r[..., 2])
+    return qm.mul(qm.conj(q[..., :1, :]), q)
+
+
+def main():
+    batch = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 40_000
+    nm = trainer.load_newmlp()
+    torch.set_num_threads(1)
+
+    tmp = tempfile.mkdtemp()
+    csv = os.path.join(tmp, "gesture_data.csv")
+    generate_dataset(csv, frames, processes=1, log=lambda *a: None)
+    ds = StoreDataset(GestureStore.from_csv(csv), nm.SEQ_LEN)
+    train_ds, _ = trainer.split(ds, 0.2)
+    X = np.ascontiguousarray(ds.samples[:batch].numpy())
+    y = ds.labels[:batch]
+
+    steps = {
+        "time warp": Augment(rotate_deg=0, bias=0, noise=0, dropout=0),
+        "rotation": Augment(warp=0, bias=0, noise=0, dropout=0),
+        "bias + noise": Augment(warp=0, rotate_deg=0, dropout=0),
+        "dropout": Augment(warp=0, rotate_deg=0, bias=0, noise=0, dropout=1.0),
+        "all (AUGMENT)": Augment(**nm.AUGMENT),
+    }
+    print(f"batch of {batch} windows x {nm.SEQ_LEN} x 33")
+    for name, aug in steps.items():
+        ms = best(lambda: aug(X, batch_rng(0, np.arange(batch))))
+        print(f"  {name:<14} {ms:7.2f} ms")
+    model = nm.LSTMClassifier(33, 128, len(ds.labels_map))
+    opt = torch.optim.Adam(model.parameters())
+    loss_fn = nn.CrossEntropyLoss()
+    Xt = torch.from_numpy(X)
+
+    def step():
+        opt.zero_grad()
+        loss_fn(model(Xt), y).backward()
+        opt.step()
+    print(f"  LSTM train step {best(step, 5):6.2f} ms")
+
+    aug_ds = AugmentedDataset(train_ds, nm.AUGMENT, seed=0)
+    print(f"LSTM epoch, {frames} frames (first 60 batches)")
+    seen = {}
+    for workers in (0, 2):
+        for name, d in (("plain", train_ds), ("augmented", aug_ds)):
+            torch.manual_seed(0)
+            rate, batches = epoch(nm.LSTMClassifier(33, 128, len(ds.labels_map)), d, batch, workers)
+            print(f"  {name:<9} workers {workers}  {rate:8,.0f} samples/s")
+            if name == "augmented":
+                seen[workers] = batches
+
+    aug = Augment(**nm.AUGMENT)
+    a = aug(X, batch_rng(7, np.arange(batch)))
+    b = aug(X, batch_rng(7, np.arange(batch)))
+    rot = Augment(warp=0, bias=0, noise=0, dropout=0)(X, batch_rng(7, np.arange(batch)))
+    err = np.abs(np.abs(np.sum(relative(X) * relative(rot), axis=-1)) - 1).max()
+    same_workers = all(torch.equal(p, q) for p, q in zip(seen[0], seen[2]))
+    print(f"same seed + indices identical: {np.array_equal(a, b)} | workers 0 / 2 identical: {same_workers}"
+          f" | relative rotations after global rotation: max |dot| error {err:.1e}")
+    shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Per-frame cost of the distilled streaming students (MLP/distill.py) next
+# to the NewMLP LSTM they replace, through inference_engine.StreamingClassifier
+# with one frame per push (untrained weights; the cost does not depend on
+# them):
+#   - LSTMClassifier re-run over the SEQ_LEN window, the stateful LSTM, the
+#     causal TCN and the GRU student, for 1 and 8 streams: p50 / p99 per
+#     prediction and frames/s, parameters and float32 size
+#   - check: the TCN's streamed outputs equal forward() over the window
+# Accuracy needs a trained teacher and real data: python MLP/distill.py report
+#
+#   python benchmarks/bench_distill.py [frames]
+
+import os
+import sys
+import time
+import numpy as np
+import torch
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "MLP"))
+from distill import CausalTCN, GRUStudent, size_of
+from inference_engine import StreamingClassifier
+import trainer
+
+
+def run(model, frames, streams, **kw):
+    engine = StreamingClassifier(model, frames.shape[-1], 50, n_streams=streams, **kw)
+    frames = np.repeat(frames[:, None], streams, axis=1)
+    t0 = time.perf_counter()
+    for frame in frames:
+        engine.push(frame)
+    wall = time.perf_counter() - t0
+    lat = engine.latency()
+    return lat["p50_ms"], lat["p99_ms"], len(frames) * streams / wall
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    nm = trainer.load_newmlp()
+    torch.set_num_threads(1)
+    torch.manual_seed(0)
+    frames = np.random.default_rng(0).normal(0, 30, (n, 33)).astype(np.float32)
+
+    lstm = nm.LSTMClassifier(33, 128, 7)
+    models = [("lstm (window)", lstm, {}), ("lstm (stateful)", lstm, {"stateful": True}),
+              ("tcn student", CausalTCN(33, 7), {}), ("gru student", GRUStudent(33, 7, window=nm.SEQ_LEN), {})]
+    print(f"{n} frames, one torch thread")
+    print(f"{'model':<16} {'params':>8} {'KB':>7} {'streams':>7} {'p50 ms':>8} {'p99 ms':>8} {'frames/s':>9}")
+    for name, model, kw in models:
+        params, size = size_of(model)
+        for streams in (1, 8):
+            p50, p99, rate = run(model, frames, streams, **kw)
+            print(f"{name:<16} {params:8d} {size / 1024:7.1f} {streams:7d} {p50:8.3f} {p99:8.3f} {rate:9.0f}")
+
+    tcn = models[2][1].eval()
+    state = tcn.init_state(1)
+    with torch.no_grad():
+        for frame in torch.from_numpy(frames[:nm.SEQ_LEN]):
+            streamed, state = tcn.step(frame[None], state)
+        windowed = tcn(torch.from_numpy(frames[None, :nm.SEQ_LEN]))
+    print(f"tcn streamed vs windowed logits: max |diff| {(streamed - windowed).abs().max().item():.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Shared-memory frame bus under load: the main process publishes decoded
+# binary frames at 500 Hz .. 4 kHz (blocks of 1 ms, as the publisher's read
+# loop would), three subscriber processes read at their own pace:
+#   viewer    take() at ~200 Hz
+#   recorder  drain() every 50 ms
+#   slow      drain() then 30 ms of "inference", ring of 64 frames to force overruns
+# Per subscriber: frames seen, lost to overruns, worst lag reported by the
+# bus and the age of the newest frame when read; plus the publish cost.
+#
+#   python benchmarks/bench_frame_bus.py [seconds]
+
+import multiprocessing as mp
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from halo.binary_protocol import FRAME_DTYPE, BinaryDecoder, FrameSimulator
+from halo.frame_bus import FramePublisher, FrameSubscriber
+
+RATES = (500, 1000, 2000, 4000)
+
+
+def subscriber(name, kind, conn):
+    sub = FrameSubscriber(name, kind)
+    conn.send("ready")
+    seen, calls, t_read = 0, 0, 0.0
+    while not sub.closed:
+        t0 = time.perf_counter()
+        if kind == "viewer":
+            seen += sub.take() is not None
+        else:
+            seen += len(sub.drain()[0])
+        t_read += time.perf_counter() - t0
+        calls += 1
+        time.sleep({"viewer": 0.005, "recorder": 0.05, "slow": 0.03}[kind])
+    conn.send((seen, sub.ring_overruns, sub.age_mean, t_read / max(calls, 1)))
+
+
+def run(rate_hz, seconds, capacity):
+    name = f"halo_bench_{os.getpid()}"
+    sim, dec = FrameSimulator(rate_hz), BinaryDecoder(capacity=rate_hz)
+    block = max(1, rate_hz // 1000)
+    dec.feed(sim.frames(rate_hz * 2))
+    frames = dec.ring.latest(rate_hz * 2)[0]
+    pub = FramePublisher(name, FRAME_DTYPE, capacity, "binary")
+    procs = {}
+    for kind in ("viewer", "recorder", "slow"):
+        a, b = mp.Pipe()
+        p = mp.Process(target=subscriber, args=(name, kind, b))
+        p.start()
+        a.recv()
+        procs[kind] = (p, a)
+
+    lag = {}
+    t_pub, n = 0.0, 0
+    start = time.perf_counter()
+    next_t = start
+    while n < rate_hz * seconds:
+        i = n % len(frames)
+        t0 = time.perf_counter()
+        pub.publish(frames[i:i + block], t0)
+        t_pub += time.perf_counter() - t0
+        n += block
+        if n % (rate_hz // 10) < block:
+            for r in pub.subscribers():
+                lag[r["name"]] = max(lag.get(r["name"], 0), r["lag"])
+        next_t += block / rate_hz
+        time.sleep(max(0.0, next_t - time.perf_counter()))
+    pub.close()
+
+    print(f"  {rate_hz:5d} Hz  published {n}  publish {t_pub / (n / block) * 1e6:.1f} us/block of {block}")
+    for kind, (p, conn) in procs.items():
+        seen, lost, age, t_read = conn.recv()
+        p.join()
+        print(f"      {kind:<9} seen {seen:6d}  lost {lost:6d}  max lag {lag.get(kind, 0):5d}"
+              f" ({lag.get(kind, 0) / rate_hz * 1e3:5.1f} ms)  age {age * 1e3:5.2f} ms  read {t_read * 1e6:5.1f} us/call")
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    for capacity in (8192, 64):
+        print(f"capacity {capacity} frames, {seconds:.0f} s per run")
+        for rate_hz in RATES:
+            run(rate_hz, seconds, capacity)
+
+
+if __name__ == "__main__":
+    main()
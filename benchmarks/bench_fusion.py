@@ -0,0 +1,47 @@
+# Host-side MPU fusion on synthetic raw-mode data (halo.synth, gyro bias
+# random walk, accel noise, starting in the flat "open" pose): cost per frame
+# for live-sized and buffered blocks, and the joint-angle error against the
+# simulated hand over time, with and without the BNO heading correction.
+#
+#   python benchmarks/bench_fusion.py [seconds] [rate_hz]
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from halo import kinematics
+from halo.fusion import Fusion, relative_heading
+from halo.synth import HandSim, records
+
+CONFIGS = [
+    ("madgwick", dict(beta=0.05)),
+    ("mahony", dict(kp=1.0)),
+]
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 300.0
+    rate_hz = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    sim = HandSim(rate_hz, seed=9)                       # seed 9 starts open-handed
+    block = sim.step(int(seconds * rate_hz))
+    raw = records(block, "raw")
+    truth = block["joints"]
+    offsets = relative_heading(block["quat"][0, 1:], block["quat"][0, 0])
+    tenth = len(raw) // 10
+    print(f"{len(raw)} frames at {rate_hz} Hz, 10 MPUs; joint error mean abs deg, first / last {tenth / rate_hz:.0f} s")
+    for method, args in CONFIGS:
+        for yaw_gain in (0.0, 0.2):
+            for size in (1, 10, 100):
+                fusion = Fusion(method, yaw_gain=yaw_gain, yaw_offsets=offsets, rate_hz=rate_hz, **args)
+                t0 = time.perf_counter()
+                q = np.concatenate([fusion.update(raw[i:i + size]) for i in range(0, len(raw), size)])
+                dt = time.perf_counter() - t0
+                err = np.degrees(np.abs(kinematics.joint_angles(q) - truth))
+                print(f"  {method:<9} yaw_gain {yaw_gain:3.1f}  block {size:3d}  {dt / len(raw) * 1e6:6.1f} us/frame"
+                      f"  error {err[:tenth].mean():5.2f} / {err[-tenth:].mean():5.2f}")
+
+
+if __name__ == "__main__":
+    main()
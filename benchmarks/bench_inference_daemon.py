@@ -0,0 +1,139 @@
+# Warm inference daemon (MLP/inference_daemon.py) with NewMLP-sized
+# untrained models (the cost does not depend on the weights):
+#   - cold start: a fresh process importing NewMLP / torch, loading the
+#     checkpoint and predicting once, vs connecting to the daemon and asking
+#   - C client processes each sending R single LSTM windows (SEQ_LEN x 33)
+#     back to back: requests/s and latency percentiles without micro-batching
+#     (max-batch 1) and with it
+#   - the same load while the checkpoint is rewritten every 0.5 s: reloads,
+#     versions seen by the clients, failed requests and dropped connections
+#
+#   python benchmarks/bench_inference_daemon.py [clients] [requests]
+
+import multiprocessing as mp
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import torch
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MLP_DIR = os.path.join(HERE, "..", "MLP")
+sys.path.insert(0, MLP_DIR)
+from inference_daemon import DaemonClient
+import trainer
+
+COLD = """
+import sys, time; t0 = time.perf_counter()
+sys.path.insert(0, {mlp!r})
+import numpy as np, torch, trainer
+nm = trainer.load_newmlp()
+ckpt = torch.load({path!r}, map_location="cpu")
+model = nm.LSTMClassifier(33, 128, len(ckpt["labels_map"]))
+model.load_state_dict(ckpt["model_state"])
+with torch.no_grad():
+    model(torch.zeros(1, nm.SEQ_LEN, 33)).argmax(1)
+print(time.perf_counter() - t0)
+"""
+
+
+def start(sock, gesture, glove, *args):
+    if os.path.exists(sock):
+        os.remove(sock)
+    proc = subprocess.Popen([sys.executable, os.path.join(MLP_DIR, "inference_daemon.py"), "serve", "--socket", sock,
+                             "--gesture", gesture, "--glove", glove, "--stats-every", "0", *args],
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    while not os.path.exists(sock):
+        if proc.poll() is not None:
+            raise RuntimeError(proc.stdout.read())
+        time.sleep(0.05)
+    return proc
+
+
+def client(args):
+    sock, n, seed = args
+    rng = np.random.default_rng(seed)
+    windows = rng.normal(size=(16, 50, 33)).astype(np.float32)
+    lat, versions, errors = [], set(), 0
+    try:
+        with DaemonClient(sock, timeout=30) as c:
+            c.info()
+            for i in range(n):
+                t0 = time.perf_counter()
+                try:
+                    c.gesture_logits(windows[i % 16])
+                except RuntimeError:
+                    errors += 1
+                lat.append(time.perf_counter() - t0)
+                versions.add(c.version)
+    except ConnectionError:
+        return lat, versions, errors, True
+    return lat, versions, errors, False
+
+
+def load(sock, clients, n, during=None):
+    with mp.Pool(clients) as pool:
+        t0 = time.perf_counter()
+        res = pool.map_async(client, [(sock, n, i) for i in range(clients)])
+        if during:
+            during(res)
+        res = res.get()
+        dt = time.perf_counter() - t0
+    lat = np.concatenate([r[0] for r in res]) * 1e3
+    versions = set().union(*(r[1] for r in res))
+    return (len(lat) / dt, np.percentile(lat, 50), np.percentile(lat, 99), versions, sum(r[2] for r in res),
+            sum(r[3] for r in res))
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    nm = trainer.load_newmlp()
+    import MLP as glove
+
+    tmp = tempfile.mkdtemp()
+    gesture, glove_path, sock = (os.path.join(tmp, f) for f in ("gesture.pth", "glove.pth", "d.sock"))
+    torch.manual_seed(0)
+    labels_map = {f"g{i}": i for i in range(7)}
+    torch.save({"model_state": nm.LSTMClassifier(33, 128, 7).state_dict(), "labels_map": labels_map}, gesture)
+    scale = {k: torch.ones(23 if k.startswith("x") else 15) for k in ("x_mean", "x_scale", "y_mean", "y_scale")}
+    torch.save({"model_state": glove.GloveMLP().state_dict(), **scale}, glove_path)
+
+    cold = float(subprocess.run([sys.executable, "-c", COLD.format(mlp=MLP_DIR, path=gesture)],
+                                capture_output=True, text=True, check=True).stdout)
+    proc = start(sock, gesture, glove_path, "--max-batch", "1", "--max-wait-ms", "0", "--watch", "0")
+    t0 = time.perf_counter()
+    with DaemonClient(sock) as c:
+        c.gesture_logits(np.zeros((50, 33), np.float32))
+    warm = time.perf_counter() - t0
+    print(f"cold start + 1 prediction {cold * 1e3:.0f} ms | daemon connect + 1 prediction {warm * 1e3:.1f} ms")
+    print(f"{clients} clients x {n} LSTM windows")
+
+    rate, p50, p99, *_ = load(sock, clients, n)
+    print(f"  no batching (max-batch 1)  {rate:7.0f} req/s  p50 {p50:6.2f} ms  p99 {p99:6.2f} ms")
+    proc.terminate()
+    proc.wait()
+
+    proc = start(sock, gesture, glove_path, "--max-batch", "64", "--max-wait-ms", "1", "--watch", "0.2")
+    rate, p50, p99, *_ = load(sock, clients, n)
+    print(f"  micro-batched (64, 1 ms)   {rate:7.0f} req/s  p50 {p50:6.2f} ms  p99 {p99:6.2f} ms")
+
+    def rewrite(res):
+        while not res.ready():
+            time.sleep(0.5)
+            torch.save({"model_state": nm.LSTMClassifier(33, 128, 7).state_dict(), "labels_map": labels_map},
+                       gesture)
+
+    rate, p50, p99, versions, errors, dropped = load(sock, clients, n, during=rewrite)
+    print(f"  checkpoint rewritten /0.5s {rate:7.0f} req/s  p50 {p50:6.2f} ms  p99 {p99:6.2f} ms"
+          f"  versions seen {sorted(versions)}  failed requests {errors}  dropped connections {dropped}")
+    proc.terminate()
+    proc.wait()
+    shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# Benchmark: NewMLP's old live loop (deque of tensors + torch.stack + one
+# forward per frame) vs MLP/inference_engine.StreamingClassifier, for the
+# LSTM on SEQ_LEN-frame windows with 1 and several gloves.
+#
+#   python benchmarks/bench_inference_engine.py [frames] [gloves]
+
+import os
+import sys
+import time
+from collections import deque
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MLP"))
+from inference_engine import StreamingClassifier
+
+INPUT_DIM = 33
+SEQ_LEN = 50
+NUM_CLASSES = 5
+
+
+class LSTMClassifier(torch.nn.Module):   # same shape as NewMLP's
+    def __init__(self, input_dim, hidden_dim, num_classes, num_layers=2):
+        super().__init__()
+        self.lstm = torch.nn.LSTM(input_dim, hidden_dim, num_layers, batch_first=True)
+        self.fc = torch.nn.Linear(hidden_dim, num_classes)
+
+    def forward(self, x):
+        _, (h_n, _) = self.lstm(x)
+        return self.fc(h_n[-1])
+
+
+@torch.no_grad()
+def old_loop(model, data):
+    preds = []
+    for rows in data:                       # one deque per glove, one forward each
+        buf = deque(maxlen=SEQ_LEN)
+        for row in rows:
+            buf.append(row)
+            if len(buf) == SEQ_LEN:
+                preds.append(torch.argmax(model(torch.stack(list(buf)).unsqueeze(0)), dim=1).item())
+    return preds
+
+
+def engine_loop(model, data, **kw):
+    engine = StreamingClassifier(model, INPUT_DIM, SEQ_LEN, n_streams=len(data), **kw)
+    for t in range(data.shape[1]):
+        engine.push(data[:, t])
+    return engine
+
+
+def main():
+    n_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    gloves = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    torch.manual_seed(0)
+    torch.set_num_threads(1)
+    model = LSTMClassifier(INPUT_DIM, 128, NUM_CLASSES).eval()
+    data = torch.randn(gloves, n_frames, INPUT_DIM)
+
+    print(f"{n_frames} frames x {gloves} gloves, LSTM window {SEQ_LEN}")
+    t0 = time.perf_counter()
+    old_loop(model, data)
+    t_old = time.perf_counter() - t0
+    print(f"  deque + stack      : {t_old/n_frames*1e3:7.3f} ms/frame (all gloves)")
+
+    for name, kw in (("engine window", {}), ("engine stride=5", {"stride": 5}),
+                     ("engine stateful", {"stateful": True})):
+        t0 = time.perf_counter()
+        engine = engine_loop(model, data, **kw)
+        dt = time.perf_counter() - t0
+        print(f"  {name:<18} : {dt/n_frames*1e3:7.3f} ms/frame ({t_old/dt:4.1f}x)  {engine.latency_line()}")
+
+
+if __name__ == "__main__":
+    main()
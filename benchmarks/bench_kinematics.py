@@ -0,0 +1,39 @@
+# Benchmark: full-hand pose (relative rotations, 15 joint angles, joint
+# positions) frame by frame vs one batched halo.kinematics.pose() call, on
+# synthetic frames; also checks the angles against the simulator's truth.
+#
+#   python benchmarks/bench_kinematics.py [frames]
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from halo import kinematics
+from halo.synth import HandSim, SensorNoise
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    block = HandSim(100, seed=1, noise=SensorNoise.none()).step(n)
+    q = block["quat"]
+
+    t0 = time.perf_counter()
+    per_frame = [kinematics.pose(q[i])["joints"] for i in range(min(n, 2000))]
+    dt_loop = (time.perf_counter() - t0) / len(per_frame)
+
+    t0 = time.perf_counter()
+    p = kinematics.pose(q)
+    dt_batch = (time.perf_counter() - t0) / n
+
+    err = np.degrees(np.abs(p["joints"] - block["joints"])).max()
+    same = np.abs(np.array(per_frame) - p["joints"][:len(per_frame)]).max()
+    print(f"{n} frames x 11 IMUs")
+    print(f"  per frame : {dt_loop * 1e6:8.1f} us/frame")
+    print(f"  batched   : {dt_batch * 1e6:8.2f} us/frame  ({dt_loop / dt_batch:.0f}x)")
+    print(f"  joint angles vs simulator truth: max err {err:.2e} deg (loop vs batch {same:.1e})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# Benchmark: MLP.py's predict_live path (sklearn scalers + eager torch) vs the
+# exported artifact through MLP/predictor.py (NumPy, and int8 dynamic quant),
+# for GloveMLP and NewMLP's LSTMClassifier.
+#
+# Cold start = fresh interpreter: imports + loading the model + first
+# prediction. Per-frame = single-frame predict in a warm process.
+#
+#   python benchmarks/bench_model_export.py [frames]
+
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import torch
+import torch.nn as nn
+from sklearn.preprocessing import StandardScaler
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MLP_DIR = os.path.join(HERE, "..", "MLP")
+sys.path.insert(0, MLP_DIR)
+from model_export import export_glove_mlp, export_gesture_model
+from predictor import load_predictor
+
+OLD_COLD = """
+import pickle, time, torch, torch.nn as nn, numpy as np
+import sklearn.preprocessing
+net = nn.Sequential(nn.Linear(23, 64), nn.ReLU(), nn.Linear(64, 15))
+net.load_state_dict(torch.load({state!r}))
+xs, ys = pickle.load(open({scalers!r}, "rb"))
+x = xs.transform(np.zeros((1, 23)))
+with torch.no_grad():
+    ys.inverse_transform(net(torch.tensor(x, dtype=torch.float32)).numpy())
+"""
+
+NEW_COLD = """
+import sys, numpy as np
+sys.path.insert(0, {mlp_dir!r})
+from predictor import load_predictor
+load_predictor({art!r}, quantize={quant}).predict_live(np.zeros(23))
+"""
+
+
+def cold(code, reps=3):
+    best = float("inf")
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-W", "ignore", "-c", code], check=True)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def per_frame(fn, frames):
+    fn(frames[0])
+    t0 = time.perf_counter()
+    for f in frames:
+        fn(f)
+    return (time.perf_counter() - t0) / len(frames)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    torch.manual_seed(0)
+    torch.set_num_threads(1)
+    rng = np.random.default_rng(0)
+    X = rng.random((1000, 23))
+    Y = rng.uniform(-1, 1, (1000, 15))
+    xs, ys = StandardScaler().fit(X), StandardScaler().fit(Y)
+    net = nn.Sequential(nn.Linear(23, 64), nn.ReLU(), nn.Linear(64, 15)).eval()
+    frames = rng.random((n, 23))
+
+    tmp = tempfile.mkdtemp()
+    state, scalers, art = (os.path.join(tmp, f) for f in ("glove.pth", "scalers.pkl", "glove.npz"))
+    torch.save(net.state_dict(), state)
+    with open(scalers, "wb") as f:
+        pickle.dump((xs, ys), f)
+    export_glove_mlp(net, xs, ys, art)
+
+    def old_predict(x):
+        with torch.no_grad():
+            out = net(torch.tensor(xs.transform([x]), dtype=torch.float32)).numpy()
+        return ys.inverse_transform(out)[0]
+
+    fp32, int8 = load_predictor(art), load_predictor(art, quantize=True)
+    err = max(abs(old_predict(f) - fp32.forward(f[None])[0]).max() for f in frames[:100])
+
+    print(f"GloveMLP, {n} single frames (1 torch thread)")
+    print(f"  cold start  sklearn+torch : {cold(OLD_COLD.format(state=state, scalers=scalers))*1e3:7.0f} ms")
+    print(f"  cold start  predictor     : {cold(NEW_COLD.format(mlp_dir=MLP_DIR, art=art, quant=False))*1e3:7.0f} ms")
+    print(f"  cold start  predictor int8: {cold(NEW_COLD.format(mlp_dir=MLP_DIR, art=art, quant=True))*1e3:7.0f} ms")
+    print(f"  per frame   sklearn+torch : {per_frame(old_predict, frames)*1e6:7.1f} us")
+    print(f"  per frame   predictor     : {per_frame(lambda f: fp32.forward(f[None]), frames)*1e6:7.1f} us")
+    print(f"  per frame   predictor int8: {per_frame(lambda f: int8.forward(f[None]), frames)*1e6:7.1f} us")
+    print(f"  max |joint| difference folded vs original: {err:.2e}")
+
+    # NewMLP LSTM on one 50-frame window
+    class LSTMClassifier(nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.lstm = nn.LSTM(33, 128, 2, batch_first=True)
+            self.fc = nn.Linear(128, 5)
+
+        def forward(self, x):
+            _, (h, _) = self.lstm(x)
+            return self.fc(h[-1])
+
+    lstm = LSTMClassifier().eval()
+    lart = os.path.join(tmp, "lstm.npz")
+    export_gesture_model(lstm, {str(i): i for i in range(5)}, lart, seq_len=50)
+    windows = rng.random((max(n // 20, 20), 1, 50, 33)).astype(np.float32)
+    lp, lt, lq = load_predictor(lart, backend="numpy"), load_predictor(lart), load_predictor(lart, quantize=True)
+
+    def old_lstm(w):
+        with torch.no_grad():
+            return lstm(torch.from_numpy(w))
+
+    print(f"LSTMClassifier, {len(windows)} windows of 50 frames")
+    print(f"  per window  eager torch    : {per_frame(old_lstm, windows)*1e6:6.1f} us")
+    print(f"  per window  predictor numpy: {per_frame(lp.forward, windows)*1e6:6.1f} us")
+    print(f"  per window  predictor torch: {per_frame(lt.forward, windows)*1e6:6.1f} us   (load_predictor default)")
+    print(f"  per window  predictor int8 : {per_frame(lq.forward, windows)*1e6:6.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# Benchmark: current readline/split/float decoding vs halo.packet_parser.
+#
+# Usage:
+#   python benchmarks/bench_packet_parser.py                     # synthetic captures
+#   python benchmarks/bench_packet_parser.py capture1.txt ...    # recorded raw serial dumps
+#
+# A recorded capture is just the raw bytes from the port, e.g.
+#   python -c "import serial; s=serial.Serial('COM4',115200); open('cap.txt','wb').write(s.read(200000))"
+
+import io
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from halo.packet_parser import StreamParser, detect_layout
+
+N_FRAMES = 20000
+
+
+def synthetic_capture(layout, n=N_FRAMES, seed=0):
+    rng = np.random.default_rng(seed)
+    out = io.BytesIO()
+    for _ in range(n):
+        if layout == "quat14":
+            q = rng.normal(size=4); q /= np.linalg.norm(q)
+            vals = ["%.4f" % v for v in q] + ["%.2f" % v for v in rng.uniform(-90, 90, 6)] + ["3"] * 4
+            out.write((",".join(vals) + "\r\n").encode())
+        elif layout == "euler_imu":
+            vals = ["%.2f" % v for v in rng.uniform(-180, 180, 27)]
+            out.write(("imu:" + ",".join(vals) + "\r\n").encode())
+        else:
+            vals = ["%.3f" % v for v in rng.normal(size=33)]
+            out.write((",".join(vals) + "\r\n").encode())
+    return out.getvalue()
+
+
+def legacy_decode(data):
+    # what the viewers / NewMLP do today, one line at a time
+    f = io.BytesIO(data)
+    frames = []
+    while True:
+        raw = f.readline()
+        if not raw:
+            break
+        line = raw.decode("utf-8", errors="ignore").strip()
+        if line.startswith("imu:"):
+            line = line[4:]
+        parts = [p.strip() for p in line.split(",")]
+        try:
+            frames.append([float(p) for p in parts])
+        except ValueError:
+            pass
+    return len(frames)
+
+
+def block_decode(data, chunk=4096):
+    # feed in port-sized chunks, as read_from() would see them
+    p = StreamParser(capacity=8192)
+    n = 0
+    for i in range(0, len(data), chunk):
+        n += p.feed(data[i:i + chunk])
+    return n
+
+
+def bench(fn, data, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        n = fn(data)
+        best = min(best, time.perf_counter() - t0)
+    return n, best
+
+
+def main():
+    captures = []
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            with open(path, "rb") as f:
+                captures.append((os.path.basename(path), f.read()))
+    else:
+        for layout in ("quat14", "euler_imu", "newmlp33"):
+            captures.append(("synthetic " + layout, synthetic_capture(layout)))
+
+    for name, data in captures:
+        first = next((l for l in data.split(b"\n") if detect_layout(l)), b"")
+        layout = detect_layout(first)
+        n_old, t_old = bench(legacy_decode, data)
+        n_new, t_new = bench(block_decode, data)
+        print(f"{name} [{layout.name if layout else '?'}] {len(data)/1e6:.1f} MB")
+        print(f"  split/float : {n_old:6d} frames  {t_old*1e3:8.1f} ms  {t_old/n_old*1e6:6.2f} us/frame")
+        print(f"  StreamParser: {n_new:6d} frames  {t_new*1e3:8.1f} ms  {t_new/n_new*1e6:6.2f} us/frame"
+              f"  ({t_old/t_new:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
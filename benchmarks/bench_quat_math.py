@@ -0,0 +1,78 @@
+# Benchmark: per-bone scalar Euler/trig path (as in the viewers) vs the
+# batched halo.quat_math kernel, for all 11 IMUs over a batch of frames.
+#
+#   python benchmarks/bench_quat_math.py [frames]
+
+import math
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from halo import quat_math
+
+NUM_IMUS = 11
+
+
+# ---------- scalar path (VPython vector ops replaced by tuples) ----------
+def cross(a, b):
+    return (a[1]*b[2] - a[2]*b[1], a[2]*b[0] - a[0]*b[2], a[0]*b[1] - a[1]*b[0])
+
+y_up = (0.0, 1.0, 0.0)
+
+def rpy_to_axis_up(roll, pitch, yaw):
+    k = (math.cos(yaw)*math.cos(pitch), math.sin(pitch), math.sin(yaw)*math.cos(pitch))
+    s = cross(k, y_up)
+    v = cross(s, k)
+    kv = cross(k, v)
+    cr, sr = math.cos(roll), math.sin(roll)
+    up = (v[0]*cr + kv[0]*sr, v[1]*cr + kv[1]*sr, v[2]*cr + kv[2]*sr)
+    return k, up
+
+def scalar_frame(quats):
+    out = []
+    for q0, q1, q2, q3 in quats:
+        roll = -math.atan2(2*(q0*q1 + q2*q3), 1 - 2*(q1*q1 + q2*q2))
+        pitch = math.asin(max(-1.0, min(1.0, 2*(q0*q2 - q3*q1))))
+        yaw = -math.atan2(2*(q0*q3 + q1*q2), 1 - 2*(q2*q2 + q3*q3))
+        out.append(rpy_to_axis_up(roll, pitch, yaw))
+    return out
+
+
+def main():
+    n_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    q = quat_math.normalize(np.random.default_rng(0).normal(size=(n_frames, NUM_IMUS, 4)))
+    q_list = q.tolist()
+
+    t0 = time.perf_counter()
+    for frame in q_list:
+        ref = scalar_frame(frame)
+    t_scalar = time.perf_counter() - t0
+
+    best = float("inf")
+    for _ in range(5):
+        t0 = time.perf_counter()
+        k, up = quat_math.to_axis_up(q)
+        best = min(best, time.perf_counter() - t0)
+
+    # one frame at a time through the kernel (what a 60 Hz render loop does)
+    t0 = time.perf_counter()
+    for i in range(min(n_frames, 1000)):
+        quat_math.to_axis_up(q[i])
+    t_single = (time.perf_counter() - t0) / min(n_frames, 1000)
+
+    # same answer as the scalar path (up normalised, the scalar one is not)
+    up_ref = np.array([u for _, u in ref])
+    up_ref /= np.linalg.norm(up_ref, axis=-1, keepdims=True)
+    err = np.abs(up[-1] - up_ref).max()
+
+    print(f"{n_frames} frames x {NUM_IMUS} IMUs")
+    print(f"  scalar math/cross : {t_scalar*1e3:8.2f} ms  {t_scalar/n_frames*1e6:7.2f} us/frame")
+    print(f"  quat_math batched : {best*1e3:8.2f} ms  {best/n_frames*1e6:7.2f} us/frame  ({t_scalar/best:.0f}x)")
+    print(f"  quat_math 1 frame : {t_single*1e6:7.2f} us/frame")
+    print(f"  max |up| difference vs scalar: {err:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# Load test for halo/relay.py: a local fake ESP32 pushing JSON frames to
+# /esp, and simulated browsers on /browser. Most browsers keep up; a few are
+# slow tabs on a congested link that only read SLOW_HZ messages per second.
+# Run once with the bounded latest-wins queues and once with unbounded queues
+# and the OS default socket buffers (what server.js does), and compare
+# delivery and ESP -> browser latency for the browsers that keep up, frames
+# dropped for the slow ones, and the deepest per-browser queue in the relay.
+#
+# The relay, the fake ESP and the browsers run in separate processes (the
+# browsers split over a few worker processes) so they do not share one
+# event loop.
+#
+#   python benchmarks/bench_relay.py [browsers] [slow] [rate_hz] [seconds]
+
+import asyncio
+import json
+import math
+import multiprocessing as mp
+import os
+import socket
+import sys
+import time
+import numpy as np
+import websockets
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from halo.relay import Relay
+
+FINGERS = 10
+SLOW_HZ = 5
+WORKERS = 4
+
+
+def esp_message(seq):
+    t = seq / 100.0
+    q = lambda a: {"x": 0.0, "y": round(math.sin(a), 4), "z": 0.0, "w": round(math.cos(a), 4)}
+    return json.dumps({
+        "seq": seq,
+        "esp_ts": seq * 10,
+        "t_send": time.time(),
+        "wrist": q(0.3 * math.sin(t)),
+        "fingers": [q(0.5 * math.sin(t + i)) for i in range(FINGERS)],
+    })
+
+
+# ---------- relay process ----------
+def relay_proc(queue_size, sndbuf, conn):
+    async def run():
+        relay = Relay(queue_size=queue_size, sndbuf=sndbuf, log=lambda *a: None)
+        async with relay.serve(host="127.0.0.1", port=0) as server:
+            conn.send(server.sockets[0].getsockname()[1])
+            loop = asyncio.get_running_loop()
+            while True:
+                cmd = await loop.run_in_executor(None, conn.recv)
+                if cmd == "clients":
+                    conn.send(len(relay.clients))
+                elif cmd == "stats":
+                    conn.send(relay.stats())
+                else:
+                    return
+    asyncio.run(run())
+
+
+# ---------- browser processes ----------
+async def browser(url, port, slow, seconds):
+    # a slow tab on a congested link: small receive buffer, reads SLOW_HZ msg/s
+    lat = []
+    kw = {}
+    if slow:
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        sock.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(sock, ("127.0.0.1", port))
+        kw = {"sock": sock, "max_queue": 1}
+    async with websockets.connect(url, close_timeout=0.1, **kw) as ws:
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            try:
+                msg = await asyncio.wait_for(ws.recv(), 0.2)
+            except asyncio.TimeoutError:
+                continue
+            except websockets.ConnectionClosed:
+                break
+            data = json.loads(msg)
+            if "t_send" in data:
+                lat.append(time.time() - data["t_send"])
+            if slow:
+                await asyncio.sleep(1.0 / SLOW_HZ)
+    return slow, lat
+
+
+def browsers_proc(port, n_fast, n_slow, seconds, out):
+    async def run():
+        url = f"ws://127.0.0.1:{port}/browser"
+        jobs = [browser(url, port, False, seconds) for _ in range(n_fast)]
+        jobs += [browser(url, port, True, seconds) for _ in range(n_slow)]
+        return await asyncio.gather(*jobs)
+    out.put(asyncio.run(run()))
+
+
+async def fake_esp(port, rate_hz, seconds):
+    async with websockets.connect(f"ws://127.0.0.1:{port}/esp") as ws:
+        n = int(rate_hz * seconds)
+        start = time.perf_counter()
+        for seq in range(n):
+            await ws.send(esp_message(seq))
+            delay = start + (seq + 1) / rate_hz - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+    return n
+
+
+def scenario(n_browsers, n_slow, rate_hz, seconds, queue_size, sndbuf):
+    conn, child = mp.Pipe()
+    relay = mp.Process(target=relay_proc, args=(queue_size, sndbuf, child))
+    relay.start()
+    port = conn.recv()
+
+    out = mp.Queue()
+    procs = []
+    for w in range(WORKERS):
+        fast = n_browsers // WORKERS + (w < n_browsers % WORKERS)
+        slow = n_slow // WORKERS + (w < n_slow % WORKERS)
+        procs.append(mp.Process(target=browsers_proc, args=(port, fast, slow, seconds + 3.0, out)))
+    for p in procs:
+        p.start()
+    while True:
+        conn.send("clients")
+        if conn.recv() >= n_browsers + n_slow:
+            break
+        time.sleep(0.05)
+
+    sent = asyncio.run(fake_esp(port, rate_hz, seconds))
+    conn.send("stats")
+    relay_stats = conn.recv()
+    results = [r for _ in procs for r in out.get()]
+    conn.send("stop")
+    for p in procs + [relay]:
+        p.join()
+
+    fast = [lat for slow, lat in results if not slow]
+    slow = [lat for slow, lat in results if slow]
+    return sent, fast, slow, relay_stats
+
+
+def summary(lats):
+    got = np.array([len(l) for l in lats])
+    flat = np.concatenate([np.asarray(l) for l in lats]) * 1e3
+    return got, np.percentile(flat, [50, 99])
+
+
+def main():
+    n_browsers = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    n_slow = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    rate_hz = float(sys.argv[3]) if len(sys.argv) > 3 else 100
+    seconds = float(sys.argv[4]) if len(sys.argv) > 4 else 5
+
+    print(f"{n_browsers} browsers + {n_slow} slow ({SLOW_HZ} msg/s), ESP at {rate_hz:.0f} Hz for {seconds:.0f} s")
+    for name, q, sndbuf in (("latest-wins queue=4", 4, 1 << 15), ("unbounded (server.js)", None, 0)):
+        sent, fast, _, st = scenario(n_browsers, n_slow, rate_hz, seconds, q, sndbuf)
+        got, (p50, p99) = summary(fast)
+        print(f"  {name}")
+        print(f"    delivered {got.mean()/sent*100:5.1f}% (min {got.min()/sent*100:5.1f}%)"
+              f"  latency p50 {p50:6.1f} ms  p99 {p99:6.1f} ms")
+        print(f"    relay: {st['esp_frames']} frames in, {st['sent']} sent, {st['dropped']} dropped,"
+              f" deepest browser queue {st['max_depth']} frames")
+
+
+if __name__ == "__main__":
+    main()
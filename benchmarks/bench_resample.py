@@ -0,0 +1,106 @@
+# Timestamp alignment on a synthetic glove with the real read skew: a 10 kHz
+# simulated hand (halo.synth, no sensor noise) is sampled the way the sketch
+# does it, a 500 Hz frame stamped with esp_ts (+-50 us loop jitter) and then
+# the wrist and the 10 MPUs read in turn (resample.read_offsets()), delivered
+# with 0.5 .. 4 ms of USB / host jitter. Every method puts the frames on a
+# 200 Hz clock and is scored against the true hand at the tick times:
+#   nearest     newest frame by host arrival, sensors taken as simultaneous
+#   host        Resampler on the host arrival times
+#   esp         esp_ts clock, no read offsets
+#   esp+skew    esp_ts clock and the per-sensor read offsets (accuracy / latency mode)
+# Reports the mean / p99 orientation error over all 11 sensors, the joint
+# angle error, the output delay and the cost per input frame.
+#
+#   python benchmarks/bench_resample.py [seconds]
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from halo import kinematics
+from halo.binary_protocol import FRAME_DTYPE
+from halo.resample import FrameResampler, read_offsets
+from halo.synth import HandSim, SensorNoise
+
+SIM_HZ = 10000
+FRAME_HZ = 500
+OUT_HZ = 200
+
+
+def glove(seconds, seed=1):
+    """(frames, host t, true quaternions at SIM_HZ)."""
+    rng = np.random.default_rng(seed)
+    truth = HandSim(SIM_HZ, seed=seed, noise=SensorNoise.none()).step(int((seconds + 0.1) * SIM_HZ))["quat_true"]
+    n = int(seconds * FRAME_HZ)
+    esp = np.arange(n) / FRAME_HZ + rng.uniform(-50e-6, 50e-6, n) + 0.01
+    at = np.rint((esp[:, None] + read_offsets()) * SIM_HZ).astype(int)
+    frames = np.zeros(n, dtype=FRAME_DTYPE)
+    frames["seq"] = np.arange(n)
+    frames["esp_ts"] = np.rint(esp * 1e6).astype(np.int64)
+    frames["quat"] = truth[at, np.arange(11)]
+    host = esp + read_offsets()[-1] + 0.5e-3 + rng.exponential(1e-3, n).clip(0, 3.5e-3)
+    return frames, np.maximum.accumulate(host), truth
+
+
+def score(ticks, q, truth):
+    ref = truth[np.rint(ticks * SIM_HZ).astype(int)]
+    d = np.abs(np.sum(q * ref, axis=-1)).clip(0, 1)
+    ang = np.degrees(2 * np.arccos(d))
+    joints = np.degrees(np.abs(kinematics.joint_angles(q) - kinematics.joint_angles(ref)))
+    return ang.mean(), np.percentile(ang, 99), joints.mean()
+
+
+def nearest(frames, host):
+    # what the models see today: the newest frame at each tick of the host clock
+    ticks = np.arange(np.ceil(host[0] * OUT_HZ), np.floor(host[-1] * OUT_HZ)) / OUT_HZ
+    i = np.searchsorted(host, ticks, side="right") - 1
+    # the frame is taken to be the state at its esp_ts
+    return frames["esp_ts"][i] * 1e-6, frames["quat"][i].astype(np.float64)
+
+
+def run(frames, host, block, **kw):
+    rs = FrameResampler("binary", OUT_HZ, **kw)
+    parts = []
+    t0 = time.perf_counter()
+    for i in range(0, len(frames), block):
+        out, _ = rs.push(frames[i:i + block], host[i:i + block])
+        parts.append(out)
+    dt = time.perf_counter() - t0
+    out = np.concatenate(parts)
+    return out["esp_ts"] * 1e-6, out["quat"].astype(np.float64), rs, dt / len(frames)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 20.0
+    frames, host, truth = glove(seconds)
+    skew = read_offsets()
+    print(f"{len(frames)} frames at {FRAME_HZ} Hz -> {OUT_HZ} Hz; read skew wrist .. last MPU "
+          f"{(skew[-1] - skew[0]) * 1e3:.2f} ms; host delivery {np.diff(host).std() * 1e3:.2f} ms jitter")
+    print(f"  {'method':<22} {'err deg':>8} {'p99':>6} {'joint':>6} {'delay ms':>9} {'us/frame':>9}")
+
+    ticks, q = nearest(frames, host)
+    print(f"  {'nearest':<22} {'%8.3f %6.2f %6.3f' % score(ticks, q, truth)} {'-':>9} {'-':>9}")
+
+    # host clock: ticks are host times, scored at the matching esp time
+    ticks, q, rs, cost = run(frames, host, 1, clock="host")
+    lag = np.median(host - frames["esp_ts"] * 1e-6)
+    print(f"  {'host':<22} {'%8.3f %6.2f %6.3f' % score(np.clip(ticks - lag, 0, None), q, truth)}"
+          f" {rs.stats()['delay_ms']:9.2f} {cost * 1e6:9.1f}")
+
+    cases = [("esp", dict(offsets=np.zeros(11))), ("esp+skew accuracy", dict(mode="accuracy")),
+             ("esp+skew latency", dict(mode="latency"))]
+    for name, kw in cases:
+        ticks, q, rs, cost = run(frames, host, 1, **kw)
+        print(f"  {name:<22} {'%8.3f %6.2f %6.3f' % score(ticks, q, truth)}"
+              f" {rs.stats()['delay_ms']:9.2f} {cost * 1e6:9.1f}")
+
+    print("  cost by block size (esp+skew accuracy)")
+    for block in (1, 16, 1024):
+        _, _, _, cost = run(frames, host, block)
+        print(f"    block {block:5d}  {cost * 1e6:6.2f} us/frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Motion-triggered segmentation on synthetic 100 Hz newmlp33 rows (halo.synth,
+# roll/pitch/yaw per sensor, gestures held 1 .. 3 s with 0.35 s transitions):
+#   - per energy kind (rows / quaternions / gyro): segments, gesture changes
+#     caught, skipped fraction and segmenter cost, offline and per frame
+#   - gated inference: NewMLP-sized LSTM on every frame (StreamingClassifier,
+#     as live_inference does today) vs once per motion segment
+#
+#   python benchmarks/bench_segment.py [seconds]
+
+import os
+import sys
+import time
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MLP"))
+from halo.packet_parser import as_rows
+from halo.segment import MotionEnergy, MotionSegmenter, fit_length
+from halo.synth import HandSim, records
+from inference_engine import StreamingClassifier
+from bench_inference_engine import LSTMClassifier
+
+RATE_HZ = 100
+SEQ_LEN = 50
+
+
+def caught(spans, changes):
+    # a gesture change counts if a segment covers its transition
+    return np.mean([((spans[:, 0] <= c + 10) & (spans[:, 1] >= c + 10)).any() for c in changes])
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 600.0
+    torch.set_num_threads(1)
+    block = HandSim(RATE_HZ, seed=2).step(int(seconds * RATE_HZ))
+    rows = as_rows(records(block, "newmlp33")).astype(np.float32)
+    changes = np.flatnonzero(np.diff(block["label"])) + 1
+    print(f"{len(rows)} frames ({seconds:.0f} s at {RATE_HZ} Hz), {len(changes)} gesture changes")
+
+    for kind, data in (("rows", rows), ("quat", block["quat"]), ("gyro", block["gyro"])):
+        seg = MotionSegmenter(MotionEnergy(kind, RATE_HZ), rate_hz=RATE_HZ)
+        out = seg.push(data) + seg.flush()
+        spans = np.array([(a, b) for a, b, _ in out])
+        live = MotionSegmenter(MotionEnergy(kind, RATE_HZ), rate_hz=RATE_HZ)
+        n = min(len(data), 20 * RATE_HZ)
+        t0 = time.perf_counter()
+        for i in range(n):
+            live.push(data[i:i + 1])
+        per_frame = (time.perf_counter() - t0) / n
+        s = seg.stats()
+        print(f"  {kind:<5} on {seg.on:5.1f} off {seg.off:5.1f}  segments {s['segments']:4d}"
+              f"  changes caught {caught(spans, changes) * 100:5.1f}%  skipped {s['skipped'] * 100:5.1f}%"
+              f"  {s['us_per_frame']:5.2f} us/frame offline, {per_frame * 1e6:5.1f} us/frame live")
+
+    model = LSTMClassifier(rows.shape[1], 128, 7).eval()
+    n = min(len(rows), 60 * RATE_HZ)
+    engine = StreamingClassifier(model, rows.shape[1], SEQ_LEN)
+    t0 = time.perf_counter()
+    for i in range(n):
+        engine.push(rows[i:i + 1])
+    every = time.perf_counter() - t0
+
+    seg = MotionSegmenter(MotionEnergy("rows", RATE_HZ), rate_hz=RATE_HZ)
+    calls = 0
+    t0 = time.perf_counter()
+    with torch.no_grad():
+        for i in range(n):
+            for _, _, frames in seg.push(rows[i:i + 1]):
+                model(torch.from_numpy(fit_length(frames, SEQ_LEN)[None]))
+                calls += 1
+    gated = time.perf_counter() - t0
+    print(f"  LSTM over {n / RATE_HZ:.0f} s: every frame {n} calls {every:6.2f} s"
+          f" ({every / n * 1e3:.2f} ms/frame) | per segment {calls} calls {gated:6.2f} s"
+          f" ({gated / n * 1e3:.3f} ms/frame, segmenter included)")
+
+
+if __name__ == "__main__":
+    main()
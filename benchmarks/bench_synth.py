@@ -0,0 +1,62 @@
+# Load test of the host read path over a virtual serial port: halo.synth
+# streams a wire format into a pty at 100 Hz .. 2 kHz from a child process,
+# SerialReader + the matching decoder read it like the glove's port, and we
+# report frames received vs sent, parse errors and how old the newest frame
+# is when a ~200 Hz render loop takes it.
+#
+#   python benchmarks/bench_synth.py [seconds] [layout ...]
+
+import multiprocessing as mp
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import serial
+from halo.binary_protocol import decoder_for
+from halo.serial_reader import SerialReader
+from halo.synth import HandSim, VirtualSerial
+
+RATES = (100, 500, 1000, 2000)
+
+
+def writer(layout, rate_hz, seconds, conn):
+    port = VirtualSerial(layout, rate_hz, HandSim(rate_hz, seed=1))
+    conn.send(port.port)
+    conn.recv()                       # reader is open
+    port.run(seconds, log=lambda *a: None, stats_every=1e9)
+    conn.send((port.frames, port.dropped_bytes))
+
+
+def run(layout, rate_hz, seconds):
+    conn, child = mp.Pipe()
+    proc = mp.Process(target=writer, args=(layout, rate_hz, seconds, child))
+    proc.start()
+    ser = serial.Serial(conn.recv(), 115200)
+    decoder = decoder_for(layout)
+    reader = SerialReader(ser, decoder).start()
+    conn.send("go")
+    while not conn.poll():            # a render loop taking the newest frame at ~200 Hz
+        reader.take()
+        time.sleep(0.005)
+    sent, dropped_bytes = conn.recv()
+    time.sleep(0.2)                   # let the reader catch up with the tail
+    reader.stop()
+    proc.join()
+    bad = decoder.stats()["crc_errors"] if layout in ("binary", "raw") else decoder.bad_lines
+    print(f"  {layout:>9} {rate_hz:5d} Hz  sent {sent:6d}  received {reader.frames:6d}"
+          f" ({reader.frames / max(sent, 1) * 100:5.1f}%)  bad {bad}  pty overflow {dropped_bytes} B"
+          f"  age mean {reader.age_mean * 1e3:.2f} ms")
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    layouts = sys.argv[2:] or ["binary", "raw", "quat14", "newmlp33"]
+    print(f"pty -> SerialReader, {seconds:.0f} s per run")
+    for layout in layouts:
+        for rate_hz in RATES:
+            run(layout, rate_hz, seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# DTW template matching on synthetic 100 Hz newmlp33 rows (halo.synth): the
+# motion segments of one recording are the templates, those of a second
+# recording (other seed) the queries. Per template count:
+#   - accuracy and query time of the pruned search (TemplateIndex.nearest)
+#   - DTW runs per query / fraction pruned
+#   - the same queries by brute force (batched DTW against every template),
+#     checked to give the same distance
+# plus the cost of adding a template at runtime.
+#
+#   python benchmarks/bench_template_matcher.py [seconds]
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MLP"))
+from halo.packet_parser import as_rows
+from halo.segment import segment_windows
+from halo.synth import HandSim, records
+from template_matcher import TemplateIndex, dtw
+
+RATE_HZ = 100
+SEQ_LEN = 50
+QUERIES = 200
+
+
+def segments(seconds, seed):
+    sim = HandSim(RATE_HZ, seed=seed)
+    block = sim.step(int(seconds * RATE_HZ))
+    rows = as_rows(records(block, "newmlp33")).astype(np.float32)
+    X, y, _ = segment_windows(rows, block["label"], SEQ_LEN, rate_hz=RATE_HZ)
+    return X, [sim.names[c] for c in y]
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3600.0
+    X, names = segments(seconds, seed=1)
+    Q, truth = segments(QUERIES * 2.0, seed=2)
+    Q, truth = Q[:QUERIES], truth[:QUERIES]
+    print(f"{len(X)} template segments from {seconds:.0f} s, {len(Q)} query segments")
+
+    counts = [c for c in (250, 1000, 4000) if c < len(X)] + [len(X)]
+    for n in counts:
+        idx = TemplateIndex(SEQ_LEN, X.shape[2])
+        idx.fit_scale(X[:n])
+        idx.add(X[:n], names[:n])
+        P = idx.prepare(Q)
+        found = [idx.nearest(q, prepared=True) for q in P]
+        acc = np.mean([idx.names[idx.labels[i]] == t for (i, _), t in zip(found, truth)])
+
+        m = min(len(P), 20)
+        t0 = time.perf_counter()
+        for q, (_, d) in zip(P[:m], found):
+            full = dtw(q, idx.x[:idx.n], idx.band).min()
+            assert abs(full - d) <= 1e-6 * max(full, 1.0), (full, d)
+        brute = (time.perf_counter() - t0) / m
+        print(f"  {n:6d} templates  accuracy {acc * 100:5.1f}%  {idx.hud()}"
+              f" | brute force {brute * 1e3:7.2f} ms/query (same distances)")
+
+    idx = TemplateIndex(SEQ_LEN, X.shape[2])
+    idx.fit_scale(X)
+    t0 = time.perf_counter()
+    for x, name in zip(X[:500], names[:500]):
+        idx.add(x, name)
+    print(f"  add one template: {(time.perf_counter() - t0) / min(len(X), 500) * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
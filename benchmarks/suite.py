@@ -0,0 +1,353 @@
+# Pipeline benchmark suite with stored baselines.
+#
+# Every stage of the 100 Hz loop timed on its own, offline, on fixtures built
+# once from the synthetic glove (halo.synth, fixed seeds) into
+# benchmarks/.fixtures/ (or on a recorded newmlp33 session, --session):
+#   parse_ascii      StreamParser, newmlp33 lines fed in 4 KB chunks
+#   parse_binary     BinaryDecoder, binary frames fed in 4 KB chunks
+#   pose_finger      quat_math.finger_pose, one frame per call (test2 viewer)
+#   pose_hand        kinematics.bone_boxes, one frame per call (full_hand viewer)
+#   kalman_frame     KalmanBank(23) one frame per update (predict_live)
+#   kalman_block     KalmanBank(23) over the whole recording (MLP.load_data)
+#   dataset_csv      GestureDataset from the CSV, store rebuilt
+#   dataset_store    GestureDataset from the existing store, SEQ_LEN windows
+#   train_mlp        one trainer.fit epoch, NewMLP MLP
+#   train_lstm       one trainer.fit epoch, NewMLP LSTMClassifier
+#   predict_live     MLP.predict_live, one frame per call
+#   live_mlp         StreamingClassifier + MLP, one frame per push (live_inference)
+#   live_lstm        StreamingClassifier + LSTM window, one frame per push
+#   replay_e2e       live_inference(seq_mode=True) on a ReplayPort at full speed:
+#                    re-encoding, parsing, windowing and the LSTM on the
+#                    newest window of every block read
+# Each stage is run `repeat` times and its best time kept, per unit of work
+# (frame / row / sample), in microseconds. torch runs on one thread.
+#
+# --save writes the results to benchmarks/baselines.json; without it they are
+# compared against that file and the run fails (exit 1) if any stage is
+# slower than its baseline by more than its margin (--margin, or the stage's
+# own wider margin for the noisy ones; a "margin" in the baseline entry
+# overrides both).
+#
+#   python benchmarks/suite.py --save                 # record baselines
+#   python benchmarks/suite.py                        # check against them
+#   python benchmarks/suite.py --only parse,kalman --margin 0.5
+#   python benchmarks/suite.py --session glove.halo   # a recorded capture
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+import numpy as np
+import torch
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, os.path.join(HERE, "..", "MLP"))
+from halo import kinematics
+from halo.binary_protocol import BinaryDecoder
+from halo.filters import KalmanBank
+from halo.packet_parser import StreamParser, as_rows
+from halo.quat_math import finger_pose
+from halo.session import ReplayPort, SessionReader, SessionWriter, encode
+from halo.synth import HandSim, glove_dataset, records
+from inference_engine import StreamingClassifier
+import trainer
+
+FIXTURES = os.path.join(HERE, ".fixtures")
+BASELINES = os.path.join(HERE, "baselines.json")
+RATE_HZ = 100
+FRAMES = 20000          # parsing / pose / filter / live stages
+TRAIN_ROWS = 20000      # dataset and training stages
+REPLAY_FRAMES = 2000
+BONE_LENGTHS = [3.0, 1.5, 1.0]
+MARGIN = 0.25
+# stages that move more between runs than the per-frame ones
+NOISY = {"train_mlp": 0.4, "train_lstm": 0.4, "dataset_csv": 0.4, "replay_e2e": 0.4}
+
+
+# ---------- fixtures ----------
+def build_fixtures(path=FIXTURES, seed=0):
+    """Deterministic inputs for every stage; built once, reused after."""
+    done = os.path.join(path, "done")
+    if os.path.exists(done):
+        return path
+    os.makedirs(path, exist_ok=True)
+    nm = trainer.load_newmlp()
+    block = HandSim(RATE_HZ, seed=seed).step(max(FRAMES, TRAIN_ROWS))
+    rows = records(block, "newmlp33")
+    names = HandSim(RATE_HZ).names
+    np.save(os.path.join(path, "quat.npy"), block["quat"][:FRAMES])
+    with open(os.path.join(path, "newmlp33.txt"), "wb") as f:
+        f.write(encode(rows[:FRAMES], "newmlp33"))
+    with open(os.path.join(path, "binary.bin"), "wb") as f:
+        f.write(encode(records(block, "binary")[:FRAMES], "binary"))
+    with open(os.path.join(path, "gesture_data.csv"), "w") as f:
+        labels = [names[k] for k in block["label"][:TRAIN_ROWS].tolist()]
+        data = np.round(as_rows(rows[:TRAIN_ROWS]), 4).tolist()
+        f.write("".join(f"{name}," + ",".join(f"{v:.4f}" for v in r) + "\n" for name, r in zip(labels, data)))
+    with SessionWriter(os.path.join(path, "replay.halo"), "newmlp33", source="synth") as w:
+        w.write(rows[:REPLAY_FRAMES], block["t"][:REPLAY_FRAMES])
+
+    # untrained models: the cost does not depend on the weights
+    torch.manual_seed(seed)
+    inputs, joints = glove_dataset(FRAMES, RATE_HZ, seed)
+    np.save(os.path.join(path, "sensor_inputs.npy"), inputs)
+    import MLP as glove
+    from sklearn.preprocessing import StandardScaler
+    torch.save({"model_state": glove.GloveMLP().state_dict(),
+                **glove.scaler_state(StandardScaler().fit(inputs), StandardScaler().fit(joints))},
+               os.path.join(path, "glove_mlp.pth"))
+    labels_map = {name: i for i, name in enumerate(names)}
+    dim = nm.NUM_SENSORS * nm.SAMPLE_DIM
+    for name, model in (("gesture_mlp.pth", nm.MLP(dim, len(names))),
+                        ("gesture_lstm.pth", nm.LSTMClassifier(dim, 128, len(names)))):
+        torch.save({"model_state": model.state_dict(), "labels_map": labels_map}, os.path.join(path, name))
+    open(done, "w").close()
+    return path
+
+
+def session_fixture(session, path):
+    """Parsing and replay inputs from a recorded newmlp33 session."""
+    reader = SessionReader(session)
+    if reader.layout != "newmlp33":
+        raise SystemExit(f"{session}: layout {reader.layout}, the suite replays newmlp33 sessions")
+    frames = reader.read()["frame"]
+    with open(os.path.join(path, "newmlp33.txt"), "wb") as f:
+        f.write(encode(frames[:FRAMES], "newmlp33"))
+    return session, min(len(frames), REPLAY_FRAMES)
+
+
+# ---------- stages ----------
+# each returns (seconds, units of work) for one run
+
+def _feed(parser, data, chunk=4096):
+    n = 0
+    t0 = time.perf_counter()
+    for i in range(0, len(data), chunk):
+        n += parser.feed(data[i:i + chunk])
+    return time.perf_counter() - t0, n
+
+
+def parse_ascii(fx):
+    with open(os.path.join(fx["dir"], "newmlp33.txt"), "rb") as f:
+        return _feed(StreamParser("newmlp33", capacity=8192), f.read())
+
+
+def parse_binary(fx):
+    with open(os.path.join(fx["dir"], "binary.bin"), "rb") as f:
+        return _feed(BinaryDecoder(capacity=8192), f.read())
+
+
+def pose_finger(fx):
+    q = fx["quat"][:2000]
+    bends = np.radians(np.linspace(0, 90, 2 * len(q))).reshape(-1, 2)
+    t0 = time.perf_counter()
+    for i in range(len(q)):
+        finger_pose(q[i:i + 1, 0], bends[i:i + 1], BONE_LENGTHS)
+    return time.perf_counter() - t0, len(q)
+
+
+def pose_hand(fx):
+    q = fx["quat"][:2000]
+    t0 = time.perf_counter()
+    for i in range(len(q)):
+        kinematics.bone_boxes(q[i])
+    return time.perf_counter() - t0, len(q)
+
+
+def kalman_frame(fx):
+    x = fx["inputs"][:5000]
+    bank = KalmanBank(x.shape[1])
+    t0 = time.perf_counter()
+    for row in x:
+        bank.update(row)
+    return time.perf_counter() - t0, len(x)
+
+
+def kalman_block(fx):
+    x = fx["inputs"]
+    t0 = time.perf_counter()
+    KalmanBank(x.shape[1]).update(x)
+    return time.perf_counter() - t0, len(x)
+
+
+def dataset_csv(fx):
+    csv_file = os.path.join(fx["dir"], "gesture_data.csv")
+    shutil.rmtree(os.path.splitext(csv_file)[0] + ".store", ignore_errors=True)
+    t0 = time.perf_counter()
+    ds = fx["nm"].GestureDataset(csv_file, seq_len=1)
+    return time.perf_counter() - t0, len(ds)
+
+
+def dataset_store(fx):
+    csv_file = os.path.join(fx["dir"], "gesture_data.csv")
+    fx["nm"].GestureDataset(csv_file, seq_len=1)            # make sure the store exists
+    t0 = time.perf_counter()
+    ds = fx["nm"].GestureDataset(csv_file, seq_len=fx["nm"].SEQ_LEN)
+    return time.perf_counter() - t0, len(ds)
+
+
+def _epoch(fx, seq):
+    nm = fx["nm"]
+    seq_len = nm.SEQ_LEN if seq else 1
+    full = nm.GestureDataset(os.path.join(fx["dir"], "gesture_data.csv"), seq_len=seq_len)
+    ds = torch.utils.data.Subset(full, range(min(len(full), 5000 if seq else len(full))))
+    dim, n_classes = nm.NUM_SENSORS * nm.SAMPLE_DIM, len(full.labels_map)
+    torch.manual_seed(0)
+    model = nm.LSTMClassifier(dim, 128, n_classes) if seq else nm.MLP(dim, n_classes)
+    out = os.path.join(fx["dir"], "train.pth")
+    t0 = time.perf_counter()
+    trainer.fit(model, ds, torch.utils.data.Subset(ds, []), torch.nn.CrossEntropyLoss(), out, epochs=1,
+                log=lambda *a: None)
+    return time.perf_counter() - t0, len(ds)
+
+
+def train_mlp(fx):
+    return _epoch(fx, seq=False)
+
+
+def train_lstm(fx):
+    return _epoch(fx, seq=True)
+
+
+def predict_live(fx):
+    import MLP as glove
+    glove.load(os.path.join(fx["dir"], "glove_mlp.pth"))
+    glove.live_filter.reset()
+    x = fx["inputs"][:2000]
+    t0 = time.perf_counter()
+    for row in x:
+        glove.predict_live(row)
+    return time.perf_counter() - t0, len(x)
+
+
+def _live(fx, seq):
+    nm = fx["nm"]
+    dim = nm.NUM_SENSORS * nm.SAMPLE_DIM
+    ckpt = torch.load(os.path.join(fx["dir"], "gesture_lstm.pth" if seq else "gesture_mlp.pth"))
+    n_classes = len(ckpt["labels_map"])
+    model = nm.LSTMClassifier(dim, 128, n_classes) if seq else nm.MLP(dim, n_classes)
+    model.load_state_dict(ckpt["model_state"])
+    engine = StreamingClassifier(model, dim, nm.SEQ_LEN if seq else 1)
+    rows = fx["rows"][:1000 if seq else 5000]
+    t0 = time.perf_counter()
+    for i in range(len(rows)):
+        engine.push(rows[i:i + 1])
+    return time.perf_counter() - t0, len(rows)
+
+
+def live_mlp(fx):
+    return _live(fx, seq=False)
+
+
+def live_lstm(fx):
+    return _live(fx, seq=True)
+
+
+def replay_e2e(fx):
+    nm = fx["nm"]
+    nm.MODEL_FILE = os.path.join(fx["dir"], "gesture_lstm.pth")
+    port = ReplayPort(fx["session"], speed=0)
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        nm.live_inference(seq_mode=True, ser=port, stats_every=0, max_frames=fx["replay_frames"])
+    return time.perf_counter() - t0, fx["replay_frames"]
+
+
+STAGES = [parse_ascii, parse_binary, pose_finger, pose_hand, kalman_frame, kalman_block, dataset_csv,
+          dataset_store, train_mlp, train_lstm, predict_live, live_mlp, live_lstm, replay_e2e]
+
+
+# ---------- run / compare ----------
+def run(stages, fx, repeat=3, log=print):
+    results = {}
+    for stage in stages:
+        best = float("inf")
+        for _ in range(repeat):
+            dt, n = stage(fx)
+            best = min(best, dt / max(n, 1))
+        results[stage.__name__] = {"us": best * 1e6, "units": n}
+        log(f"  {stage.__name__:<14} {best * 1e6:10.2f} us/unit  ({n} units)")
+    return results
+
+
+def compare(results, baseline, margin=MARGIN):
+    """[(stage, now, base, allowed margin)] of the stages past their margin."""
+    failed = []
+    for name, r in results.items():
+        base = baseline.get("stages", {}).get(name)
+        if base is None:
+            continue
+        allowed = base.get("margin", max(margin, NOISY.get(name, 0.0)))
+        if r["us"] > base["us"] * (1 + allowed):
+            failed.append((name, r["us"], base["us"], allowed))
+    return failed
+
+
+def machine():
+    return {"python": platform.python_version(), "torch": torch.__version__, "numpy": np.__version__,
+            "machine": platform.machine(), "processor": platform.processor(), "cpus": os.cpu_count()}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="HALO pipeline benchmarks against stored baselines")
+    ap.add_argument("--save", action="store_true", help="write the results as the new baselines")
+    ap.add_argument("--baselines", default=BASELINES)
+    ap.add_argument("--margin", type=float, default=MARGIN, help="allowed slowdown, 0.25 = 25%%")
+    ap.add_argument("--only", help="comma-separated stage name prefixes, e.g. parse,kalman")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--session", help="recorded newmlp33 session for the parsing and replay stages")
+    ap.add_argument("--fixtures", default=FIXTURES)
+    args = ap.parse_args()
+
+    torch.set_num_threads(1)
+    stages = STAGES
+    if args.only:
+        prefixes = args.only.split(",")
+        stages = [s for s in STAGES if s.__name__.startswith(tuple(prefixes))]
+
+    path = build_fixtures(args.fixtures)
+    fx = {"dir": path, "nm": trainer.load_newmlp(), "quat": np.load(os.path.join(path, "quat.npy")),
+          "inputs": np.load(os.path.join(path, "sensor_inputs.npy")),
+          "session": os.path.join(path, "replay.halo"), "replay_frames": REPLAY_FRAMES}
+    if args.session:
+        fx["dir"] = path = os.path.join(args.fixtures, "session")
+        if not os.path.exists(path):
+            shutil.copytree(args.fixtures, path, ignore=shutil.ignore_patterns("session"))
+        fx["session"], fx["replay_frames"] = session_fixture(args.session, path)
+    with open(os.path.join(path, "newmlp33.txt"), "rb") as f:
+        p = StreamParser("newmlp33", capacity=FRAMES + 1)
+        p.feed(f.read())
+        fx["rows"] = as_rows(p.ring.latest(len(p.ring))[0]).astype(np.float32)
+
+    print(f"HALO benchmark suite ({len(stages)} stages, best of {args.repeat}, fixtures {path})")
+    results = run(stages, fx, args.repeat)
+
+    if args.save:
+        with open(args.baselines, "w") as f:
+            json.dump({"machine": machine(), "stages": results}, f, indent=1)
+        print(f"baselines -> {args.baselines}")
+        return
+    if not os.path.exists(args.baselines):
+        print(f"no baselines at {args.baselines}; run with --save first")
+        return
+    with open(args.baselines) as f:
+        baseline = json.load(f)
+    if baseline.get("machine") != machine():
+        print("note: baselines were recorded on a different machine / library versions")
+    failed = compare(results, baseline, args.margin)
+    for name, now, base, allowed in failed:
+        print(f"REGRESSION {name}: {now:.2f} us vs baseline {base:.2f} us (+{(now / base - 1) * 100:.0f}%,"
+              f" allowed +{allowed * 100:.0f}%)")
+    if failed:
+        sys.exit(1)
+    print(f"all {len(results)} stages within their margin of {args.baselines}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2 @@
+# HALO host-side stream tools (parsing, math, filtering) shared by the
+# VPython viewers in Vpython_test_dataglove and the models in MLP.
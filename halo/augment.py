@@ -0,0 +1,149 @@
+# On-the-fly augmentation of gesture windows, vectorised over a batch.
+#
+# Augment(batch (B, T, n_sensors * c), rng) -> (B, seq_len, n_sensors * c),
+# in this order:
+#   time warp     each window is read along its own random monotonic time map
+#                 (piecewise linear through `knots` points, local speed
+#                 1 +- warp) and resampled to seq_len frames; angles are
+#                 interpolated the short way round
+#   rotation      one random rotation of up to rotate_deg per window, applied
+#                 to every sensor, i.e. the whole hand turned in the world
+#                 frame; relative bone orientations do not change
+#   bias, noise   a constant offset per window and sensor channel plus white
+#                 noise per sample
+#   dropout       with probability `dropout` one sensor of the window fails
+#                 from a random frame on, as a dead mux channel does: its
+#                 value freezes (hold) or reads 0 (zero)
+# Sensor values are `kind` per sensor: "rpy" (roll / pitch / yaw in degrees,
+# what NewMLP's newmlp33 rows carry), "vector" (accel / gyro, rotated as
+# vectors) or "quat" (w, x, y, z, e.g. binary sessions).
+#
+# The random draws come from the rng passed in, so a batch is reproducible
+# from (seed, its indices) whatever DataLoader worker computes it
+# (batch_rng()). The dataset / DataLoader side is
+# MLP/gesture_store.AugmentedDataset.
+#
+#   aug = Augment(seq_len=50, rotate_deg=20, dropout=0.1)
+#   x = aug(windows, batch_rng(0, indices))
+
+import zlib
+import numpy as np
+
+from halo import quat_math as qm
+
+KINDS = {"rpy": 3, "vector": 3, "quat": 4}
+
+
+def batch_rng(seed, indices):
+    """Generator for one batch: depends on the seed and the sample indices
+    only, not on the worker or the order batches are fetched in."""
+    key = zlib.crc32(np.ascontiguousarray(indices, dtype=np.int64).tobytes())
+    return np.random.default_rng([seed, key])
+
+
+def _wrap(deg):
+    return np.mod(deg + 180.0, 360.0) - 180.0
+
+
+def random_rotations(rng, n, max_deg):
+    """n rotations (n, 4): uniform axis, angle uniform in +-max_deg."""
+    axis = rng.normal(size=(n, 3))
+    return qm.axis_angle(axis, np.radians(rng.uniform(-max_deg, max_deg, n)))
+
+
+class Augment:
+    def __init__(self, seq_len=None, n_sensors=11, kind="rpy", warp=0.2, knots=4, rotate_deg=20.0, bias=2.0,
+                 noise=0.5, dropout=0.1, dropout_mode="hold"):
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {tuple(KINDS)}")
+        if dropout_mode not in ("hold", "zero"):
+            raise ValueError("dropout_mode must be hold or zero")
+        self.seq_len = seq_len
+        self.n_sensors = n_sensors
+        self.kind = kind
+        self.c = KINDS[kind]
+        self.warp, self.knots = warp, knots
+        self.rotate_deg = rotate_deg
+        self.bias, self.noise = bias, noise
+        self.dropout, self.dropout_mode = dropout, dropout_mode
+
+    def __call__(self, x, rng):
+        x = np.asarray(x, dtype=np.float32)
+        B, T, D = x.shape
+        if D != self.n_sensors * self.c:
+            raise ValueError(f"expected {self.n_sensors} x {self.c} values per frame, got {D}")
+        x = self.time_warp(x, rng)
+        x = x.reshape(B, len(x[0]), self.n_sensors, self.c)
+        if self.rotate_deg:
+            x = self.rotate(x, random_rotations(rng, B, self.rotate_deg))
+        if self.bias or self.noise:
+            x = self.perturb(x, rng)
+        if self.dropout:
+            x = self.drop(x, rng)
+        return x.reshape(B, -1, D)
+
+    # ---------- steps ----------
+    def time_warp(self, x, rng):
+        B, T, _ = x.shape
+        L = self.seq_len or T
+        if T == 1 or (not self.warp and L == T):   # single frames are left as they are
+            return x
+        # per window: knot speeds 1 +- warp, integrated into positions 0 .. T - 1
+        k = max(self.knots, 1)
+        speed = np.clip(1.0 + self.warp * rng.uniform(-1.0, 1.0, (B, k)), 0.05, None)
+        grid = np.concatenate([np.zeros((B, 1)), np.cumsum(speed, axis=1)], axis=1)
+        grid *= (T - 1) / grid[:, -1:]
+        u = np.linspace(0.0, k, L)
+        seg = np.minimum(u.astype(np.intp), k - 1)
+        frac = u - seg
+        pos = grid[:, seg] + (grid[:, seg + 1] - grid[:, seg]) * frac          # (B, L) monotonic
+        i0 = np.clip(np.floor(pos).astype(np.intp), 0, T - 2)
+        w = (pos - i0).astype(np.float32)[..., None]
+        rows = np.arange(B)[:, None]
+        a, b = x[rows, i0], x[rows, i0 + 1]
+        if self.kind == "rpy":
+            return _wrap(a + w * _wrap(b - a))
+        if self.kind == "vector":
+            return a + w * (b - a)
+        # quaternions: sign-aligned lerp, renormalised (slerp to well within the
+        # noise for adjacent frames)
+        a, b = a.reshape(B, L, -1, 4), b.reshape(B, L, -1, 4)
+        b = np.where(np.sum(a * b, axis=-1, keepdims=True) < 0, -b, b)
+        out = a + w[..., None] * (b - a)
+        return (out / np.linalg.norm(out, axis=-1, keepdims=True)).reshape(B, L, -1)
+
+    def rotate(self, x, q):
+        # x (B, L, S, c), q (B, 4): the same world-frame rotation for every sensor
+        q = q[:, None, None]
+        if self.kind == "quat":
+            return qm.mul(q, x).astype(np.float32)
+        if self.kind == "vector":
+            return qm.rotate(q, x).astype(np.float32)
+        r, p, y = np.radians(np.moveaxis(x, -1, 0))
+        out = np.stack(qm.to_rpy(qm.mul(q, qm.from_rpy(r, p, y))), axis=-1)
+        return np.degrees(out).astype(np.float32)
+
+    def perturb(self, x, rng):
+        B, L, S, c = x.shape
+        x = x + (rng.normal(0.0, self.bias, (B, 1, S, c)) + rng.normal(0.0, self.noise, x.shape)).astype(np.float32)
+        if self.kind == "quat":
+            x /= np.linalg.norm(x, axis=-1, keepdims=True)
+        elif self.kind == "rpy":
+            x = _wrap(x)
+        return x
+
+    def drop(self, x, rng):
+        B, L, S, _ = x.shape
+        hit = np.flatnonzero(rng.random(B) < self.dropout)
+        if not len(hit):
+            return x
+        sensor = rng.integers(0, S, len(hit))
+        start = rng.integers(0, L, len(hit))
+        after = np.arange(L)[None, :] >= start[:, None]                    # (hits, L)
+        cur = x[hit, :, sensor]                                            # (hits, L, c)
+        if self.dropout_mode == "hold":
+            new = np.where(after[..., None], x[hit, start, sensor][:, None], cur)
+        else:
+            new = np.where(after[..., None], 0.0, cur)
+        x[hit, :, sensor] = new
+        return x
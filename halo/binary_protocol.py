@@ -0,0 +1,293 @@
+# Fixed-layout binary frame for the glove (replaces JSON / ASCII floats).
+#
+# Little-endian, 104 bytes per frame:
+#   offset  size  field
+#   0       2     sync    0xA5 0x5A
+#   2       4     seq     uint32, +1 per frame (wraps)
+#   6       4     esp_ts  uint32, micros() on the ESP32
+#   10      88    quat    11 x (w, x, y, z) int16 Q14 (1.0 == 16384)
+#                         index 0 = wrist BNO055, 1..10 = fingers in the
+#                         fingerNames order of Website/main.js
+#   98      4     calib   BNO055 sys, gyro, accel, mag (uint8 each)
+#   102     2     crc     CRC-16/CCITT-FALSE over bytes 2..101
+#
+# Raw mode (firmware built with RAW_MODE 1): the MPUs are not filtered on the
+# ESP32, each frame carries their int16 readings and the host fuses them
+# (halo/fusion.py). 144 bytes per frame:
+#   0       2     sync    0xA5 0x5B
+#   2       4     seq
+#   6       4     esp_ts
+#   10      8     quat    wrist BNO055 (w, x, y, z) int16 Q14
+#   18      120   imu     10 x (ax, ay, az, gx, gy, gz) int16, MPU6050 counts
+#                         at +-2 g (16384 / g) and +-250 deg/s (131 / deg/s)
+#   138     4     calib
+#   142     2     crc     over bytes 2..141
+#
+# The C side of this is hand_simulation/halo_frame.h.
+
+import time
+from binascii import crc_hqx
+import numpy as np
+
+from halo.packet_parser import FrameRing, StreamParser
+
+SYNC = b"\xa5\x5a"
+RAW_SYNC = b"\xa5\x5b"
+NUM_IMUS = 11
+NUM_MPUS = NUM_IMUS - 1
+Q14 = 16384.0
+ACCEL_LSB_PER_G = 16384.0
+GYRO_LSB_PER_DPS = 131.0
+
+WIRE_DTYPE = np.dtype([
+    ("sync", "<u2"),
+    ("seq", "<u4"),
+    ("esp_ts", "<u4"),
+    ("quat", "<i2", (NUM_IMUS, 4)),
+    ("calib", "u1", 4),
+    ("crc", "<u2"),
+])
+FRAME_SIZE = WIRE_DTYPE.itemsize          # 104
+
+# what the decoder hands out
+FRAME_DTYPE = np.dtype([
+    ("seq", np.uint32),
+    ("esp_ts", np.uint32),
+    ("quat", np.float32, (NUM_IMUS, 4)),
+    ("calib", np.uint8, 4),
+])
+
+RAW_WIRE_DTYPE = np.dtype([
+    ("sync", "<u2"),
+    ("seq", "<u4"),
+    ("esp_ts", "<u4"),
+    ("quat", "<i2", 4),
+    ("imu", "<i2", (NUM_MPUS, 6)),
+    ("calib", "u1", 4),
+    ("crc", "<u2"),
+])
+RAW_FRAME_SIZE = RAW_WIRE_DTYPE.itemsize  # 144
+
+# raw frames decoded: wrist quaternion, MPU accel in g and gyro in rad/s
+RAW_FRAME_DTYPE = np.dtype([
+    ("seq", np.uint32),
+    ("esp_ts", np.uint32),
+    ("quat", np.float32, 4),
+    ("accel", np.float32, (NUM_MPUS, 3)),
+    ("gyro", np.float32, (NUM_MPUS, 3)),
+    ("calib", np.uint8, 4),
+])
+
+
+def crc16(data):
+    return crc_hqx(data, 0xFFFF)
+
+
+def encode_frames(seq, esp_ts, quat, calib=None):
+    """Pack N frames into bytes. quat is (N, 11, 4) floats in w,x,y,z order."""
+    quat = np.asarray(quat, dtype=np.float32).reshape(-1, NUM_IMUS, 4)
+    n = len(quat)
+    wire = np.zeros(n, dtype=WIRE_DTYPE)
+    wire["sync"] = 0x5AA5
+    wire["seq"] = seq
+    wire["esp_ts"] = esp_ts
+    wire["quat"] = np.clip(np.rint(quat * Q14), -32768, 32767)
+    if calib is not None:
+        wire["calib"] = calib
+    return _with_crc(wire)
+
+
+def encode_raw_frames(seq, esp_ts, quat, accel, gyro, calib=None):
+    """Pack N raw-mode frames: wrist quat (N, 4), MPU accel (N, 10, 3) in g
+    and gyro (N, 10, 3) in rad/s, quantised to the MPU6050 counts."""
+    quat = np.asarray(quat, dtype=np.float32).reshape(-1, 4)
+    wire = np.zeros(len(quat), dtype=RAW_WIRE_DTYPE)
+    wire["sync"] = 0x5BA5
+    wire["seq"] = seq
+    wire["esp_ts"] = esp_ts
+    wire["quat"] = np.clip(np.rint(quat * Q14), -32768, 32767)
+    imu = np.concatenate([np.asarray(accel) * ACCEL_LSB_PER_G,
+                          np.degrees(np.asarray(gyro)) * GYRO_LSB_PER_DPS], axis=-1)
+    wire["imu"] = np.clip(np.rint(imu), -32768, 32767)
+    if calib is not None:
+        wire["calib"] = calib
+    return _with_crc(wire)
+
+
+def _with_crc(wire):
+    size = wire.dtype.itemsize
+    raw = bytearray(wire.tobytes())
+    for i in range(0, len(raw), size):
+        c = crc16(raw[i + 2:i + size - 2])
+        raw[i + size - 2] = c & 0xFF
+        raw[i + size - 1] = c >> 8
+    return bytes(raw)
+
+
+def from_json(data):
+    """One decoded WebSocket message (the node.js_handsim JSON: seq, esp_ts in
+    ms, wrist {x,y,z,w}, fingers [{x,y,z,w} x 10]) as a FRAME_DTYPE record."""
+    rec = np.zeros((), dtype=FRAME_DTYPE)
+    rec["seq"] = int(data.get("seq", 0)) % (1 << 32)
+    rec["esp_ts"] = int(data.get("esp_ts", 0)) * 1000 % (1 << 32)
+    quats = [data.get("wrist")] + list(data.get("fingers") or [])
+    for i, q in enumerate(quats[:NUM_IMUS]):
+        if q:
+            rec["quat"][i] = (q.get("w", 1.0), q.get("x", 0.0), q.get("y", 0.0), q.get("z", 0.0))
+    return rec
+
+
+class BinaryDecoder:
+    """Turns a byte stream of binary frames into FRAME_DTYPE records.
+
+    Same interface as packet_parser.StreamParser (feed / read_from / ring), so
+    either can sit behind the same reader. Corrupt or partial frames are
+    skipped by scanning for the next sync word that is followed by a valid CRC.
+    """
+    sync = SYNC
+    wire_dtype = WIRE_DTYPE
+    dtype = FRAME_DTYPE
+
+    def __init__(self, capacity=4096, buf_size=1 << 16):
+        self.buf = bytearray()
+        self.buf_size = buf_size
+        self.ring = FrameRing(self.dtype, capacity)
+        self.last_seq = None
+        self.frames = 0
+        self.dropped = 0          # frames missing according to seq
+        self.crc_errors = 0
+        self.skipped_bytes = 0    # bytes thrown away while resyncing
+
+    def read_from(self, ser):
+        waiting = ser.in_waiting
+        if not waiting:
+            return 0
+        return self.feed(ser.read(waiting))
+
+    def feed(self, data, t=None):
+        self.buf += data
+        buf = self.buf
+        size = self.wire_dtype.itemsize
+        s0, s1 = self.sync
+        good = []
+        i = 0
+        end = len(buf) - size
+        while i <= end:
+            if buf[i] != s0 or buf[i + 1] != s1:
+                j = buf.find(self.sync, i + 1)
+                if j < 0:
+                    # keep a possible half sync word at the very end
+                    j = len(buf) - 1 if buf[-1] == s0 else len(buf)
+                self.skipped_bytes += j - i
+                i = j
+                continue
+            crc = buf[i + size - 2] | (buf[i + size - 1] << 8)
+            if crc16(buf[i + 2:i + size - 2]) != crc:
+                self.crc_errors += 1
+                self.skipped_bytes += 1
+                i += 1
+                continue
+            good.append(i)
+            i += size
+
+        if good:
+            wire = self._gather(buf, good)
+            self._push(wire, time.perf_counter() if t is None else t)
+        del buf[:i]
+        if len(buf) > self.buf_size:
+            self.skipped_bytes += len(buf)
+            buf.clear()
+        return len(good)
+
+    def _gather(self, buf, offsets):
+        first, size = offsets[0], self.wire_dtype.itemsize
+        if offsets[-1] - first == (len(offsets) - 1) * size:
+            # the usual case: frames back to back, decode them in one go
+            return np.frombuffer(buf, dtype=self.wire_dtype, count=len(offsets), offset=first).copy()
+        joined = b"".join(buf[o:o + size] for o in offsets)
+        return np.frombuffer(joined, dtype=self.wire_dtype)
+
+    def _push(self, wire, t):
+        seq = wire["seq"].astype(np.int64)
+        prev = np.concatenate(([seq[0] - 1 if self.last_seq is None else self.last_seq], seq[:-1]))
+        gaps = (seq - prev - 1) % (1 << 32)
+        # a huge gap means the ESP rebooted (seq went back to 0), not lost frames
+        gaps[gaps > (1 << 31)] = 0
+        self.dropped += int(gaps.sum())
+        self.last_seq = int(seq[-1])
+        self.frames += len(wire)
+        self.ring.push(self._convert(wire), t)
+
+    def _convert(self, wire):
+        out = np.empty(len(wire), dtype=self.dtype)
+        out["seq"] = wire["seq"]
+        out["esp_ts"] = wire["esp_ts"]
+        out["quat"] = wire["quat"] * (1.0 / Q14)
+        out["calib"] = wire["calib"]
+        return out
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "crc_errors": self.crc_errors,
+            "skipped_bytes": self.skipped_bytes,
+        }
+
+
+class RawDecoder(BinaryDecoder):
+    """Raw-mode frames (RAW_WIRE_DTYPE) -> RAW_FRAME_DTYPE records, in
+    physical units; halo.fusion.FusionDecoder turns them into FRAME_DTYPE."""
+    sync = RAW_SYNC
+    wire_dtype = RAW_WIRE_DTYPE
+    dtype = RAW_FRAME_DTYPE
+
+    def _convert(self, wire):
+        out = super()._convert(wire)
+        imu = wire["imu"].astype(np.float32)
+        out["accel"] = imu[..., :3] * (1.0 / ACCEL_LSB_PER_G)
+        out["gyro"] = imu[..., 3:] * np.float32(np.pi / 180.0 / GYRO_LSB_PER_DPS)
+        return out
+
+
+def decoder_for(layout):
+    """The decoder for a layout name: binary, raw, a packet_parser layout, or
+    auto (detect the ASCII layout from the first lines)."""
+    if layout == "binary":
+        return BinaryDecoder()
+    if layout == "raw":
+        return RawDecoder()
+    return StreamParser(None if layout == "auto" else layout)
+
+
+class FrameSimulator:
+    """Produces binary frames at a fixed rate, as the ESP32 would.
+
+    Quaternions are slow sinusoidal rotations per IMU; drop_rate and
+    corrupt_rate inject lost frames and flipped bytes to exercise the decoder.
+    """
+
+    def __init__(self, rate_hz=500, drop_rate=0.0, corrupt_rate=0.0, seed=0):
+        self.rate_hz = rate_hz
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self.rng = np.random.default_rng(seed)
+        self.seq = 0
+        self.phase = self.rng.uniform(0, 2 * np.pi, NUM_IMUS)
+
+    def frames(self, n):
+        seq = self.seq + np.arange(n, dtype=np.int64)
+        self.seq += n
+        esp_ts = (seq * 1e6 / self.rate_hz).astype(np.int64) % (1 << 32)
+        t = seq[:, None] / self.rate_hz
+        half = 0.5 * np.sin(2 * np.pi * 0.5 * t + self.phase)          # (n, 11)
+        axis = np.array([0.0, 0.6, 0.0, 0.8])                          # fixed tilted axis
+        quat = np.cos(half)[..., None] * np.array([1.0, 0, 0, 0]) + np.sin(half)[..., None] * axis
+        calib = np.full((n, 4), 3, dtype=np.uint8)
+
+        keep = self.rng.random(n) >= self.drop_rate
+        data = bytearray(encode_frames(seq[keep] % (1 << 32), esp_ts[keep], quat[keep], calib[keep]))
+        n_corrupt = self.rng.binomial(len(data), self.corrupt_rate / FRAME_SIZE) if self.corrupt_rate else 0
+        for pos in self.rng.integers(0, len(data), n_corrupt):
+            data[pos] ^= 0xFF
+        return bytes(data)
@@ -0,0 +1,363 @@
+# Calibration of the glove's IMUs, computed from the stream and kept per glove.
+#
+# The glove is held still in the reference pose for a moment; the mean
+# rotation of each IMU over that window becomes its offset and later frames
+# are reported relative to it, as in Website/main.js:
+#     q_out = q * offset^-1 * axis_fix
+#
+# The mean is the rotation mean (Markley et al. 2007) instead of the average
+# of the components main.js takes: each IMU accumulates M = sum q q^T (4x4;
+# q and -q add the same term, so sign flips of the sensor's output do not
+# cancel out) and the mean is the eigenvector of M's largest eigenvalue. That
+# is one 4x4 per IMU however long the window is, and one eigen-solve at the
+# end. Scalar fields (the MPU roll/pitch/yaw of the ASCII layouts) get a
+# running mean, used as zeros.
+#
+# Offsets, axis fixes and zeros are saved per glove as JSON in CALIB_DIR
+# (~/.halo/calibration, or $HALO_CALIB_DIR) and loaded at startup, so a
+# session starts calibrated.
+#
+#   python -m halo.calibration capture left --port COM4 [--layout binary] [--seconds 1.5]
+#   python -m halo.calibration capture left --port glove.halo      # from a recording
+#   python -m halo.calibration axis-fix left --wrist x90 --fingers y90
+#   python -m halo.calibration show left
+
+import argparse
+import json
+import math
+import os
+import time
+import numpy as np
+
+from halo import quat_math as qm
+from halo.binary_protocol import NUM_IMUS
+
+CALIB_DIR = os.environ.get("HALO_CALIB_DIR", os.path.join(os.path.expanduser("~"), ".halo", "calibration"))
+IMU_NAMES = ["wrist",
+             "pointer1", "pointer2", "middle1", "middle2", "ring1", "ring2",
+             "pinky1", "pinky2", "thumb1", "thumb2"]
+IDENTITY = np.array([1.0, 0.0, 0.0, 0.0])
+
+
+def axis_fix(spec):
+    """"x90", "-y90", "z180", "none" -> quaternion (w, x, y, z); the keys
+    1-3 / 7-9 of main.js are x90, y90, z90."""
+    spec = spec.strip().lower()
+    if spec in ("", "none", "0"):
+        return IDENTITY.copy()
+    sign = -1.0 if spec[0] == "-" else 1.0
+    spec = spec.lstrip("+-")
+    if spec[0] not in "xyz":
+        raise ValueError(f"axis fix must look like x90, -y90, z180: {spec!r}")
+    half = sign * math.radians(float(spec[1:])) / 2.0
+    q = np.zeros(4)
+    q[0] = math.cos(half)
+    q[1 + "xyz".index(spec[0])] = math.sin(half)
+    return q
+
+
+# ---------- running means ----------
+class QuatMean:
+    """Rotation mean of n IMUs at once, O(1) memory per IMU."""
+
+    def __init__(self, n=NUM_IMUS):
+        self.n = n
+        self.reset()
+
+    def reset(self):
+        self.M = np.zeros((self.n, 4, 4))
+        self.count = np.zeros(self.n, dtype=np.int64)
+
+    def add(self, q):
+        """One frame (n, 4) or a block (T, n, 4). All-zero quaternions (IMU
+        missing from the layout) are skipped."""
+        q = np.asarray(q, dtype=np.float64).reshape(-1, self.n, 4)
+        norm = np.linalg.norm(q, axis=-1)
+        valid = norm > 0.5
+        q = np.where(valid[..., None], q / np.maximum(norm, 1e-12)[..., None], 0.0)
+        self.M += np.einsum("tni,tnj->nij", q, q)
+        self.count += valid.sum(axis=0)
+
+    def mean(self):
+        """(n, 4) mean quaternions with w >= 0; identity where nothing was added."""
+        vals, vecs = np.linalg.eigh(self.M)
+        q = vecs[..., -1]
+        q = np.where(q[:, :1] < 0, -q, q)
+        return np.where(self.count[:, None] > 0, q, IDENTITY)
+
+    def spread_deg(self):
+        """Per-IMU dispersion: the rotation angle whose cos^2(angle/2) is the
+        share of the largest eigenvalue (0 for a perfectly still IMU)."""
+        vals = np.linalg.eigvalsh(self.M)
+        share = vals[:, -1] / np.maximum(self.count, 1)
+        return np.degrees(2 * np.arccos(np.sqrt(np.clip(share, 0.0, 1.0))))
+
+
+class ScalarMean:
+    def __init__(self):
+        self.sum = 0.0
+        self.count = 0
+
+    def add(self, values):
+        """One frame (k,) or a block (T, k)."""
+        values = np.asarray(values, dtype=np.float64)
+        block = values if values.ndim > 1 else values[None]
+        self.sum = self.sum + block.sum(axis=0)
+        self.count += len(block)
+
+    def mean(self):
+        return self.sum / max(self.count, 1)
+
+
+# ---------- per-glove calibration ----------
+class Calibration:
+    def __init__(self, glove="default", offsets=None, axis_fixes=None, zeros=None, created=None):
+        self.glove = glove
+        self.offsets = np.tile(IDENTITY, (NUM_IMUS, 1)) if offsets is None else np.asarray(offsets, dtype=np.float64)
+        self.axis_fixes = np.tile(IDENTITY, (NUM_IMUS, 1)) if axis_fixes is None else np.asarray(axis_fixes, dtype=np.float64)
+        self.zeros = {k: np.asarray(v, dtype=np.float64) for k, v in (zeros or {}).items()}
+        self.created = created
+        self._update()
+
+    def _update(self):
+        # q * offset^-1 * fix == q * (offset^-1 * fix): one product per frame
+        self.correction = qm.mul(qm.conj(qm.normalize(self.offsets)), qm.normalize(self.axis_fixes))
+
+    def set_offsets(self, offsets, imus=None):
+        imus = np.arange(NUM_IMUS) if imus is None else np.asarray(imus)
+        self.offsets[imus] = offsets
+        self._update()
+
+    def set_axis_fix(self, fix, imus):
+        self.axis_fixes[imus] = fix
+        self._update()
+
+    def apply(self, q, imus=None):
+        """Calibrated quaternions: q is (..., 11, 4), or (..., len(imus), 4)
+        for a subset, e.g. apply(wrist_q, imus=0)."""
+        corr = self.correction if imus is None else self.correction[imus]
+        return qm.mul(q, corr)
+
+    def zero(self, name, values):
+        """values minus the saved zero for that field (unchanged if none)."""
+        z = self.zeros.get(name)
+        return values if z is None else np.asarray(values) - z
+
+    # ---------- persistence ----------
+    def to_dict(self):
+        return {
+            "version": 1,
+            "glove": self.glove,
+            "created": self.created,
+            "imus": IMU_NAMES,
+            "offsets": np.round(self.offsets, 7).tolist(),
+            "axis_fixes": np.round(self.axis_fixes, 7).tolist(),
+            "zeros": {k: np.round(v, 5).tolist() for k, v in self.zeros.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d.get("glove", "default"), d.get("offsets"), d.get("axis_fixes"), d.get("zeros"),
+                   d.get("created"))
+
+    def save(self, path=None):
+        path = path or calibration_path(self.glove)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+        os.replace(tmp, path)       # a crash mid-write keeps the old file
+        return path
+
+
+def calibration_path(glove):
+    return os.path.join(CALIB_DIR, f"{glove}.json")
+
+
+def load_calibration(glove="default", path=None):
+    """The saved calibration for a glove, or an identity one if there is none."""
+    path = path or calibration_path(glove)
+    if not os.path.exists(path):
+        return Calibration(glove)
+    with open(path) as f:
+        return Calibration.from_dict(json.load(f))
+
+
+# ---------- streaming capture ----------
+def frame_quats(frames):
+    """(T, 11, 4) quaternions from decoder records: binary frames carry all
+    11, the ASCII layouts only the wrist BNO (the rest stay zero = missing)."""
+    names = frames.dtype.names or ()
+    if "quat" not in names:
+        return None
+    q = np.asarray(frames["quat"], dtype=np.float64)
+    if q.ndim == 3:
+        return q
+    out = np.zeros((len(q), NUM_IMUS, 4))
+    out[:, 0] = q
+    return out
+
+
+def frame_scalars(frames):
+    """Float fields other than quat / calib (e.g. mpu1_rpy), by name."""
+    return {name: np.asarray(frames[name], dtype=np.float64) for name in frames.dtype.names
+            if name not in ("quat", "calib", "seq", "esp_ts") and frames.dtype[name].base.kind == "f"}
+
+
+class Calibrator:
+    """Feeds the stream into running means for `seconds`, then writes the
+    result into the calibration (and saves it). Nothing is applied if any
+    IMU moved more than max_spread_deg during the window.
+
+        cal = load_calibration("left")
+        calib = Calibrator(cal).start()
+        ...  calib.feed_frames(frames, t)  # per block of decoder records
+        if calib.done: print(calib.status)
+    """
+
+    def __init__(self, calibration, seconds=1.5, max_spread_deg=5.0, quats=True, fields=None, save=True):
+        self.calibration = calibration
+        self.seconds = seconds
+        self.max_spread_deg = max_spread_deg
+        self.quats = quats
+        self.fields = fields          # scalar field names to zero, None = all
+        self.save = save
+        self.qmean = QuatMean()
+        self.smeans = {}
+        self.t_start = None
+        self.active = False
+        self.done = False
+        self.ok = False
+        self.status = (time.strftime("saved %Y-%m-%d %H:%M", time.localtime(calibration.created))
+                       if calibration.created else "not calibrated")
+
+    def start(self):
+        self.qmean.reset()
+        self.smeans = {}
+        self.t_start = None
+        self.active, self.done, self.ok = True, False, False
+        self.status = "calibrating, hold still..."
+        return self
+
+    def progress(self, t):
+        if self.t_start is None:
+            return 0.0
+        return min(1.0, (t - self.t_start) / self.seconds)
+
+    def feed(self, quat=None, t=None, scalars=None):
+        """quat (T, 11, 4), (11, 4), or (4,) for the wrist alone; scalars
+        {name: (T, k) or (k,)}. Returns True on the call that finishes the
+        capture."""
+        if not self.active:
+            return False
+        if quat is not None and np.ndim(quat) == 1:
+            quat = np.vstack([quat, np.zeros((NUM_IMUS - 1, 4))])
+        t = time.perf_counter() if t is None else float(np.max(t))
+        if self.t_start is None:
+            self.t_start = t
+        if self.quats and quat is not None:
+            self.qmean.add(quat)
+        for name, values in (scalars or {}).items():
+            if self.fields is None or name in self.fields:
+                self.smeans.setdefault(name, ScalarMean()).add(values)
+        if t - self.t_start >= self.seconds:
+            self.finish()
+            return True
+        return False
+
+    def feed_frames(self, frames, t=None):
+        frames = np.asarray(frames).reshape(-1)      # one record or a block
+        return self.feed(frame_quats(frames) if self.quats else None, t, frame_scalars(frames))
+
+    def finish(self):
+        self.active = False
+        self.done = True
+        cal = self.calibration
+        seen = np.flatnonzero(self.qmean.count)
+        spread = self.qmean.spread_deg()
+        moved = [IMU_NAMES[i] for i in seen if spread[i] > self.max_spread_deg]
+        if moved:
+            self.status = f"moved during calibration ({', '.join(moved)}), nothing changed"
+            return
+        if len(seen):
+            cal.set_offsets(self.qmean.mean()[seen], seen)
+        for name, m in self.smeans.items():
+            cal.zeros[name] = m.mean()
+        cal.created = time.time()
+        self.ok = True
+        where = f", saved {cal.save()}" if self.save else ""
+        worst = f", spread max {spread[seen].max():.2f} deg" if len(seen) else ""
+        self.status = f"calibrated {len(seen)} IMUs + {len(self.smeans)} fields{worst}{where}"
+
+
+def capture(glove, port, layout="auto", baud=115200, seconds=1.5, max_spread_deg=5.0):
+    """Calibrate from a serial port (or a .halo recording) and save it."""
+    from halo.serial_reader import SerialReader
+    from halo.binary_protocol import decoder_for
+
+    if port.endswith(".halo"):
+        from halo.session import ReplayPort
+        ser = ReplayPort(port)
+        layout = ser.reader.layout
+    else:
+        import serial
+        ser = serial.Serial(port, baud)
+    if layout == "raw":
+        # raw-mode MPUs carry no orientation until they are fused
+        from halo.fusion import FusionDecoder
+        decoder = FusionDecoder()
+    else:
+        decoder = decoder_for(layout)
+    reader = SerialReader(ser, decoder).start()
+    calib = Calibrator(load_calibration(glove), seconds, max_spread_deg).start()
+    print(f"Hold the glove still in the reference pose for {seconds:.1f} s")
+    try:
+        while not calib.done:
+            time.sleep(0.02)
+            got = reader.drain()
+            if got is not None and len(got[0]):
+                calib.feed_frames(*got)
+    finally:
+        reader.stop()
+    print(calib.status)
+    return calib
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Capture / edit per-glove IMU calibration")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    cap = sub.add_parser("capture")
+    cap.add_argument("glove")
+    cap.add_argument("--port", required=True, help="serial port or a .halo recording")
+    cap.add_argument("--layout", default="auto", help="auto, binary, raw or a packet_parser layout")
+    cap.add_argument("--baud", type=int, default=115200)
+    cap.add_argument("--seconds", type=float, default=1.5)
+    cap.add_argument("--max-spread", type=float, default=5.0, help="degrees an IMU may move while capturing")
+    fix = sub.add_parser("axis-fix")
+    fix.add_argument("glove")
+    fix.add_argument("--wrist", help="e.g. x90, -y90, none")
+    fix.add_argument("--fingers", help="same fix for all 10 finger IMUs")
+    show = sub.add_parser("show")
+    show.add_argument("glove")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "capture":
+        capture(args.glove, args.port, args.layout, args.baud, args.seconds, args.max_spread)
+    elif args.cmd == "axis-fix":
+        cal = load_calibration(args.glove)
+        if args.wrist is not None:
+            cal.set_axis_fix(axis_fix(args.wrist), 0)
+        if args.fingers is not None:
+            cal.set_axis_fix(axis_fix(args.fingers), slice(1, None))
+        print("saved", cal.save())
+    else:
+        path = calibration_path(args.glove)
+        if not os.path.exists(path):
+            print(f"no calibration for {args.glove!r} ({path})")
+            return
+        print(path)
+        print(json.dumps(load_calibration(args.glove).to_dict(), indent=1))
+
+
+if __name__ == "__main__":
+    main()
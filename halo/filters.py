@@ -0,0 +1,131 @@
+# Stateful per-channel filters, vectorised over channels.
+#
+# Every filter holds its state between calls and takes either one frame
+# (C,) or a block of frames (T, C), returning the filtered values in the same
+# shape. The time loop runs once per frame of the block; all channels are
+# updated together with NumPy. The same objects are used for training
+# preprocessing (run over the recorded data in order) and live prediction,
+# so both see the same filtering.
+#
+#   kf = KalmanBank(23)
+#   X_f = kf.update(X)          # (N, 23) training data
+#   kf.reset()
+#   x_f = kf.update(frame)      # later, one live frame at a time
+
+import numpy as np
+
+
+class _Bank:
+    def __init__(self, n_channels):
+        self.n_channels = n_channels
+
+    def update(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        single = x.ndim == 1
+        block = x.reshape(-1, self.n_channels)
+        out = np.empty_like(block)
+        for t in range(len(block)):
+            out[t] = self._step(block[t])
+        return out[0] if single else out
+
+    def __call__(self, x):
+        return self.update(x)
+
+
+class KalmanBank(_Bank):
+    """SimpleKalman (random-walk 1D Kalman) for every channel at once."""
+
+    def __init__(self, n_channels, q=0.01, r=0.1):
+        super().__init__(n_channels)
+        self.q = q
+        self.r = r
+        self.reset()
+
+    def reset(self):
+        self.p = np.ones(self.n_channels)
+        self.x = np.zeros(self.n_channels)
+
+    def _step(self, z):
+        self.p += self.q
+        k = self.p / (self.p + self.r)
+        self.x += k * (z - self.x)
+        self.p *= 1 - k
+        return self.x
+
+
+class EMABank(_Bank):
+    """y = (1 - alpha) * y_prev + alpha * x, the viewers' SMOOTH filter.
+
+    alpha=0 passes the input through (SMOOTH = 0 means no smoothing). The
+    state starts at `initial` (0.0, as in the viewers); initial=None seeds it
+    with the first frame instead.
+    """
+
+    def __init__(self, n_channels, alpha=0.15, initial=0.0):
+        super().__init__(n_channels)
+        self.alpha = alpha
+        self.initial = initial
+        self.reset()
+
+    def reset(self):
+        self.y = None if self.initial is None else np.full(self.n_channels, float(self.initial))
+
+    def _step(self, x):
+        if self.alpha <= 0 or self.y is None:
+            self.y = x.copy()
+            return self.y
+        self.y = (1.0 - self.alpha) * self.y + self.alpha * x
+        return self.y
+
+
+class ComplementaryBank:
+    """Gyro/accel complementary filter, as in hand_simulation/wrist_and_fingers.ino:
+
+        angle = alpha * (angle + rate * dt) + (1 - alpha) * acc_angle
+
+    update(rate, acc_angle, dt) takes (C,) or (T, C) arrays; dt is a scalar
+    or one value per frame. The first frame starts from acc_angle.
+    """
+
+    def __init__(self, n_channels, alpha=0.98):
+        self.n_channels = n_channels
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self):
+        self.angle = None
+
+    def update(self, rate, acc_angle, dt):
+        rate = np.asarray(rate, dtype=np.float64)
+        single = rate.ndim == 1
+        rate = rate.reshape(-1, self.n_channels)
+        acc = np.asarray(acc_angle, dtype=np.float64).reshape(-1, self.n_channels)
+        dt = np.broadcast_to(np.asarray(dt, dtype=np.float64).reshape(-1, 1), (len(rate), 1))
+        out = np.empty_like(rate)
+        a = self.alpha
+        for t in range(len(rate)):
+            if self.angle is None:
+                self.angle = acc[t].copy()
+            else:
+                self.angle = a * (self.angle + rate[t] * dt[t]) + (1 - a) * acc[t]
+            out[t] = self.angle
+        return out[0] if single else out
+
+
+class FilterChain:
+    """Several banks applied one after the other (e.g. Kalman then EMA)."""
+
+    def __init__(self, *filters):
+        self.filters = filters
+
+    def reset(self):
+        for f in self.filters:
+            f.reset()
+
+    def update(self, x):
+        for f in self.filters:
+            x = f.update(x)
+        return x
+
+    def __call__(self, x):
+        return self.update(x)
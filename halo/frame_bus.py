@@ -0,0 +1,486 @@
+# Shared-memory frame bus: one publisher process owns the serial port and
+# writes decoded frames into a multiprocessing.shared_memory ring; any number
+# of subscriber processes (viewer, recorder, inference) read it without
+# copying, each at its own pace.
+#
+# Segment layout (native byte order, one writer, no locks):
+#   header      : HEADER_DTYPE (magic, sizes, head / count counters, heartbeat)
+#   subscribers : MAX_SUBSCRIBERS x SUB_DTYPE (each subscriber owns one slot)
+#   meta        : JSON (layout, dtype descr, source), padded to 64 bytes
+#   frames      : capacity x frame dtype (a packet_parser layout or FRAME_DTYPE)
+#   t           : capacity x f8, host perf_counter() at arrival
+#
+# The publisher bumps `head` before it overwrites slots and `count` after, so
+# a reader that copied frames [a, count) and then sees head = h knows that
+# everything before h - capacity may have been overwritten meanwhile; those
+# frames are dropped and counted as overruns for that subscriber. Each
+# subscriber writes its cursor / overruns / last-seen time into its slot, so
+# `python -m halo.frame_bus status` (or the publisher's log) shows the lag of
+# every reader. perf_counter is a system-wide monotonic clock on Linux,
+# Windows and macOS, so arrival times compare across processes.
+#
+# Publish:
+#   python -m halo.frame_bus publish --port COM4 [--layout quat14|binary|auto] [--name halo]
+#   python -m halo.frame_bus publish --port glove.halo        # a recording (ReplayPort)
+#   python -m halo.frame_bus publish --port COM4 --layout raw --fuse madgwick   # halo/fusion.py
+#   python -m halo.frame_bus status [--name halo]
+# Subscribe (take / drain / hud / stats like SerialReader):
+#   sub = FrameSubscriber("halo", "viewer")
+#   got = sub.take()                 # newest frame, or None
+#   frames, t = sub.drain()          # every frame since the last drain
+# The test2 viewer takes `bus:halo` as its port, the session recorder
+# `--bus halo`, NewMLP's live_inference / collect_data a FrameSubscriber.
+
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing import shared_memory
+import numpy as np
+
+from halo.binary_protocol import decoder_for
+
+MAGIC = b"HALOBUS1"
+MAX_SUBSCRIBERS = 16
+STALE_AFTER = 10.0          # a slot not updated for this long can be reclaimed
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("meta_len", "<u4"), ("capacity", "<u4"),
+                         ("head", "<u8"), ("count", "<u8"), ("heartbeat", "<f8"),
+                         ("closed", "<u4"), ("pid", "<u4")])
+SUB_DTYPE = np.dtype([("pid", "<i8"), ("name", "S24"), ("cursor", "<u8"), ("overruns", "<u8"),
+                      ("skipped", "<u8"), ("last_seen", "<f8")])
+
+
+def _align(n, to=64):
+    return (n + to - 1) // to * to
+
+
+def _offsets(meta_len, dtype, capacity):
+    subs = _align(HEADER_DTYPE.itemsize)
+    meta = subs + _align(MAX_SUBSCRIBERS * SUB_DTYPE.itemsize)
+    frames = meta + _align(meta_len)
+    t = frames + _align(capacity * dtype.itemsize)
+    return subs, meta, frames, t, t + capacity * 8
+
+
+def _attach(name):
+    # attach without registering the segment with the resource tracker, which
+    # would unlink it when the subscriber exits (Python < 3.13 has no track=False;
+    # unregistering afterwards breaks children forked from the publisher, which
+    # share its tracker)
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        from multiprocessing import resource_tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class _Segment:
+    """numpy views of a bus segment."""
+
+    def __init__(self, shm, meta=None, meta_len=None):
+        self.shm = shm
+        buf = shm.buf
+        self.header = np.ndarray((), HEADER_DTYPE, buffer=buf)
+        if meta is None:
+            if bytes(self.header["magic"]) != MAGIC:
+                raise ValueError(f"{shm.name}: not a HALO frame bus")
+            meta_len = int(self.header["meta_len"])
+            start = _offsets(meta_len, np.dtype("u1"), 0)[1]
+            meta = json.loads(bytes(buf[start:start + meta_len]))
+        self.meta = meta
+        self.dtype = np.lib.format.descr_to_dtype(meta["descr"])
+        self.capacity = meta["capacity"]
+        subs, _, frames, t, _ = _offsets(meta_len, self.dtype, self.capacity)
+        self.subs = np.ndarray((MAX_SUBSCRIBERS,), SUB_DTYPE, buffer=buf, offset=subs)
+        self.frames = np.ndarray((self.capacity,), self.dtype, buffer=buf, offset=frames)
+        self.t = np.ndarray((self.capacity,), np.float64, buffer=buf, offset=t)
+
+    def close(self):
+        self.header = self.subs = self.frames = self.t = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass          # a caller still holds drain() views; the mapping goes with them
+
+
+# ---------- publisher ----------
+class FramePublisher:
+    """Owns the segment; publish() is called from a single thread."""
+
+    def __init__(self, name, dtype, capacity=8192, layout="", source=""):
+        dtype = np.dtype(dtype)
+        meta = {"layout": layout, "descr": np.lib.format.dtype_to_descr(dtype),
+                "capacity": capacity, "source": source}
+        raw = json.dumps(meta).encode()
+        size = _offsets(len(raw), dtype, capacity)[-1]
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # left behind by a publisher that was killed; live ones keep a heartbeat
+            old = _attach(name)
+            hdr = np.ndarray((), HEADER_DTYPE, buffer=old.buf)
+            alive = not hdr["closed"] and time.perf_counter() - hdr["heartbeat"] < STALE_AFTER
+            del hdr
+            old.close()
+            if alive:
+                raise RuntimeError(f"frame bus {name!r} already has a publisher")
+            shared_memory.SharedMemory(name=name).unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        start = _offsets(len(raw), dtype, capacity)[1]
+        shm.buf[start:start + len(raw)] = raw
+        self.seg = _Segment(shm, meta, len(raw))
+        h = self.seg.header
+        h["meta_len"] = len(raw)
+        h["capacity"] = capacity
+        h["pid"] = os.getpid()
+        h["heartbeat"] = time.perf_counter()
+        h["magic"] = MAGIC                 # last: subscribers check it
+        self.name = name
+        self.capacity = capacity
+        self.count = 0
+
+    def publish(self, frames, t):
+        """Append decoded frames with their arrival time(s)."""
+        n = len(frames)
+        if n == 0:
+            return
+        seg, cap = self.seg, self.capacity
+        t = np.broadcast_to(np.asarray(t, dtype=np.float64), (n,))
+        if n > cap:
+            frames, t = frames[-cap:], t[-cap:]
+            self.count += n - cap
+            n = cap
+        seg.header["head"] = self.count + n
+        start = self.count % cap
+        first = min(n, cap - start)
+        seg.frames[start:start + first] = frames[:first]
+        seg.t[start:start + first] = t[:first]
+        if first < n:
+            seg.frames[:n - first] = frames[first:]
+            seg.t[:n - first] = t[first:]
+        self.count += n
+        seg.header["count"] = self.count
+        seg.header["heartbeat"] = time.perf_counter()
+
+    def heartbeat(self):
+        self.seg.header["heartbeat"] = time.perf_counter()
+
+    def subscribers(self):
+        return subscriber_table(self.seg, self.count)
+
+    def close(self):
+        self.seg.header["closed"] = 1
+        shm = self.seg.shm
+        self.seg.close()
+        shm.unlink()
+
+
+def subscriber_table(seg, count=None):
+    """One dict per registered subscriber: lag in frames behind the newest,
+    frames lost to overruns, frames skipped by take(), seconds since it last read."""
+    count = int(seg.header["count"]) if count is None else count
+    now = time.perf_counter()
+    rows = []
+    for s in seg.subs.copy():
+        if s["pid"] == 0:
+            continue
+        rows.append({"name": s["name"].decode(), "pid": int(s["pid"]),
+                     "lag": count - int(s["cursor"]), "overruns": int(s["overruns"]),
+                     "skipped": int(s["skipped"]), "idle_s": now - float(s["last_seen"])})
+    return rows
+
+
+def format_table(rows, rate_hz=None):
+    if not rows:
+        return "no subscribers"
+    out = []
+    for r in rows:
+        lag = f"lag {r['lag']:5d}"
+        if rate_hz:
+            lag += f" ({r['lag'] / rate_hz * 1e3:6.1f} ms)"
+        idle = "  (idle)" if r["idle_s"] > STALE_AFTER else ""
+        out.append(f"  {r['name']:<16} pid {r['pid']:<7d} {lag}  overruns {r['overruns']}"
+                   f"  skipped {r['skipped']}{idle}")
+    return "\n".join(out)
+
+
+# ---------- subscriber ----------
+class FrameSubscriber:
+    """Reads a bus. take() / drain() / stats() / hud() behave like
+    SerialReader's, so the viewers and the recorder can use either."""
+
+    def __init__(self, name="halo", who=None, wait=5.0, stale_after=0.1, metrics=None):
+        deadline = time.perf_counter() + wait
+        while True:
+            try:
+                shm = _attach(name)
+                if shm.size >= HEADER_DTYPE.itemsize and bytes(shm.buf[:8]) == MAGIC:
+                    break
+                shm.close()
+            except FileNotFoundError:
+                pass
+            if time.perf_counter() > deadline:
+                raise FileNotFoundError(f"no frame bus {name!r} (is `python -m halo.frame_bus publish` running?)")
+            time.sleep(0.05)
+        self.seg = _Segment(shm)
+        self.name = name
+        self.layout = self.seg.meta["layout"]
+        self.dtype = self.seg.dtype
+        self.capacity = self.seg.capacity
+        self.metrics = metrics
+        self.stale_after = stale_after
+        self._taken = self._drained = self._joined = int(self.seg.header["count"])
+        self.slot = self._register(who or f"{os.path.basename(sys.argv[0]) or 'python'}")
+        # plain views of this slot's cursor / overruns / skipped and last_seen
+        # (cheaper to update per read than the structured record)
+        base = _align(HEADER_DTYPE.itemsize) + self.slot * SUB_DTYPE.itemsize
+        self._counts = np.ndarray((3,), "<u8", buffer=shm.buf, offset=base + SUB_DTYPE.fields["cursor"][1])
+        self._seen = np.ndarray((1,), "<f8", buffer=shm.buf, offset=base + SUB_DTYPE.fields["last_seen"][1])
+
+        # counters (as SerialReader)
+        self.overruns = 0        # frames replaced before take() saw them
+        self.ring_overruns = 0   # frames lost to drain() because the publisher lapped it
+        self.stale = 0
+        self.age_last = 0.0
+        self.age_max = 0.0
+        self.age_mean = 0.0
+
+    def _register(self, who):
+        subs = self.seg.subs
+        pid = os.getpid()
+        for _ in range(3):
+            now = time.perf_counter()
+            for i in range(MAX_SUBSCRIBERS):
+                if subs[i]["pid"] == 0 or now - subs[i]["last_seen"] > STALE_AFTER:
+                    subs[i]["pid"] = pid
+                    time.sleep(0.001)            # another subscriber racing for the slot?
+                    if subs[i]["pid"] != pid:
+                        continue
+                    subs[i]["name"] = who.encode()[:24]
+                    subs[i]["cursor"] = self._joined
+                    subs[i]["overruns"] = subs[i]["skipped"] = 0
+                    subs[i]["last_seen"] = now
+                    return i
+        raise RuntimeError(f"frame bus {self.name!r}: all {MAX_SUBSCRIBERS} subscriber slots taken")
+
+    def _report(self, cursor):
+        self._counts[:] = (cursor, self.ring_overruns, self.overruns)
+        self._seen[0] = time.perf_counter()
+
+    # ---------- SerialReader interface ----------
+    def start(self):
+        return self
+
+    def stop(self):
+        self.close()
+
+    @property
+    def closed(self):
+        return self.seg.header is None or bool(self.seg.header["closed"])
+
+    @property
+    def count(self):
+        return int(self.seg.header["count"])
+
+    @property
+    def frames(self):
+        """Frames published since this subscriber attached."""
+        return int(self.seg.header["count"]) - self._joined
+
+    def take(self):
+        """Newest frame as (frame, t) if one was published since the last call, else None."""
+        seg = self.seg
+        count = int(seg.header["count"])
+        if count == self._taken:
+            return None
+        i = (count - 1) % self.capacity
+        frame, t = seg.frames[i].copy(), float(seg.t[i])
+        if int(seg.header["head"]) - self.capacity >= count:
+            return None              # lapped while copying a single frame: next call
+        self.overruns += count - self._taken - 1
+        self._taken = count
+        self._report(count)
+        self._age(t)
+        return frame, t
+
+    def _age(self, t):
+        age = time.perf_counter() - t
+        if self.metrics is not None:
+            self.metrics.observe("queue", age)
+        self.age_last = age
+        self.age_max = max(self.age_max, age)
+        self.age_mean += 0.05 * (age - self.age_mean)
+        if age > self.stale_after:
+            self.stale += 1
+
+    def drain(self, max_frames=None):
+        """Every frame since the last drain() as (frames, t). Unless the range
+        wraps the ring end these are views into the segment: valid until the
+        publisher laps them (capacity frames after they were written), so
+        copy what you keep."""
+        seg, cap = self.seg, self.capacity
+        count = int(seg.header["count"])
+        start = self._drained
+        if max_frames is not None:
+            count = min(count, start + max_frames)
+        start = max(start, count - cap)
+        a = start % cap
+        b = a + count - start
+        if b <= cap:
+            frames, t = seg.frames[a:b], seg.t[a:b]
+        else:
+            frames = np.concatenate((seg.frames[a:], seg.frames[:b - cap]))
+            t = np.concatenate((seg.t[a:], seg.t[:b - cap]))
+        # anything the publisher started overwriting meanwhile is dropped
+        valid_from = int(seg.header["head"]) - cap
+        if valid_from > start:
+            cut = min(valid_from, count) - start
+            frames, t = frames[cut:], t[cut:]
+            start += cut
+        self.ring_overruns += start - self._drained
+        self._drained = count
+        self._report(count)
+        if len(t):
+            self._age(float(t[-1]))
+        return frames, t
+
+    def lag(self):
+        """Frames published but not yet drained / taken."""
+        return int(self.seg.header["count"]) - max(self._drained, self._taken)
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "lag": self.lag(),
+            "overruns": self.overruns,
+            "ring_overruns": self.ring_overruns,
+            "stale": self.stale,
+            "age_ms": self.age_last * 1e3,
+            "age_max_ms": self.age_max * 1e3,
+            "age_mean_ms": self.age_mean * 1e3,
+        }
+
+    def hud(self):
+        return (f"bus {self.name}  frames {self.frames}  skipped {self.overruns}  lost {self.ring_overruns}  "
+                f"stale {self.stale}  age {self.age_last*1e3:.1f} ms (max {self.age_max*1e3:.0f})")
+
+    def wait(self, timeout=0.1, poll=0.0005):
+        """Sleep until something new is published (True) or timeout (False)."""
+        seen = max(self._drained, self._taken)
+        deadline = time.perf_counter() + timeout
+        while int(self.seg.header["count"]) == seen:
+            if self.closed or time.perf_counter() > deadline:
+                return False
+            time.sleep(poll)
+        return True
+
+    def close(self):
+        if self.seg.header is None:
+            return
+        if self.seg.subs[self.slot]["pid"] == os.getpid():
+            self.seg.subs[self.slot]["pid"] = 0
+        self._counts = self._seen = None
+        self.seg.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ---------- publishing a port ----------
+def open_port(port, baud=115200):
+    if port.endswith(".halo"):
+        from halo.session import ReplayPort
+        return ReplayPort(port, loop=True)
+    import serial
+    ser = serial.Serial(port, baud)
+    ser.reset_input_buffer()
+    return ser
+
+
+def publish_port(port, name="halo", layout="auto", baud=115200, capacity=8192,
+                 stats_every=5.0, duration=None, metrics=None, fuse=None, log=print):
+    """Read `port` (serial device or .halo recording), decode and publish
+    until interrupted. The segment is created once the layout is known. With
+    fuse="madgwick" / "mahony" raw-mode frames are filtered here and published
+    as binary frames."""
+    ser = open_port(port, baud)
+    ser.timeout = 0.02
+    if fuse:
+        from halo.fusion import FusionDecoder
+        decoder, layout = FusionDecoder(fuse), "binary"
+    else:
+        decoder = decoder_for(layout)
+    bus = None
+    start = last = time.perf_counter()
+    last_count = 0
+    try:
+        while duration is None or time.perf_counter() - start < duration:
+            data = ser.read(max(1, ser.in_waiting))
+            now = time.perf_counter()
+            if data:
+                n = decoder.feed(data, now)
+                if n:
+                    if bus is None:
+                        found = layout if layout in ("binary", "raw") else decoder.layout.name
+                        bus = FramePublisher(name, decoder.ring.dtype, capacity, found, f"serial:{port}")
+                        log(f"publishing {found} frames from {port} on bus {name!r}")
+                    frames, t = decoder.ring.latest(n)
+                    if metrics is not None:
+                        metrics.count("frames", n)
+                        with metrics.stage("publish"):
+                            bus.publish(frames, t)
+                    else:
+                        bus.publish(frames, t)
+            if bus is not None and now - last > stats_every:
+                bus.heartbeat()
+                rate = (bus.count - last_count) / (now - last)
+                last, last_count = now, bus.count
+                log(f"{bus.count} frames ({rate:.0f}/s)\n{format_table(bus.subscribers(), rate)}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if bus is not None:
+            bus.close()
+        ser.close()
+    return bus
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Shared-memory frame bus for the HALO glove")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    pub = sub.add_parser("publish")
+    pub.add_argument("--port", required=True, help="serial port, pty or .halo recording")
+    pub.add_argument("--baud", type=int, default=115200)
+    pub.add_argument("--layout", default="auto", help="auto, binary, raw or a packet_parser layout")
+    pub.add_argument("--fuse", choices=["madgwick", "mahony"], help="filter raw-mode frames before publishing")
+    pub.add_argument("--name", default="halo")
+    pub.add_argument("--capacity", type=int, default=8192)
+    pub.add_argument("--duration", type=float)
+    st = sub.add_parser("status")
+    st.add_argument("--name", default="halo")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "publish":
+        publish_port(args.port, args.name, args.layout, args.baud, args.capacity, duration=args.duration,
+                     fuse=args.fuse)
+    else:
+        seg = _Segment(_attach(args.name))
+        h = seg.header
+        print(f"bus {args.name!r}: {seg.meta['layout']} from {seg.meta['source']}, capacity {seg.capacity},"
+              f" {int(h['count'])} frames, publisher pid {int(h['pid'])}"
+              f"{' (closed)' if h['closed'] else ''}, last write {time.perf_counter() - h['heartbeat']:.1f} s ago")
+        print(format_table(subscriber_table(seg)))
+        seg.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
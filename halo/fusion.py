@@ -0,0 +1,345 @@
+# Host-side orientation filters for the finger MPU6050s.
+#
+# With the firmware in raw mode (RAW_MODE 1 in binary_serial_stream.ino) the
+# ESP32 only samples: each frame carries the BNO055 wrist quaternion and the
+# int16 accel / gyro of the 10 MPUs (binary_protocol.RAW_WIRE_DTYPE), and the
+# filtering runs here, so the glove can sample faster and beta / kp / ki can
+# be tuned on a recording without reflashing.
+#
+# - MadgwickBank / MahonyBank: the 6-DOF (IMU) updates of MadgwickAHRS.c /
+#   MahonyAHRS.c, one time step per frame with all MPUs updated together in
+#   NumPy; update() takes a block of frames (T, n, 3) and returns (T, n, 4).
+#   Normalising the accel, dt and the yaw reference are done for the whole
+#   block at once.
+# - yaw correction: an MPU has no heading reference, so its yaw drifts with
+#   the gyro bias (the ESP32 sketches integrate it open loop; the test viewers
+#   work around it with yawM = yawB). Given the BNO055 wrist quaternion, each
+#   MPU's heading in the wrist frame (its twist about the palm normal, which
+#   finger flexion does not change) is pulled towards its offset at yaw_gain
+#   rad/s per rad of error, every yaw_period seconds. Keep the gain low so
+#   finger abduction passes through and only the slow drift is removed. The
+#   MPUs start at the wrist heading + yaw_offsets (0: same heading, as the
+#   viewers assume) and the offsets are re-taken by reset_yaw(), i.e. in the
+#   reference pose.
+# - Fusion: either bank plus the yaw correction over RAW_FRAME_DTYPE records
+#   (dt from esp_ts) -> the 11 quaternions of a FRAME_DTYPE frame.
+# - FusionDecoder: RawDecoder + Fusion behind the decoder interface (feed /
+#   read_from / ring of FRAME_DTYPE), so SerialReader, the frame bus, the
+#   recorder and full_hand.py take raw-mode gloves unchanged.
+#
+# Re-filter a raw recording with other parameters:
+#   python -m halo.fusion convert raw.halo fused.halo --method mahony --kp 2 --yaw-gain 0.1
+
+import argparse
+import time
+import numpy as np
+
+from halo import quat_math as qm
+from halo.binary_protocol import FRAME_DTYPE, NUM_MPUS, RawDecoder
+from halo.packet_parser import FrameRing
+
+METHODS = ("madgwick", "mahony")
+
+
+def heading(q):
+    """Rotation about z of q = twist_z * swing, radians in (-pi, pi]."""
+    q = np.asarray(q, dtype=np.float64)
+    return _wrap(2 * np.arctan2(q[..., 3], q[..., 0]))
+
+
+def relative_heading(q, reference):
+    """Heading of q (..., n, 4) in the frame of reference (..., 4)."""
+    return heading(qm.mul(qm.conj(np.asarray(reference, dtype=np.float64))[..., None, :], q))
+
+
+def _wrap(a):
+    return np.pi - np.mod(np.pi - a, 2 * np.pi)
+
+
+def from_gravity(accel, yaw=0.0):
+    """Orientation (..., 4) whose sensor-frame gravity is `accel` (..., 3),
+    with heading `yaw`: Rz(yaw) Ry(pitch) Rx(roll)."""
+    a = np.asarray(accel, dtype=np.float64)
+    roll = np.arctan2(a[..., 1], a[..., 2])
+    pitch = np.arctan2(-a[..., 0], np.hypot(a[..., 1], a[..., 2]))
+    yaw = np.broadcast_to(np.asarray(yaw, dtype=np.float64), roll.shape)
+    return qm.mul(qm.axis_angle([0, 0, 1], yaw),
+                  qm.mul(qm.axis_angle([0, 1, 0], pitch), qm.axis_angle([1, 0, 0], roll)))
+
+
+def _arc(u, v):
+    # shortest rotation taking unit vectors u to v, (..., 4)
+    w = 1.0 + (u * v).sum(axis=-1, keepdims=True)
+    axis = np.cross(u, v)
+    # u = -v: any half turn about an axis normal to u
+    flip = w[..., 0] < 1e-9
+    if flip.any():
+        alt = np.cross(u, [1.0, 0.0, 0.0])
+        alt = np.where(np.linalg.norm(alt, axis=-1, keepdims=True) < 1e-6, np.cross(u, [0.0, 1.0, 0.0]), alt)
+        axis = np.where(flip[..., None], alt, axis)
+    return qm.normalize(np.concatenate([w, axis], axis=-1))
+
+
+# ---------- filter banks ----------
+class _AHRSBank:
+    yaw_period = 0.02
+
+    def __init__(self, n, yaw_gain=0.0, yaw_offsets=0.0):
+        self.n = n
+        self.yaw_gain = yaw_gain
+        self.yaw_offsets = np.broadcast_to(np.asarray(yaw_offsets, dtype=np.float64), (n,))
+        self.reset()
+
+    def reset(self):
+        self.q = None                  # (4, n): rows w, x, y, z
+        self.yaw_offset = None         # current target headings in the reference frame
+        self._yaw_due = 0.0            # seconds since the last yaw correction
+
+    def reset_yaw(self, reference):
+        """Take the MPUs' current headings relative to the reference (wrist)
+        quaternion as their targets."""
+        if self.q is not None:
+            self.yaw_offset = relative_heading(self.q.T, reference)
+
+    def start(self, accel, reference=None):
+        if reference is None:
+            self.q = from_gravity(accel, self.yaw_offsets).T.copy()
+            return
+        # the wrist turned by yaw_offsets about its z, then tilted the shortest
+        # way onto the measured gravity
+        guess = qm.mul(reference, qm.axis_angle([0, 0, 1], self.yaw_offsets))
+        predicted = qm.rotate(qm.conj(guess), np.array([0.0, 0.0, 1.0]))
+        self.q = qm.normalize(qm.mul(guess, _arc(accel, predicted))).T.copy()
+        self.reset_yaw(reference)
+
+    def update(self, gyro, accel, dt, reference=None):
+        """gyro (rad/s) and accel (any unit) (T, n, 3) or (n, 3); dt scalar or (T,);
+        reference: the wrist quaternions (T, 4) for the yaw correction, or None.
+        Returns the quaternions (T, n, 4) / (n, 4)."""
+        gyro = np.asarray(gyro, dtype=np.float64)
+        single = gyro.ndim == 2
+        gyro = gyro.reshape(-1, self.n, 3)
+        accel = np.asarray(accel, dtype=np.float64).reshape(-1, self.n, 3)
+        T = len(gyro)
+        dt = np.broadcast_to(np.asarray(dt, dtype=np.float64), (T,))
+        if reference is not None:
+            reference = np.asarray(reference, dtype=np.float64).reshape(T, 4)
+        norm = np.linalg.norm(accel, axis=-1, keepdims=True)
+        valid = norm[..., 0] > 0
+        accel = np.divide(accel, norm, out=np.zeros_like(accel), where=norm > 0)
+        # per step the kernels read rows: (T, 3, n)
+        g = np.ascontiguousarray(gyro.transpose(0, 2, 1))
+        a = np.ascontiguousarray(accel.transpose(0, 2, 1))
+        if self.q is None:
+            self.start(accel[0], None if reference is None else reference[0])
+        out = np.empty((T, 4, self.n))
+        q = self.q
+        for k in range(T):
+            q = self._step(q, g[k], a[k], valid[k], dt[k])
+            out[k] = q
+        self.q = q
+        if reference is not None and self.yaw_gain > 0:
+            self._yaw_due += float(dt.sum())
+            if self._yaw_due >= self.yaw_period:
+                self._correct_yaw(reference[-1], min(1.0, self.yaw_gain * self._yaw_due))
+                self._yaw_due = 0.0
+        out = out.transpose(0, 2, 1)
+        return out[0] if single else out
+
+    def _correct_yaw(self, reference, fraction):
+        # turn each MPU about world z (leaves its tilt, which gravity fixes,
+        # alone) by `fraction` of its heading error in the wrist frame
+        if self.yaw_offset is None:
+            self.reset_yaw(reference)
+        q = self.q.T
+        err = _wrap(self.yaw_offset - relative_heading(q, reference))
+        self.q = qm.normalize(qm.mul(qm.axis_angle([0, 0, 1], fraction * err), q)).T.copy()
+
+
+def _rate(q, gx, gy, gz):
+    # 0.5 * q * (0, g)
+    w, x, y, z = q
+    return 0.5 * np.stack([-x * gx - y * gy - z * gz,
+                           w * gx + y * gz - z * gy,
+                           w * gy - x * gz + z * gx,
+                           w * gz + x * gy - y * gx])
+
+
+def _normalize(q):
+    return q / np.sqrt((q * q).sum(axis=0))
+
+
+class MadgwickBank(_AHRSBank):
+    """Madgwick gradient-descent IMU update for n sensors; beta in rad/s."""
+
+    def __init__(self, n=NUM_MPUS, beta=0.1, yaw_gain=0.0, yaw_offsets=0.0):
+        super().__init__(n, yaw_gain, yaw_offsets)
+        self.beta = beta
+
+    def _step(self, q, g, a, valid, dt):
+        w, x, y, z = q
+        ax, ay, az = a
+        # gravity error f and its gradient J^T f
+        f1 = 2 * (x * z - w * y) - ax
+        f2 = 2 * (w * x + y * z) - ay
+        f3 = 1 - 2 * (x * x + y * y) - az
+        s = np.stack([-2 * y * f1 + 2 * x * f2,
+                      2 * z * f1 + 2 * w * f2 - 4 * x * f3,
+                      -2 * w * f1 + 2 * z * f2 - 4 * y * f3,
+                      2 * x * f1 + 2 * y * f2])
+        sn = np.sqrt((s * s).sum(axis=0))
+        s *= np.where(valid & (sn > 0), self.beta / np.maximum(sn, 1e-12), 0.0)
+        return _normalize(q + (_rate(q, *g) - s) * dt)
+
+
+class MahonyBank(_AHRSBank):
+    """Mahony PI complementary IMU update for n sensors."""
+
+    def __init__(self, n=NUM_MPUS, kp=1.0, ki=0.0, yaw_gain=0.0, yaw_offsets=0.0):
+        super().__init__(n, yaw_gain, yaw_offsets)
+        self.kp = kp
+        self.ki = ki
+
+    def reset(self):
+        super().reset()
+        self.integral = np.zeros((3, self.n))
+
+    def _step(self, q, g, a, valid, dt):
+        w, x, y, z = q
+        ax, ay, az = a
+        # measured gravity x estimated gravity
+        vx = 2 * (x * z - w * y)
+        vy = 2 * (w * x + y * z)
+        vz = w * w - x * x - y * y + z * z
+        e = np.stack([ay * vz - az * vy, az * vx - ax * vz, ax * vy - ay * vx]) * valid
+        if self.ki > 0:
+            self.integral += self.ki * e * dt
+            g = g + self.integral
+        g = g + self.kp * e
+        return _normalize(q + _rate(q, *g) * dt)
+
+
+def make_bank(method="madgwick", n=NUM_MPUS, beta=0.1, kp=1.0, ki=0.0, yaw_gain=0.0, yaw_offsets=0.0):
+    if method == "madgwick":
+        return MadgwickBank(n, beta, yaw_gain, yaw_offsets)
+    if method == "mahony":
+        return MahonyBank(n, kp, ki, yaw_gain, yaw_offsets)
+    raise ValueError(f"unknown fusion method {method!r}, expected one of {METHODS}")
+
+
+# ---------- raw frames ----------
+class Fusion:
+    """Filters RAW_FRAME_DTYPE records into the 11 quaternions of a frame:
+    index 0 the BNO055 wrist as sent, 1..10 the fused MPUs. The wrist is the
+    heading reference; yaw_gain=0 turns the correction off."""
+
+    def __init__(self, method="madgwick", beta=0.1, kp=1.0, ki=0.0, yaw_gain=0.2, yaw_offsets=0.0,
+                 rate_hz=600.0, max_dt=0.1):
+        self.bank = make_bank(method, NUM_MPUS, beta, kp, ki, yaw_gain, yaw_offsets)
+        self.method = method
+        self.rate_hz = rate_hz
+        self.max_dt = max_dt
+        self._last_ts = None
+        self.frames = 0
+        self.seconds = 0.0             # time spent filtering
+
+    def reset(self):
+        self.bank.reset()
+        self._last_ts = None
+
+    def dt(self, esp_ts):
+        """Sample intervals from the ESP's micros() (wrapping at 2^32)."""
+        ts = np.asarray(esp_ts, dtype=np.int64)
+        prev = np.concatenate(([ts[0] if self._last_ts is None else self._last_ts], ts[:-1]))
+        dt = ((ts - prev) % (1 << 32)) * 1e-6
+        if self._last_ts is None:
+            dt[0] = 1.0 / self.rate_hz
+        self._last_ts = int(ts[-1])
+        # a stall or a reboot: do not integrate across it
+        return np.where((dt > 0) & (dt <= self.max_dt), dt, 1.0 / self.rate_hz)
+
+    def update(self, frames):
+        """(T,) raw records -> quaternions (T, 11, 4)."""
+        t0 = time.perf_counter()
+        frames = np.asarray(frames).reshape(-1)
+        wrist = qm.normalize(frames["quat"])
+        fused = self.bank.update(frames["gyro"], frames["accel"], self.dt(frames["esp_ts"]), wrist)
+        out = np.concatenate([wrist[:, None], fused], axis=1)
+        self.frames += len(frames)
+        self.seconds += time.perf_counter() - t0
+        return out
+
+    def to_frames(self, raw):
+        """Raw records -> FRAME_DTYPE records with the fused quaternions."""
+        out = np.empty(len(raw), dtype=FRAME_DTYPE)
+        out["seq"] = raw["seq"]
+        out["esp_ts"] = raw["esp_ts"]
+        out["calib"] = raw["calib"]
+        out["quat"] = self.update(raw)
+        return out
+
+
+class FusionDecoder:
+    """Raw-mode bytes in, FRAME_DTYPE frames out (same interface as
+    BinaryDecoder). The raw records stay available in self.raw.ring."""
+
+    def __init__(self, method="madgwick", capacity=4096, **fusion_args):
+        self.raw = RawDecoder(capacity)
+        self.fusion = Fusion(method, **fusion_args)
+        self.ring = FrameRing(FRAME_DTYPE, capacity)
+
+    def read_from(self, ser):
+        waiting = ser.in_waiting
+        if not waiting:
+            return 0
+        return self.feed(ser.read(waiting))
+
+    def feed(self, data, t=None):
+        n = self.raw.feed(data, t)
+        if n:
+            raw, ts = self.raw.ring.latest(n)
+            self.ring.push(self.fusion.to_frames(raw), ts)
+        return n
+
+    def stats(self):
+        s = self.raw.stats()
+        f = self.fusion
+        s["fusion_us_per_frame"] = f.seconds / f.frames * 1e6 if f.frames else 0.0
+        return s
+
+
+def convert_session(src, dst, method="madgwick", **fusion_args):
+    """Filter a raw-layout recording into a binary-layout one. Returns the
+    Fusion, e.g. for its timing."""
+    from halo.session import SessionReader, SessionWriter
+
+    reader = SessionReader(src)
+    if reader.layout != "raw":
+        raise ValueError(f"{src}: layout {reader.layout!r}, expected raw")
+    fusion = Fusion(method, **fusion_args)
+    with SessionWriter(dst, "binary", source=f"fusion:{method}:{src}") as writer:
+        for recs in reader.chunks():
+            writer.write(fusion.to_frames(recs["frame"]), recs["t"])
+    return fusion
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Host-side MPU fusion for raw-mode glove data")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    conv = sub.add_parser("convert")
+    conv.add_argument("src")
+    conv.add_argument("dst")
+    conv.add_argument("--method", default="madgwick", choices=METHODS)
+    conv.add_argument("--beta", type=float, default=0.1)
+    conv.add_argument("--kp", type=float, default=1.0)
+    conv.add_argument("--ki", type=float, default=0.0)
+    conv.add_argument("--yaw-gain", type=float, default=0.2, help="BNO heading correction, 0 = off")
+    args = ap.parse_args(argv)
+
+    fusion = convert_session(args.src, args.dst, args.method, beta=args.beta, kp=args.kp, ki=args.ki,
+                             yaw_gain=args.yaw_gain)
+    print(f"{fusion.frames} frames -> {args.dst}, {fusion.seconds / max(fusion.frames, 1) * 1e6:.1f} us/frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# Hand kinematics over all 11 IMUs, batched over frames.
+#
+# Sensors are in the fingerNames order of Website/main.js: index 0 is the
+# wrist BNO055, then bone 1 / bone 2 of pointer, middle, ring, pinky, thumb.
+# Each finger's bone 1 sits on the palm at FINGER_BASE (a fixed rotation from
+# the wrist frame) and turns about it by
+#   bone1 = wrist * base * Rz(mcp_abd) * Ry(mcp_flex)
+#   bone2 = bone1 * Ry(pip_flex)
+# so joint_angles() recovers (mcp_flex, mcp_abd, pip_flex) per finger, the 15
+# joint values GloveMLP predicts, and bone_quats() is its inverse. The
+# distal joint has no IMU; DIP is taken as DIP_RATIO * PIP for fingertip
+# positions. Bones point along their local x axis, flexion turns them towards
+# the palm (-z of the wrist frame); the world is z up, lengths in cm.
+#
+#   p = pose(q)                  # q (N, 11, 4) from the decoder / synth
+#   p["joints"]                  # (N, 15)
+#   p["positions"]               # (N, 5, 4, 3): knuckle, PIP, DIP, tip
+#   axis, up, pos = bone_boxes(q, p["joints"])   # VPython boxes, (N, 15, 3)
+#
+# Training labels from a recorded session (binary layout, all 11 IMUs):
+#   python -m halo.kinematics labels glove.halo -o joint_outputs.npy
+
+import argparse
+import numpy as np
+
+from halo import quat_math as qm
+
+FINGERS = ["pointer", "middle", "ring", "pinky", "thumb"]
+JOINT_NAMES = [f"{f}_{j}" for f in FINGERS for j in ("mcp_flex", "mcp_abd", "pip_flex")]
+FLEX_AXIS = np.array([0.0, 1.0, 0.0])
+ABD_AXIS = np.array([0.0, 0.0, 1.0])
+DIP_RATIO = 2.0 / 3.0
+
+# palm: knuckle positions in the wrist frame and the bone 1 rest rotations
+# (slight fan of the fingers; the thumb turned under the palm)
+KNUCKLES = np.array([[8.0, 2.4, 0.0], [8.3, 0.8, 0.0], [8.0, -0.8, 0.0], [7.4, -2.4, 0.0], [2.5, 3.0, -1.0]])
+FINGER_BASE = qm.mul(qm.axis_angle(ABD_AXIS, np.radians([8, 0, -8, -16, 45])),
+                     qm.axis_angle([1, 0, 0], np.radians([0, 0, 0, 0, -60])))
+# proximal, middle, distal phalanx (the thumb's two IMU bones are its
+# proximal and distal phalanx)
+PHALANX = np.array([[4.0, 2.4, 1.8], [4.5, 2.8, 1.9], [4.2, 2.7, 1.9], [3.4, 2.0, 1.7], [3.2, 2.8, 0.0]])
+
+
+def _split(q):
+    q = np.asarray(q, dtype=np.float64)
+    return q[..., 0, :], q[..., 1::2, :], q[..., 2::2, :]
+
+
+def relative_rotations(q):
+    """(..., 11, 4) sensor quaternions -> (..., 5, 2, 4): bone 1 relative to
+    its rest pose on the wrist, bone 2 relative to bone 1."""
+    wrist, b1, b2 = _split(q)
+    rest = qm.mul(wrist[..., None, :], FINGER_BASE)
+    return np.stack([qm.mul(qm.conj(rest), b1), qm.mul(qm.conj(b1), b2)], axis=-2)
+
+
+def _flex_abd(r):
+    # r = Rz(abd) Ry(flex) (twist about the bone discarded), from the matrix
+    # entries R20 = -sin(flex), R22 = cos(flex), R01 = -sin(abd), R11 = cos(abd)
+    w, x, y, z = np.moveaxis(r, -1, 0)
+    flex = np.arctan2(-2 * (x * z - w * y), 1 - 2 * (x * x + y * y))
+    abd = np.arctan2(-2 * (x * y - w * z), 1 - 2 * (x * x + z * z))
+    return flex, abd
+
+
+def joint_angles(q, relative=None):
+    """(..., 11, 4) -> (..., 15) radians in JOINT_NAMES order."""
+    rel = relative_rotations(q) if relative is None else relative
+    mcp_flex, mcp_abd = _flex_abd(rel[..., 0, :])
+    pip_flex, _ = _flex_abd(rel[..., 1, :])
+    return np.stack([mcp_flex, mcp_abd, pip_flex], axis=-1).reshape(rel.shape[:-3] + (15,))
+
+
+def bone_quats(wrist, joints):
+    """Inverse of joint_angles(): wrist (..., 4) and joints (..., 15) ->
+    all 11 sensor quaternions (..., 11, 4)."""
+    wrist = np.asarray(wrist, dtype=np.float64)
+    j = np.asarray(joints, dtype=np.float64).reshape(wrist.shape[:-1] + (5, 3))
+    rest = qm.mul(wrist[..., None, :], FINGER_BASE)
+    b1 = qm.mul(rest, qm.mul(qm.axis_angle(ABD_AXIS, j[..., 1]), qm.axis_angle(FLEX_AXIS, j[..., 0])))
+    b2 = qm.mul(b1, qm.axis_angle(FLEX_AXIS, j[..., 2]))
+    q = np.empty(wrist.shape[:-1] + (11, 4))
+    q[..., 0, :] = wrist
+    q[..., 1::2, :] = b1
+    q[..., 2::2, :] = b2
+    return q
+
+
+def _segments(q, joints):
+    # orientation of the proximal, middle and distal phalanx: (..., 5, 3, 4)
+    _, b1, b2 = _split(q)
+    dip = np.asarray(joints).reshape(joints.shape[:-1] + (5, 3))[..., 2] * DIP_RATIO
+    b3 = qm.mul(b2, qm.axis_angle(FLEX_AXIS, dip))
+    return np.stack([b1, b2, b3], axis=-2)
+
+
+def positions(q, joints=None, origin=(0.0, 0.0, 0.0)):
+    """Joint positions (..., 5, 4, 3): knuckle, PIP, DIP and fingertip of each
+    finger, with the wrist sensor at origin."""
+    q = np.asarray(q, dtype=np.float64)
+    joints = joint_angles(q) if joints is None else np.asarray(joints)
+    seg = _segments(q, joints)
+    knuckle = qm.rotate(q[..., 0:1, :], KNUCKLES) + np.asarray(origin, dtype=np.float64)
+    steps = qm.rotate(seg, PHALANX[..., None] * np.array([1.0, 0.0, 0.0]))      # (..., 5, 3, 3)
+    return np.concatenate([knuckle[..., None, :], knuckle[..., None, :] + np.cumsum(steps, axis=-2)], axis=-2)
+
+
+def pose(q, origin=(0.0, 0.0, 0.0)):
+    """Everything for N frames at once: relative bone rotations, the 15 joint
+    angles and the joint positions."""
+    q = qm.normalize(q)
+    rel = relative_rotations(q)
+    joints = joint_angles(q, rel)
+    return {"relative": rel, "joints": joints, "positions": positions(q, joints, origin)}
+
+
+def bone_boxes(q, joints=None, origin=(0.0, 0.0, 0.0)):
+    """(axis, up, pos) of the 15 phalanx boxes, (..., 15, 3) each, in
+    pointer .. thumb order (proximal, middle, distal): axis spans the bone,
+    up is the bone's z axis, pos is its centre."""
+    q = qm.normalize(q)
+    joints = joint_angles(q) if joints is None else np.asarray(joints)
+    p = positions(q, joints, origin)
+    axis = p[..., 1:, :] - p[..., :-1, :]
+    centre = (p[..., 1:, :] + p[..., :-1, :]) / 2
+    up = qm.rotate(_segments(q, joints), np.array([0.0, 0.0, 1.0]))
+    shape = axis.shape[:-3] + (15, 3)
+    return axis.reshape(shape), up.reshape(shape), centre.reshape(shape)
+
+
+def session_labels(path, calibration=None):
+    """(t, joints (N, 15)) for every frame of a binary-layout .halo session.
+    With a halo.calibration.Calibration, its reference pose is taken as the
+    model's rest pose (flat hand, all joints 0): calibrated sensors read
+    identity there and are rotated onto the rest bones."""
+    from halo.session import SessionReader
+
+    reader = SessionReader(path)
+    if reader.layout != "binary":
+        raise ValueError(f"{path}: layout {reader.layout!r} has no finger quaternions")
+    recs = reader.read()
+    q = np.asarray(recs["frame"]["quat"], dtype=np.float64)
+    if calibration is not None:
+        q = qm.mul(calibration.apply(q), bone_quats(np.array([1.0, 0.0, 0.0, 0.0]), np.zeros(15)))
+    return recs["t"], joint_angles(qm.normalize(q))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Joint-angle labels from recorded glove sessions")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    lab = sub.add_parser("labels")
+    lab.add_argument("session")
+    lab.add_argument("-o", "--out", default="joint_outputs.npy")
+    lab.add_argument("--glove", help="apply this glove's saved calibration first")
+    args = ap.parse_args(argv)
+
+    cal = None
+    if args.glove:
+        from halo.calibration import load_calibration
+        cal = load_calibration(args.glove)
+    t, joints = session_labels(args.session, cal)
+    np.save(args.out, joints.astype(np.float32))
+    deg = np.degrees(joints)
+    print(f"saved {args.out} {joints.shape}, {t[-1] - t[0]:.1f} s")
+    for k, name in enumerate(JOINT_NAMES):
+        print(f"  {name:<18} {deg[:, k].min():7.1f} .. {deg[:, k].max():6.1f} deg")
+
+
+if __name__ == "__main__":
+    main()
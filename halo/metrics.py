@@ -0,0 +1,292 @@
+# Timing metrics for the host pipeline (read -> parse -> filter ->
+# inference / render).
+#
+# - Histogram: fixed log-spaced buckets (1 us .. ~16 s, 4 per octave), so
+#   recording is a bisect and a list increment; percentiles come from the
+#   buckets.
+# - Metrics: per-stage histograms plus "total" (arrival -> done), counters
+#   with rates, sequence gaps from `seq`, and the offset / delay jitter of
+#   the host clock against the ESP's `esp_ts`.
+# - Output: hud() one-liner, snapshot() dict, to_json(), to_prometheus(),
+#   serve(port) for a local HTTP endpoint (/metrics Prometheus text,
+#   /metrics.json) and start_dump(interval) for a periodic summary.
+#
+# All times are time.perf_counter() seconds.
+#
+#   m = Metrics()
+#   with m.stage("render"):
+#       ...
+#   m.done(t_arrival)                 # end-to-end for a frame read at t_arrival
+#   m.seq(frames["seq"]); m.esp_clock(frames["esp_ts"], t)
+
+import json
+import math
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+BUCKETS = [1e-6 * 2 ** (i / 4) for i in range(97)]      # 1 us .. 16.8 s
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)    # last one is +Inf
+        self.n = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, v):
+        self.counts[bisect_left(BUCKETS, v)] += 1
+        self.n += 1
+        self.sum += v
+        if v > self.max:
+            self.max = v
+
+    def record_many(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values) == 0:
+            return
+        idx = np.searchsorted(BUCKETS, values, side="left")
+        for i, c in zip(*np.unique(idx, return_counts=True)):
+            self.counts[i] += int(c)
+        self.n += len(values)
+        self.sum += float(values.sum())
+        self.max = max(self.max, float(values.max()))
+
+    def percentile(self, p):
+        if self.n == 0:
+            return 0.0
+        target = p / 100.0 * self.n
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target and c:
+                return min(BUCKETS[i] if i < len(BUCKETS) else self.max, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "n": self.n,
+            "mean_ms": self.sum / self.n * 1e3 if self.n else 0.0,
+            "p50_ms": self.percentile(50) * 1e3,
+            "p90_ms": self.percentile(90) * 1e3,
+            "p99_ms": self.percentile(99) * 1e3,
+            "max_ms": self.max * 1e3,
+        }
+
+
+class _Stage:
+    __slots__ = ("hist", "t0")
+
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.record(time.perf_counter() - self.t0)
+
+
+class Metrics:
+    def __init__(self, clock_window=2.0):
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self._rate_prev = {}           # name -> (t, count) at the last rates() call
+        self._rates = {}
+        # sequence gaps
+        self.last_seq = None
+        self.seq_frames = 0
+        self.seq_gaps = 0              # gap events
+        self.seq_lost = 0              # frames missing in those gaps
+        self.seq_resets = 0            # seq went backwards a lot (ESP reboot)
+        # ESP clock
+        self.clock_window = clock_window
+        self._esp_prev = None          # last raw esp_ts, for unwrapping
+        self._esp_wraps = 0
+        self._off_block = (None, math.inf, math.inf)   # (block start, this block min, previous block min)
+        self.clock_offset = None       # host - esp, seconds, minimum-delay estimate
+        self.esp_delay = Histogram()   # per-frame delay above that minimum (jitter)
+        self._lock = threading.Lock()
+
+    # ---------- recording ----------
+    def hist(self, name):
+        h = self.stages.get(name)
+        if h is None:
+            # inserts under the lock: snapshot() / to_prometheus() iterate the
+            # dicts from the HTTP thread
+            with self._lock:
+                h = self.stages.setdefault(name, Histogram())
+        return h
+
+    def observe(self, name, seconds):
+        self.hist(name).record(seconds)
+
+    def stage(self, name):
+        """Context manager timing one stage."""
+        return _Stage(self.hist(name))
+
+    def done(self, t_arrival, t_done=None):
+        """End-to-end latency of a frame that arrived at t_arrival."""
+        self.hist("total").record((time.perf_counter() if t_done is None else t_done) - t_arrival)
+
+    def count(self, name, n=1):
+        if name in self.counters:
+            self.counters[name] += n
+        else:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def seq(self, seqs, modulo=1 << 32):
+        """Sequence numbers of received frames, in order (scalar or array)."""
+        seqs = np.atleast_1d(np.asarray(seqs, dtype=np.int64))
+        if len(seqs) == 0:
+            return
+        prev = np.concatenate(([seqs[0] - 1 if self.last_seq is None else self.last_seq], seqs[:-1]))
+        gaps = (seqs - prev - 1) % modulo
+        resets = gaps > modulo // 2
+        gaps[resets] = 0
+        self.seq_resets += int(resets.sum())
+        self.seq_gaps += int((gaps > 0).sum())
+        self.seq_lost += int(gaps.sum())
+        self.seq_frames += len(seqs)
+        self.last_seq = int(seqs[-1])
+
+    def esp_clock(self, esp_ts, t_host, units=1e-6, wrap=1 << 32):
+        """ESP timestamps (µs by default, wrapping at 2^32) against host arrival
+        times. The offset is the minimum host - esp over the last clock_window
+        to 2 * clock_window seconds, i.e. the lowest-delay frames; each frame's
+        excess over it goes into the esp_delay histogram."""
+        esp = np.atleast_1d(np.asarray(esp_ts, dtype=np.int64))
+        t_host = np.broadcast_to(np.asarray(t_host, dtype=np.float64), esp.shape)
+        if len(esp) == 0:
+            return
+        prev = np.concatenate(([esp[0] if self._esp_prev is None else self._esp_prev], esp[:-1]))
+        wraps = self._esp_wraps + np.cumsum(esp < prev - wrap // 2)
+        self._esp_wraps = int(wraps[-1])
+        self._esp_prev = int(esp[-1])
+        offsets = t_host - (esp + wraps * wrap) * units
+
+        start, cur, previous = self._off_block
+        now = float(t_host[-1])
+        if start is None:
+            start = now
+        elif now - start > self.clock_window:
+            start, previous, cur = now, cur, math.inf
+        cur = min(cur, float(offsets.min()))
+        self._off_block = (start, cur, previous)
+        self.clock_offset = min(cur, previous)
+        self.esp_delay.record_many(offsets - self.clock_offset)
+
+    # ---------- reporting ----------
+    def rates(self):
+        """Per-second rate of each counter since the previous call."""
+        now = time.perf_counter()
+        for name, n in list(self.counters.items()):
+            t0, n0 = self._rate_prev.get(name, (self.start, 0))
+            if now - t0 >= 0.5:
+                self._rates[name] = (n - n0) / (now - t0)
+                self._rate_prev[name] = (now, n)
+        return dict(self._rates)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "uptime_s": time.perf_counter() - self.start,
+                "stages": {k: h.summary() for k, h in self.stages.items()},
+                "counters": dict(self.counters),
+                "rates": self.rates(),
+                "seq": {"frames": self.seq_frames, "gaps": self.seq_gaps, "lost": self.seq_lost,
+                        "resets": self.seq_resets},
+                "clock": {"offset_s": self.clock_offset, "delay": self.esp_delay.summary()},
+            }
+
+    def hud(self):
+        parts = []
+        for name, h in list(self.stages.items()):
+            if h.n:
+                parts.append(f"{name} {h.percentile(50)*1e3:.1f}/{h.percentile(99)*1e3:.1f}")
+        line = "ms p50/p99: " + "  ".join(parts) if parts else "no timings yet"
+        rates = self.rates()
+        if rates:
+            line += "  |  " + "  ".join(f"{k} {v:.0f}/s" for k, v in rates.items())
+        if self.seq_frames:
+            line += f"  |  lost {self.seq_lost} in {self.seq_gaps} gaps"
+        if self.clock_offset is not None and self.esp_delay.n:
+            line += f"  |  esp jitter p99 {self.esp_delay.percentile(99)*1e3:.1f} ms"
+        return line
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=1)
+
+    def to_prometheus(self, prefix="halo"):
+        out = []
+        with self._lock:
+            for name, h in self.stages.items():
+                metric = f"{prefix}_{name}_seconds"
+                out.append(f"# TYPE {metric} histogram")
+                cum = 0
+                for edge, c in zip(BUCKETS, h.counts):
+                    cum += c
+                    out.append(f'{metric}_bucket{{le="{edge:.6g}"}} {cum}')
+                out.append(f'{metric}_bucket{{le="+Inf"}} {h.n}')
+                out.append(f"{metric}_sum {h.sum:.9g}")
+                out.append(f"{metric}_count {h.n}")
+            for name, n in self.counters.items():
+                out.append(f"# TYPE {prefix}_{name}_total counter")
+                out.append(f"{prefix}_{name}_total {n}")
+            out.append(f"# TYPE {prefix}_seq_lost_total counter")
+            out.append(f"{prefix}_seq_lost_total {self.seq_lost}")
+            out.append(f"# TYPE {prefix}_seq_gaps_total counter")
+            out.append(f"{prefix}_seq_gaps_total {self.seq_gaps}")
+            if self.clock_offset is not None:
+                out.append(f"# TYPE {prefix}_esp_clock_offset_seconds gauge")
+                out.append(f"{prefix}_esp_clock_offset_seconds {self.clock_offset:.9g}")
+                out.append(f"# TYPE {prefix}_esp_delay_p99_seconds gauge")
+                out.append(f"{prefix}_esp_delay_p99_seconds {self.esp_delay.percentile(99):.9g}")
+        return "\n".join(out) + "\n"
+
+    # ---------- endpoints ----------
+    def serve(self, port=9109, host="127.0.0.1"):
+        """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body, ctype = metrics.to_json().encode(), "application/json"
+                elif self.path.startswith("/metrics"):
+                    body, ctype = metrics.to_prometheus().encode(), "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+    def start_dump(self, interval=10.0, path=None, log=print):
+        """Every `interval` s print hud() (or append a JSON snapshot line to path)."""
+        def run():
+            while True:
+                time.sleep(interval)
+                if path is None:
+                    log("[metrics]", self.hud())
+                else:
+                    with open(path, "a") as f:
+                        f.write(json.dumps(self.snapshot()) + "\n")
+        t = threading.Thread(target=run, name="metrics-dump", daemon=True)
+        t.start()
+        return t
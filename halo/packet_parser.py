@@ -0,0 +1,228 @@
+# Block parser for the glove's ASCII serial stream.
+#
+# Instead of readline() + split(',') + float() per field, raw bytes are read
+# straight from the port into a preallocated buffer and every complete line in
+# that buffer is converted with one numpy call. Decoded frames land in a
+# preallocated ring of structured records (one dtype per layout).
+#
+# This is not allocation-free: each block is copied out of the buffer (plus
+# the prefix / newline replaces, and np.fromstring's output and the line-count
+# temporaries). np.fromstring's float parsing dominates, so the gain over
+# split/float is modest: ~1.1-1.4x, 1.6-4.1 us/frame on the synthetic captures
+# of benchmarks/bench_packet_parser.py. The win is mainly fewer Python-level
+# calls per frame and frames arriving as one array.
+#
+# Known layouts (see the .ino files and the viewers):
+#   euler_imu : "imu:" + BNO euler(3) + 8 x MPU roll/pitch/yaw    (wrist_and_fingers.ino)
+#   quat14    : BNO quat(4), MPU1 rpy(3), MPU2 rpy(3), calib(4)   (test2_2mpu_bno_sameRollYaw.py)
+#   quat11    : BNO quat(4), MPU rpy(3), calib(4)                 (test_bno_and_mpu.py)
+#   newmlp33  : 11 sensors x 3 values                             (MLP/NewMLP)
+#   quat4     : BNO quat(4) only                                  (only_bno.py)
+
+import time
+import warnings
+import numpy as np
+
+f4 = np.float32
+
+
+class Layout:
+    def __init__(self, name, fields, prefix=b""):
+        self.name = name
+        self.prefix = prefix
+        self.dtype = np.dtype(fields)
+        self.n_fields = self.dtype.itemsize // 4
+
+
+LAYOUTS = {
+    "euler_imu": Layout("euler_imu", [("bno_euler", f4, 3), ("mpu_rpy", f4, (8, 3))], prefix=b"imu:"),
+    "quat14": Layout("quat14", [("quat", f4, 4), ("mpu1_rpy", f4, 3), ("mpu2_rpy", f4, 3), ("calib", f4, 4)]),
+    "quat11": Layout("quat11", [("quat", f4, 4), ("mpu_rpy", f4, 3), ("calib", f4, 4)]),
+    "newmlp33": Layout("newmlp33", [("sensors", f4, (11, 3))]),
+    "quat4": Layout("quat4", [("quat", f4, 4)]),
+}
+
+
+def detect_layout(line):
+    """Guess the layout of one raw line (bytes), or return None."""
+    line = line.strip()
+    for layout in LAYOUTS.values():
+        if layout.prefix and line.startswith(layout.prefix):
+            return layout
+    n = line.count(b",") + 1
+    for layout in LAYOUTS.values():
+        if not layout.prefix and layout.n_fields == n:
+            return layout
+    return None
+
+
+class FrameRing:
+    """Fixed-size ring of decoded frames (structured records + host timestamps)."""
+
+    def __init__(self, dtype, capacity=4096):
+        self.dtype = np.dtype(dtype)
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=self.dtype)
+        self.t = np.zeros(capacity, dtype=np.float64)
+        self.count = 0          # total frames ever written
+
+    def push(self, records, t):
+        n = len(records)
+        if n == 0:
+            return
+        if n > self.capacity:
+            records = records[-self.capacity:]
+            self.count += n - self.capacity
+            n = self.capacity
+        start = self.count % self.capacity
+        first = min(n, self.capacity - start)
+        self.data[start:start + first] = records[:first]
+        self.t[start:start + first] = t
+        if first < n:
+            self.data[:n - first] = records[first:]
+            self.t[:n - first] = t
+        self.count += n
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def latest(self, n=1):
+        """Return (records, t) of the newest n frames, oldest first (copies)."""
+        n = min(n, len(self))
+        idx = (np.arange(self.count - n, self.count)) % self.capacity
+        return self.data[idx], self.t[idx]
+
+    def since(self, count):
+        """Frames written after the absolute counter value `count`."""
+        n = min(self.count - count, len(self))
+        return self.latest(n) if n > 0 else (self.data[:0], self.t[:0])
+
+
+def as_rows(records):
+    """Flatten all-float32 records (the text layouts) to an (N, n_fields) array,
+    or to a 1-D row for a single record."""
+    arr = np.asarray(records)
+    if arr.ndim == 0:
+        return arr.reshape(1).view(np.float32)
+    return np.ascontiguousarray(arr).view(np.float32).reshape(len(arr), -1)
+
+
+class StreamParser:
+    """Reads raw serial bytes into a preallocated buffer and decodes whole
+    blocks of lines at once into a FrameRing.
+
+    layout may be a Layout, a key of LAYOUTS, or None to auto-detect it from
+    the first line that matches one of the known layouts.
+    """
+
+    def __init__(self, layout=None, capacity=4096, buf_size=1 << 16):
+        if isinstance(layout, str):
+            layout = LAYOUTS[layout]
+        self.buf = bytearray(buf_size)
+        self.view = memoryview(self.buf)
+        self.fill = 0
+        self.capacity = capacity
+        self.layout = None
+        self.ring = None
+        self.bad_lines = 0
+        self.overflows = 0
+        if layout is not None:
+            self._set_layout(layout)
+
+    def _set_layout(self, layout):
+        self.layout = layout
+        self.ring = FrameRing(layout.dtype, self.capacity)
+
+    # ---------- input ----------
+    def read_from(self, ser):
+        """Drain whatever the port has without blocking; returns frames decoded."""
+        waiting = ser.in_waiting
+        if waiting:
+            self._make_room(waiting)
+            n = ser.readinto(self.view[self.fill:self.fill + min(waiting, len(self.buf) - self.fill)])
+            self.fill += n or 0
+        return self.parse()
+
+    def feed(self, data, t=None):
+        """Append raw bytes (e.g. from a capture file) and decode; returns frames
+        decoded. t is the arrival time stamped on them (default: now)."""
+        total = 0
+        mv = memoryview(data)
+        while len(mv):
+            self._make_room(len(mv))
+            n = min(len(mv), len(self.buf) - self.fill)
+            self.buf[self.fill:self.fill + n] = mv[:n]
+            self.fill += n
+            mv = mv[n:]
+            total += self.parse(t)
+        return total
+
+    def _make_room(self, n):
+        if self.fill + n <= len(self.buf):
+            return
+        self.parse()
+        if self.fill + n > len(self.buf) and self.fill == len(self.buf):
+            # a full buffer without a newline is garbage; drop it
+            self.overflows += 1
+            self.fill = 0
+
+    # ---------- decode ----------
+    def parse(self, t=None):
+        end = self.buf.rfind(b"\n", 0, self.fill) + 1
+        if end == 0:
+            return 0
+        block = bytes(self.view[:end])
+        rest = self.fill - end
+        self.buf[:rest] = self.view[end:self.fill]
+        self.fill = rest
+
+        if self.layout is None:
+            for line in block.split(b"\n"):
+                layout = detect_layout(line)
+                if layout is not None:
+                    self._set_layout(layout)
+                    break
+            else:
+                self.bad_lines += block.count(b"\n")
+                return 0
+
+        rows = self._decode_block(block)
+        self.ring.push(rows.view(self.layout.dtype).reshape(-1), time.perf_counter() if t is None else t)
+        return len(rows)
+
+    def _decode_block(self, block):
+        layout = self.layout
+        if layout.prefix:
+            block = block.replace(layout.prefix, b"")
+        raw = np.frombuffer(block, dtype=np.uint8)
+        nl = np.flatnonzero(raw == 10)
+        commas = np.cumsum(raw == 44)[nl]
+        per_line = np.diff(commas, prepend=0)
+        good = per_line == layout.n_fields - 1
+
+        if good.all():
+            with warnings.catch_warnings():
+                # numpy warns (rather than raises) on trailing garbage
+                warnings.simplefilter("error", DeprecationWarning)
+                try:
+                    vals = np.fromstring(block.replace(b"\n", b","), dtype=np.float32, sep=",")
+                    if vals.size == len(nl) * layout.n_fields:
+                        return vals.reshape(-1, layout.n_fields)
+                except (ValueError, DeprecationWarning):
+                    pass
+
+        # slow path: some lines are short, corrupt or debug prints
+        starts = np.concatenate(([0], nl[:-1] + 1))
+        rows = []
+        for s, e, ok in zip(starts, nl, good):
+            if not ok:
+                if e > s + 1:
+                    self.bad_lines += 1
+                continue
+            try:
+                rows.append(np.array(block[s:e].split(b","), dtype=np.float32))
+            except ValueError:
+                self.bad_lines += 1
+        if not rows:
+            return np.zeros((0, layout.n_fields), dtype=np.float32)
+        return np.stack(rows)
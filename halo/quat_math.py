@@ -0,0 +1,165 @@
+# Batched quaternion / orientation math for the viewers and models.
+#
+# Everything takes arrays with the quaternion (w, x, y, z) or vector in the
+# last axis and any number of leading axes, e.g. (frames, 11 IMUs, 4).
+# The Euler convention is the one the VPython scripts use:
+#   roll  = -atan2(2(q0q1 + q2q3), 1 - 2(q1^2 + q2^2))
+#   pitch =  asin(2(q0q2 - q3q1))       (clamped, anothertest.py style)
+#   yaw   = -atan2(2(q0q3 + q1q2), 1 - 2(q2^2 + q3^2))
+# and rpy_to_axis_up() matches the scripts' helper of the same name.
+
+import numpy as np
+
+
+def normalize(q, eps=1e-12):
+    q = np.asarray(q, dtype=np.float64)
+    n = np.linalg.norm(q, axis=-1, keepdims=True)
+    return q / np.maximum(n, eps)
+
+
+def conj(q):
+    q = np.asarray(q)
+    return q * np.array([1.0, -1.0, -1.0, -1.0])
+
+
+def mul(a, b):
+    """Hamilton product a * b, broadcasting over leading axes."""
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    aw, ax, ay, az = np.moveaxis(a, -1, 0)
+    bw, bx, by, bz = np.moveaxis(b, -1, 0)
+    return np.stack([
+        aw * bw - ax * bx - ay * by - az * bz,
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw,
+    ], axis=-1)
+
+
+def to_rpy(q):
+    """Quaternions -> (roll, pitch, yaw) in radians, viewer sign convention."""
+    q0, q1, q2, q3 = np.moveaxis(np.asarray(q, dtype=np.float64), -1, 0)
+    roll = -np.arctan2(2 * (q0 * q1 + q2 * q3), 1 - 2 * (q1 * q1 + q2 * q2))
+    # |value| can creep past 1 from rounding / unnormalised input
+    pitch = np.arcsin(np.clip(2 * (q0 * q2 - q3 * q1), -1.0, 1.0))
+    yaw = -np.arctan2(2 * (q0 * q3 + q1 * q2), 1 - 2 * (q2 * q2 + q3 * q3))
+    return roll, pitch, yaw
+
+
+def from_rpy(roll, pitch, yaw):
+    """Inverse of to_rpy() (same sign convention): radians -> (..., 4)."""
+    roll, pitch, yaw = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64) for a in (roll, pitch, yaw)))
+    # to_rpy() is the standard ZYX decomposition with roll and yaw negated
+    cr, sr = np.cos(-roll / 2), np.sin(-roll / 2)
+    cp, sp = np.cos(pitch / 2), np.sin(pitch / 2)
+    cy, sy = np.cos(-yaw / 2), np.sin(-yaw / 2)
+    return np.stack([
+        cr * cp * cy + sr * sp * sy,
+        sr * cp * cy - cr * sp * sy,
+        cr * sp * cy + sr * cp * sy,
+        cr * cp * sy - sr * sp * cy,
+    ], axis=-1)
+
+
+def axis_angle(axis, angle):
+    """Rotation of `angle` radians (...) about a unit axis (..., 3)."""
+    angle = np.asarray(angle, dtype=np.float64)[..., None]
+    axis = np.asarray(axis, dtype=np.float64)
+    axis = axis / np.linalg.norm(axis, axis=-1, keepdims=True)
+    v = axis * np.sin(angle / 2)
+    w = np.broadcast_to(np.cos(angle / 2), v.shape[:-1] + (1,))
+    return np.concatenate([w, v], axis=-1)
+
+
+def slerp(a, b, u, eps=1e-6):
+    """Spherical interpolation from a to b at fraction u (...), shortest
+    path; u outside [0, 1] extrapolates along the same arc. Nearly equal
+    pairs fall back to normalised lerp."""
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    u = np.asarray(u, dtype=np.float64)[..., None]
+    d = np.sum(a * b, axis=-1, keepdims=True)
+    b = np.where(d < 0, -b, b)
+    d = np.minimum(np.abs(d), 1.0)
+    theta = np.arccos(d)
+    s = np.sin(theta)
+    small = s < eps
+    s = np.where(small, 1.0, s)
+    wa = np.where(small, 1 - u, np.sin((1 - u) * theta) / s)
+    wb = np.where(small, u, np.sin(u * theta) / s)
+    return normalize(wa * a + wb * b)
+
+
+def rpy_to_axis_up(roll, pitch, yaw):
+    """Vectorised rpy_to_axis_up(): returns unit (axis, up), each (..., 3).
+
+    The scripts build the side vector as cross(k, y_up), which vanishes when
+    pitch is +-90 deg and leaves `up` undefined. Here the side vector is taken
+    from yaw alone, (-sin yaw, 0, cos yaw). For |pitch| < 90 deg (cos pitch
+    > 0, the range to_rpy() returns) it points the same way as the original;
+    for |pitch| > 90 deg it is flipped, and at the poles it stays valid.
+    """
+    roll, pitch, yaw = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64) for a in (roll, pitch, yaw)))
+    cp, sp = np.cos(pitch), np.sin(pitch)
+    cy, sy = np.cos(yaw), np.sin(yaw)
+    cr, sr = np.cos(roll), np.sin(roll)
+
+    k = np.stack([cy * cp, sp, sy * cp], axis=-1)
+    # v = cross(side, k) with side = (-sy, 0, cy); cross(k, v) is side again
+    up = np.stack([-cy * sp * cr - sy * sr, cp * cr, -sy * sp * cr + cy * sr], axis=-1)
+    return k, up
+
+
+def to_axis_up(q):
+    """Quaternions straight to VPython (axis, up) vectors."""
+    return rpy_to_axis_up(*to_rpy(q))
+
+
+def to_matrix(q):
+    """Quaternions -> rotation matrices (..., 3, 3)."""
+    w, x, y, z = np.moveaxis(normalize(q), -1, 0)
+    m = np.empty(w.shape + (3, 3))
+    m[..., 0, 0] = 1 - 2 * (y * y + z * z)
+    m[..., 0, 1] = 2 * (x * y - w * z)
+    m[..., 0, 2] = 2 * (x * z + w * y)
+    m[..., 1, 0] = 2 * (x * y + w * z)
+    m[..., 1, 1] = 1 - 2 * (x * x + z * z)
+    m[..., 1, 2] = 2 * (y * z - w * x)
+    m[..., 2, 0] = 2 * (x * z - w * y)
+    m[..., 2, 1] = 2 * (y * z + w * x)
+    m[..., 2, 2] = 1 - 2 * (x * x + y * y)
+    return m
+
+
+def rotate(q, v):
+    """Rotate vectors v (..., 3) by quaternions q (..., 4)."""
+    return np.einsum("...ij,...j->...i", to_matrix(q), v)
+
+
+def chain_centers(axes, lengths, origin=(0.0, 0.0, 0.0)):
+    """Centre positions of boxes chained end to end along their axes.
+
+    axes: (..., B, 3) unit axis per bone (bone 0 is the wrist, centred on
+    origin); lengths: (B,). Same placement as the viewers:
+        bone[i].pos = bone[i-1].pos + k[i-1] * (len[i-1]/2 + len[i]/2)
+    """
+    lengths = np.asarray(lengths, dtype=np.float64)
+    step = (lengths[:-1] + lengths[1:]) / 2.0
+    offsets = axes[..., :-1, :] * step[:, None]
+    pos = np.zeros(axes.shape)
+    pos[..., 1:, :] = np.cumsum(offsets, axis=-2)
+    return pos + np.asarray(origin, dtype=np.float64)
+
+
+def finger_pose(q_wrist, bends, lengths):
+    """The test2_2mpu_bno_sameRollYaw.py hand: wrist from the BNO quaternion,
+    finger bones inheriting the wrist's roll and yaw with their own bend as
+    pitch, chained from the wrist.
+
+    q_wrist: (N, 4); bends: (N, B) radians; lengths: (B + 1,) wrist first.
+    Returns axis, up, pos each (N, B + 1, 3).
+    """
+    roll, pitch, yaw = to_rpy(q_wrist)
+    pitches = np.concatenate([pitch[..., None], np.asarray(bends, dtype=np.float64)], axis=-1)
+    axis, up = rpy_to_axis_up(roll[..., None], pitches, yaw[..., None])
+    return axis, up, chain_centers(axis, lengths)
@@ -0,0 +1,250 @@
+# asyncio WebSocket relay: the Python replacement for Website/server.js.
+#
+# Same endpoints and messages as the Node server:
+#   /esp       the ESP32 pushes JSON frames (seq, esp_ts, wrist, fingers, ...)
+#   /browser   every browser gets each frame with "server_ts" (ms) appended,
+#              and {"type": "esp_status", "status": "disconnected"} when the
+#              ESP drops
+#   /calibration/<glove>.json   the saved halo.calibration file, which
+#              main.js loads at startup
+#   anything else is served as a static file from Website/
+#
+# Each ESP message is parsed once (to validate it) and encoded once; all
+# browsers are sent the same pre-encoded UTF-8 bytes as a text frame. Every
+# browser has its own bounded queue and sender task: when a client falls
+# behind, its oldest queued frames are dropped (latest frame wins) instead of
+# buffering without limit, and one slow tab no longer delays the others.
+# rate_cap optionally limits frames/s per client (frames in between are
+# superseded, not queued). Status messages are never dropped. Each browser
+# socket's kernel send buffer is kept small (sndbuf) so stale frames pile up
+# in neither the relay nor the OS.
+#
+#   python -m halo.relay [--port 3000] [--queue 4] [--rate-cap 60]
+
+import argparse
+import asyncio
+import json
+import mimetypes
+import os
+import socket
+import time
+from collections import deque
+
+from websockets.asyncio.server import serve
+from websockets.datastructures import Headers
+from websockets.exceptions import ConnectionClosed
+from websockets.http11 import Response
+
+from halo.calibration import CALIB_DIR
+
+WEBSITE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Website")
+DISCONNECT_NOTICE = json.dumps({"type": "esp_status", "status": "disconnected"}, separators=(",", ":")).encode()
+
+
+def stamp(msg, server_ts=None):
+    """Validate one ESP message and return it as bytes with server_ts added,
+    or None if it is not a JSON object. The original text is kept and the
+    field appended, so keys stay in the ESP's order (as JSON.stringify did)."""
+    try:
+        data = json.loads(msg)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    ts = int(time.time() * 1000) if server_ts is None else server_ts
+    if isinstance(msg, str):
+        msg = msg.encode()
+    body = msg.rstrip()
+    if not data or "server_ts" in data:
+        data["server_ts"] = ts
+        return json.dumps(data, separators=(",", ":")).encode()
+    return body[:-1] + b',"server_ts":%d}' % ts
+
+
+class BrowserClient:
+    def __init__(self, ws, queue_size=4, rate_cap=0.0):
+        self.ws = ws
+        self.frames = deque(maxlen=queue_size)   # full deque drops the oldest on append
+        self.control = deque()                   # status messages, never dropped
+        self.min_interval = 1.0 / rate_cap if rate_cap else 0.0
+        self.wakeup = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def offer(self, payload):
+        if len(self.frames) == self.frames.maxlen:
+            self.dropped += 1
+        self.frames.append(payload)
+        self.max_depth = max(self.max_depth, len(self.frames))
+        self.wakeup.set()
+
+    def notify(self, payload):
+        self.control.append(payload)
+        self.wakeup.set()
+
+    async def run(self):
+        try:
+            await self._send_loop()
+        except ConnectionClosed:
+            pass
+
+    async def _send_loop(self):
+        last = 0.0
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            while self.control:
+                await self.ws.send(self.control.popleft(), text=True)
+            if not self.frames:
+                continue
+            if self.min_interval:
+                wait = last + self.min_interval - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)     # newer frames replace queued ones meanwhile
+                # one frame per interval, the newest: the rest are stale
+                self.dropped += len(self.frames) - 1
+                frame = self.frames.pop()
+                self.frames.clear()
+                await self.ws.send(frame, text=True)
+                self.sent += 1
+            else:
+                while self.frames:
+                    await self.ws.send(self.frames.popleft(), text=True)
+                    self.sent += 1
+            last = time.monotonic()
+            if self.control:
+                self.wakeup.set()
+
+
+class Relay:
+    def __init__(self, queue_size=4, rate_cap=0.0, sndbuf=1 << 15, static_dir=WEBSITE_DIR, log=print,
+                 calib_dir=CALIB_DIR):
+        self.queue_size = queue_size
+        self.rate_cap = rate_cap
+        self.sndbuf = sndbuf
+        self.static_dir = os.path.abspath(static_dir) if static_dir else None
+        self.calib_dir = os.path.abspath(calib_dir) if calib_dir else None
+        self.log = log
+        self.clients = set()
+        self.esp_frames = 0
+        self.bad_frames = 0
+        self.dropped_closed = 0    # drops counted for clients that have since left
+        self.sent_closed = 0
+
+    # ---------- fan-out ----------
+    def publish(self, payload):
+        for c in self.clients:
+            c.offer(payload)
+
+    def stats(self):
+        return {
+            "esp_frames": self.esp_frames,
+            "bad_frames": self.bad_frames,
+            "browsers": len(self.clients),
+            "sent": self.sent_closed + sum(c.sent for c in self.clients),
+            "dropped": self.dropped_closed + sum(c.dropped for c in self.clients),
+            "max_depth": max((c.max_depth for c in self.clients), default=0),
+        }
+
+    # ---------- endpoints ----------
+    async def handle_esp(self, ws):
+        self.log("[Relay] ESP32 connected")
+        try:
+            async for msg in ws:
+                payload = stamp(msg)
+                if payload is None:
+                    self.bad_frames += 1
+                    continue
+                self.esp_frames += 1
+                self.publish(payload)
+        except ConnectionClosed:
+            pass
+        self.log("[Relay] ESP32 disconnected")
+        for c in self.clients:
+            c.notify(DISCONNECT_NOTICE)
+
+    async def handle_browser(self, ws):
+        client = BrowserClient(ws, self.queue_size, self.rate_cap)
+        sock = ws.transport.get_extra_info("socket")
+        if self.sndbuf and sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf)
+        self.clients.add(client)
+        self.log("[Relay] Browser connected")
+        sender = asyncio.create_task(client.run())
+        try:
+            await ws.wait_closed()
+        finally:
+            sender.cancel()
+            self.clients.discard(client)
+            self.sent_closed += client.sent
+            self.dropped_closed += client.dropped
+            self.log("[Relay] Browser disconnected")
+
+    async def handler(self, ws):
+        path = ws.request.path
+        if path == "/esp":
+            await self.handle_esp(ws)
+        elif path == "/browser":
+            await self.handle_browser(ws)
+
+    def process_request(self, ws, request):
+        if request.path in ("/esp", "/browser"):
+            return None
+        if request.path.startswith("/calibration/"):
+            return self.static_file(request.path[len("/calibration/"):], self.calib_dir)
+        return self.static_file(request.path)
+
+    def static_file(self, path, root=None):
+        root = root or self.static_dir
+        path = path.split("?", 1)[0].lstrip("/") or "index.html"
+        full = os.path.abspath(os.path.join(root or "", path))
+        if not root or not full.startswith(root + os.sep) or not os.path.isfile(full):
+            return Response(404, "Not Found", Headers([("Content-Length", "0")]), b"")
+        with open(full, "rb") as f:
+            body = f.read()
+        ctype = mimetypes.guess_type(full)[0] or "application/octet-stream"
+        return Response(200, "OK", Headers([("Content-Type", ctype), ("Content-Length", str(len(body)))]), body)
+
+    def serve(self, host="0.0.0.0", port=3000, **kw):
+        # small write buffer so a stalled browser blocks its own sender early
+        kw.setdefault("write_limit", 1 << 16)
+        return serve(self.handler, host, port, process_request=self.process_request,
+                     compression=None, **kw)
+
+
+def lan_addresses():
+    try:
+        return sorted({a[4][0] for a in socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET)
+                       if not a[4][0].startswith("127.")})
+    except socket.gaierror:
+        return []
+
+
+async def run(port=3000, queue_size=4, rate_cap=0.0, sndbuf=1 << 15, stats_every=10.0):
+    relay = Relay(queue_size, rate_cap, sndbuf)
+    async with relay.serve(port=port):
+        print(f"[Relay] Running at http://localhost:{port}/index.html")
+        for addr in lan_addresses():
+            print(f"  LAN: http://{addr}:{port}/index.html")
+        while True:
+            await asyncio.sleep(stats_every)
+            print("[Relay]", "  ".join(f"{k}={v}" for k, v in relay.stats().items()))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="HALO WebSocket relay (/esp -> /browser)")
+    ap.add_argument("--port", type=int, default=3000)
+    ap.add_argument("--queue", type=int, default=4, help="frames queued per browser (latest wins)")
+    ap.add_argument("--rate-cap", type=float, default=0.0, help="max frames/s per browser, 0 = none")
+    ap.add_argument("--sndbuf", type=int, default=1 << 15, help="kernel send buffer per browser, 0 = OS default")
+    ap.add_argument("--stats-every", type=float, default=10.0)
+    args = ap.parse_args(argv)
+    try:
+        asyncio.run(run(args.port, args.queue, args.rate_cap, args.sndbuf, args.stats_every))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
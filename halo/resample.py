@@ -0,0 +1,375 @@
+# Timestamp alignment: irregular glove samples onto a fixed clock.
+#
+# The sensors of one frame are not sampled together. The ESP32 stamps a frame
+# with micros() and then reads the BNO055 and the 10 MPUs one after the other
+# behind the two TCA9548A muxes (binary_serial_stream.ino), so the last MPU
+# is several ms younger than the wrist; serial / WebSocket delivery adds host
+# jitter on top. The models (NewMLP windows, MLP.py) assume evenly spaced
+# frames, so everything is put on one clock here.
+#
+# - Resampler: per-sensor timestamps in, frames at k / rate_hz out. Quaternion
+#   channels are slerped, scalar channels interpolated linearly (optionally
+#   on the circle, for angles), all sensors and output ticks of a block in one
+#   batched call. Only a bounded look-behind (capacity frames / lookbehind
+#   seconds) is kept.
+#     mode="accuracy": a tick is emitted once every sensor has a sample past
+#       it, i.e. pure interpolation; the output trails the newest frame by
+#       about one frame period plus the read skew.
+#     mode="latency": ticks go up to the newest sample; sensors that have not
+#       reached the tick yet are extrapolated from their last two samples
+#       (by at most max_extrapolate seconds).
+#   A step back in time (ESP reboot) or a gap over max_gap restarts the clock.
+# - FrameResampler: the same over decoder records of any session layout.
+#   With esp_ts (binary / raw) the ESP clock plus the read order offsets
+#   (read_offsets()) give the per-sensor times and the host arrival time is
+#   carried as a channel; ASCII layouts use the host time.
+#
+#   rs = FrameResampler("binary", 200)
+#   frames, t = rs.push(*decoder.ring.latest(n))      # live, any block size
+#
+# Resample a recording for training:
+#   python -m halo.resample session glove.halo glove_200hz.halo --rate 200
+
+import argparse
+import numpy as np
+
+from halo import quat_math as qm
+from halo.binary_protocol import NUM_MPUS
+from halo.session import frame_dtype
+
+MODES = ("accuracy", "latency")
+
+# One loop of the sketch at 400 kHz I2C: BNO055 getQuat + getCalibration,
+# then per MPU tcaSelect + getMotion6. Estimates; measure your glove (scope on
+# SDA, or micros() around the reads) and pass read_offsets(...) if they differ.
+BNO_READ_US = 700
+MPU_READ_US = 450
+
+
+def read_offsets(bno_us=BNO_READ_US, mpu_us=MPU_READ_US, n_mpus=NUM_MPUS):
+    """Sample instant of the wrist and each MPU after the frame's esp_ts, in
+    seconds (1 + n_mpus,): the middle of each read, in read order."""
+    mid = np.concatenate(([bno_us / 2], bno_us + (np.arange(n_mpus) + 0.5) * mpu_us))
+    return mid * 1e-6
+
+
+class EspClock:
+    """Unwraps the ESP's 32-bit micros() into seconds."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._last = None
+        self._us = 0
+
+    def seconds(self, esp_ts):
+        ts = np.asarray(esp_ts, dtype=np.int64)
+        if self._last is None:
+            self._last = self._us = int(ts[0])
+        prev = np.concatenate(([self._last], ts[:-1]))
+        us = self._us + np.cumsum((ts - prev) % (1 << 32))
+        self._last, self._us = int(ts[-1]), int(us[-1])
+        return us * 1e-6
+
+
+class Resampler:
+    """Per-sensor timestamped samples in, frames on a fixed clock out.
+
+    quat_sensor / scalar_sensor give the sensor (timestamp column) of each
+    quaternion / scalar channel, default all 0. periodic: per scalar channel
+    period (e.g. 360 for degrees), 0 or None for plain values."""
+
+    def __init__(self, rate_hz, n_quats=0, n_scalars=0, quat_sensor=None, scalar_sensor=None, periodic=None,
+                 mode="accuracy", capacity=256, lookbehind=0.5, max_extrapolate=0.02, max_gap=0.25):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        self.rate_hz = float(rate_hz)
+        self.mode = mode
+        self.qs = np.zeros(n_quats, dtype=np.intp) if quat_sensor is None else np.asarray(quat_sensor, dtype=np.intp)
+        self.ss = np.zeros(n_scalars, dtype=np.intp) if scalar_sensor is None else np.asarray(scalar_sensor, dtype=np.intp)
+        self.n_sensors = int(max(self.qs.max(initial=0), self.ss.max(initial=0))) + 1
+        self.period = np.broadcast_to(np.asarray(0.0 if periodic is None else periodic, dtype=np.float64),
+                                      (n_scalars,)).copy()
+        self.capacity = max(int(capacity), 2)
+        self.lookbehind = lookbehind
+        self.max_extrapolate = max_extrapolate
+        self.max_gap = max_gap
+        self._t = np.empty((self.capacity, self.n_sensors))
+        self._q = np.empty((self.capacity, n_quats, 4))
+        self._s = np.empty((self.capacity, n_scalars))
+        self.frames_in = self.ticks = self.late = self.extrapolated = self.restarts = 0
+        self.delay_sum = 0.0
+        self.reset()
+
+    def reset(self):
+        """Forget the buffer; the clock restarts at the next sample."""
+        self._n = 0
+        self._k = None
+
+    def stats(self):
+        return {"frames_in": self.frames_in, "ticks": self.ticks, "late": self.late,
+                "extrapolated": self.extrapolated, "restarts": self.restarts,
+                "delay_ms": self.delay_sum / self.ticks * 1e3 if self.ticks else 0.0}
+
+    def push(self, t, quats=None, scalars=None):
+        """t: (T,) or (T, n_sensors) seconds; quats (T, Q, 4); scalars (T, C).
+        Returns (ticks (M,), quats (M, Q, 4), scalars (M, C)) for every tick
+        that became due."""
+        t = np.asarray(t, dtype=np.float64)
+        t = np.broadcast_to(t.reshape(len(t), -1), (len(t), self.n_sensors))
+        q = np.zeros((len(t), len(self.qs), 4)) if quats is None else np.asarray(quats).reshape(len(t), -1, 4)
+        s = np.zeros((len(t), len(self.ss))) if scalars is None else np.asarray(scalars).reshape(len(t), -1)
+        self.frames_in += len(t)
+
+        # split at discontinuities (time going back, or a gap the clock should
+        # not bridge) and into pieces that fit the look-behind buffer
+        prev = np.concatenate((self._t[self._n - 1:self._n] if self._n else t[:1], t[:-1]))
+        step = t - prev
+        cut = np.flatnonzero((step < 0).any(axis=1) | (step > self.max_gap).any(axis=1))
+        piece = self.capacity // 2
+        out = []
+        lo = 0
+        for c in list(cut) + [len(t)]:
+            for a in range(lo, c, piece):
+                b = min(a + piece, c)
+                self._append(t[a:b], q[a:b], s[a:b])
+                out.append(self._emit())
+            if c < len(t):
+                self.restarts += 1
+                self.reset()
+            lo = c
+        if len(out) == 1:
+            return out[0]
+        if not out:
+            return self._empty()
+        return tuple(np.concatenate(parts) for parts in zip(*out))
+
+    def _empty(self):
+        return np.zeros(0), np.zeros((0, len(self.qs), 4)), np.zeros((0, len(self.ss)))
+
+    def _append(self, t, q, s):
+        n, cap = self._n, self.capacity
+        if n + len(t) > cap:
+            keep = cap - len(t)
+            self._drop(n - keep)
+            n = self._n
+        self._t[n:n + len(t)] = t
+        self._q[n:n + len(t)] = q
+        self._s[n:n + len(t)] = s
+        self._n = n + len(t)
+        if self._k is None:
+            self._k = int(np.ceil(self._t[0].max() * self.rate_hz - 1e-9))
+
+    def _drop(self, m):
+        if m <= 0:
+            return
+        n = self._n
+        self._t[:n - m] = self._t[m:n]
+        self._q[:n - m] = self._q[m:n]
+        self._s[:n - m] = self._s[m:n]
+        self._n = n - m
+
+    def _emit(self):
+        n = self._n
+        tb = self._t[:n]
+        newest = tb[-1].max()
+        horizon = tb[-1].min() if self.mode == "accuracy" else newest
+        k_end = int(np.floor(horizon * self.rate_hz + 1e-9))
+        if k_end < self._k:
+            return self._empty()
+        ticks = np.arange(self._k, k_end + 1) / self.rate_hz
+        self._k = k_end + 1
+
+        # bracketing samples of every (tick, sensor) with one searchsorted:
+        # each sensor's column is shifted into its own range of a flat key
+        S = self.n_sensors
+        base = min(tb[0].min(), ticks[0])
+        width = max(newest, ticks[-1]) - base + 1.0
+        shift = width * np.arange(S)
+        keys = (tb - base + shift).T.ravel()
+        i = np.searchsorted(keys, ticks[:, None] - base + shift, side="right") - 1 - n * np.arange(S)
+        i0 = np.clip(i, 0, max(n - 2, 0))
+        i1 = np.minimum(i0 + 1, n - 1)
+        cols = np.arange(S)
+        t0, t1 = tb[i0, cols], tb[i1, cols]
+        span = t1 - t0
+        u = np.divide(ticks[:, None] - t0, span, out=np.zeros_like(span), where=span > 0)
+        u_max = 1.0 + np.divide(self.max_extrapolate, span, out=np.zeros_like(span), where=span > 0)
+        self.late += int((u < 0).any(axis=1).sum())
+        self.extrapolated += int((u > 1).any(axis=1).sum())
+        u = np.clip(u, 0.0, u_max)
+
+        qi = np.arange(len(self.qs))
+        qa = self._q[i0[:, self.qs], qi]
+        qb = self._q[i1[:, self.qs], qi]
+        quats = qm.slerp(qa, qb, u[:, self.qs])
+
+        si = np.arange(len(self.ss))
+        sa = self._s[i0[:, self.ss], si]
+        d = self._s[i1[:, self.ss], si] - sa
+        P = self.period
+        per = P > 0
+        if per.any():
+            half = np.where(per, P / 2, 0.0)
+            d = np.where(per, np.mod(d + half, np.where(per, P, 1.0)) - half, d)
+        scalars = sa + u[:, self.ss] * d
+        if per.any():
+            scalars = np.where(per, np.mod(scalars + half, np.where(per, P, 1.0)) - half, scalars)
+
+        self.ticks += len(ticks)
+        self.delay_sum += float((newest - ticks).sum())
+        self._trim(ticks[-1])
+        return ticks, quats, scalars
+
+    def _trim(self, last_tick):
+        # keep each sensor's last sample before the next tick, and no more
+        # than lookbehind seconds (at least two frames)
+        n = self._n
+        tb = self._t[:n]
+        next_tick = last_tick + 1.0 / self.rate_hz
+        needed = (tb <= next_tick).all(axis=1).sum() - 1
+        old = int((tb.max(axis=1) < tb[-1].max() - self.lookbehind).sum())
+        self._drop(min(max(needed, old, 0), n - 2))
+
+
+class FrameResampler:
+    """Resampler over decoder records of a session layout: push(frames, t)
+    with t the host arrival times returns resampled (frames, t). seq becomes
+    the tick index, esp_ts the tick time on the ESP clock."""
+
+    def __init__(self, layout, rate_hz, mode="accuracy", offsets=None, clock=None, **kw):
+        self.layout = layout
+        self.dtype = frame_dtype(layout)
+        names = self.dtype.names
+        self.clock = clock or ("esp" if "esp_ts" in names else "host")
+        if self.clock == "esp" and "esp_ts" not in names:
+            raise ValueError(f"layout {layout!r} has no esp_ts, use clock='host'")
+        self.esp = EspClock()
+        self.offsets = read_offsets() if offsets is None else np.asarray(offsets, dtype=np.float64)
+        n_slots = len(self.offsets)
+
+        # channel plan: (field, kind, sub-shape); a field over all 11 sensors
+        # starts at the wrist, a per-MPU field at slot 1
+        self.fields = []
+        quat_sensor, scalar_sensor, periodic = [], [], []
+        for name in names:
+            if name in ("seq", "esp_ts"):
+                continue
+            shape = self.dtype[name].shape
+            lead = shape[0] if len(shape) > 1 else 1
+            slots = np.arange(lead) + n_slots - lead if self.clock == "esp" and lead > 1 else np.zeros(lead, int)
+            if name == "quat" and shape[-1] == 4:
+                self.fields.append((name, "quat", shape))
+                quat_sensor += list(slots)
+            else:
+                size = int(np.prod(shape)) if shape else 1
+                self.fields.append((name, "scalar", shape))
+                scalar_sensor += list(np.repeat(slots, size // lead))
+                periodic += [360.0 if ("rpy" in name or "euler" in name) else 0.0] * size
+        if self.clock == "esp":
+            scalar_sensor.append(0)                     # host arrival time
+            periodic.append(0.0)
+        self.rs = Resampler(rate_hz, len(quat_sensor), len(scalar_sensor), quat_sensor, scalar_sensor, periodic,
+                            mode=mode, **kw)
+
+    def reset(self):
+        self.rs.reset()
+        self.esp.reset()
+
+    def stats(self):
+        return self.rs.stats()
+
+    def sensor_times(self, frames, t):
+        """(T, n_sensors) sample times in seconds."""
+        if self.clock == "host":
+            return np.asarray(t, dtype=np.float64)[:, None]
+        return self.esp.seconds(frames["esp_ts"])[:, None] + self.offsets[:self.rs.n_sensors]
+
+    def push(self, frames, t):
+        frames = np.asarray(frames).reshape(-1)
+        if not len(frames):
+            return np.zeros(0, dtype=self.dtype), np.zeros(0)
+        times = self.sensor_times(frames, t)
+        quats = [frames[name].reshape(len(frames), -1, 4) for name, kind, _ in self.fields if kind == "quat"]
+        scalars = [frames[name].reshape(len(frames), -1).astype(np.float64)
+                   for name, kind, _ in self.fields if kind == "scalar"]
+        if self.clock == "esp":
+            scalars.append(np.asarray(t, dtype=np.float64)[:, None])
+        q = np.concatenate(quats, axis=1) if quats else None
+        s = np.concatenate(scalars, axis=1) if scalars else None
+        ticks, q_out, s_out = self.rs.push(times, q, s)
+
+        out = np.zeros(len(ticks), dtype=self.dtype)
+        qi = si = 0
+        for name, kind, shape in self.fields:
+            if kind == "quat":
+                n = int(np.prod(shape[:-1])) if len(shape) > 1 else 1
+                out[name] = q_out[:, qi:qi + n].reshape((len(ticks),) + shape)
+                qi += n
+            else:
+                n = int(np.prod(shape)) if shape else 1
+                v = s_out[:, si:si + n].reshape((len(ticks),) + shape)
+                out[name] = np.rint(v) if np.issubdtype(self.dtype[name].base, np.integer) else v
+                si += n
+        if "seq" in self.dtype.names:
+            out["seq"] = np.rint(ticks * self.rs.rate_hz).astype(np.int64) % (1 << 32)
+        if "esp_ts" in self.dtype.names:
+            out["esp_ts"] = np.rint(ticks * 1e6).astype(np.int64) % (1 << 32)
+        t_out = s_out[:, -1] if self.clock == "esp" else ticks
+        return out, t_out
+
+
+def resample_session(src, dst, rate_hz, mode="accuracy", **kw):
+    """Write a copy of a recording on a fixed clock. Returns the
+    FrameResampler, e.g. for its stats()."""
+    from halo.session import SessionReader, SessionWriter
+
+    reader = SessionReader(src)
+    rs = FrameResampler(reader.layout, rate_hz, mode, **kw)
+    with SessionWriter(dst, reader.layout, source=f"resample:{rate_hz:g}:{src}") as writer:
+        for recs in reader.chunks():
+            frames, t = rs.push(recs["frame"], recs["t"])
+            if len(frames):
+                writer.write(frames, t)
+    return rs
+
+
+def spacing(t):
+    """(mean, std) of the sample intervals in ms."""
+    dt = np.diff(np.asarray(t, dtype=np.float64)) * 1e3
+    return (float(dt.mean()), float(dt.std())) if len(dt) else (0.0, 0.0)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Resample glove data onto a fixed clock")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ses = sub.add_parser("session")
+    ses.add_argument("src")
+    ses.add_argument("dst")
+    ses.add_argument("--rate", type=float, default=200.0)
+    ses.add_argument("--mode", default="accuracy", choices=MODES)
+    ses.add_argument("--clock", choices=("esp", "host"), help="default: esp when the layout has esp_ts")
+    ses.add_argument("--bno-us", type=float, default=BNO_READ_US, help="wrist read time per frame")
+    ses.add_argument("--mpu-us", type=float, default=MPU_READ_US, help="mux select + read time per MPU")
+    args = ap.parse_args(argv)
+
+    from halo.session import SessionReader
+
+    rs = resample_session(args.src, args.dst, args.rate, args.mode, clock=args.clock,
+                          offsets=read_offsets(args.bno_us, args.mpu_us))
+    rec_in, rec_out = SessionReader(args.src).read(), SessionReader(args.dst).read()
+    s = rs.stats()
+    print(f"{s['frames_in']} frames -> {s['ticks']} at {args.rate:g} Hz ({args.mode}, {rs.clock} clock) -> {args.dst}")
+    print("  host arrival spacing %.2f +- %.2f ms" % spacing(rec_in["t"]))
+    if rs.clock == "esp":
+        print("  esp_ts spacing %.2f +- %.2f ms -> %.2f +- %.2f ms"
+              % (spacing(EspClock().seconds(rec_in["frame"]["esp_ts"]))
+                 + spacing(EspClock().seconds(rec_out["frame"]["esp_ts"]))))
+    else:
+        print("  output spacing %.2f +- %.2f ms" % spacing(rec_out["t"]))
+    print(f"  late {s['late']}  extrapolated {s['extrapolated']}  restarts {s['restarts']}")
+
+
+if __name__ == "__main__":
+    main()
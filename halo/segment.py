@@ -0,0 +1,240 @@
+# Motion-triggered gesture segmentation.
+#
+# A gesture is the movement between two still poses, so instead of running
+# the classifier on every frame the stream is cut where the hand moves:
+#
+# - MotionEnergy: one cheap number per frame. For quaternions (binary frames,
+#   (T, 11, 4)) the mean angular speed over the sensors, taken over `span`
+#   seconds so single-frame noise does not dominate; for gyro (raw frames) the
+#   mean rate magnitude; for rows (NewMLP's newmlp33, any ASCII layout) the
+#   mean absolute rate of change per channel, wrapped at `period` for angles.
+# - MotionSegmenter: hysteresis on that energy. A segment starts once the
+#   energy stays above `on` for min_on seconds and ends once it stays below
+#   `off` for `hold` seconds; pre_roll frames before the trigger are included.
+#   Runs longer than max_len (a wave) are emitted as max_len windows every
+#   max_len / 2 while the motion goes on. The thresholding is vectorised over
+#   each block with the run lengths carried between calls; only the segment
+#   edges are handled in Python.
+# - fit_length(): a segment of any length -> seq_len frames (resampled or
+#   padded), what NewMLP's LSTM takes.
+# - segment_windows(): the same cut over a continuous recording, one labelled
+#   training window per segment (label of its last frame) instead of every
+#   overlapping window.
+#
+#   seg = MotionSegmenter(MotionEnergy("rows", 100), 40, 20, rate_hz=100)
+#   for start, end, frames in seg.push(rows):        # live, any block size
+#       model(fit_length(frames, SEQ_LEN))
+#   seg.hud()                                        # skipped fraction, cost
+#
+#   X, y, spans = segment_windows(samples, labels, 50, rate_hz=100)
+
+import time
+import numpy as np
+
+KINDS = ("quat", "gyro", "rows")
+# default (on, off) per kind: rad/s for quat / gyro, units/s for rows
+# (deg/s with the firmware's roll/pitch/yaw)
+THRESHOLDS = {"quat": (0.8, 0.4), "gyro": (1.0, 0.5), "rows": (40.0, 20.0)}
+
+
+class MotionEnergy:
+    """Per-frame motion energy of a stream; keeps the last `span` seconds."""
+
+    def __init__(self, kind="rows", rate_hz=100.0, span=0.1, period=360.0):
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {KINDS}")
+        self.kind = kind
+        self.lag = max(1, int(round(span * rate_hz)))
+        self.scale = rate_hz / self.lag
+        self.period = period
+        self._hist = None
+
+    def reset(self):
+        self._hist = None
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        if self.kind == "gyro":
+            return np.linalg.norm(x.reshape(len(x), -1, 3), axis=-1).mean(axis=1)
+        if self._hist is None:
+            self._hist = np.repeat(x[:1], self.lag, axis=0)
+        both = np.concatenate([self._hist, x])
+        prev, cur = both[:len(x)], both[self.lag:]
+        self._hist = both[-self.lag:]
+        if self.kind == "quat":
+            prev, cur = prev.reshape(len(x), -1, 4), cur.reshape(len(x), -1, 4)
+            d = np.abs(np.sum(prev * cur, axis=-1)).clip(0.0, 1.0)
+            return 2 * np.arccos(d).mean(axis=1) * self.scale
+        d = (cur - prev).reshape(len(x), -1)
+        if self.period:
+            d = np.mod(d + self.period / 2, self.period) - self.period / 2
+        return np.abs(d).mean(axis=1) * self.scale
+
+
+def energy_for(layout, rate_hz=100.0, **kw):
+    """MotionEnergy plus the function taking its input from decoder records
+    of a session layout."""
+    from halo.packet_parser import as_rows
+
+    if layout == "binary":
+        return MotionEnergy("quat", rate_hz, **kw), lambda f: f["quat"]
+    if layout == "raw":
+        return MotionEnergy("gyro", rate_hz, **kw), lambda f: f["gyro"]
+    return MotionEnergy("rows", rate_hz, **kw), as_rows
+
+
+class MotionSegmenter:
+    """Streaming start / end detection with hysteresis. push(frames) returns
+    the segments completed by this block as (start, end, frames) with global
+    frame indices; energy(frames) is computed by `energy` (a MotionEnergy, or
+    any callable) unless passed in."""
+
+    def __init__(self, energy, on=None, off=None, rate_hz=100.0, min_on=0.03, hold=0.15, pre_roll=0.1,
+                 min_len=0.15, max_len=2.0):
+        kind = getattr(energy, "kind", "rows")
+        self.energy = energy
+        self.on = THRESHOLDS[kind][0] if on is None else on
+        self.off = THRESHOLDS[kind][1] if off is None else off
+        if self.off > self.on:
+            raise ValueError("off threshold above on threshold")
+        frames = lambda s: max(1, int(round(s * rate_hz)))
+        self.min_on, self.hold, self.pre_roll = frames(min_on), frames(hold), frames(pre_roll) - 1
+        self.min_len, self.max_len = frames(min_len), max(frames(max_len), 2)
+        # history must cover a whole max_len window plus the trigger delays
+        self.keep = self.max_len + self.pre_roll + self.min_on + self.hold
+        self.piece = max(self.keep, 256)
+        self._buf = None
+        self.frames = self.active_frames = self.segments = self.rejected = 0
+        self.seconds = 0.0
+        self.reset()
+
+    def reset(self):
+        self.n = 0                  # frames pushed
+        self.active = False
+        self.start = self._emitted = 0
+        self._run_above = self._run_below = 0
+        if hasattr(self.energy, "reset"):
+            self.energy.reset()
+
+    # ---------- history ----------
+    def _store(self, frames):
+        if self._buf is None or self._buf.shape[1:] != frames.shape[1:] or self._buf.dtype != frames.dtype:
+            self._buf = np.empty((self.keep + self.piece,) + frames.shape[1:], dtype=frames.dtype)
+        idx = (self.n + np.arange(len(frames))) % len(self._buf)
+        self._buf[idx] = frames
+
+    def _frames(self, start, end):
+        return self._buf[np.arange(start, end) % len(self._buf)]
+
+    def _emit(self, out, start, end):
+        n = end - start
+        if n < self.min_len:
+            self.rejected += 1
+            return
+        self.segments += 1
+        out.append((start, end, self._frames(start, end)))
+
+    # ---------- stream ----------
+    def push(self, frames, energy=None):
+        t0 = time.perf_counter()
+        frames = np.asarray(frames)
+        out = []
+        for a in range(0, len(frames), self.piece):
+            part = frames[a:a + self.piece]
+            e = self.energy(part) if energy is None else np.asarray(energy)[a:a + self.piece]
+            self._push(part, e, out)
+        self.seconds += time.perf_counter() - t0
+        return out
+
+    def _push(self, frames, e, out):
+        T = len(frames)
+        self._store(frames)
+        idx = np.arange(T)
+        above, below = e > self.on, e < self.off
+
+        # consecutive frames above on / below off ending at each frame
+        last = np.maximum.accumulate(np.where(above, -1, idx))
+        run_above = np.where(last < 0, idx + 1 + self._run_above, idx - last)
+        last = np.maximum.accumulate(np.where(below, -1, idx))
+        run_below = np.where(last < 0, idx + 1 + self._run_below, idx - last)
+        self._run_above, self._run_below = int(run_above[-1]), int(run_below[-1])
+
+        # hysteresis: the state is the latest start / end event, else unchanged
+        event = np.where(run_above >= self.min_on, 1, np.where(run_below >= self.hold, 0, -1))
+        last = np.maximum.accumulate(np.where(event >= 0, idx, -1))
+        state = np.where(last >= 0, event[np.maximum(last, 0)] == 1, self.active)
+        prev = np.concatenate(([self.active], state[:-1]))
+        self.active_frames += int(state.sum())
+
+        oldest = max(self.n + T - len(self._buf), 0)
+        for t in np.flatnonzero(state != prev):
+            g = self.n + int(t)
+            if state[t]:
+                self.start = self._emitted = max(g - (self.min_on - 1) - self.pre_roll, oldest)
+            else:
+                end = g - self.hold + 1
+                self._split(out, end, final=True)
+        self.active = bool(state[-1])
+        self.n += T
+        self.frames += T
+        if self.active:
+            self._split(out, self.n, final=False)
+
+    def _split(self, out, end, final):
+        # long motion: max_len windows every max_len / 2, then the rest at the end
+        while end - self.start >= self.max_len:
+            self._emit(out, self.start, self.start + self.max_len)
+            self._emitted = self.start + self.max_len
+            self.start += self.max_len // 2
+        if final and end > max(self.start, self._emitted):
+            self._emit(out, self.start, end)
+
+    def flush(self):
+        """End a segment still in progress (end of a recording)."""
+        out = []
+        if self.active:
+            self._split(out, self.n, final=True)
+            self.active = False
+        return out
+
+    # ---------- stats ----------
+    def stats(self):
+        n = max(self.frames, 1)
+        return {"frames": self.frames, "segments": self.segments, "rejected": self.rejected,
+                "skipped": 1.0 - self.active_frames / n, "us_per_frame": self.seconds / n * 1e6}
+
+    def hud(self):
+        s = self.stats()
+        return (f"segments {s['segments']} (rejected {s['rejected']})  skipped {s['skipped'] * 100:.1f}% of"
+                f" {s['frames']} frames  segmenter {s['us_per_frame']:.2f} us/frame")
+
+
+def fit_length(frames, seq_len, how="resample"):
+    """(n, ...) -> (seq_len, ...): linear resampling over the whole segment,
+    or (how="pad") its last seq_len frames, front-padded with the first."""
+    x = np.asarray(frames, dtype=np.float32)
+    n = len(x)
+    if how == "pad":
+        if n >= seq_len:
+            return x[n - seq_len:]
+        return np.concatenate([np.repeat(x[:1], seq_len - n, axis=0), x])
+    pos = np.linspace(0.0, n - 1, seq_len)
+    i0 = np.floor(pos).astype(np.intp)
+    i1 = np.minimum(i0 + 1, n - 1)
+    u = (pos - i0).astype(np.float32).reshape((-1,) + (1,) * (x.ndim - 1))
+    return x[i0] * (1 - u) + x[i1] * u
+
+
+def segment_windows(samples, labels, seq_len, rate_hz=100.0, kind="rows", how="resample", on=None, off=None,
+                    **kw):
+    """Cut a continuous recording (N, D) at its motion: (X (S, seq_len, D),
+    y (S,) label of each segment's last frame, spans (S, 2) frame ranges)."""
+    seg = MotionSegmenter(MotionEnergy(kind, rate_hz), on, off, rate_hz=rate_hz, **kw)
+    samples = np.asarray(samples)
+    segments = seg.push(samples) + seg.flush()
+    if not segments:
+        return (np.zeros((0, seq_len) + samples.shape[1:], np.float32), np.zeros(0, np.int64),
+                np.zeros((0, 2), np.int64))
+    X = np.stack([fit_length(f, seq_len, how) for _, _, f in segments])
+    spans = np.array([(s, e) for s, e, _ in segments], dtype=np.int64)
+    return X, np.asarray(labels)[spans[:, 1] - 1], spans
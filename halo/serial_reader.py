@@ -0,0 +1,141 @@
+# Background acquisition for the viewers.
+#
+# A daemon thread drains the serial port continuously (blocking read with a
+# short timeout, so no busy-wait) and feeds a decoder (StreamParser or
+# BinaryDecoder). The newest frame is published to a single slot that the
+# render loop can take without blocking; consumers that need every frame
+# (recorder, inference) use drain() instead.
+#
+#   reader = SerialReader(ser, StreamParser("quat14")).start()
+#   while True:
+#       got = reader.take()
+#       if got is None:
+#           rate(200); continue
+#       frame, t = got
+#
+# With a halo.metrics.Metrics the thread also records the decode time per
+# read ("parse"), frame counts, seq gaps and the ESP clock offset (binary
+# frames), and take() records how long the frame waited ("queue").
+
+import threading
+import time
+
+
+class SerialReader:
+    def __init__(self, ser, decoder, read_timeout=0.02, stale_after=0.1, metrics=None):
+        self.ser = ser
+        self.decoder = decoder
+        self.metrics = metrics
+        self.stale_after = stale_after
+        self.ser.timeout = read_timeout
+        self._lock = threading.Lock()      # decoder ring vs drain(); the slot needs none
+        self._slot = None                  # (frame, t, count) replaced atomically
+        self._taken = 0                    # count of the last frame handed to take()
+        self._drained = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+        # counters
+        self.frames = 0
+        self.overruns = 0        # frames replaced in the slot before take() saw them
+        self.ring_overruns = 0   # frames lost to drain() because the ring wrapped
+        self.stale = 0           # take() calls that got a frame older than stale_after
+        self.read_errors = 0
+        self.age_last = 0.0
+        self.age_max = 0.0
+        self.age_mean = 0.0
+
+    # ---------- thread ----------
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="serial-reader", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def _run(self):
+        ser = self.ser
+        while not self._stop.is_set():
+            try:
+                # blocks until at least one byte (or timeout), then takes the rest
+                data = ser.read(max(1, ser.in_waiting))
+            except Exception:
+                self.read_errors += 1
+                time.sleep(self.ser.timeout or 0.02)
+                continue
+            if not data:
+                if getattr(ser, "exhausted", False):
+                    break   # a ReplayPort that has played its session
+                continue
+            t0 = time.perf_counter()
+            with self._lock:
+                n = self.decoder.feed(data, t0)
+            if n == 0:
+                continue
+            ring = self.decoder.ring
+            if self.metrics is not None:
+                self._record(ring, n, t0)
+            frames, t = ring.latest(1)
+            self.frames += n
+            self._slot = (frames[0], float(t[0]), ring.count)
+
+    def _record(self, ring, n, t0):
+        m = self.metrics
+        m.observe("parse", time.perf_counter() - t0)
+        m.count("frames", n)
+        names = ring.data.dtype.names or ()
+        if "seq" in names:
+            frames, t = ring.latest(n)
+            m.seq(frames["seq"])
+            m.esp_clock(frames["esp_ts"], t)
+
+    # ---------- consumers ----------
+    def take(self):
+        """Newest frame as (frame, t) if one arrived since the last call, else None."""
+        slot = self._slot
+        if slot is None or slot[2] == self._taken:
+            return None
+        frame, t, count = slot
+        self.overruns += count - self._taken - 1
+        self._taken = count
+        age = time.perf_counter() - t
+        if self.metrics is not None:
+            self.metrics.observe("queue", age)
+        self.age_last = age
+        self.age_max = max(self.age_max, age)
+        self.age_mean += 0.05 * (age - self.age_mean)
+        if age > self.stale_after:
+            self.stale += 1
+        return frame, t
+
+    def drain(self):
+        """Every frame since the last drain() as (frames, t) arrays."""
+        with self._lock:
+            ring = self.decoder.ring
+            if ring is None:
+                return None
+            missed = ring.count - self._drained - len(ring)
+            if missed > 0:
+                self.ring_overruns += missed
+            frames, t = ring.since(self._drained)
+            self._drained = ring.count
+        return frames, t
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "overruns": self.overruns,
+            "ring_overruns": self.ring_overruns,
+            "stale": self.stale,
+            "read_errors": self.read_errors,
+            "age_ms": self.age_last * 1e3,
+            "age_max_ms": self.age_max * 1e3,
+            "age_mean_ms": self.age_mean * 1e3,
+        }
+
+    def hud(self):
+        return (f"frames {self.frames}  skipped {self.overruns}  stale {self.stale}  "
+                f"age {self.age_last*1e3:.1f} ms (max {self.age_max*1e3:.0f})")
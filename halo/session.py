@@ -0,0 +1,465 @@
+# Record / replay of glove sessions.
+#
+# File layout (.halo), everything little-endian:
+#   "HALOSES1" | u32 header_len | header JSON (padded to 8 bytes)
+#   chunk*     : "CHNK" | u32 n | f64 t_first | f64 t_last | n records
+#   index      : "INDX" | u32 n_chunks | n_chunks x INDEX_DTYPE
+#   footer     : u64 index_offset | "HALOEND1"
+#
+# A record is (t, frame): t is seconds since the recording started (host
+# perf_counter), frame is the decoder's record (a packet_parser layout or
+# binary_protocol.FRAME_DTYPE). Chunks are written whole and flushed, so a
+# session cut short by a crash is still readable: without a footer the reader
+# rebuilds the index by walking the chunk headers.
+#
+# Record:
+#   python -m halo.session record glove.halo --port COM4 [--layout quat14|binary]
+#   python -m halo.session record glove.halo --ws ws://localhost:3000/browser
+#   python -m halo.session record glove.halo --bus halo      # from halo.frame_bus
+# Inspect / replay:
+#   python -m halo.session info glove.halo
+#   python -m halo.session replay glove.halo --speed 4
+#
+# Viewers and NewMLP can read a session through ReplayPort, which behaves like
+# the serial.Serial they already use.
+
+import argparse
+import io
+import json
+import os
+import struct
+import sys
+import time
+import numpy as np
+
+from halo.packet_parser import LAYOUTS, as_rows
+from halo.binary_protocol import FRAME_DTYPE, RAW_FRAME_DTYPE, decoder_for, encode_frames, encode_raw_frames, from_json
+
+MAGIC = b"HALOSES1"
+END_MAGIC = b"HALOEND1"
+CHUNK_HEAD = struct.Struct("<4sIdd")        # 24 bytes
+INDEX_DTYPE = np.dtype([("offset", "<u8"), ("n", "<u4"), ("t_first", "<f8"), ("t_last", "<f8")])
+
+
+def frame_dtype(layout):
+    if layout == "binary":
+        return FRAME_DTYPE
+    if layout == "raw":
+        return RAW_FRAME_DTYPE
+    return LAYOUTS[layout].dtype
+
+
+def record_dtype(layout):
+    return np.dtype([("t", "<f8"), ("frame", frame_dtype(layout))])
+
+
+class SessionWriter:
+    def __init__(self, path, layout, source="", chunk_frames=1024):
+        self.path = path
+        self.layout = layout
+        self.dtype = record_dtype(layout)
+        self.chunk = np.zeros(chunk_frames, dtype=self.dtype)
+        self.fill = 0
+        self.index = []
+        self.frames = 0
+        self.t0 = None
+
+        header = json.dumps({
+            "version": 1,
+            "layout": layout,
+            "source": source,
+            "started": time.time(),
+            "chunk_frames": chunk_frames,
+        }).encode()
+        header += b" " * (-len(header) % 8)
+        self.f = open(path, "wb")
+        self.f.write(MAGIC + struct.pack("<I", len(header)) + header + b"\0" * 4)
+
+    def write(self, frames, t):
+        """Append decoder records with their host perf_counter timestamps."""
+        if self.t0 is None and len(frames):
+            self.t0 = float(np.min(t))
+        t = np.broadcast_to(np.asarray(t, dtype=np.float64) - (self.t0 or 0.0), (len(frames),))
+        i = 0
+        while i < len(frames):
+            n = min(len(frames) - i, len(self.chunk) - self.fill)
+            self.chunk["t"][self.fill:self.fill + n] = t[i:i + n]
+            self.chunk["frame"][self.fill:self.fill + n] = frames[i:i + n]
+            self.fill += n
+            i += n
+            if self.fill == len(self.chunk):
+                self.flush()
+        self.frames += len(frames)
+
+    def flush(self):
+        if self.fill == 0:
+            return
+        recs = self.chunk[:self.fill]
+        offset = self.f.tell()
+        self.f.write(CHUNK_HEAD.pack(b"CHNK", self.fill, recs["t"][0], recs["t"][-1]))
+        self.f.write(recs.tobytes())
+        self.f.flush()
+        self.index.append((offset, self.fill, recs["t"][0], recs["t"][-1]))
+        self.fill = 0
+
+    def close(self):
+        if self.f.closed:
+            return
+        self.flush()
+        index_offset = self.f.tell()
+        index = np.array(self.index, dtype=INDEX_DTYPE)
+        self.f.write(b"INDX" + struct.pack("<I", len(index)) + index.tobytes())
+        self.f.write(struct.pack("<Q", index_offset) + END_MAGIC)
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SessionReader:
+    """Memory-maps a session; chunks come back as zero-copy record views."""
+
+    def __init__(self, path):
+        self.path = path
+        self.mm = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self.mm[:8]) != MAGIC:
+            raise ValueError(f"{path} is not a HALO session")
+        hlen = struct.unpack("<I", bytes(self.mm[8:12]))[0]
+        self.header = json.loads(bytes(self.mm[12:12 + hlen]))
+        self.layout = self.header["layout"]
+        self.dtype = record_dtype(self.layout)
+        self.data_start = 12 + hlen + 4
+        self.index = self._read_index()
+        self.frames = int(self.index["n"].sum())
+
+    def _read_index(self):
+        mm = self.mm
+        if len(mm) >= 16 and bytes(mm[-8:]) == END_MAGIC:
+            offset = struct.unpack("<Q", bytes(mm[-16:-8]))[0]
+            n = struct.unpack("<I", bytes(mm[offset + 4:offset + 8]))[0]
+            return np.frombuffer(mm, dtype=INDEX_DTYPE, count=n, offset=offset + 8).copy()
+        # no footer (recording was interrupted): walk the chunk headers
+        entries = []
+        pos = self.data_start
+        size = self.dtype.itemsize
+        while pos + CHUNK_HEAD.size <= len(mm):
+            tag, n, t_first, t_last = CHUNK_HEAD.unpack(bytes(mm[pos:pos + CHUNK_HEAD.size]))
+            if tag != b"CHNK":
+                break
+            n = min(n, (len(mm) - pos - CHUNK_HEAD.size) // size)
+            if n:
+                entries.append((pos, n, t_first, t_last))
+            pos += CHUNK_HEAD.size + n * size
+        return np.array(entries, dtype=INDEX_DTYPE)
+
+    def __len__(self):
+        return self.frames
+
+    @property
+    def duration(self):
+        return float(self.index["t_last"][-1] - self.index["t_first"][0]) if len(self.index) else 0.0
+
+    def chunk(self, i):
+        offset, n = int(self.index["offset"][i]), int(self.index["n"][i])
+        return np.frombuffer(self.mm, dtype=self.dtype, count=n, offset=offset + CHUNK_HEAD.size)
+
+    def chunks(self, start=0):
+        for i in range(start, len(self.index)):
+            yield self.chunk(i)
+
+    def read(self, t_start=None, t_end=None):
+        """All records (optionally within [t_start, t_end)) as one array."""
+        lo = 0 if t_start is None else int(np.searchsorted(self.index["t_last"], t_start))
+        hi = len(self.index) if t_end is None else int(np.searchsorted(self.index["t_first"], t_end))
+        parts = [self.chunk(i) for i in range(lo, hi)]
+        if not parts:
+            return np.zeros(0, dtype=self.dtype)
+        recs = np.concatenate(parts)
+        keep = np.ones(len(recs), dtype=bool)
+        if t_start is not None:
+            keep &= recs["t"] >= t_start
+        if t_end is not None:
+            keep &= recs["t"] < t_end
+        return recs[keep]
+
+    def replay(self, speed=1.0, loop=False):
+        """Yield (frames, t) blocks paced at `speed` x real time; speed=None
+        yields whole chunks as fast as the consumer takes them."""
+        clock = ReplayClock(self, speed, loop)
+        while True:
+            recs = clock.due()
+            if recs is None:
+                return
+            if len(recs):
+                yield recs["frame"], recs["t"]
+            else:
+                time.sleep(clock.wait())
+
+
+class ReplayClock:
+    """Hands out records whose (scaled) time has come; never blocks.
+    speed 0 or None means as fast as possible."""
+
+    def __init__(self, reader, speed=1.0, loop=False):
+        self.reader = reader
+        self.speed = speed or None
+        self.loop = loop
+        self.i = 0
+        self.pos = 0
+        self.current = reader.chunk(0) if len(reader.index) else None
+        self.wall0 = time.perf_counter()
+        self.t0 = float(reader.index["t_first"][0]) if len(reader.index) else 0.0
+
+    def _now(self):
+        return self.t0 + (time.perf_counter() - self.wall0) * self.speed
+
+    def due(self):
+        """Records that are due now ([] if none yet, None at the end)."""
+        if self.current is None:
+            return None
+        if self.pos >= len(self.current):
+            self.i += 1
+            self.pos = 0
+            if self.i >= len(self.reader.index):
+                if not self.loop:
+                    self.current = None
+                    return None
+                self.i = 0
+                self.wall0 = time.perf_counter()
+            self.current = self.reader.chunk(self.i)
+        if self.speed is None:
+            end = len(self.current)
+        else:
+            end = int(np.searchsorted(self.current["t"], self._now(), side="right"))
+            end = max(end, self.pos)
+        recs = self.current[self.pos:end]
+        self.pos = end
+        return recs
+
+    def wait(self):
+        """Seconds until the next record is due."""
+        if self.current is None or self.speed is None or self.pos >= len(self.current):
+            return 0.0
+        return max(0.0, (float(self.current["t"][self.pos]) - self._now()) / self.speed)
+
+
+def encode(frames, layout):
+    """Turn records back into the bytes the glove would have sent."""
+    if layout == "binary":
+        return encode_frames(frames["seq"], frames["esp_ts"], frames["quat"], frames["calib"])
+    if layout == "raw":
+        return encode_raw_frames(frames["seq"], frames["esp_ts"], frames["quat"], frames["accel"],
+                                 frames["gyro"], frames["calib"])
+    out = io.BytesIO()
+    np.savetxt(out, as_rows(frames), fmt="%.4f", delimiter=",", newline="\r\n")
+    data = out.getvalue()
+    prefix = LAYOUTS[layout].prefix
+    if prefix:
+        data = prefix + data.replace(b"\r\n", b"\r\n" + prefix)[:-len(prefix)]
+    return data
+
+
+class ReplayPort:
+    """Looks enough like serial.Serial (read/readinto/readline/in_waiting) for
+    the viewers, SerialReader and NewMLP to run from a recorded session.
+
+    Once a non-looping replay has run out, `exhausted` is set; reads return
+    what is left, then b"" after waiting out the timeout like an idle port."""
+
+    def __init__(self, path, speed=1.0, loop=False, timeout=1.0):
+        self.reader = SessionReader(path)
+        self.clock = ReplayClock(self.reader, speed, loop)
+        self.timeout = timeout
+        self.port = path
+        self._pending = bytearray()
+        self.is_open = True
+        self.exhausted = False
+
+    def _pump(self):
+        recs = self.clock.due()
+        if recs is None:
+            self.exhausted = True
+            return False
+        if len(recs):
+            self._pending += encode(recs["frame"], self.reader.layout)
+        return True
+
+    @property
+    def in_waiting(self):
+        self._pump()
+        return len(self._pending)
+
+    def inWaiting(self):
+        return self.in_waiting
+
+    def read(self, size=1):
+        deadline = time.perf_counter() + (self.timeout if self.timeout is not None else 1e9)
+        while len(self._pending) < size:
+            if not self._pump() or len(self._pending) >= size or time.perf_counter() >= deadline:
+                break
+            time.sleep(min(self.clock.wait(), max(0.0, deadline - time.perf_counter()), 0.05))
+        if self.exhausted and not self._pending:
+            self._idle()
+        out = bytes(self._pending[:size])
+        del self._pending[:size]
+        return out
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def readline(self):
+        deadline = time.perf_counter() + (self.timeout if self.timeout is not None else 1e9)
+        while b"\n" not in self._pending and time.perf_counter() < deadline:
+            if not self._pump():
+                break
+            time.sleep(min(self.clock.wait(), 0.05))
+        if self.exhausted and not self._pending:
+            self._idle()
+        end = self._pending.find(b"\n") + 1 or len(self._pending)
+        out = bytes(self._pending[:end])
+        del self._pending[:end]
+        return out
+
+    def _idle(self):
+        # a real port with nothing to send blocks for its timeout
+        if self.timeout:
+            time.sleep(self.timeout)
+
+    def reset_input_buffer(self):
+        self._pending.clear()
+
+    def close(self):
+        self.is_open = False
+
+
+# ---------- recording ----------
+def record_serial(path, port, baud=115200, layout="auto", duration=None):
+    import serial
+    from halo.serial_reader import SerialReader
+
+    ser = serial.Serial(port, baud)
+    decoder = decoder_for(layout)
+    reader = SerialReader(ser, decoder).start()
+    writer = None
+    start = time.time()
+    try:
+        while duration is None or time.time() - start < duration:
+            time.sleep(0.05)
+            got = reader.drain()
+            if got is None or len(got[0]) == 0:
+                continue
+            if writer is None:
+                name = layout if layout in ("binary", "raw") else decoder.layout.name
+                writer = SessionWriter(path, name, source=f"serial:{port}")
+            writer.write(*got)
+            print(f"\r{writer.frames} frames  {reader.hud()}", end="")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.stop()
+        if writer is not None:
+            writer.close()
+    print()
+    return writer
+
+
+def record_bus(path, name="halo", duration=None):
+    from halo.frame_bus import FrameSubscriber
+
+    sub = FrameSubscriber(name, "recorder")
+    writer = SessionWriter(path, sub.layout, source=f"bus:{name}")
+    start = time.time()
+    try:
+        while not sub.closed and (duration is None or time.time() - start < duration):
+            time.sleep(0.05)
+            frames, t = sub.drain()             # views into the bus, copied into the chunk
+            if len(frames) == 0:
+                continue
+            writer.write(frames, t)
+            print(f"\r{writer.frames} frames  {sub.hud()}", end="")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sub.close()
+        writer.close()
+    print()
+    return writer
+
+
+def record_ws(path, url, duration=None):
+    import asyncio
+    import websockets
+
+    writer = SessionWriter(path, "binary", source=f"ws:{url}")
+
+    async def run():
+        start = time.perf_counter()
+        async with websockets.connect(url) as ws:
+            async for msg in ws:
+                t = time.perf_counter()
+                data = json.loads(msg)
+                if "wrist" not in data and "fingers" not in data:
+                    continue          # status messages
+                writer.write(from_json(data).reshape(1), t)
+                if duration is not None and t - start > duration:
+                    break
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+    return writer
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Record / inspect / replay HALO glove sessions")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rec = sub.add_parser("record")
+    rec.add_argument("path")
+    rec.add_argument("--port")
+    rec.add_argument("--baud", type=int, default=115200)
+    rec.add_argument("--layout", default="auto", help="auto, binary, raw or a packet_parser layout")
+    rec.add_argument("--ws", help="relay URL, e.g. ws://localhost:3000/browser")
+    rec.add_argument("--bus", help="halo.frame_bus name, e.g. halo")
+    rec.add_argument("--duration", type=float)
+    info = sub.add_parser("info")
+    info.add_argument("path")
+    rep = sub.add_parser("replay")
+    rep.add_argument("path")
+    rep.add_argument("--speed", type=float, default=1.0, help="0 = as fast as possible")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "record":
+        if args.ws:
+            w = record_ws(args.path, args.ws, args.duration)
+        elif args.bus:
+            w = record_bus(args.path, args.bus, args.duration)
+        elif args.port:
+            w = record_serial(args.path, args.port, args.baud, args.layout, args.duration)
+        else:
+            ap.error("record needs --port, --ws or --bus")
+        print(f"saved {w.frames if w else 0} frames to {args.path}")
+    elif args.cmd == "info":
+        r = SessionReader(args.path)
+        print(json.dumps(r.header, indent=2))
+        print(f"{len(r)} frames in {len(r.index)} chunks, {r.duration:.1f} s"
+              f" ({len(r) / max(r.duration, 1e-9):.1f} Hz), {os.path.getsize(args.path)/1e6:.1f} MB")
+    elif args.cmd == "replay":
+        r = SessionReader(args.path)
+        t0 = time.perf_counter()
+        n = 0
+        for frames, _ in r.replay(speed=args.speed or None):
+            n += len(frames)
+        dt = time.perf_counter() - t0
+        print(f"replayed {n} frames in {dt:.2f} s ({n / max(dt, 1e-9):,.0f} frames/s)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
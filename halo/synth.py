@@ -0,0 +1,511 @@
+# Synthetic glove: a kinematic hand driving simulated sensors, for load
+# tests, viewer demos and training data without the glove.
+#
+# Hand: the wrist (BNO055) plus 5 fingers x 2 bones (MPU6050s), in the
+# fingerNames order of Website/main.js (pointer, middle, ring, pinky, thumb;
+# bone 1 then bone 2). A gesture is a flexion per finger (0 open .. 1 curled)
+# plus a wrist pose and an optional wrist oscillation ("wave"). The hand moves
+# through random gestures with smooth transitions, per-segment variation,
+# tremor and slow wrist wander. Flexion sets each finger's MCP / PIP angles
+# (open fingers also spread apart), and halo.kinematics.bone_quats() turns
+# those 15 joint values into the bone orientations, so everything below is
+# consistent with the same motion:
+#   quaternions   true orientation (+ noise) for every IMU
+#   gyro          body rate from consecutive orientations (+ noise, bias walk)
+#   accel         gravity in the sensor frame (+ noise); the hand does not
+#                 translate, so there is no linear acceleration
+#   rpy           what the firmware reports per MPU: roll/pitch/yaw in degrees
+#                 with a yaw drift (no magnetometer) and noise
+# The world frame is z up.
+#
+# Output in any wire format the host reads: binary (binary_protocol), the
+# packet_parser ASCII layouts and the relay's JSON messages.
+#
+#   python -m halo.synth stream --layout quat14 --rate 500 --link /tmp/ttyHALO
+#       a pty the viewers / NewMLP open like a serial port (--ws to push JSON
+#       to a relay's /esp instead)
+#   python -m halo.synth dataset gesture_data.csv --frames 2000000 --processes 8
+#       labelled NewMLP training data (CSV plus its prebuilt .store)
+#   python -m halo.synth glove --frames 20000
+#       sensor_inputs.npy / joint_outputs.npy for MLP.py
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+import numpy as np
+
+from halo import quat_math as qm
+from halo.binary_protocol import FRAME_DTYPE, NUM_IMUS, RAW_FRAME_DTYPE, encode_frames, encode_raw_frames
+from halo.kinematics import DIP_RATIO, FINGERS, bone_quats
+from halo.packet_parser import LAYOUTS
+
+BONE_NAMES = [f"{f}{b}" for f in FINGERS for b in ("001", "002")]     # main.js bone names
+GRAVITY = 9.81
+
+# max MCP / PIP flexion (rad) per finger, thumb last
+MCP_MAX = np.radians([90, 90, 90, 90, 55])
+PIP_MAX = np.radians([100, 105, 100, 95, 75])
+SPREAD = np.radians([6, 0, -5, -10, 12])     # MCP abduction of an open hand
+
+# flexion (pointer, middle, ring, pinky, thumb), wrist roll/pitch/yaw (deg),
+# wrist oscillation amplitude roll/pitch/yaw (deg) and frequency (Hz)
+GESTURES = {
+    "open":      ((0.0, 0.0, 0.0, 0.0, 0.0), (0, 0, 0), (0, 0, 0), 0.0),
+    "fist":      ((1.0, 1.0, 1.0, 1.0, 0.8), (0, 0, 0), (0, 0, 0), 0.0),
+    "point":     ((0.0, 1.0, 1.0, 1.0, 0.8), (0, 0, 0), (0, 0, 0), 0.0),
+    "peace":     ((0.0, 0.0, 1.0, 1.0, 0.8), (0, 0, 0), (0, 0, 0), 0.0),
+    "ok":        ((0.6, 0.0, 0.0, 0.0, 0.6), (0, 0, 0), (0, 0, 0), 0.0),
+    "thumbs_up": ((1.0, 1.0, 1.0, 1.0, 0.0), (90, 0, 0), (0, 0, 0), 0.0),
+    "wave":      ((0.0, 0.0, 0.0, 0.0, 0.0), (0, -20, 0), (0, 0, 30), 1.5),
+}
+
+
+class SensorNoise:
+    def __init__(self, quat_deg=0.2, gyro=0.01, gyro_bias_walk=5e-4, accel=0.05, rpy_deg=0.3,
+                 mpu_yaw_drift=0.5, bno_yaw_drift=0.0):
+        self.quat_deg = quat_deg                # orientation noise of the reported quaternions
+        self.gyro = gyro                        # white noise, rad/s
+        self.gyro_bias_walk = gyro_bias_walk    # bias random walk, rad/s per sqrt(s)
+        self.accel = accel                      # white noise, m/s^2
+        self.rpy_deg = rpy_deg                  # noise on the reported MPU roll/pitch/yaw
+        self.mpu_yaw_drift = mpu_yaw_drift      # std of each MPU's yaw drift rate, deg/s
+        self.bno_yaw_drift = bno_yaw_drift      # BNO055 yaw drift, deg/s
+
+    @classmethod
+    def none(cls):
+        return cls(0, 0, 0, 0, 0, 0, 0)
+
+
+# ---------- the hand ----------
+class HandSim:
+    """Streaming simulation: step(n) returns the next n frames as a dict of
+    arrays, continuing smoothly from the previous call.
+
+        sim = HandSim(rate_hz=500, seed=1)
+        block = sim.step(1000)      # block["quat"] (1000, 11, 4), ...
+    """
+
+    def __init__(self, rate_hz=100, gestures=None, seed=0, noise=None, segment=(1.0, 3.0), transition=0.35):
+        self.rate_hz = rate_hz
+        self.names = sorted(gestures or GESTURES)
+        self.noise = noise or SensorNoise()
+        self.segment = segment
+        self.transition = transition
+        self.rng = np.random.default_rng(seed)
+        self.frame = 0
+        # segments: start time, gesture id, flexion (5,), wrist rpy (3,) rad
+        self.seg_start = [0.0]
+        self.seg_label = [int(self.rng.integers(len(self.names)))]
+        self.seg_flex = [self._flex(self.seg_label[0])]
+        self.seg_wrist = [self._wrist(self.seg_label[0])]
+        # per-run constants
+        self.tremor_phase = self.rng.uniform(0, 2 * np.pi, 5)
+        self.wander = self.rng.uniform(0, 2 * np.pi, (3, 3))                # phases of 3 slow sines per axis
+        self.wander_hz = np.array([0.05, 0.13, 0.31])
+        self.yaw_drift = np.radians(self.rng.normal(0, self.noise.mpu_yaw_drift, NUM_IMUS))
+        self.yaw_drift[0] = np.radians(self.noise.bno_yaw_drift)
+        self.gyro_bias = np.zeros((NUM_IMUS, 3))
+        self.prev_q = None
+
+    def _flex(self, label):
+        flex = np.array(GESTURES[self.names[label]][0])
+        return np.clip(flex + self.rng.normal(0, 0.08, 5), 0.0, 1.0)
+
+    def _wrist(self, label):
+        return np.radians(np.array(GESTURES[self.names[label]][1], dtype=np.float64) + self.rng.normal(0, 8, 3))
+
+    def _extend(self, t_end):
+        while self.seg_start[-1] < t_end:
+            start = self.seg_start[-1] + self.rng.uniform(*self.segment)
+            label = int(self.rng.integers(len(self.names)))
+            self.seg_start.append(start)
+            self.seg_label.append(label)
+            self.seg_flex.append(self._flex(label))
+            self.seg_wrist.append(self._wrist(label))
+
+    def _drop_old(self, t):
+        # keep the segment in progress and the one before it (its transition start)
+        k = int(np.searchsorted(self.seg_start, t, side="right")) - 2
+        if k > 0:
+            for lst in (self.seg_start, self.seg_label, self.seg_flex, self.seg_wrist):
+                del lst[:k]
+
+    def joints(self, t):
+        """Gesture labels (n,), flexion (n, 5) and wrist roll/pitch/yaw (n, 3)
+        at times t (s)."""
+        self._extend(t[-1] + 1.0)
+        starts = np.asarray(self.seg_start)
+        k = np.searchsorted(starts, t, side="right") - 1
+        flex, wrist = np.asarray(self.seg_flex), np.asarray(self.seg_wrist)
+        prev = np.maximum(k - 1, 0)
+        # smoothstep from the previous segment's pose over `transition` seconds
+        u = np.clip((t - starts[k]) / self.transition, 0.0, 1.0)[:, None]
+        u = u * u * (3 - 2 * u)
+        f = flex[prev] + (flex[k] - flex[prev]) * u
+        w = wrist[prev] + (wrist[k] - wrist[prev]) * u
+
+        labels = np.asarray(self.seg_label)[k]
+        prev_labels = np.asarray(self.seg_label)[prev]
+        amp = np.radians(np.array([GESTURES[n][2] for n in self.names], dtype=np.float64))
+        hz = np.array([GESTURES[n][3] for n in self.names])
+        for lab, weight in ((prev_labels, 1 - u), (labels, u)):     # oscillation fades in / out too
+            w = w + weight * amp[lab] * np.sin(2 * np.pi * hz[lab] * t)[:, None]
+        w = w + np.radians(4.0) * np.sin(2 * np.pi * self.wander_hz * t[:, None, None] + self.wander).sum(-1) / 3
+        f = f + 0.005 * np.sin(2 * np.pi * 9.0 * t[:, None] + self.tremor_phase)    # physiological tremor
+        return labels, np.clip(f, 0.0, 1.05), w
+
+    def step(self, n):
+        t = (self.frame + np.arange(n)) / self.rate_hz
+        self.frame += n
+        labels, flex, wrist_rpy = self.joints(t)
+        self._drop_old(t[-1])
+        joint_angles = np.stack([flex * MCP_MAX, (1.0 - np.minimum(flex, 1.0)) * SPREAD, flex * PIP_MAX],
+                                axis=-1).reshape(n, 15)
+        q = bone_quats(qm.from_rpy(*wrist_rpy.T), joint_angles)
+        return self._sensors(t, labels, joint_angles, q)
+
+    def _sensors(self, t, labels, joint_angles, q):
+        nz, rng, dt = self.noise, self.rng, 1.0 / self.rate_hz
+        n = len(t)
+
+        # body rate from q_t^-1 q_{t+1}; the first frame of a run repeats the next
+        prev = q[:1] if self.prev_q is None else self.prev_q[None]
+        q_all = np.concatenate([prev, q])
+        d = qm.mul(qm.conj(q_all[:-1]), q_all[1:])
+        d = np.where(d[..., :1] < 0, -d, d)
+        vn = np.linalg.norm(d[..., 1:], axis=-1, keepdims=True)
+        gyro = 2 * np.arctan2(vn, d[..., :1]) * d[..., 1:] / np.maximum(vn, 1e-12) / dt
+        self.prev_q = q[-1]
+
+        walk = rng.normal(0, nz.gyro_bias_walk * np.sqrt(dt), (n, NUM_IMUS, 3))
+        bias = self.gyro_bias + np.cumsum(walk, axis=0)
+        self.gyro_bias = bias[-1]
+        gyro = gyro + bias + rng.normal(0, nz.gyro, gyro.shape)
+
+        accel = qm.rotate(qm.conj(q), np.array([0.0, 0.0, GRAVITY]))
+        accel = accel + rng.normal(0, nz.accel, accel.shape)
+
+        # reported orientation: world yaw drift * q * small noise rotation
+        drift = qm.axis_angle([0, 0, 1], t[:, None] * self.yaw_drift)
+        noisy = qm.mul(drift, q)
+        if nz.quat_deg:
+            noisy = qm.mul(noisy, _small_rotations(rng, np.radians(nz.quat_deg), q.shape[:-1]))
+        rpy = np.degrees(np.stack(qm.to_rpy(noisy), axis=-1))
+        rpy = rpy + rng.normal(0, nz.rpy_deg, rpy.shape)
+
+        return {
+            "t": t,
+            "seq": (np.arange(n) + self.frame - n) % (1 << 32),
+            "label": labels,
+            "joints": joint_angles,     # (n, 15) rad, kinematics.JOINT_NAMES order
+            "quat_true": q,             # (n, 11, 4)
+            "quat": noisy,              # (n, 11, 4) as reported
+            "gyro": gyro,               # (n, 11, 3) rad/s, sensor frame
+            "accel": accel,             # (n, 11, 3) m/s^2, sensor frame
+            "rpy": rpy,                 # (n, 11, 3) deg as reported
+        }
+
+
+def _small_rotations(rng, std, shape):
+    v = rng.normal(0, std / 2, shape + (3,))
+    return qm.normalize(np.concatenate([np.ones(shape + (1,)), v], axis=-1))
+
+
+# ---------- wire formats ----------
+WIRE_FORMATS = ["binary", "raw", "json"] + list(LAYOUTS)
+
+
+def records(block, layout, newmlp="rpy"):
+    """A HandSim block as decoder records of `layout` (binary, raw or a
+    packet_parser layout). newmlp33 carries `newmlp` (rpy, accel or gyro) per
+    sensor."""
+    n = len(block["t"])
+    if layout in ("binary", "raw"):
+        rec = np.zeros(n, dtype=FRAME_DTYPE if layout == "binary" else RAW_FRAME_DTYPE)
+        rec["seq"] = block["seq"]
+        rec["esp_ts"] = (block["t"] * 1e6).astype(np.int64) % (1 << 32)
+        rec["calib"] = 3
+        if layout == "binary":
+            rec["quat"] = block["quat"]
+        else:
+            rec["quat"] = block["quat"][:, 0]
+            rec["accel"] = block["accel"][:, 1:] / GRAVITY
+            rec["gyro"] = block["gyro"][:, 1:]
+        return rec
+    rec = np.zeros(n, dtype=LAYOUTS[layout].dtype)
+    names = rec.dtype.names
+    rpy = block["rpy"]
+    if "quat" in names:
+        rec["quat"] = block["quat"][:, 0]
+    if "calib" in names:
+        rec["calib"] = 3
+    if layout == "quat14":
+        rec["mpu1_rpy"], rec["mpu2_rpy"] = rpy[:, 1], rpy[:, 2]
+    elif layout == "quat11":
+        rec["mpu_rpy"] = rpy[:, 1]
+    elif layout == "euler_imu":
+        rec["bno_euler"] = rpy[:, 0]
+        rec["mpu_rpy"] = rpy[:, 1:9]
+    elif layout == "newmlp33":
+        rec["sensors"] = block[newmlp]
+    return rec
+
+
+def json_messages(block):
+    """The node.js_handsim messages (wrist / fingers as {x, y, z, w})."""
+    out = []
+    q = np.round(block["quat"], 4).tolist()
+    for seq, t, frame in zip(block["seq"].tolist(), block["t"].tolist(), q):
+        as_xyzw = [{"x": x, "y": y, "z": z, "w": w} for w, x, y, z in frame]
+        out.append(json.dumps({"seq": seq, "esp_ts": int(t * 1000), "wrist": as_xyzw[0], "fingers": as_xyzw[1:]}))
+    return out
+
+
+def encode(block, layout, newmlp="rpy"):
+    """Bytes as the glove would send them over serial."""
+    if layout == "json":
+        return "".join(m + "\n" for m in json_messages(block)).encode()
+    rec = records(block, layout, newmlp)
+    if layout == "binary":
+        return encode_frames(rec["seq"], rec["esp_ts"], rec["quat"], rec["calib"])
+    if layout == "raw":
+        return encode_raw_frames(rec["seq"], rec["esp_ts"], rec["quat"], rec["accel"], rec["gyro"], rec["calib"])
+    from halo.session import encode as encode_ascii
+    return encode_ascii(rec, layout)
+
+
+# ---------- virtual serial port ----------
+class VirtualSerial:
+    """A pty pair: the simulator writes frames to the master side at rate_hz,
+    and the slave side (self.port, or the `link` symlink to it) can be opened
+    with serial.Serial like the glove's port. If nobody reads, the pty buffer
+    fills and further bytes are dropped, as a UART would."""
+
+    def __init__(self, layout="quat14", rate_hz=500, sim=None, link=None, newmlp="rpy"):
+        import tty
+        self.layout = layout
+        self.rate_hz = rate_hz
+        self.sim = sim or HandSim(rate_hz)
+        self.newmlp = newmlp
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)            # no echo / newline translation
+        os.set_blocking(self.master, False)
+        self.port = os.ttyname(self.slave)
+        self.link = link
+        if link:
+            if os.path.lexists(link):
+                os.remove(link)
+            os.symlink(self.port, link)
+        self.frames = 0
+        self.bytes = 0
+        self.dropped_bytes = 0
+
+    def write(self, data):
+        try:
+            n = os.write(self.master, data)
+        except BlockingIOError:
+            n = 0
+        self.bytes += n
+        self.dropped_bytes += len(data) - n
+
+    def drain_echo(self):
+        # anything the reader wrote to the port (e.g. a "start" command)
+        try:
+            return os.read(self.master, 4096)
+        except (BlockingIOError, OSError):
+            return b""
+
+    def run(self, seconds=None, tick=0.002, log=print, stats_every=5.0):
+        start = time.perf_counter()
+        next_stats = start + stats_every
+        try:
+            while seconds is None or time.perf_counter() - start < seconds:
+                now = time.perf_counter()
+                due = int((now - start) * self.rate_hz) - self.frames
+                if due > 0:
+                    due = min(due, max(1, int(self.rate_hz * 0.1)))   # no bursts after a stall
+                    self.write(encode(self.sim.step(due), self.layout, self.newmlp))
+                    self.frames += due
+                    self.drain_echo()
+                if now >= next_stats:
+                    log(f"[synth] {self.port}: {self.frames} frames, {self.frames / (now - start):.0f}/s, "
+                        f"{self.bytes} bytes, {self.dropped_bytes} dropped (no reader)")
+                    next_stats += stats_every
+                time.sleep(max(0.0, min(tick, start + (self.frames + 1) / self.rate_hz - time.perf_counter())))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        if self.link and os.path.islink(self.link):
+            os.remove(self.link)
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+def stream_ws(url, rate_hz=100, seconds=None, sim=None):
+    """Push the relay JSON messages to a relay's /esp endpoint."""
+    import asyncio
+    import websockets
+
+    sim = sim or HandSim(rate_hz)
+
+    async def run():
+        async with websockets.connect(url) as ws:
+            start = time.perf_counter()
+            sent = 0
+            while seconds is None or time.perf_counter() - start < seconds:
+                due = int((time.perf_counter() - start) * rate_hz) - sent
+                if due > 0:
+                    for msg in json_messages(sim.step(due)):
+                        await ws.send(msg)
+                    sent += due
+                await asyncio.sleep(0.002)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+# ---------- datasets ----------
+def _dataset_shard(args):
+    shard, seed, start, n, rate_hz, layout, newmlp, samples_path, csv_path, chunk = args
+    from halo.packet_parser import as_rows
+
+    sim = HandSim(rate_hz, seed=seed + shard)
+    samples = np.load(samples_path, mmap_mode="r+")
+    labels = np.load(samples_path.replace("samples", "labels"), mmap_mode="r+")
+    fmt = "%s," + ",".join(["%.4f"] * samples.shape[1]) + "\n"
+    with open(csv_path, "w") as f:
+        done = 0
+        while done < n:
+            m = min(chunk, n - done)
+            block = sim.step(m)
+            rows = np.round(as_rows(records(block, layout, newmlp)), 4)
+            samples[start + done:start + done + m] = rows
+            labels[start + done:start + done + m] = block["label"]
+            names = [sim.names[k] for k in block["label"].tolist()]
+            f.write("".join(fmt % (name, *r) for name, r in zip(names, rows.tolist())))
+            done += m
+    samples.flush()
+    labels.flush()
+    return shard
+
+
+def generate_dataset(csv_file, frames=1_000_000, rate_hz=100, processes=None, layout="newmlp33",
+                     newmlp="rpy", seed=0, chunk=100_000, log=print):
+    """Labelled gesture data for NewMLP: `frames` rows of `layout` written as
+    csv_file (label, values...) together with its gesture_store directory, so
+    training starts without a CSV conversion. Each process simulates its own
+    hand (seed + shard) and writes its slice of both."""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "MLP"))
+    from gesture_store import _csv_signature, store_dir_for
+
+    processes = processes or os.cpu_count() or 1
+    names = sorted(GESTURES)
+    cols = LAYOUTS[layout].n_fields if layout != "binary" else None
+    if cols is None:
+        raise ValueError("datasets are written in an ASCII layout")
+    store = store_dir_for(csv_file)
+    os.makedirs(store, exist_ok=True)
+    samples_path = os.path.join(store, "samples.npy")
+    np.lib.format.open_memmap(samples_path, mode="w+", dtype=np.float32, shape=(frames, cols)).flush()
+    np.lib.format.open_memmap(os.path.join(store, "labels.npy"), mode="w+", dtype=np.int16, shape=(frames,)).flush()
+
+    per = -(-frames // processes)
+    jobs = [(i, seed, i * per, min(per, frames - i * per), rate_hz, layout, newmlp, samples_path,
+             f"{csv_file}.part{i}", chunk) for i in range(processes) if i * per < frames]
+    t0 = time.perf_counter()
+    with mp.Pool(len(jobs)) as pool:
+        for shard in pool.imap_unordered(_dataset_shard, jobs):
+            log(f"[synth] shard {shard} done")
+    with open(csv_file, "wb") as out:
+        for job in jobs:
+            with open(job[8], "rb") as part:
+                while True:
+                    block = part.read(16 << 20)
+                    if not block:
+                        break
+                    out.write(block)
+            os.remove(job[8])
+    meta = {"rows": frames, "cols": cols, "labels_map": {name: i for i, name in enumerate(names)},
+            "csv": _csv_signature(csv_file)}
+    with open(os.path.join(store, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=1)
+    log(f"[synth] {frames} frames in {time.perf_counter() - t0:.1f} s -> {csv_file} (+ {store})")
+    return csv_file
+
+
+def glove_dataset(frames=20000, rate_hz=100, seed=0):
+    """(inputs (n, 23), joints (n, 15)) for MLP.py's GloveMLP: 10 joint
+    encoders (MCP, PIP flexion per finger), 4 flex sensors (total bend of
+    pointer .. pinky, saturating), and the wrist IMU's accel, gyro and
+    roll/pitch/yaw. The targets are the 15 kinematics.JOINT_NAMES values."""
+    sim = HandSim(rate_hz, seed=seed)
+    block = sim.step(frames)
+    rng = sim.rng
+    joints = block["joints"]
+    j = joints.reshape(-1, 5, 3)
+    encoders = j[:, :, [0, 2]].reshape(-1, 10) + rng.normal(0, np.radians(1.0), (frames, 10))
+    bend = j[:, :4, 0] + j[:, :4, 2] * (1.0 + DIP_RATIO)
+    flex = 1.0 - np.exp(-bend / 2.0) + rng.normal(0, 0.01, (frames, 4))
+    wrist = np.concatenate([block["accel"][:, 0], block["gyro"][:, 0], np.radians(block["rpy"][:, 0])], axis=-1)
+    return np.concatenate([encoders, flex, wrist], axis=-1), joints
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Synthetic HALO glove streams and datasets")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    st = sub.add_parser("stream", help="serve frames on a pty (or push JSON to a relay)")
+    st.add_argument("--layout", default="quat14", choices=WIRE_FORMATS)
+    st.add_argument("--rate", type=float, default=100.0, help="frames per second (100 .. 2000)")
+    st.add_argument("--link", help="symlink to the pty, e.g. /tmp/ttyHALO")
+    st.add_argument("--ws", help="relay /esp URL instead of a pty, e.g. ws://localhost:3000/esp")
+    st.add_argument("--seconds", type=float)
+    st.add_argument("--seed", type=int, default=0)
+    st.add_argument("--newmlp", default="rpy", choices=["rpy", "accel", "gyro"], help="newmlp33 values")
+    st.add_argument("--quiet", action="store_true", help="no sensor noise or drift")
+    ds = sub.add_parser("dataset", help="labelled gesture CSV (+ .store) for NewMLP")
+    ds.add_argument("csv")
+    ds.add_argument("--frames", type=int, default=1_000_000)
+    ds.add_argument("--rate", type=float, default=100.0)
+    ds.add_argument("--processes", type=int, default=0, help="0 = one per CPU")
+    ds.add_argument("--layout", default="newmlp33", choices=list(LAYOUTS))
+    ds.add_argument("--newmlp", default="rpy", choices=["rpy", "accel", "gyro"])
+    ds.add_argument("--seed", type=int, default=0)
+    gl = sub.add_parser("glove", help="sensor_inputs.npy / joint_outputs.npy for MLP.py")
+    gl.add_argument("--frames", type=int, default=20000)
+    gl.add_argument("--inputs", default="sensor_inputs.npy")
+    gl.add_argument("--outputs", default="joint_outputs.npy")
+    gl.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "stream":
+        sim = HandSim(args.rate, seed=args.seed, noise=SensorNoise.none() if args.quiet else None)
+        if args.ws:
+            stream_ws(args.ws, args.rate, args.seconds, sim)
+            return
+        port = VirtualSerial(args.layout, args.rate, sim, args.link, args.newmlp)
+        print(f"[synth] {args.layout} at {args.rate:.0f} Hz on {port.port}"
+              + (f" (-> {args.link})" if args.link else ""))
+        port.run(args.seconds)
+    elif args.cmd == "dataset":
+        generate_dataset(args.csv, args.frames, args.rate, args.processes or None, args.layout, args.newmlp,
+                         args.seed)
+    else:
+        X, y = glove_dataset(args.frames, seed=args.seed)
+        np.save(args.inputs, X)
+        np.save(args.outputs, y)
+        print(f"saved {args.inputs} {X.shape}, {args.outputs} {y.shape}")
+
+
+if __name__ == "__main__":
+    main()
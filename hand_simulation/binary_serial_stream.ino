@@ -0,0 +1,120 @@
+// Same sensors as node.js_handsim_arduino.ino, but streams fixed-size binary
+// frames (halo_frame.h) over USB serial instead of JSON over WebSocket.
+// Host side: halo/binary_protocol.py (BinaryDecoder).
+// RAW_MODE 1 skips the Madgwick filters and sends the MPU readings as they
+// are (HaloRawFrame); the host fuses them (halo/fusion.py, FusionDecoder), so
+// the loop only samples and can run faster (600 Hz, what the UART carries).
+#include <Wire.h>
+#include <MPU6050.h>
+#include <Adafruit_BNO055.h>
+#include <MadgwickAHRS.h>
+#include "halo_frame.h"
+
+#define BAUD 921600
+#define RAW_MODE 0
+#if RAW_MODE
+// 144-byte frames: 921600 baud carries at most ~640 per second (10 bits a byte)
+#define RATE_HZ 600
+#else
+#define RATE_HZ 500
+#endif
+#define SEND_PERIOD_US (1000000UL / RATE_HZ)
+#define DEG_TO_RAD 0.01745329251f
+
+#define NUM_MPU1 6 //mux1
+#define NUM_MPU2 4 //mux2
+MPU6050 mpus1[NUM_MPU1];
+MPU6050 mpus2[NUM_MPU2];
+Madgwick filter1[NUM_MPU1];
+Madgwick filter2[NUM_MPU2];
+Adafruit_BNO055 bno = Adafruit_BNO055(55);
+
+//multiplexers
+#define TCA1 0x70
+#define TCA2 0x71
+uint8_t mux1_channels[] = {0,2,3,4,5,6};
+uint8_t mux2_channels[] = {0,1,6,7};
+
+unsigned long lastSend = 0;
+uint32_t seq = 0;
+HaloFrame frame;
+HaloRawFrame rawFrame;
+
+void tcaSelect(uint8_t addr, uint8_t channel) {
+  if(channel > 7) return;
+  Wire.beginTransmission(addr);
+  Wire.write(1 << channel);
+  Wire.endTransmission();
+}
+
+void readMpu(MPU6050& mpu, Madgwick& filter, int idx) {
+  int16_t ax, ay, az, gx, gy, gz;
+  mpu.getMotion6(&ax, &ay, &az, &gx, &gy, &gz);
+#if RAW_MODE
+  int16_t* r = rawFrame.imu[idx - 1];
+  r[0] = ax; r[1] = ay; r[2] = az; r[3] = gx; r[4] = gy; r[5] = gz;
+#else
+  filter.updateIMU(
+    gx*DEG_TO_RAD/131.0f, gy*DEG_TO_RAD/131.0f, gz*DEG_TO_RAD/131.0f,
+    ax/16384.0f, ay/16384.0f, az/16384.0f
+  );
+  haloSetQuat(&frame, idx, filter.q0, filter.q1, filter.q2, filter.q3);
+#endif
+}
+
+void setup() {
+  Serial.begin(BAUD);
+  Wire.begin();
+  Wire.setClock(400000);
+
+  for(int i = 0; i < NUM_MPU1; i++){
+    tcaSelect(TCA1, mux1_channels[i]);
+    mpus1[i].initialize();
+    filter1[i].begin(RATE_HZ);
+  }
+  for(int i = 0; i < NUM_MPU2; i++){
+    tcaSelect(TCA2, mux2_channels[i]);
+    mpus2[i].initialize();
+    filter2[i].begin(RATE_HZ);
+  }
+
+  if(bno.begin()) bno.setExtCrystalUse(true);
+  // no text output after this point, the host expects binary only
+}
+
+void loop() {
+  unsigned long now = micros();
+  if(now - lastSend < SEND_PERIOD_US){ return; }
+  lastSend = now;
+
+  frame.seq = seq++;
+  frame.esp_ts = now;
+
+  // Wrist
+  imu::Quaternion q = bno.getQuat();
+  haloSetQuat(&frame, 0, q.w(), q.x(), q.y(), q.z());
+  uint8_t sys, gyro, accel, mag;
+  bno.getCalibration(&sys, &gyro, &accel, &mag);
+  frame.calib[0] = sys; frame.calib[1] = gyro; frame.calib[2] = accel; frame.calib[3] = mag;
+
+  // Fingers, same order as the JSON "fingers" array
+  for(int i = 0; i < NUM_MPU1; i++){
+    tcaSelect(TCA1, mux1_channels[i]);
+    readMpu(mpus1[i], filter1[i], 1 + i);
+  }
+  for(int i = 0; i < NUM_MPU2; i++){
+    tcaSelect(TCA2, mux2_channels[i]);
+    readMpu(mpus2[i], filter2[i], 1 + NUM_MPU1 + i);
+  }
+
+#if RAW_MODE
+  rawFrame.seq = frame.seq;
+  rawFrame.esp_ts = frame.esp_ts;
+  for(int k = 0; k < 4; k++){ rawFrame.quat[k] = frame.quat[0][k]; rawFrame.calib[k] = frame.calib[k]; }
+  haloFinishRaw(&rawFrame);
+  Serial.write((const uint8_t*)&rawFrame, sizeof(rawFrame));
+#else
+  haloFinish(&frame);
+  Serial.write((const uint8_t*)&frame, sizeof(frame));
+#endif
+}
@@ -0,0 +1,71 @@
+// Binary frame shared by the ESP32 sketches and halo/binary_protocol.py.
+// Little-endian, 104 bytes. Keep both sides in sync if you change anything.
+#pragma once
+#include <stdint.h>
+#include <stddef.h>
+#include <math.h>
+
+#define HALO_SYNC0 0xA5
+#define HALO_SYNC1 0x5A
+#define HALO_RAW_SYNC1 0x5B
+#define HALO_NUM_MPUS 10
+#define HALO_NUM_IMUS 11
+#define HALO_Q14 16384.0f
+
+typedef struct __attribute__((packed)) {
+  uint8_t  sync[2];                    // 0xA5 0x5A
+  uint32_t seq;                        // +1 per frame
+  uint32_t esp_ts;                     // micros()
+  int16_t  quat[HALO_NUM_IMUS][4];     // w,x,y,z in Q14; 0 = wrist BNO, 1..10 = fingers
+  uint8_t  calib[4];                   // BNO sys, gyro, accel, mag
+  uint16_t crc;                        // over seq..calib
+} HaloFrame;
+
+// Raw mode: MPUs unfiltered, the host fuses them (halo/fusion.py). 144 bytes.
+typedef struct __attribute__((packed)) {
+  uint8_t  sync[2];                    // 0xA5 0x5B
+  uint32_t seq;
+  uint32_t esp_ts;
+  int16_t  quat[4];                    // wrist BNO w,x,y,z in Q14
+  int16_t  imu[HALO_NUM_MPUS][6];      // ax,ay,az,gx,gy,gz counts (+-2 g, +-250 deg/s)
+  uint8_t  calib[4];
+  uint16_t crc;                        // over seq..calib
+} HaloRawFrame;
+
+// CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF), same as python binascii.crc_hqx(data, 0xFFFF)
+static inline uint16_t haloCrc16(const uint8_t* data, size_t len) {
+  uint16_t crc = 0xFFFF;
+  for (size_t i = 0; i < len; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (int b = 0; b < 8; b++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : (crc << 1);
+    }
+  }
+  return crc;
+}
+
+static inline int16_t haloToQ14(float v) {
+  float s = v * HALO_Q14;
+  if (s > 32767.0f) s = 32767.0f;
+  if (s < -32768.0f) s = -32768.0f;
+  return (int16_t)lrintf(s);
+}
+
+static inline void haloSetQuat(HaloFrame* f, int idx, float w, float x, float y, float z) {
+  f->quat[idx][0] = haloToQ14(w);
+  f->quat[idx][1] = haloToQ14(x);
+  f->quat[idx][2] = haloToQ14(y);
+  f->quat[idx][3] = haloToQ14(z);
+}
+
+static inline void haloFinish(HaloFrame* f) {
+  f->sync[0] = HALO_SYNC0;
+  f->sync[1] = HALO_SYNC1;
+  f->crc = haloCrc16(((const uint8_t*)f) + 2, sizeof(HaloFrame) - 4);
+}
+
+static inline void haloFinishRaw(HaloRawFrame* f) {
+  f->sync[0] = HALO_SYNC0;
+  f->sync[1] = HALO_RAW_SYNC1;
+  f->crc = haloCrc16(((const uint8_t*)f) + 2, sizeof(HaloRawFrame) - 4);
+}